@@ -5,32 +5,42 @@ import asyncio
 import math
 import pandas as pd
 import numpy as np
-import yfinance as yf
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from datetime import datetime, timedelta
-import akshare as ak
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from tradingagents.graph.trading_graph import TradingAgentsGraph
 from tradingagents.default_config import DEFAULT_CONFIG
 from tradingagents.utils.logging_manager import get_logger
+from tradingagents.utils.metrics import CONTENT_TYPE, render_metrics
 import backtest
-from tradingagents.dataflows.providers.china.akshare import AKShareProvider
 
-try:
-    from tradingagents.dataflows.providers.hk.improved_hk import get_hk_financial_indicators
-    HK_AVAILABLE = True
-except ImportError:
-    HK_AVAILABLE = False
-
-# Initialize Provider
-stock_provider = AKShareProvider()
+# akshare, yfinance and the TradingAgentsGraph stack are imported on first use, not at startup
 logger = get_logger("api")
+_stock_provider = None
+
+
+def get_stock_provider():
+    # AKShare provider, created on the first search request
+    global _stock_provider
+    if _stock_provider is None:
+        from tradingagents.dataflows.providers.china.akshare import AKShareProvider
+        _stock_provider = AKShareProvider()
+    return _stock_provider
+
+
+def get_hk_indicators_fn():
+    # HK financial indicators helper, or None when the HK provider is unavailable
+    try:
+        from tradingagents.dataflows.providers.hk.improved_hk import get_hk_financial_indicators
+        return get_hk_financial_indicators
+    except ImportError:
+        return None
 
 app = FastAPI(title="Mojin Quant Core", version="1.0.0")
 app.include_router(backtest.router)
@@ -135,6 +145,7 @@ def calculate_technicals(df: pd.DataFrame) -> Dict[str, float]:
 
 def get_capital_flow(code: str) -> Dict[str, Any]:
     try:
+        import akshare as ak
         # Determine market
         market = "sh" if code.startswith("6") else "sz"
         if code.startswith(("8", "4", "9")): market = "bj"
@@ -157,10 +168,15 @@ def get_capital_flow(code: str) -> Dict[str, Any]:
 @app.get("/")
 def health(): return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text format: data source, cache, LLM and graph node metrics of this process
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
 @app.get("/search")
 async def search(q: str):
     try:
-        stocks = await stock_provider.get_stock_list()
+        stocks = await get_stock_provider().get_stock_list()
         q_str = q.lower().strip()
         results = []
         for s in stocks:
@@ -180,13 +196,16 @@ async def get_fundamentals(code: str):
         is_hk = code.endswith(".HK") or (len(code) == 5 and code.isdigit())
         is_us = any(c.isalpha() for c in code) and not code.endswith(".HK")
         
+        import akshare as ak
+
         result = {"code": code}
         technicals = {}
         capital_flow = {}
 
         if is_hk:
             code_hk = f"{int(code):05d}.HK" if code.isdigit() else code
-            if HK_AVAILABLE:
+            get_hk_financial_indicators = get_hk_indicators_fn()
+            if get_hk_financial_indicators is not None:
                 hk_f = await asyncio.to_thread(get_hk_financial_indicators, code_hk)
                 result.update({
                     'eps': hk_f.get('eps_basic'), 'bvps': hk_f.get('bps'),
@@ -200,6 +219,7 @@ async def get_fundamentals(code: str):
             except: pass
 
         elif is_us:
+            import yfinance as yf
             ticker = yf.Ticker(code)
             info = ticker.info
             result.update({
@@ -299,6 +319,7 @@ async def analyze(req: AnalyzeRequest):
             "quick_think_llm": os.getenv("GEMINI_MODEL", "gemini-3-pro-preview"),
         })
         if "GEMINI_API_KEY" in os.environ: os.environ["GOOGLE_API_KEY"] = os.environ["GEMINI_API_KEY"]
+        from tradingagents.graph.trading_graph import TradingAgentsGraph
         ta = TradingAgentsGraph(debug=True, config=config)
         final_state, decision = ta.propagate(req.code, req.date)
         return {"code": req.code, "decision": decision, "final_state": final_state}
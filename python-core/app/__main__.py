@@ -3,6 +3,7 @@ TradingAgents-CN Backend Entry Point
 支持 python -m app 启动方式
 """
 
+import asyncio
 import uvicorn
 import sys
 import os
@@ -100,6 +101,7 @@ def check_env_file():
 try:
     from app.core.config import settings
     from app.core.dev_config import DEV_CONFIG
+    from app.core.process_role import get_process_role
 except Exception as e:
     import traceback
     print(f"❌ 导入配置模块失败: {e}")
@@ -114,8 +116,19 @@ def main():
     """主启动函数"""
     import logging
     logger = logging.getLogger("app.startup")
-    
-    logger.info("🚀 Starting TradingAgents-CN Backend...")
+
+    # 按进程角色选择入口：scheduler / worker 不启动 HTTP 服务
+    role = get_process_role()
+    if role == "scheduler":
+        from app.scheduler_main import main as scheduler_main
+        asyncio.run(scheduler_main())
+        return
+    if role == "worker":
+        from app.worker.analysis_worker import main as worker_main
+        asyncio.run(worker_main())
+        return
+
+    logger.info(f"🚀 Starting TradingAgents-CN Backend (APP_ROLE={role})...")
     logger.info(f"📍 Host: {settings.HOST}")
     logger.info(f"🔌 Port: {settings.PORT}")
     logger.info(f"🐛 Debug Mode: {settings.DEBUG}")
@@ -26,6 +26,10 @@ class Settings(BaseSettings):
     PORT: int = Field(default=8000)
     ALLOWED_ORIGINS: List[str] = Field(default_factory=lambda: ["*"])
     ALLOWED_HOSTS: List[str] = Field(default_factory=lambda: ["*"])
+    APP_ROLE: str = Field(
+        default="all",
+        description="进程角色：all（API+调度器）/ api（仅HTTP）/ scheduler（仅定时任务）/ worker（仅分析队列）"
+    )
 
     # MongoDB配置
     MONGODB_HOST: str = Field(default="localhost")
@@ -116,6 +120,31 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = Field(default=10 * 1024 * 1024)  # 10MB
     UPLOAD_DIR: str = Field(default="uploads")
 
+    # 报告导出缓存（PDF/DOCX 渲染结果按内容哈希缓存到磁盘）
+    REPORT_EXPORT_CACHE_DIR: str = Field(default="data/report_exports", description="报告导出缓存目录")
+    REPORT_EXPORT_CACHE_MAX_MB: int = Field(default=512, description="报告导出缓存容量上限（MB），超出按最近最少使用淘汰")
+    REPORT_EXPORT_WORKERS: int = Field(default=2, description="报告渲染进程池大小")
+    REPORT_EXPORT_PREWARM: bool = Field(default=True, description="分析完成后预渲染 PDF/DOCX")
+
+    # 纸上交易持仓估值价格缓存
+    PAPER_PRICE_CACHE_TTL_SECONDS: float = Field(default=5.0, description="纸上交易取价缓存有效期（秒），多个请求共享")
+    PAPER_ORDER_MATCHING_ENABLED: bool = Field(default=True, description="启用纸上交易限价/止损挂单撮合")
+    PAPER_ORDER_POLL_SECONDS: float = Field(default=5.0, description="挂单轮询撮合及订单簿同步间隔（秒，港股/美股及不支持变更流时的A股）")
+    PAPER_ORDER_CLAIM_TIMEOUT_SECONDS: float = Field(default=120.0, description="挂单认领超时（秒），超时仍未成交的 filling 订单才会被放回 open")
+
+    # 回测日线缓存
+    BACKTEST_BAR_CACHE_DIR: str = Field(default="data/backtest_bars", description="回测日线缓存目录")
+    BACKTEST_BAR_REFRESH_SECONDS: int = Field(default=3600, description="回测日线最新数据刷新间隔（秒）")
+    BACKTEST_JOB_WORKERS: int = Field(default=2, description="回测稳健性任务（walk-forward/蒙特卡洛）进程池大小")
+    BACKTEST_MC_CHUNK_PATHS: int = Field(default=250, description="蒙特卡洛每个子任务重采样的路径数")
+    BACKTEST_MAX_COMBINATIONS: int = Field(default=5000, description="单次回测参数网格的组合数上限，超出返回 400")
+
+    # 分析任务采样剖析（按任务参数 enable_profiling 开启，或按比例抽样）
+    ANALYSIS_PROFILE_SAMPLE_RATE: float = Field(default=0.0, ge=0.0, le=1.0, description="自动剖析的分析任务比例（0-1，0 表示只剖析显式要求的任务）")
+    ANALYSIS_PROFILE_INTERVAL_MS: int = Field(default=10, ge=1, description="剖析采样间隔（毫秒）")
+    ANALYSIS_PROFILE_ALL_THREADS: bool = Field(default=False, description="采样进程内全部线程（默认只采样执行分析的线程）")
+    ANALYSIS_PROFILE_MAX_FILES: int = Field(default=200, description="保留的剖析结果份数上限，超出删除最旧的")
+
     # 缓存配置
     CACHE_TTL: int = Field(default=3600)  # 1小时
     SCREENING_CACHE_TTL: int = Field(default=1800)  # 30分钟
@@ -139,6 +168,9 @@ class Settings(BaseSettings):
 
     # 监控配置
     METRICS_ENABLED: bool = Field(default=True)
+    METRICS_HOST: str = Field(default="0.0.0.0", description="Worker/定时任务进程指标端点监听地址")
+    WORKER_METRICS_PORT: int = Field(default=9101, description="分析 Worker 进程 /metrics 端口（0 表示不启动；同机多个 Worker 需各自配置）")
+    SCHEDULER_METRICS_PORT: int = Field(default=9102, description="定时任务进程 /metrics 端口（0 表示不启动）")
     HEALTH_CHECK_INTERVAL: int = Field(default=60)  # 60秒
 
 
@@ -181,6 +213,32 @@ class Settings(BaseSettings):
         default=True,
         description="自动检测Tushare rt_k接口权限，付费用户自动切换到高频模式（5秒）"
     )
+    # 增量入库与变更推送
+    QUOTES_DELTA_FULL_REFRESH_SECONDS: int = Field(
+        default=1800,
+        description="增量入库模式下全量重写 market_quotes 的间隔（秒），用于与数据库对账；0 表示每次都全量写入"
+    )
+    QUOTES_CHANGE_FEED_ENABLED: bool = Field(
+        default=True,
+        description="将每次采集的行情变更（code, 变化字段）发布到 Redis 频道"
+    )
+    QUOTES_CHANGE_FEED_CHANNEL: str = Field(
+        default="market_quotes:changes",
+        description="行情变更推送的 Redis 频道名"
+    )
+    # 盘中分钟K线（由行情快照聚合）
+    QUOTES_INTRADAY_BARS_ENABLED: bool = Field(
+        default=True,
+        description="根据每次采集的行情快照聚合 1/5/15 分钟K线并写入 intraday_bars 集合"
+    )
+    QUOTES_INTRADAY_BAR_RETENTION_DAYS: int = Field(
+        default=5,
+        description="分钟K线保留天数（TTL 索引自动清理）"
+    )
+    QUOTES_INTRADAY_MAX_PENDING_BARS: int = Field(
+        default=200000,
+        description="数据库不可用时内存中待写分钟K线的上限，超出丢弃最旧的"
+    )
 
     # Tushare基础配置
     TUSHARE_TOKEN: str = Field(default="", description="Tushare API Token")
@@ -64,6 +64,9 @@ redis_pool: Optional[ConnectionPool] = None
 _sync_mongo_client: Optional[MongoClient] = None
 _sync_mongo_db: Optional[Database] = None
 
+# 同步 Redis 连接（用于非异步上下文，如线程中的数据源调用）
+_sync_redis_client = None
+
 
 class DatabaseManager:
     """数据库连接管理器"""
@@ -407,6 +410,11 @@ async def create_database_indexes(db):
         await market_quotes.create_index([("amount", -1)])
         await market_quotes.create_index([("updated_at", -1)])
 
+        # backtest_jobs 的索引（回测任务结果）
+        backtest_jobs = db["backtest_jobs"]
+        await backtest_jobs.create_index([("job_id", 1)], unique=True)
+        await backtest_jobs.create_index([("user_id", 1), ("created_at", -1)])
+
         logger.info("✅ 数据库索引创建完成")
 
     except Exception as e:
@@ -464,6 +472,25 @@ def get_mongo_db_sync() -> Database:
     return _sync_mongo_db
 
 
+def get_redis_client_sync():
+    """
+    获取同步版本的Redis客户端
+    用于非异步上下文（如线程池中的数据源调用）
+    """
+    global _sync_redis_client
+
+    if _sync_redis_client is None:
+        import redis as sync_redis
+        _sync_redis_client = sync_redis.Redis.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=True,
+            socket_timeout=5,
+            socket_connect_timeout=5,
+        )
+    return _sync_redis_client
+
+
 def get_redis_client() -> Redis:
     """获取Redis客户端"""
     if redis_client is None:
@@ -6,6 +6,7 @@ import os
 import platform
 
 from app.core.logging_context import LoggingContextFilter, trace_id_var
+from tradingagents.utils.async_logging import flush_queue_logging, install_queue_logging_for
 
 # 🔥 在 Windows 上使用 concurrent-log-handler 避免文件占用问题
 _IS_WINDOWS = platform.system() == "Windows"
@@ -63,12 +64,24 @@ def _parse_size(size_str: str) -> int:
             return 10 * 1024 * 1024
     return 10 * 1024 * 1024
 
+
+def _install_queue_logging(logging_config: dict):
+    """dictConfig 之后把各日志器的处理器移到后台队列线程（事件循环/工作线程不阻塞在磁盘 I/O 上）"""
+    names = [None] + list(logging_config.get("loggers", {}).keys())
+    installed = install_queue_logging_for(names)
+    if installed:
+        print(f"✅ [setup_logging] 已启用队列日志: {installed}")
+
+
 def setup_logging(log_level: str = "INFO"):
     """
     设置应用日志配置：
     1) 优先尝试从 config/logging.toml 读取并转化为 dictConfig
     2) 失败或不存在时，回退到内置默认配置
     """
+    # 重新配置前先写出队列中积压的日志（dictConfig 会关闭旧处理器）
+    flush_queue_logging()
+
     # 1) 若存在 TOML 配置且可解析，则优先使用
     try:
         cfg_path = resolve_logging_cfg_path()
@@ -335,6 +348,7 @@ def setup_logging(log_level: str = "INFO"):
             print(f"🔍 [setup_logging] 开始应用 dictConfig")
 
             logging.config.dictConfig(logging_config)
+            _install_queue_logging(logging_config)
 
             print(f"✅ [setup_logging] dictConfig 应用成功")
 
@@ -421,4 +435,5 @@ def setup_logging(log_level: str = "INFO"):
     }
 
     logging.config.dictConfig(logging_config)
+    _install_queue_logging(logging_config)
     logging.getLogger("webapi").info("Logging configured successfully (built-in)")
\ No newline at end of file
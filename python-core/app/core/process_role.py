@@ -0,0 +1,32 @@
+"""
+进程角色（APP_ROLE）
+- all：API + 定时任务调度器（单进程部署，默认）
+- api：仅提供 HTTP 接口，不运行调度器，不加载数据源同步服务
+- scheduler：仅运行定时同步任务、启动补数与纸上交易挂单撮合（python -m app）
+- worker：仅消费分析任务队列（python -m app）
+"""
+
+from typing import Optional
+
+PROCESS_ROLES = ("all", "api", "scheduler", "worker")
+
+
+def get_process_role(role: Optional[str] = None) -> str:
+    """返回规范化的进程角色（默认读取 settings.APP_ROLE），无效值抛出 ValueError"""
+    if role is None:
+        from app.core.config import settings
+        role = settings.APP_ROLE
+    role = (role or "all").strip().lower()
+    if role not in PROCESS_ROLES:
+        raise ValueError(f"无效的 APP_ROLE: {role}（可选: {', '.join(PROCESS_ROLES)}）")
+    return role
+
+
+def serves_http(role: Optional[str] = None) -> bool:
+    """该角色是否提供 HTTP 接口"""
+    return get_process_role(role) in ("all", "api")
+
+
+def runs_scheduler(role: Optional[str] = None) -> bool:
+    """该角色是否运行定时任务调度器"""
+    return get_process_role(role) in ("all", "scheduler")
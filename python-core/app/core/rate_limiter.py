@@ -1,16 +1,66 @@
 """
 速率限制器
 用于控制API调用频率，避免超过数据源的限流限制
+
+- RateLimiter: 进程内滑动窗口限流
+- DistributedRateLimiter: 基于 Redis 令牌桶的跨进程/跨副本限流，Redis 不可用时退化为进程内限流
 """
 import asyncio
+import threading
 import time
 import logging
 from collections import deque
-from typing import Optional
+from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
 
+class RatePriority:
+    """调用优先级（数值越小优先级越高）"""
+
+    INTERACTIVE = 0  # 交互式分析（用户正在等待结果）
+    NORMAL = 1       # 普通调用
+    BULK = 2         # 批量同步任务
+
+    NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BULK: "bulk"}
+
+
+# 令牌桶 Lua 脚本（原子执行：补充令牌 + 尝试取令牌）
+# KEYS[1]: 令牌桶哈希键
+# ARGV: now_ms, capacity, refill_per_ms, reserve(为高优先级保留的令牌数), ttl_ms
+# 返回: {需要等待的毫秒数(0 表示已获取), 剩余令牌数}
+TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local rate = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+local ttl = tonumber(ARGV[5])
+
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1])
+local ts = tonumber(data[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+if now > ts then
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    ts = now
+end
+
+local wait = 0
+if tokens >= 1 + reserve then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 + reserve - tokens) / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(ts))
+redis.call('PEXPIRE', KEYS[1], ttl)
+return {wait, tostring(tokens)}
+"""
+
+
 class RateLimiter:
     """
     滑动窗口速率限制器
@@ -97,7 +147,210 @@ class RateLimiter:
         logger.info(f"🔄 {self.name} 统计信息已重置")
 
 
-class TushareRateLimiter(RateLimiter):
+class DistributedRateLimiter(RateLimiter):
+    """
+    分布式令牌桶速率限制器
+
+    多个同步 worker 和 API 副本共享同一个 Redis 令牌桶，保证整体调用频率不超过数据源配额。
+    低优先级调用只能使用保留令牌之外的额度，交互式分析因此总能优先获得令牌。
+    Redis 不可用时自动退化为进程内滑动窗口限流，并在 REDIS_RETRY_SECONDS 内不再尝试 Redis。
+    """
+
+    KEY_PREFIX = "rate_limiter:"
+
+    # 各优先级需要为更高优先级保留的令牌比例
+    PRIORITY_RESERVE = {
+        RatePriority.INTERACTIVE: 0.0,
+        RatePriority.NORMAL: 0.1,
+        RatePriority.BULK: 0.25,
+    }
+
+    # 单次等待上限（秒），超过后重新向 Redis 询问，以便及时响应其他进程释放的额度
+    MAX_SLEEP = 1.0
+
+    # Redis 调用失败后在该时长（秒）内直接使用进程内限流，避免每次调用都重连并等待 socket 超时
+    REDIS_RETRY_SECONDS = 30.0
+
+    def __init__(self, max_calls: int, time_window: float, name: str = "RateLimiter", bucket: Optional[str] = None):
+        """
+        初始化分布式速率限制器
+
+        Args:
+            max_calls: 时间窗口内最大调用次数（令牌桶容量）
+            time_window: 时间窗口大小（秒）
+            name: 限制器名称（用于日志）
+            bucket: Redis 令牌桶名称，相同名称的限制器共享配额（默认使用 name）
+        """
+        super().__init__(max_calls=max_calls, time_window=time_window, name=name)
+        self.bucket_key = f"{self.KEY_PREFIX}{bucket or name}"
+        self.refill_per_ms = max_calls / (time_window * 1000.0)
+        self.ttl_ms = int(time_window * 2000)
+
+        self._async_script = None
+        self._sync_script = None
+        self._sync_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        # 按优先级统计等待情况
+        self.priority_stats: Dict[int, Dict[str, float]] = {
+            p: {"calls": 0, "waits": 0, "wait_time": 0.0, "max_wait": 0.0} for p in RatePriority.NAMES
+        }
+        self.redis_fallbacks = 0
+        self._redis_retry_at = 0.0
+
+    def _redis_available(self) -> bool:
+        """是否应尝试 Redis 令牌桶（失败后的退避期内返回 False）"""
+        return time.time() >= self._redis_retry_at
+
+    def _on_redis_error(self, e: Exception):
+        """记录 Redis 失败并进入退避期"""
+        self._redis_retry_at = time.time() + self.REDIS_RETRY_SECONDS
+        logger.debug(f"⚠️ {self.name} Redis令牌桶不可用，{self.REDIS_RETRY_SECONDS:.0f}秒内使用进程内限流: {e}")
+
+    def _reserve_tokens(self, priority: int) -> float:
+        return self.max_calls * self.PRIORITY_RESERVE.get(priority, 0.0)
+
+    def _script_args(self, priority: int):
+        return [int(time.time() * 1000), self.max_calls, self.refill_per_ms,
+                self._reserve_tokens(priority), self.ttl_ms]
+
+    def _record(self, priority: int, wait_time: float):
+        with self._stats_lock:
+            self.total_calls += 1
+            bucket = self.priority_stats.setdefault(
+                priority, {"calls": 0, "waits": 0, "wait_time": 0.0, "max_wait": 0.0}
+            )
+            bucket["calls"] += 1
+            if wait_time > 0:
+                self.total_waits += 1
+                self.total_wait_time += wait_time
+                bucket["waits"] += 1
+                bucket["wait_time"] += wait_time
+                bucket["max_wait"] = max(bucket["max_wait"], wait_time)
+
+    def _get_async_script(self):
+        if self._async_script is None:
+            from app.core.database import get_redis_client
+            self._async_script = get_redis_client().register_script(TOKEN_BUCKET_LUA)
+        return self._async_script
+
+    def _get_sync_script(self):
+        if self._sync_script is None:
+            from app.core.database import get_redis_client_sync
+            self._sync_script = get_redis_client_sync().register_script(TOKEN_BUCKET_LUA)
+        return self._sync_script
+
+    async def acquire(self, priority: int = RatePriority.NORMAL):
+        """
+        获取调用许可（异步）
+        如果超过速率限制，会等待直到可以调用
+
+        Args:
+            priority: 调用优先级，见 RatePriority
+        """
+        start = time.time()
+        if not self._redis_available():
+            self.redis_fallbacks += 1
+            await self._acquire_local()
+            self._record(priority, time.time() - start)
+            return
+        try:
+            script = self._get_async_script()
+            while True:
+                wait_ms, _ = await script(keys=[self.bucket_key], args=self._script_args(priority))
+                wait_ms = int(wait_ms)
+                if wait_ms <= 0:
+                    break
+                logger.debug(f"⏳ {self.name} 达到速率限制，等待 {wait_ms / 1000:.2f}秒 "
+                             f"(优先级: {RatePriority.NAMES.get(priority, priority)})")
+                await asyncio.sleep(min(wait_ms / 1000.0, self.MAX_SLEEP))
+        except Exception as e:
+            self._async_script = None
+            self.redis_fallbacks += 1
+            self._on_redis_error(e)
+            await self._acquire_local()
+        self._record(priority, time.time() - start)
+
+    async def _acquire_local(self):
+        """进程内滑动窗口限流（Redis 不可用时使用）"""
+        async with self.lock:
+            now = time.time()
+            while self.calls and self.calls[0] <= now - self.time_window:
+                self.calls.popleft()
+            if len(self.calls) >= self.max_calls:
+                wait_time = self.calls[0] + self.time_window - now + 0.01
+                if wait_time > 0:
+                    await asyncio.sleep(wait_time)
+                    now = time.time()
+                    while self.calls and self.calls[0] <= now - self.time_window:
+                        self.calls.popleft()
+            self.calls.append(now)
+
+    def acquire_sync(self, priority: int = RatePriority.NORMAL):
+        """
+        获取调用许可（同步，供线程中的数据源调用使用）
+
+        Args:
+            priority: 调用优先级，见 RatePriority
+        """
+        start = time.time()
+        if not self._redis_available():
+            self.redis_fallbacks += 1
+            self._acquire_local_sync()
+            self._record(priority, time.time() - start)
+            return
+        try:
+            script = self._get_sync_script()
+            while True:
+                wait_ms, _ = script(keys=[self.bucket_key], args=self._script_args(priority))
+                wait_ms = int(wait_ms)
+                if wait_ms <= 0:
+                    break
+                time.sleep(min(wait_ms / 1000.0, self.MAX_SLEEP))
+        except Exception as e:
+            self._sync_script = None
+            self.redis_fallbacks += 1
+            self._on_redis_error(e)
+            self._acquire_local_sync()
+        self._record(priority, time.time() - start)
+
+    def _acquire_local_sync(self):
+        with self._sync_lock:
+            now = time.time()
+            while self.calls and self.calls[0] <= now - self.time_window:
+                self.calls.popleft()
+            if len(self.calls) >= self.max_calls:
+                wait_time = self.calls[0] + self.time_window - now + 0.01
+                if wait_time > 0:
+                    time.sleep(wait_time)
+                    now = time.time()
+                    while self.calls and self.calls[0] <= now - self.time_window:
+                        self.calls.popleft()
+            self.calls.append(now)
+
+    def get_stats(self) -> dict:
+        """获取统计信息（包含按优先级的等待统计）"""
+        stats = super().get_stats()
+        stats["bucket"] = self.bucket_key
+        stats["redis_fallbacks"] = self.redis_fallbacks
+        stats["priorities"] = {
+            RatePriority.NAMES.get(p, str(p)): {
+                **values,
+                "avg_wait_time": values["wait_time"] / values["waits"] if values["waits"] > 0 else 0,
+            }
+            for p, values in self.priority_stats.items()
+        }
+        return stats
+
+    def reset_stats(self):
+        """重置统计信息"""
+        for values in self.priority_stats.values():
+            values.update({"calls": 0, "waits": 0, "wait_time": 0.0, "max_wait": 0.0})
+        self.redis_fallbacks = 0
+        super().reset_stats()
+
+
+class TushareRateLimiter(DistributedRateLimiter):
     """
     Tushare专用速率限制器
     
@@ -134,7 +387,8 @@ class TushareRateLimiter(RateLimiter):
         super().__init__(
             max_calls=max_calls,
             time_window=time_window,
-            name=f"TushareRateLimiter({tier})"
+            name=f"TushareRateLimiter({tier})",
+            bucket="tushare"
         )
         
         self.tier = tier
@@ -144,7 +398,7 @@ class TushareRateLimiter(RateLimiter):
                    f"{max_calls}次/{time_window}秒 (安全边际: {safety_margin*100:.0f}%)")
 
 
-class AKShareRateLimiter(RateLimiter):
+class AKShareRateLimiter(DistributedRateLimiter):
     """
     AKShare专用速率限制器
     
@@ -162,11 +416,12 @@ class AKShareRateLimiter(RateLimiter):
         super().__init__(
             max_calls=max_calls,
             time_window=time_window,
-            name="AKShareRateLimiter"
+            name="AKShareRateLimiter",
+            bucket="akshare"
         )
 
 
-class BaoStockRateLimiter(RateLimiter):
+class BaoStockRateLimiter(DistributedRateLimiter):
     """
     BaoStock专用速率限制器
     
@@ -184,7 +439,8 @@ class BaoStockRateLimiter(RateLimiter):
         super().__init__(
             max_calls=max_calls,
             time_window=time_window,
-            name="BaoStockRateLimiter"
+            name="BaoStockRateLimiter",
+            bucket="baostock"
         )
 
 
@@ -218,6 +474,15 @@ def get_baostock_rate_limiter() -> BaoStockRateLimiter:
     return _baostock_limiter
 
 
+def get_all_rate_limiter_stats() -> Dict[str, dict]:
+    """获取所有已创建的速率限制器的统计信息"""
+    stats = {}
+    for key, limiter in (("tushare", _tushare_limiter), ("akshare", _akshare_limiter), ("baostock", _baostock_limiter)):
+        if limiter is not None:
+            stats[key] = limiter.get_stats()
+    return stats
+
+
 def reset_all_limiters():
     """重置所有速率限制器"""
     global _tushare_limiter, _akshare_limiter, _baostock_limiter
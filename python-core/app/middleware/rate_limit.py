@@ -1,25 +1,152 @@
 """
 速率限制中间件
 防止API滥用，实现用户级和端点级速率限制
+
+- 端点级限流使用 Redis 有序集合实现的滑动窗口，由 Lua 脚本原子执行
+- 同一个 Lua 脚本同时校验每日配额，每个请求只需一次 Redis 往返
+- 限流键使用路由模板（如 /api/reports/{report_id}）而不是原始路径，避免键空间随ID膨胀
+- 进程内预检查：本地窗口已超限或 Redis 已判定封禁的客户端直接拒绝，不访问 Redis
 """
 
 from fastapi import Request, Response, HTTPException
+from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import Match
+import datetime
 import logging
-from typing import Callable, Dict, Optional
-from core.redis_client import get_redis_service, RedisKeys
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from app.core.redis_client import get_redis_service, RedisKeys
 
 logger = logging.getLogger(__name__)
 
 
+# 滑动窗口 + 每日配额 原子检查脚本
+# KEYS[1]: 滑动窗口有序集合键  KEYS[2]: 每日配额计数键
+# ARGV: now_ms, window_ms, rate_limit, member, daily_quota(<=0 表示不检查), quota_ttl
+# 返回: {状态(0=通过,1=限流,2=配额超限), 窗口内计数, 建议重试毫秒数, 今日使用量(-1 表示未检查)}
+SLIDING_WINDOW_QUOTA_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local member = ARGV[4]
+local quota = tonumber(ARGV[5])
+local quota_ttl = tonumber(ARGV[6])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count >= limit then
+    local retry = window
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    if oldest[2] then
+        retry = tonumber(oldest[2]) + window - now
+    end
+    return {1, count, retry, -1}
+end
+
+local usage = -1
+if quota > 0 then
+    usage = tonumber(redis.call('GET', KEYS[2]) or '0')
+    if usage >= quota then
+        return {2, count, 0, usage}
+    end
+    usage = redis.call('INCR', KEYS[2])
+    if usage == 1 then
+        redis.call('EXPIRE', KEYS[2], quota_ttl)
+    end
+end
+
+redis.call('ZADD', KEYS[1], now, member)
+redis.call('PEXPIRE', KEYS[1], window)
+return {0, count + 1, 0, usage}
+"""
+
+
+class LocalRateGuard:
+    """
+    进程内限流预检查
+
+    本进程内的请求数只会小于等于全局请求数，因此本地窗口已满时全局必然超限，
+    可以直接拒绝；Redis 判定限流后记录封禁截止时间，窗口释放前同样本地拒绝。
+    """
+
+    def __init__(self, window_seconds: float = 60.0, max_keys: int = 10000):
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._windows: "OrderedDict[str, deque]" = OrderedDict()
+        self._blocked_until: Dict[str, float] = {}
+
+    def check(self, key: str, limit: int, now: Optional[float] = None) -> float:
+        """返回需要等待的秒数，0 表示放行到 Redis 检查"""
+        now = time.monotonic() if now is None else now
+
+        blocked_until = self._blocked_until.get(key)
+        if blocked_until is not None:
+            if blocked_until > now:
+                return blocked_until - now
+            self._blocked_until.pop(key, None)
+
+        window = self._windows.get(key)
+        if window is None:
+            return 0.0
+        while window and window[0] <= now - self.window_seconds:
+            window.popleft()
+        if len(window) >= limit:
+            return window[0] + self.window_seconds - now
+        return 0.0
+
+    def record(self, key: str, limit: int, now: Optional[float] = None):
+        """记录一次已放行的请求"""
+        now = time.monotonic() if now is None else now
+        window = self._windows.get(key)
+        if window is None or window.maxlen != limit:
+            window = deque(window or (), maxlen=limit)
+            self._windows[key] = window
+        window.append(now)
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.max_keys:
+            self._windows.popitem(last=False)
+
+    def block(self, key: str, seconds: float, now: Optional[float] = None):
+        """记录 Redis 判定的封禁"""
+        now = time.monotonic() if now is None else now
+        if len(self._blocked_until) >= self.max_keys:
+            # 清理已过期的封禁记录
+            self._blocked_until = {k: v for k, v in self._blocked_until.items() if v > now}
+        self._blocked_until[key] = now + max(seconds, 0.0)
+
+
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    """速率限制中间件"""
-    
-    def __init__(self, app, default_rate_limit: int = 100):
+    """速率限制中间件（滑动窗口 + 每日配额，单次 Redis 往返）"""
+
+    # 路由模板解析缓存大小（按 方法+原始路径 缓存）
+    ROUTE_CACHE_SIZE = 4096
+
+    def __init__(
+        self,
+        app,
+        default_rate_limit: int = 100,
+        window_seconds: int = 60,
+        daily_quota: int = 0,
+        quota_endpoints: Optional[Iterable[str]] = None,
+        local_precheck: bool = True,
+    ):
+        """
+        Args:
+            default_rate_limit: 未单独配置端点的窗口内最大请求数
+            window_seconds: 滑动窗口大小（秒）
+            daily_quota: 每日配额，<=0 表示不检查配额
+            quota_endpoints: 计入每日配额的路由模板，默认与 QuotaMiddleware 一致
+            local_precheck: 是否启用进程内预检查
+        """
         super().__init__(app)
         self.default_rate_limit = default_rate_limit
-        
-        # 不同端点的速率限制配置
+        self.window_seconds = window_seconds
+        self.daily_quota = daily_quota
+
+        # 不同端点的速率限制配置（键为路由模板）
         self.endpoint_limits = {
             "/api/analysis/single": 10,      # 单股分析：每分钟10次
             "/api/analysis/batch": 5,        # 批量分析：每分钟5次
@@ -27,128 +154,222 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             "/api/auth/login": 5,            # 登录：每分钟5次
             "/api/auth/register": 3,         # 注册：每分钟3次
         }
-    
+
+        # 需要计入配额的端点
+        self.quota_endpoints = set(quota_endpoints) if quota_endpoints is not None else {
+            "/api/analysis/single",
+            "/api/analysis/batch",
+            "/api/screening/filter"
+        }
+
+        self.local_guard = LocalRateGuard(window_seconds=window_seconds) if local_precheck else None
+        self._route_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._script = None
+
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         # 跳过健康检查和静态资源
         if request.url.path.startswith(("/api/health", "/docs", "/redoc", "/openapi.json")):
             return await call_next(request)
-        
+
         # 获取用户ID（如果已认证）
         user_id = getattr(request.state, "user_id", None)
+        authenticated = bool(user_id)
         if not user_id:
             # 对于未认证用户，使用IP地址
             user_id = f"ip:{request.client.host}" if request.client else "unknown"
-        
+
+        endpoint = self.resolve_route_template(request)
+
         # 检查速率限制
         try:
-            await self.check_rate_limit(user_id, request.url.path)
-        except HTTPException:
-            raise
+            await self.check_rate_limit(user_id, endpoint, check_quota=authenticated)
+        except HTTPException as exc:
+            # BaseHTTPMiddleware 中抛出的异常不会经过 FastAPI 的异常处理器，这里直接返回 429
+            return JSONResponse(status_code=exc.status_code, content=exc.detail, headers=exc.headers)
         except Exception as exc:
             logger.error(f"速率限制检查失败: {exc}")
             # 如果Redis不可用，允许请求通过
-        
+
         return await call_next(request)
-    
-    async def check_rate_limit(self, user_id: str, endpoint: str):
-        """检查速率限制"""
-        redis_service = get_redis_service()
-        
+
+    def resolve_route_template(self, request: Request) -> str:
+        """将原始路径解析为路由模板，无法匹配时返回原始路径"""
+        path = request.url.path
+        cache_key = (request.method, path)
+        cached = self._route_cache.get(cache_key)
+        if cached is not None:
+            self._route_cache.move_to_end(cache_key)
+            return cached
+
+        template = path
+        router = getattr(request.app, "router", None)
+        for route in getattr(router, "routes", ()):
+            try:
+                match, _ = route.matches(request.scope)
+            except Exception:
+                continue
+            if match == Match.FULL:
+                template = getattr(route, "path", path)
+                break
+
+        # 只缓存模板路径，未匹配的原始路径不缓存，防止缓存被随机路径占满
+        if template != path or path in self.endpoint_limits:
+            self._route_cache[cache_key] = template
+            while len(self._route_cache) > self.ROUTE_CACHE_SIZE:
+                self._route_cache.popitem(last=False)
+        return template
+
+    def _get_script(self, redis_service):
+        """注册 Lua 脚本（EVALSHA，脚本只上传一次）"""
+        if self._script is None:
+            self._script = redis_service.redis.register_script(SLIDING_WINDOW_QUOTA_LUA)
+        return self._script
+
+    async def check_rate_limit(self, user_id: str, endpoint: str, check_quota: bool = True):
+        """检查速率限制（同时检查每日配额）"""
         # 获取端点的速率限制
         rate_limit = self.endpoint_limits.get(endpoint, self.default_rate_limit)
-        
+        local_key = f"{user_id}|{endpoint}"
+
+        # 进程内预检查
+        if self.local_guard is not None:
+            wait_seconds = self.local_guard.check(local_key, rate_limit)
+            if wait_seconds > 0:
+                logger.debug(f"本地速率预检查拒绝 - 用户: {user_id}, 端点: {endpoint}")
+                raise self._rate_limit_exception(rate_limit, rate_limit, wait_seconds)
+
+        redis_service = get_redis_service()
+
         # 构建Redis键
         rate_key = RedisKeys.USER_RATE_LIMIT.format(
             user_id=user_id,
             endpoint=endpoint.replace("/", "_")
         )
-        
-        # 获取当前计数
-        current_count = await redis_service.increment_with_ttl(rate_key, ttl=60)
-        
-        # 检查是否超过限制
-        if current_count > rate_limit:
+        quota = self.daily_quota if (check_quota and endpoint in self.quota_endpoints) else 0
+        today = datetime.date.today().isoformat()
+        quota_key = RedisKeys.USER_DAILY_QUOTA.format(user_id=user_id, date=today)
+
+        now_ms = int(time.time() * 1000)
+        status, current_count, retry_ms, current_usage = await self._get_script(redis_service)(
+            keys=[rate_key, quota_key],
+            args=[now_ms, self.window_seconds * 1000, rate_limit, f"{now_ms}:{uuid.uuid4().hex[:8]}", quota, 86400],
+        )
+        status, current_count, current_usage = int(status), int(current_count), int(current_usage)
+
+        if status == 1:
+            retry_seconds = max(int(retry_ms), 0) / 1000.0
+            if self.local_guard is not None:
+                self.local_guard.block(local_key, retry_seconds)
             logger.warning(
                 f"速率限制触发 - 用户: {user_id}, "
                 f"端点: {endpoint}, "
                 f"当前计数: {current_count}, "
                 f"限制: {rate_limit}"
             )
-            
+            raise self._rate_limit_exception(rate_limit, current_count, retry_seconds)
+
+        if status == 2:
+            logger.warning(
+                f"每日配额超限 - 用户: {user_id}, "
+                f"今日使用: {current_usage}, "
+                f"配额: {quota}"
+            )
             raise HTTPException(
                 status_code=429,
                 detail={
                     "error": {
-                        "code": "RATE_LIMIT_EXCEEDED",
-                        "message": f"请求过于频繁，请稍后重试",
-                        "rate_limit": rate_limit,
-                        "current_count": current_count,
-                        "reset_time": 60
+                        "code": "DAILY_QUOTA_EXCEEDED",
+                        "message": "今日配额已用完，请明天再试",
+                        "daily_quota": quota,
+                        "current_usage": current_usage,
+                        "reset_date": today
                     }
                 }
             )
-        
+
+        if self.local_guard is not None:
+            self.local_guard.record(local_key, rate_limit)
+
         logger.debug(
             f"速率限制检查通过 - 用户: {user_id}, "
             f"端点: {endpoint}, "
             f"当前计数: {current_count}/{rate_limit}"
         )
 
+    def _rate_limit_exception(self, rate_limit: int, current_count: int, retry_seconds: float) -> HTTPException:
+        reset_time = max(1, int(retry_seconds + 0.999))
+        return HTTPException(
+            status_code=429,
+            detail={
+                "error": {
+                    "code": "RATE_LIMIT_EXCEEDED",
+                    "message": f"请求过于频繁，请稍后重试",
+                    "rate_limit": rate_limit,
+                    "current_count": current_count,
+                    "reset_time": reset_time
+                }
+            },
+            headers={"Retry-After": str(reset_time)}
+        )
+
 
 class QuotaMiddleware(BaseHTTPMiddleware):
-    """每日配额中间件"""
-    
+    """
+    每日配额中间件
+
+    注意：RateLimitMiddleware 设置 daily_quota 后会在同一次 Redis 往返中检查配额，
+    两者同时启用时无需再注册本中间件。
+    """
+
     def __init__(self, app, daily_quota: int = 1000):
         super().__init__(app)
         self.daily_quota = daily_quota
-        
+
         # 需要计入配额的端点
         self.quota_endpoints = {
             "/api/analysis/single",
             "/api/analysis/batch",
             "/api/screening/filter"
         }
-    
+
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         # 只对需要配额的端点进行检查
         if request.url.path not in self.quota_endpoints:
             return await call_next(request)
-        
+
         # 获取用户ID
         user_id = getattr(request.state, "user_id", None)
         if not user_id:
             # 未认证用户不受配额限制
             return await call_next(request)
-        
+
         # 检查每日配额
         try:
             await self.check_daily_quota(user_id)
-        except HTTPException:
-            raise
+        except HTTPException as exc:
+            return JSONResponse(status_code=exc.status_code, content=exc.detail)
         except Exception as exc:
             logger.error(f"配额检查失败: {exc}")
             # 如果Redis不可用，允许请求通过
-        
+
         return await call_next(request)
-    
+
     async def check_daily_quota(self, user_id: str):
         """检查每日配额"""
-        import datetime
-        
         redis_service = get_redis_service()
-        
+
         # 获取今天的日期
         today = datetime.date.today().isoformat()
-        
+
         # 构建Redis键
         quota_key = RedisKeys.USER_DAILY_QUOTA.format(
             user_id=user_id,
             date=today
         )
-        
+
         # 获取今日使用量
         current_usage = await redis_service.increment_with_ttl(quota_key, ttl=86400)  # 24小时TTL
-        
+
         # 检查是否超过配额
         if current_usage > self.daily_quota:
             logger.warning(
@@ -156,7 +377,7 @@ class QuotaMiddleware(BaseHTTPMiddleware):
                 f"今日使用: {current_usage}, "
                 f"配额: {self.daily_quota}"
             )
-            
+
             raise HTTPException(
                 status_code=429,
                 detail={
@@ -169,7 +390,7 @@ class QuotaMiddleware(BaseHTTPMiddleware):
                     }
                 }
             )
-        
+
         logger.debug(
             f"配额检查通过 - 用户: {user_id}, "
             f"今日使用: {current_usage}/{self.daily_quota}"
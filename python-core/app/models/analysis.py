@@ -51,6 +51,8 @@ class AnalysisParameters(BaseModel):
     # 模型配置
     quick_analysis_model: Optional[str] = "qwen-turbo"
     deep_analysis_model: Optional[str] = "qwen-max"
+    # 采样剖析（结果写入 performance_metrics.profile，可通过 /api/profiles 下载火焰图）
+    enable_profiling: bool = False
 
 
 class AnalysisResult(BaseModel):
@@ -306,6 +306,7 @@ class UsageRecord(BaseModel):
     session_id: str = Field(..., description="会话ID")
     analysis_type: str = Field(default="stock_analysis", description="分析类型")
     stock_code: Optional[str] = Field(None, description="股票代码")
+    user_id: Optional[str] = Field(None, description="用户ID")
 
 
 class UsageStatistics(BaseModel):
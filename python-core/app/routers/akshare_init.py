@@ -11,8 +11,7 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
 from pydantic import BaseModel, Field
 
 from app.core.database import get_mongo_db
-from app.worker.akshare_init_service import get_akshare_init_service
-from app.worker.akshare_sync_service import get_akshare_sync_service
+from app.worker import get_akshare_init_service, get_akshare_sync_service
 from app.routers.auth_db import get_current_user
 from app.utils.timezone import now_tz
 
@@ -0,0 +1,69 @@
+"""
+回测稳健性任务 API
+- 提交 walk-forward / 蒙特卡洛任务（入队后由 Worker 在进程池中执行）
+- 查询任务进度与结果、列出历史任务
+"""
+from typing import Any, Dict, List, Literal, Optional
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+
+from app.core.response import ok
+from app.routers.auth_db import get_current_user
+from app.services.backtest.jobs import get_backtest_job, list_backtest_jobs, submit_backtest_job
+from app.services.queue_service import QueueService, get_queue_service
+
+router = APIRouter(prefix="/backtest", tags=["backtest"])
+logger = logging.getLogger("webapi")
+
+
+class BacktestJobRequest(BaseModel):
+    job_type: Literal["walk_forward", "monte_carlo"]
+    symbols: List[str] = Field(..., min_length=1, max_length=50, description="6位A股代码，多只时按等权组合回测")
+    strategy: str = "ma_cross"
+    params: Optional[Dict[str, Any]] = Field(None, description="参数网格，值为单值或列表")
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    initial_capital: float = Field(default=100000.0, gt=0)
+    fee_rate: float = Field(default=0.0, ge=0, le=0.05)
+    sort_by: str = "sharpe"
+    max_points: int = Field(default=300, ge=20, le=5000)
+    # walk-forward
+    train_days: int = Field(default=252, ge=20, le=2520, description="训练窗口（交易日）")
+    test_days: int = Field(default=63, ge=5, le=1260, description="测试窗口（交易日）")
+    anchored: bool = Field(default=False, description="训练窗口起点固定（扩展窗口）")
+    # 蒙特卡洛
+    n_paths: int = Field(default=1000, ge=100, le=20000, description="重采样路径数")
+    block_size: int = Field(default=20, ge=1, le=250, description="分块自助重采样的块长度（交易日）")
+    seed: Optional[int] = Field(default=None, ge=0)
+
+
+@router.post("/jobs")
+async def create_backtest_job(
+    req: BacktestJobRequest,
+    user: dict = Depends(get_current_user),
+    queue: QueueService = Depends(get_queue_service),
+):
+    try:
+        job = await submit_backtest_job(queue, user["id"], req.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ok(job, "回测任务已提交")
+
+
+@router.get("/jobs")
+async def get_backtest_jobs(
+    job_type: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    user: dict = Depends(get_current_user),
+):
+    return ok(await list_backtest_jobs(user["id"], limit=limit, job_type=job_type))
+
+
+@router.get("/jobs/{job_id}")
+async def get_backtest_job_detail(job_id: str, user: dict = Depends(get_current_user)):
+    job = await get_backtest_job(job_id, user["id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="回测任务不存在")
+    return ok(job)
@@ -10,8 +10,7 @@ from typing import Dict, Any, Optional
 from fastapi import APIRouter, BackgroundTasks, HTTPException
 from pydantic import BaseModel, Field
 
-from app.worker.baostock_init_service import BaoStockInitService
-from app.worker.baostock_sync_service import BaoStockSyncService
+from app.worker import BaoStockInitService, BaoStockSyncService
 
 logger = logging.getLogger(__name__)
 
@@ -8,7 +8,7 @@ from typing import Dict, Any, List, Optional
 from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
 from pydantic import BaseModel, Field
 
-from app.worker.financial_data_sync_service import get_financial_sync_service
+from app.worker import get_financial_sync_service
 from app.services.financial_data_service import get_financial_data_service
 from app.core.response import ok
 
@@ -0,0 +1,31 @@
+"""
+进程内指标导出（Prometheus 文本格式）
+"""
+import asyncio
+import logging
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from tradingagents.utils.metrics import CONTENT_TYPE, render_metrics, set_queue_depth
+
+router = APIRouter()
+logger = logging.getLogger("webapi")
+
+
+async def _refresh_queue_depth():
+    """导出前读取 Redis 分析队列深度（Redis 不可用时保留上次的值）"""
+    try:
+        from app.services.queue_service import get_queue_service
+        stats = await asyncio.wait_for(get_queue_service().stats(), timeout=1.0)
+        for state in ("queued", "processing"):
+            set_queue_depth("analysis", state, stats.get(state, 0))
+    except Exception as e:
+        logger.debug(f"读取队列深度失败: {e}")
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 抓取端点"""
+    await _refresh_queue_depth()
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
@@ -9,7 +9,7 @@ from typing import Dict, Any, List, Optional
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel, Field
 
-from app.worker.multi_period_sync_service import get_multi_period_sync_service
+from app.worker import get_multi_period_sync_service
 
 logger = logging.getLogger(__name__)
 
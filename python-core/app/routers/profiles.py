@@ -0,0 +1,59 @@
+"""
+分析任务剖析结果路由
+列出采样剖析结果、查看热点摘要、下载 collapsed-stack / speedscope 文件
+非管理员只能访问自己任务的剖析结果
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+
+from app.routers.auth_db import get_current_user
+from app.core.response import ok
+from app.services.analysis_profiler import PROFILE_FORMATS, get_profile_store
+
+router = APIRouter(prefix="/api/profiles", tags=["profiles"])
+
+
+def _owner_filter(user: dict) -> Optional[str]:
+    """管理员可查看全部剖析结果，其他用户只能查看自己的"""
+    return None if user.get("is_admin") else str(user["id"])
+
+
+@router.get("")
+async def list_profiles(
+    limit: int = Query(50, ge=1, le=500, description="返回条数"),
+    current_user: dict = Depends(get_current_user)
+):
+    """按时间倒序列出剖析结果（不含热点明细）"""
+    items = await get_profile_store().list(limit=limit, user_id=_owner_filter(current_user))
+    return ok(data={"items": items, "total": len(items)}, message="获取剖析结果列表成功")
+
+
+@router.get("/{task_id}")
+async def get_profile(task_id: str, current_user: dict = Depends(get_current_user)):
+    """获取单个任务的剖析摘要（含自身耗时/包含耗时热点帧）"""
+    info = await get_profile_store().get(task_id, user_id=_owner_filter(current_user))
+    if info is None:
+        raise HTTPException(status_code=404, detail="剖析结果不存在")
+    return ok(data=info, message="获取剖析结果成功")
+
+
+@router.get("/{task_id}/download")
+async def download_profile(
+    task_id: str,
+    format: str = Query("speedscope", description="下载格式：speedscope（https://www.speedscope.app 打开）或 collapsed（flamegraph.pl）"),
+    current_user: dict = Depends(get_current_user)
+):
+    """下载剖析文件"""
+    if format not in PROFILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的格式: {format}，可选: {', '.join(PROFILE_FORMATS)}")
+    loaded = await get_profile_store().load_file(task_id, format, user_id=_owner_filter(current_user))
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="剖析结果不存在")
+    filename, content = loaded
+    return Response(
+        content=content,
+        media_type=PROFILE_FORMATS[format][1],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -14,77 +14,18 @@ from pydantic import BaseModel
 from .auth_db import get_current_user
 from ..core.database import get_mongo_db
 from ..utils.timezone import to_config_tz
+from ..services.report_search import (
+    apply_cursor,
+    build_keyword_query,
+    count_reports,
+    encode_cursor,
+    get_stock_name_async,
+    get_stock_names,
+)
 import logging
 
 logger = logging.getLogger("webapi")
 
-# 股票名称缓存
-_stock_name_cache = {}
-
-def get_stock_name(stock_code: str) -> str:
-    """
-    获取股票名称
-    优先级：缓存 -> MongoDB（按数据源优先级） -> 默认返回股票代码
-    """
-    global _stock_name_cache
-
-    # 检查缓存
-    if stock_code in _stock_name_cache:
-        return _stock_name_cache[stock_code]
-
-    try:
-        # 从 MongoDB 获取股票名称
-        from ..core.database import get_mongo_db_sync
-        from ..core.unified_config import UnifiedConfigManager
-
-        db = get_mongo_db_sync()
-        code6 = str(stock_code).zfill(6)
-
-        # 🔥 按数据源优先级查询
-        config = UnifiedConfigManager()
-        data_source_configs = config.get_data_source_configs()
-
-        # 提取启用的数据源，按优先级排序
-        enabled_sources = [
-            ds.type.lower() for ds in data_source_configs
-            if ds.enabled and ds.type.lower() in ['tushare', 'akshare', 'baostock']
-        ]
-
-        if not enabled_sources:
-            enabled_sources = ['tushare', 'akshare', 'baostock']
-
-        # 按数据源优先级查询
-        stock_info = None
-        for data_source in enabled_sources:
-            stock_info = db.stock_basic_info.find_one(
-                {"$or": [{"symbol": code6}, {"code": code6}], "source": data_source}
-            )
-            if stock_info:
-                logger.debug(f"✅ 使用数据源 {data_source} 获取股票名称 {code6}")
-                break
-
-        # 如果所有数据源都没有，尝试不带 source 条件查询（兼容旧数据）
-        if not stock_info:
-            stock_info = db.stock_basic_info.find_one(
-                {"$or": [{"symbol": code6}, {"code": code6}]}
-            )
-            if stock_info:
-                logger.warning(f"⚠️ 使用旧数据（无 source 字段）获取股票名称 {code6}")
-
-        if stock_info and stock_info.get("name"):
-            stock_name = stock_info["name"]
-            _stock_name_cache[stock_code] = stock_name
-            return stock_name
-
-        # 如果没有找到，返回股票代码
-        _stock_name_cache[stock_code] = stock_code
-        return stock_code
-
-    except Exception as e:
-        logger.warning(f"⚠️ 获取股票名称失败 {stock_code}: {e}")
-        return stock_code
-
-
 # 统一构建报告查询：支持 _id(ObjectId) / analysis_id / task_id 三种
 def _build_report_query(report_id: str) -> Dict[str, Any]:
     ors = [
@@ -118,8 +59,9 @@ class ReportListResponse(BaseModel):
 
 @router.get("/list", response_model=Dict[str, Any])
 async def get_reports_list(
-    page: int = Query(1, ge=1, description="页码"),
+    page: int = Query(1, ge=1, description="页码（未提供 cursor 时使用）"),
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor），优先于 page"),
     search_keyword: Optional[str] = Query(None, description="搜索关键词"),
     market_filter: Optional[str] = Query(None, description="市场筛选（A股/港股/美股）"),
     start_date: Optional[str] = Query(None, description="开始日期"),
@@ -127,9 +69,15 @@ async def get_reports_list(
     stock_code: Optional[str] = Query(None, description="股票代码"),
     user: dict = Depends(get_current_user)
 ):
-    """获取分析报告列表"""
+    """
+    获取分析报告列表
+
+    - 关键词检索走 search_tokens 索引（n-gram），支持代码/名称/分析ID/摘要子串
+    - 翻页优先使用 cursor（按 created_at、_id 倒序的游标），page 仅用于兼容旧调用
+    - total 超过计数上限或无筛选条件时为估算值（total_is_estimate=True）
+    """
     try:
-        logger.info(f"🔍 获取报告列表: 用户={user['id']}, 页码={page}, 每页={page_size}, 市场={market_filter}")
+        logger.info(f"🔍 获取报告列表: 用户={user['id']}, 页码={page}, 游标={'有' if cursor else '无'}, 每页={page_size}, 市场={market_filter}")
 
         db = get_mongo_db()
 
@@ -138,11 +86,9 @@ async def get_reports_list(
 
         # 搜索关键词
         if search_keyword:
-            query["$or"] = [
-                {"stock_symbol": {"$regex": search_keyword, "$options": "i"}},
-                {"analysis_id": {"$regex": search_keyword, "$options": "i"}},
-                {"summary": {"$regex": search_keyword, "$options": "i"}}
-            ]
+            keyword_query = build_keyword_query(search_keyword)
+            if keyword_query:
+                query.update(keyword_query)
 
         # 市场筛选
         if market_filter:
@@ -163,21 +109,35 @@ async def get_reports_list(
 
         logger.info(f"📊 查询条件: {query}")
 
-        # 计算总数
-        total = await db.analysis_reports.count_documents(query)
-
-        # 分页查询
-        skip = (page - 1) * page_size
-        cursor = db.analysis_reports.find(query).sort("created_at", -1).skip(skip).limit(page_size)
+        # 计算总数（带上限，超过上限返回估算值）
+        total, total_exact = await count_reports(db, query)
+
+        # 分页查询：游标优先，其次兼容 page（skip）
+        try:
+            page_query = apply_cursor(query, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        find = db.analysis_reports.find(page_query, {"reports": 0}).sort([("created_at", -1), ("_id", -1)])
+        if not cursor and page > 1:
+            find = find.skip((page - 1) * page_size)
+        docs = await find.limit(page_size + 1).to_list(length=page_size + 1)
+
+        has_more = len(docs) > page_size
+        docs = docs[:page_size]
+        next_cursor = None
+        if has_more and isinstance(docs[-1].get("created_at"), datetime):
+            next_cursor = encode_cursor(docs[-1]["created_at"], docs[-1]["_id"])
+
+        # 🔥 优先使用MongoDB中保存的股票名称，缺失的批量查询
+        names = await get_stock_names(
+            d.get("stock_symbol", "") for d in docs if not d.get("stock_name")
+        )
 
         reports = []
-        async for doc in cursor:
+        for doc in docs:
             # 转换为前端需要的格式
             stock_code = doc.get("stock_symbol", "")
-            # 🔥 优先使用MongoDB中保存的股票名称，如果没有则查询
-            stock_name = doc.get("stock_name")
-            if not stock_name:
-                stock_name = get_stock_name(stock_code)
+            stock_name = doc.get("stock_name") or names.get(stock_code, stock_code)
 
             # 🔥 获取市场类型，如果没有则根据股票代码推断
             market_type = doc.get("market_type")
@@ -212,25 +172,30 @@ async def get_reports_list(
                 "analysts": doc.get("analysts", []),
                 "research_depth": doc.get("research_depth", 1),
                 "summary": doc.get("summary", ""),
-                "file_size": len(str(doc.get("reports", {}))),  # 估算大小
+                "file_size": doc.get("report_size", 0),  # 报告内容大小（列表不再读取完整报告）
                 "source": doc.get("source", "unknown"),
                 "task_id": doc.get("task_id", "")
             }
             reports.append(report)
 
-        logger.info(f"✅ 查询完成: 总数={total}, 返回={len(reports)}")
+        logger.info(f"✅ 查询完成: 总数={total}{'' if total_exact else '+'}, 返回={len(reports)}")
 
         return {
             "success": True,
             "data": {
                 "reports": reports,
                 "total": total,
+                "total_is_estimate": not total_exact,
                 "page": page,
-                "page_size": page_size
+                "page_size": page_size,
+                "has_more": has_more,
+                "next_cursor": next_cursor
             },
             "message": "报告列表获取成功"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ 获取报告列表失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -276,7 +241,7 @@ async def get_report_detail(
             stock_symbol = r.get("stock_symbol", r.get("stock_code", tasks_doc.get("stock_code", "")))
             stock_name = r.get("stock_name")
             if not stock_name:
-                stock_name = get_stock_name(stock_symbol)
+                stock_name = await get_stock_name_async(stock_symbol)
 
             report = {
                 "id": tasks_doc.get("task_id", report_id),
@@ -306,7 +271,7 @@ async def get_report_detail(
             stock_symbol = doc.get("stock_symbol", "")
             stock_name = doc.get("stock_name")
             if not stock_name:
-                stock_name = get_stock_name(stock_symbol)
+                stock_name = await get_stock_name_async(stock_symbol)
 
             # 获取时间（数据库中是 UTC 时间，需要转换为 UTC+8）
             created_at = doc.get("created_at", datetime.utcnow())
@@ -520,16 +485,14 @@ async def download_report(
                 )
 
             try:
-                # 生成 Word 文档
-                docx_content = report_exporter.generate_docx_report(doc)
-                filename = f"{stock_symbol}_{analysis_date}_report.docx"
+                # 按内容哈希命中磁盘缓存，未命中时在进程池中渲染
+                from app.services.report_export_cache import get_report_export_cache
 
-                # 返回文件流
-                def generate():
-                    yield docx_content
+                docx_path = await get_report_export_cache().get_or_render(doc, "docx")
+                filename = f"{stock_symbol}_{analysis_date}_report.docx"
 
-                return StreamingResponse(
-                    generate(),
+                return FileResponse(
+                    docx_path,
                     media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
                     headers={"Content-Disposition": f"attachment; filename={filename}"}
                 )
@@ -548,16 +511,14 @@ async def download_report(
                 )
 
             try:
-                # 生成 PDF 文档
-                pdf_content = report_exporter.generate_pdf_report(doc)
-                filename = f"{stock_symbol}_{analysis_date}_report.pdf"
+                # 按内容哈希命中磁盘缓存，未命中时在进程池中渲染
+                from app.services.report_export_cache import get_report_export_cache
 
-                # 返回文件流
-                def generate():
-                    yield pdf_content
+                pdf_path = await get_report_export_cache().get_or_render(doc, "pdf")
+                filename = f"{stock_symbol}_{analysis_date}_report.pdf"
 
-                return StreamingResponse(
-                    generate(),
+                return FileResponse(
+                    pdf_path,
                     media_type="application/pdf",
                     headers={"Content-Disposition": f"attachment; filename={filename}"}
                 )
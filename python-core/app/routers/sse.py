@@ -67,7 +67,9 @@ async def task_progress_generator(task_id: str, user_id: str):
                     idle_elapsed = 0.0
                     try:
                         progress_data = json.loads(message['data'])
-                        yield f"event: progress\ndata: {json.dumps(progress_data, ensure_ascii=False)}\n\n"
+                        # LLM 增量输出使用独立事件类型，前端可单独渲染
+                        event_type = "llm_stream" if progress_data.get("type") == "llm_stream" else "progress"
+                        yield f"event: {event_type}\ndata: {json.dumps(progress_data, ensure_ascii=False)}\n\n"
                     except json.JSONDecodeError:
                         logger.warning(f"Invalid JSON in progress message: {message['data']}")
                 else:
@@ -10,9 +10,7 @@ from pydantic import BaseModel, Field
 from app.routers.auth_db import get_current_user
 from app.core.response import ok
 from app.core.database import get_mongo_db
-from app.worker.tushare_sync_service import get_tushare_sync_service
-from app.worker.akshare_sync_service import get_akshare_sync_service
-from app.worker.financial_data_sync_service import get_financial_sync_service
+from app.worker import get_akshare_sync_service, get_financial_sync_service, get_tushare_sync_service
 import logging
 import asyncio
 from datetime import datetime, timedelta
@@ -4,8 +4,10 @@
 - 所有端点均需鉴权 (Bearer Token)
 - 路径前缀在 main.py 中挂载为 /api，当前路由自身前缀为 /stocks
 """
+from datetime import datetime
 from typing import Optional, Dict, Any, List, Tuple
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from pydantic import BaseModel, Field
 import logging
 import re
 
@@ -14,7 +16,6 @@ from app.core.database import get_mongo_db
 from app.core.database import get_mongo_db
 from app.core.response import ok
 import asyncio
-import akshare as ak
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +67,77 @@ def _detect_market_and_code(code: str) -> Tuple[str, str]:
     return ('CN', _zfill_code(code))
 
 
+class BatchQuotesRequest(BaseModel):
+    codes: List[str] = Field(..., min_length=1, max_length=200, description="股票代码列表（支持A股/港股/美股混合）")
+    force_refresh: bool = Field(False, description="是否强制刷新（跳过缓存）")
+
+
+@router.post("/quotes/batch", response_model=dict)
+async def get_quotes_batch(
+    payload: BatchQuotesRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    批量获取股票实时行情（自选股/关注列表一次请求）
+
+    - A股：一次 $in 查询 market_quotes
+    - 港股/美股：ForeignStockService.get_quotes（缓存去重 + 批量获取）
+
+    返回字段（data内）:
+      - items: {请求代码: 行情}
+      - missing: 未获取到行情的请求代码
+    """
+    groups: Dict[str, Dict[str, str]] = {"CN": {}, "HK": {}, "US": {}}
+    for raw in payload.codes:
+        market, normalized_code = _detect_market_and_code(raw)
+        groups[market][normalized_code] = raw
+
+    items: Dict[str, Any] = {}
+    db = get_mongo_db()
+
+    if groups["CN"]:
+        cursor = db["market_quotes"].find({"code": {"$in": list(groups["CN"].keys())}}, {"_id": 0})
+        async for q in cursor:
+            raw = groups["CN"].get(q.get("code"))
+            if raw is None:
+                continue
+            items[raw] = {
+                "code": q.get("code"),
+                "market": "CN",
+                "price": q.get("close"),
+                "change_percent": q.get("pct_chg"),
+                "amount": q.get("amount"),
+                "volume": q.get("volume"),
+                "open": q.get("open"),
+                "high": q.get("high"),
+                "low": q.get("low"),
+                "prev_close": q.get("pre_close"),
+                "trade_date": q.get("trade_date"),
+                "updated_at": q.get("updated_at"),
+            }
+
+    foreign_markets = [m for m in ("HK", "US") if groups[m]]
+    if foreign_markets:
+        from app.services.foreign_stock_service import ForeignStockService
+
+        service = ForeignStockService(db=db)
+        results = await asyncio.gather(
+            *(service.get_quotes(m, list(groups[m].keys()), payload.force_refresh) for m in foreign_markets),
+            return_exceptions=True
+        )
+        for market, quotes in zip(foreign_markets, results):
+            if isinstance(quotes, Exception):
+                logger.error(f"批量获取{market}行情失败: {quotes}")
+                continue
+            for code, quote in quotes.items():
+                raw = groups[market].get(code)
+                if raw is not None:
+                    items[raw] = quote
+
+    missing = [c for c in dict.fromkeys(payload.codes) if c not in items]
+    return ok(data={"items": items, "missing": missing})
+
+
 @router.get("/{code}/quote", response_model=dict)
 async def get_quote(
     code: str,
@@ -389,6 +461,7 @@ async def get_fundamentals(
                             if date_keys: return r.get(date_keys[0])
                     return None
 
+                import akshare as ak  # 按需导入，不计入 API 冷启动
                 df_main = await asyncio.to_thread(ak.stock_financial_abstract, symbol=code6)
 
                 if df_main is not None and not df_main.empty:
@@ -809,6 +882,46 @@ async def get_kline(
     return ok(data)
 
 
+@router.get("/{code}/intraday-bars", response_model=dict)
+async def get_intraday_bars(
+    code: str,
+    interval: int = Query(5, description="K线周期（分钟）：1/5/15"),
+    start: Optional[datetime] = Query(None, description="开始时间（含），不带时区时按本地时间"),
+    end: Optional[datetime] = Query(None, description="结束时间（含），不带时区时按本地时间"),
+    limit: int = Query(240, ge=1, le=2000, description="最多返回条数（取最近的K线）"),
+    include_open: bool = Query(True, description="是否包含当前未收盘的K线"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    获取A股盘中分钟K线（由实时行情快照聚合，不调用上游接口）
+
+    仅保留最近若干天（QUOTES_INTRADAY_BAR_RETENTION_DAYS），粒度受行情采集间隔限制
+    """
+    from app.services.intraday_bar_aggregator import get_intraday_bar_aggregator
+
+    market, normalized_code = _detect_market_and_code(code)
+    if market != "CN":
+        raise HTTPException(status_code=400, detail="分钟K线仅支持A股")
+
+    aggregator = get_intraday_bar_aggregator()
+    try:
+        items = await aggregator.get_bars(
+            normalized_code, interval, start=start, end=end, limit=limit, include_open=include_open
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    for item in items:
+        item["start"] = item["start"].isoformat()
+        item["end"] = item["end"].isoformat()
+
+    return ok(data={
+        "code": normalized_code,
+        "interval": interval,
+        "items": items,
+    })
+
+
 @router.get("/{code}/news", response_model=dict)
 async def get_news(code: str, days: int = 30, limit: int = 50, include_announcements: bool = True, current_user: dict = Depends(get_current_user)):
     """获取新闻与公告（支持A股、港股、美股）"""
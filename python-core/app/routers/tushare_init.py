@@ -10,7 +10,7 @@ from pydantic import BaseModel, Field
 
 from app.routers.auth_db import get_current_user
 from app.core.database import get_mongo_db
-from app.worker.tushare_init_service import get_tushare_init_service
+from app.worker import get_tushare_init_service
 from app.core.response import ok
 
 router = APIRouter(prefix="/api/tushare-init", tags=["Tushare初始化"])
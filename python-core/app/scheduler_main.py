@@ -0,0 +1,56 @@
+"""
+定时任务进程入口（APP_ROLE=scheduler）
+不提供 HTTP 接口，只运行定时同步任务、启动补数与纸上交易挂单撮合；
+与 APP_ROLE=api 的 API 进程配合，实现 API / 调度器 / 分析 Worker 分进程部署
+"""
+
+import asyncio
+import logging
+import signal
+
+from app.core.config import settings
+from app.core.database import init_db, close_db
+from app.core.logging_config import setup_logging
+from app.services.scheduler_jobs import start_background_jobs, stop_background_jobs
+from tradingagents.utils.metrics import start_metrics_server
+
+
+async def main():
+    """启动调度器并运行到收到 SIGINT/SIGTERM"""
+    setup_logging(settings.LOG_LEVEL)
+    logger = logging.getLogger("app.scheduler")
+
+    await init_db()
+
+    # 定时任务进程不提供 HTTP 接口：独立线程暴露同步任务、数据源与缓存指标
+    if settings.METRICS_ENABLED:
+        start_metrics_server(settings.SCHEDULER_METRICS_PORT, settings.METRICS_HOST)
+
+    # 配置桥接：将统一配置写入环境变量，供 TradingAgents 核心库使用
+    try:
+        from app.core.config_bridge import bridge_config_to_env
+        bridge_config_to_env()
+    except Exception as e:
+        logger.warning(f"⚠️  配置桥接失败: {e}")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows 不支持 add_signal_handler，依赖 KeyboardInterrupt 退出
+            pass
+
+    scheduler = await start_background_jobs(logger)
+    logger.info("⏰ 定时任务进程已启动（APP_ROLE=scheduler）")
+    try:
+        await stop_event.wait()
+    finally:
+        await stop_background_jobs(scheduler, logger)
+        await close_db()
+        logger.info("🛑 定时任务进程已停止")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,249 @@
+"""
+分析任务采样剖析
+- 按任务开启（AnalysisParameters.enable_profiling）或按比例抽样（ANALYSIS_PROFILE_SAMPLE_RATE）
+- 剖析结果写入 MongoDB analysis_profiles 集合（元数据、热点摘要与压缩后的 collapsed / speedscope 文件），
+  worker、API 等不同进程产生的剖析结果都可以从任一 API 副本查看和下载
+- 每份剖析记录所属用户（user_id），非管理员只能查看自己任务的剖析结果
+- 摘要与下载地址写入分析结果的 performance_metrics.profile，便于从报告直接定位慢任务的火焰图
+- 保留最近 ANALYSIS_PROFILE_MAX_FILES 份，超出删除最旧的
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import Binary
+
+from tradingagents.utils.sampling_profiler import SamplingProfiler
+from app.utils.timezone import now_tz
+
+logger = logging.getLogger(__name__)
+
+PROFILE_COLLECTION = "analysis_profiles"
+
+# 下载格式 -> (文件后缀, MIME)
+PROFILE_FORMATS = {
+    "collapsed": (".collapsed.txt", "text/plain; charset=utf-8"),
+    "speedscope": (".speedscope.json", "application/json"),
+}
+_TASK_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+# 压缩后的剖析文件总大小上限（MongoDB 单文档上限为 16MB），超出时只保存摘要
+MAX_PROFILE_BYTES = 12 * 1024 * 1024
+
+# 列表与摘要查询不返回文件内容
+_META_PROJECTION = {"_id": 0, "data": 0}
+_LIST_PROJECTION = {"_id": 0, "data": 0, "top_self": 0, "top_inclusive": 0}
+
+
+def should_profile(task_id: str, requested: bool = False, sample_rate: Optional[float] = None) -> bool:
+    """
+    是否剖析该任务
+
+    显式请求的任务总是剖析；其余任务按 task_id 哈希抽样（同一任务重试时结论一致）
+    """
+    if requested:
+        return True
+    if sample_rate is None:
+        from app.core.config import settings
+
+        sample_rate = settings.ANALYSIS_PROFILE_SAMPLE_RATE
+    if sample_rate <= 0:
+        return False
+    if sample_rate >= 1:
+        return True
+    bucket = int(hashlib.sha1(str(task_id).encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return bucket < sample_rate
+
+
+def _valid_task_id(task_id: str) -> bool:
+    return bool(_TASK_ID_PATTERN.match(str(task_id))) and str(task_id).strip(".") != ""
+
+
+class AnalysisProfileStore:
+    """
+    剖析结果存储（MongoDB，每个任务一个文档，按数量上限淘汰最旧的）
+
+    写入在分析线程中同步执行（pymongo），查询由 API 异步执行（motor）
+    """
+
+    def __init__(self, max_profiles: int = 200, sync_db=None, db=None):
+        """
+        Args:
+            max_profiles: 保留的剖析结果份数上限
+            sync_db: 同步数据库（默认 get_mongo_db_sync()）
+            db: 异步数据库（默认 get_mongo_db()）
+        """
+        self.max_profiles = max_profiles
+        self._sync_db = sync_db
+        self._db = db
+        self._indexes_ready = False
+
+    def _sync_collection(self):
+        if self._sync_db is None:
+            from app.core.database import get_mongo_db_sync
+
+            self._sync_db = get_mongo_db_sync()
+        return self._sync_db[PROFILE_COLLECTION]
+
+    def _collection(self):
+        if self._db is None:
+            from app.core.database import get_mongo_db
+
+            self._db = get_mongo_db()
+        return self._db[PROFILE_COLLECTION]
+
+    # ---------------- 写入 ----------------
+
+    def _ensure_indexes(self, collection) -> None:
+        if self._indexes_ready:
+            return
+        collection.create_index("task_id", unique=True)
+        collection.create_index([("user_id", 1), ("created_at", -1)])
+        collection.create_index([("created_at", -1)])
+        self._indexes_ready = True
+
+    def save(self, task_id: str, profiler: SamplingProfiler, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        保存剖析结果（同一任务重复剖析时覆盖）
+
+        Returns:
+            元数据（任务ID、所属用户、来源、采样摘要、文件名与下载地址），可直接写入 performance_metrics.profile
+        """
+        if not _valid_task_id(task_id):
+            raise ValueError(f"非法的任务ID: {task_id!r}")
+
+        data = {
+            "collapsed": zlib.compress(profiler.to_collapsed().encode("utf-8")),
+            "speedscope": zlib.compress(profiler.to_speedscope_json(name=f"analysis {task_id}").encode("utf-8")),
+        }
+        stored = sum(len(blob) for blob in data.values())
+        if stored > MAX_PROFILE_BYTES:
+            logger.warning(f"⚠️ 剖析文件过大（压缩后 {stored / 1024 / 1024:.1f}MB），只保存摘要: {task_id}")
+            data = {}
+
+        info = {
+            "task_id": task_id,
+            "created_at": now_tz().isoformat(),
+            **(meta or {}),
+            **profiler.summary(),
+            "files": {fmt: f"{task_id}{suffix}" for fmt, (suffix, _) in PROFILE_FORMATS.items() if fmt in data},
+            "download": {fmt: f"/api/profiles/{task_id}/download?format={fmt}" for fmt in PROFILE_FORMATS if fmt in data},
+        }
+        if info.get("user_id") is not None:
+            info["user_id"] = str(info["user_id"])
+
+        collection = self._sync_collection()
+        self._ensure_indexes(collection)
+        doc = {**info, "data": {fmt: Binary(blob) for fmt, blob in data.items()}}
+        collection.replace_one({"task_id": task_id}, doc, upsert=True)
+        self._prune(collection)
+        return info
+
+    def _prune(self, collection) -> None:
+        stale = [
+            doc["_id"] for doc in
+            collection.find({}, {"_id": 1}).sort("created_at", -1).skip(self.max_profiles)
+        ]
+        if stale:
+            collection.delete_many({"_id": {"$in": stale}})
+
+    # ---------------- 查询 ----------------
+
+    @staticmethod
+    def _owner_query(task_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+        query: Dict[str, Any] = {}
+        if task_id is not None:
+            query["task_id"] = task_id
+        if user_id is not None:
+            query["user_id"] = str(user_id)
+        return query
+
+    async def get(self, task_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取单个任务的剖析元数据
+
+        Args:
+            user_id: 指定时只返回该用户的剖析结果（None 表示不限，供管理员使用）
+        """
+        if not _valid_task_id(task_id):
+            return None
+        return await self._collection().find_one(self._owner_query(task_id, user_id), _META_PROJECTION)
+
+    async def list(self, limit: int = 50, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按创建时间倒序列出剖析元数据（不含热点明细）"""
+        cursor = self._collection().find(self._owner_query(user_id=user_id), _LIST_PROJECTION)
+        return await cursor.sort("created_at", -1).limit(limit).to_list(length=limit)
+
+    async def load_file(self, task_id: str, fmt: str, user_id: Optional[str] = None) -> Optional[Tuple[str, bytes]]:
+        """
+        读取剖析文件
+
+        Returns:
+            (文件名, 内容)；格式不支持、任务不存在或不属于该用户时返回 None
+        """
+        if fmt not in PROFILE_FORMATS or not _valid_task_id(task_id):
+            return None
+        doc = await self._collection().find_one(
+            self._owner_query(task_id, user_id), {"_id": 0, f"data.{fmt}": 1}
+        )
+        blob = ((doc or {}).get("data") or {}).get(fmt)
+        if blob is None:
+            return None
+        return f"{task_id}{PROFILE_FORMATS[fmt][0]}", zlib.decompress(bytes(blob))
+
+
+_profile_store: Optional[AnalysisProfileStore] = None
+
+
+def get_profile_store() -> AnalysisProfileStore:
+    """获取剖析结果存储（单例）"""
+    global _profile_store
+    if _profile_store is None:
+        from app.core.config import settings
+
+        _profile_store = AnalysisProfileStore(max_profiles=settings.ANALYSIS_PROFILE_MAX_FILES)
+    return _profile_store
+
+
+@contextmanager
+def profile_analysis(task_id: str, requested: bool = False, **meta: Any) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    剖析一次分析执行（采样调用本上下文的线程）
+
+    未命中剖析策略时 yield None；否则 yield 一个字典，退出上下文后填入剖析元数据（保存失败时保持为空）。
+    被剖析代码抛出的异常照常向外传播，剖析结果仍会保存。
+
+    Args:
+        task_id: 任务ID
+        requested: 任务参数是否显式要求剖析
+        **meta: 附加到元数据的字段（如 user_id、source、stock_code）
+    """
+    if not should_profile(task_id, requested):
+        yield None
+        return
+
+    from app.core.config import settings
+
+    profiler = SamplingProfiler(
+        interval=settings.ANALYSIS_PROFILE_INTERVAL_MS / 1000.0,
+        all_threads=settings.ANALYSIS_PROFILE_ALL_THREADS,
+    )
+    logger.info(f"🔬 开始采样剖析: {task_id} (间隔 {profiler.interval * 1000:.0f}ms)")
+    profile: Dict[str, Any] = {}
+    profiler.start()
+    try:
+        yield profile
+    finally:
+        profiler.stop()
+        try:
+            profile.update(get_profile_store().save(task_id, profiler, {"requested": requested, **meta}))
+            logger.info(
+                f"🔬 剖析完成: {task_id} - {profile['samples']} 个样本, {profile['duration_seconds']}s"
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 保存剖析结果失败: {task_id} - {e}")
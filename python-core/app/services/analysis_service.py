@@ -8,7 +8,7 @@ import uuid
 import json
 import logging
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Callable
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Callable
 from pathlib import Path
 import sys
 
@@ -20,7 +20,6 @@ sys.path.insert(0, str(project_root))
 from tradingagents.utils.logging_init import init_logging
 init_logging()
 
-from tradingagents.graph.trading_graph import TradingAgentsGraph
 from tradingagents.default_config import DEFAULT_CONFIG
 from app.services.simple_analysis_service import create_analysis_config, get_provider_by_model_name
 from app.models.analysis import (
@@ -39,6 +38,10 @@ from app.services.queue import DEFAULT_USER_CONCURRENT_LIMIT, GLOBAL_CONCURRENT_
 from app.services.usage_statistics_service import UsageStatisticsService
 from app.models.config import UsageRecord
 
+if TYPE_CHECKING:
+    # 分析图在创建实例时才导入，不计入 API 冷启动
+    from tradingagents.graph.trading_graph import TradingAgentsGraph
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -79,11 +82,12 @@ class AnalysisService:
             logger.warning(f"⚠️ 生成新的用户ID: {new_object_id}")
             return PyObjectId(new_object_id)
     
-    def _get_trading_graph(self, config: Dict[str, Any]) -> TradingAgentsGraph:
+    def _get_trading_graph(self, config: Dict[str, Any]) -> "TradingAgentsGraph":
         """获取或创建TradingAgents图实例（带缓存）- 与单股分析保持一致"""
         config_key = json.dumps(config, sort_keys=True)
 
         if config_key not in self._trading_graph_cache:
+            from tradingagents.graph.trading_graph import TradingAgentsGraph
             # 直接使用完整配置，不再合并DEFAULT_CONFIG（因为create_analysis_config已经处理了）
             # 这与单股分析服务和web目录的方式一致
             self._trading_graph_cache[config_key] = TradingAgentsGraph(
@@ -927,7 +931,8 @@ class AnalysisService:
                 currency=currency,
                 session_id=task.task_id,
                 analysis_type="stock_analysis",
-                stock_code=task.symbol
+                stock_code=task.symbol,
+                user_id=str(task.user_id)
             )
 
             # 保存到数据库
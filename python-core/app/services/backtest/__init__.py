@@ -0,0 +1,8 @@
+"""
+Backtest 子包
+- engine: 向量化参数网格回测引擎
+- bars: 回测日线本地缓存
+- service: 回测入口与结果组装
+"""
+from .engine import STRATEGIES, expand_grid, get_strategy, run_grid
+from .service import run_backtest
@@ -0,0 +1,180 @@
+"""
+回测日线数据本地缓存
+- 前复权日线按股票缓存在内存与磁盘（pickle），重复回测不再请求数据源
+- 请求区间超出缓存时增量补齐：重叠的最后一根 K 线收盘价变化（复权因子更新）时整段重新获取
+- 数据源请求在线程池中执行，并经过 AKShare 共享限流器
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import pickle
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BAR_COLUMNS = {"日期": "date", "开盘": "open", "收盘": "close", "最高": "high", "最低": "low", "成交量": "volume"}
+
+
+def normalize_date(value: Optional[str], default: pd.Timestamp) -> pd.Timestamp:
+    """支持 YYYYMMDD / YYYY-MM-DD"""
+    if not value:
+        return default.normalize()
+    return pd.Timestamp(datetime.strptime(value.replace("-", ""), "%Y%m%d"))
+
+
+def _fetch_akshare_bars(symbol: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    """AKShare 前复权日线"""
+    import akshare as ak
+
+    df = ak.stock_zh_a_hist(
+        symbol=symbol, period="daily",
+        start_date=start.strftime("%Y%m%d"), end_date=end.strftime("%Y%m%d"), adjust="qfq",
+    )
+    if df is None or df.empty:
+        return pd.DataFrame(columns=list(BAR_COLUMNS.values())[1:])
+    df = df.rename(columns=BAR_COLUMNS)[list(BAR_COLUMNS.values())]
+    df["date"] = pd.to_datetime(df["date"])
+    return df.set_index("date").sort_index()
+
+
+class BarStore:
+    """日线缓存：symbol -> {bars, start, end, fetched_at}"""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        refresh_seconds: float = 3600,
+        fetcher: Optional[Callable[[str, pd.Timestamp, pd.Timestamp], pd.DataFrame]] = None,
+        max_concurrency: int = 4,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.refresh_seconds = refresh_seconds
+        self.fetcher = fetcher or _fetch_akshare_bars
+        self._memory: Dict[str, dict] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def get_closes(self, symbols: List[str], start_date: Optional[str], end_date: Optional[str],
+                         default_days: int = 365) -> pd.DataFrame:
+        """
+        获取多只股票的收盘价矩阵（交易日并集为索引，列为股票代码；停牌日向前填充，上市前为 NaN）
+
+        Raises:
+            ValueError: 所有股票在区间内均无数据
+        """
+        today = pd.Timestamp.now().normalize()
+        end = min(normalize_date(end_date, today), today)
+        start = normalize_date(start_date, end - pd.Timedelta(days=default_days))
+
+        frames = await asyncio.gather(*(self.get_bars(s, start, end) for s in symbols))
+        closes = {s: f["close"] for s, f in zip(symbols, frames) if not f.empty}
+        if not closes:
+            raise ValueError("所选股票在该区间内没有行情数据")
+        matrix = pd.DataFrame(closes).sort_index().ffill()
+        return matrix.reindex(columns=[s for s in symbols if s in closes])
+
+    async def get_bars(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        lock = self._locks.setdefault(symbol, asyncio.Lock())
+        async with lock:
+            entry = self._memory.get(symbol) or await asyncio.to_thread(self._load_disk, symbol)
+            entry = await self._ensure_coverage(symbol, entry, start, end)
+            self._memory[symbol] = entry
+        bars = entry["bars"]
+        return bars.loc[(bars.index >= start) & (bars.index <= end)]
+
+    async def _ensure_coverage(self, symbol: str, entry: Optional[dict], start: pd.Timestamp, end: pd.Timestamp) -> dict:
+        if entry is None or start < entry["start"]:
+            fetch_end = max(end, entry["end"]) if entry else end
+            return await self._fetch_full(symbol, start, fetch_end)
+
+        # 缓存覆盖到 end：缓存截止日早于获取日（数据已完整）或未过刷新间隔
+        fetched_day = pd.Timestamp(datetime.fromtimestamp(entry["fetched_at"])).normalize()
+        fresh_enough = time.time() - entry["fetched_at"] <= self.refresh_seconds
+        if end <= entry["end"] and (entry["end"] < fetched_day or fresh_enough):
+            return entry
+
+        end = max(end, entry["end"])
+        bars = entry["bars"]
+        if bars.empty:
+            return await self._fetch_full(symbol, entry["start"], end)
+
+        # 增量：从缓存最后一根 K 线开始获取，用重叠的 K 线校验复权是否变化
+        last_date = bars.index[-1]
+        fresh = await self._fetch(symbol, last_date, end)
+        if fresh.empty or last_date not in fresh.index:
+            entry.update(end=end, fetched_at=time.time())
+            return entry
+        old_close, new_close = float(bars["close"].iloc[-1]), float(fresh.loc[last_date, "close"])
+        if abs(new_close - old_close) > 1e-6 * max(abs(old_close), 1.0):
+            logger.info(f"🔄 {symbol} 复权价格已变化，重新获取完整日线")
+            return await self._fetch_full(symbol, entry["start"], end)
+
+        merged = pd.concat([bars, fresh.loc[fresh.index > last_date]])
+        entry = {"bars": merged, "start": entry["start"], "end": end, "fetched_at": time.time()}
+        await asyncio.to_thread(self._save_disk, symbol, entry)
+        return entry
+
+    async def _fetch_full(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp) -> dict:
+        bars = await self._fetch(symbol, start, end)
+        entry = {"bars": bars, "start": start, "end": end, "fetched_at": time.time()}
+        await asyncio.to_thread(self._save_disk, symbol, entry)
+        return entry
+
+    async def _fetch(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        async with self._semaphore:
+            await self._acquire_rate_limit()
+            logger.info(f"📥 获取回测日线: {symbol} {start.date()} ~ {end.date()}")
+            return await asyncio.to_thread(self.fetcher, symbol, start, end)
+
+    @staticmethod
+    async def _acquire_rate_limit():
+        try:
+            from app.core.rate_limiter import RatePriority, get_akshare_rate_limiter
+            await get_akshare_rate_limiter().acquire(priority=RatePriority.NORMAL)
+        except Exception as e:
+            logger.debug(f"AKShare 限流器不可用: {e}")
+
+    def _path(self, symbol: str) -> Path:
+        return self.cache_dir / f"{symbol}_qfq.pkl"
+
+    def _load_disk(self, symbol: str) -> Optional[dict]:
+        try:
+            with open(self._path(symbol), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ 回测日线缓存损坏，将重新获取 {symbol}: {e}")
+            return None
+
+    def _save_disk(self, symbol: str, entry: dict):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self._path(symbol).with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp.replace(self._path(symbol))
+        except Exception as e:
+            logger.warning(f"⚠️ 保存回测日线缓存失败 {symbol}: {e}")
+
+
+_bar_store: Optional[BarStore] = None
+
+
+def get_bar_store() -> BarStore:
+    """获取回测日线缓存（单例）"""
+    global _bar_store
+    if _bar_store is None:
+        from app.core.config import settings
+
+        _bar_store = BarStore(
+            cache_dir=settings.BACKTEST_BAR_CACHE_DIR,
+            refresh_seconds=settings.BACKTEST_BAR_REFRESH_SECONDS,
+        )
+    return _bar_store
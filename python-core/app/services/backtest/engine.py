@@ -0,0 +1,304 @@
+"""
+向量化回测引擎
+- 策略 + 参数网格：所有参数组合一次性展开为 (组合, 交易日, 股票) 的持仓矩阵，整体计算收益
+- 多股票组合：每只股票一个等权仓位，按日再平衡，输出组合层面的净值
+- 信号在收盘产生、次日持有（避免未来函数），换仓按换手率扣除手续费
+"""
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+# 单批持仓矩阵的元素上限（控制内存：约 32MB float32）
+CHUNK_ELEMENTS = 8_000_000
+METRIC_NAMES = ("total_return", "annualized_return", "max_drawdown", "volatility", "sharpe", "trades", "exposure")
+
+
+# ---------------- 指标计算（沿时间轴，输入为 (T, S)） ----------------
+
+def _shift(arr: np.ndarray, periods: int) -> np.ndarray:
+    out = np.full_like(arr, np.nan)
+    if periods < len(arr):
+        out[periods:] = arr[:-periods] if periods else arr
+    return out
+
+
+def rolling_mean(arr: np.ndarray, window: int) -> np.ndarray:
+    """滚动均值（前 window-1 行或窗口内含 NaN 时为 NaN）"""
+    valid = ~np.isnan(arr)
+    csum = np.cumsum(np.where(valid, arr, 0.0), axis=0)
+    ccount = np.cumsum(valid, axis=0)
+    out = np.full(arr.shape, np.nan)
+    if window > len(arr):
+        return out
+    total = csum[window - 1:].copy()
+    count = ccount[window - 1:].copy()
+    total[1:] -= csum[:-window]
+    count[1:] -= ccount[:-window]
+    out[window - 1:] = np.where(count == window, total / window, np.nan)
+    return out
+
+
+def rsi(prices: np.ndarray, window: int) -> np.ndarray:
+    """简单均值版 RSI（与 api.py calculate_technicals 口径一致）"""
+    delta = prices - _shift(prices, 1)
+    gain = rolling_mean(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)), window)
+    loss = rolling_mean(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)), window)
+    return 100 - 100 / (1 + gain / (loss + 1e-9))
+
+
+def hold_state(entry: np.ndarray, exit_: np.ndarray) -> np.ndarray:
+    """
+    由入场/离场事件得到持仓状态（向前填充最近一次事件，同日同时出现时以入场为准）
+    """
+    event = np.where(entry, 1.0, np.where(exit_, 0.0, np.nan))
+    rows = np.arange(len(event))[:, None]
+    last = np.where(~np.isnan(event), rows, 0)
+    np.maximum.accumulate(last, axis=0, out=last)
+    state = event[last, np.arange(event.shape[1])]
+    return np.nan_to_num(state, nan=0.0)
+
+
+# ---------------- 策略定义 ----------------
+
+@dataclass(frozen=True)
+class Strategy:
+    """策略：参数名、默认参数网格、组合合法性校验与批量信号函数"""
+    name: str
+    description: str
+    default_grid: Dict[str, List[Any]]
+    signals: Callable[[np.ndarray, List[Dict[str, Any]]], np.ndarray]
+    validate: Callable[[Dict[str, Any]], bool] = lambda combo: True
+
+
+def _ma_cross_signals(prices: np.ndarray, combos: List[Dict[str, Any]]) -> np.ndarray:
+    windows = {int(c["fast"]) for c in combos} | {int(c["slow"]) for c in combos}
+    mas = {w: rolling_mean(prices, w) for w in windows}
+    out = np.empty((len(combos),) + prices.shape, dtype=np.float32)
+    for k, c in enumerate(combos):
+        out[k] = mas[int(c["fast"])] > mas[int(c["slow"])]
+    return out
+
+
+def _momentum_signals(prices: np.ndarray, combos: List[Dict[str, Any]]) -> np.ndarray:
+    changes = {}
+    out = np.empty((len(combos),) + prices.shape, dtype=np.float32)
+    for k, c in enumerate(combos):
+        lookback = int(c["lookback"])
+        if lookback not in changes:
+            changes[lookback] = prices / _shift(prices, lookback) - 1
+        out[k] = changes[lookback] > float(c.get("threshold", 0.0))
+    return out
+
+
+def _rsi_signals(prices: np.ndarray, combos: List[Dict[str, Any]]) -> np.ndarray:
+    values = {}
+    out = np.empty((len(combos),) + prices.shape, dtype=np.float32)
+    for k, c in enumerate(combos):
+        window = int(c["window"])
+        if window not in values:
+            values[window] = rsi(prices, window)
+        r = values[window]
+        out[k] = hold_state(r < float(c["lower"]), r > float(c["upper"]))
+    return out
+
+
+STRATEGIES: Dict[str, Strategy] = {
+    "ma_cross": Strategy(
+        name="ma_cross",
+        description="均线交叉：快线上穿慢线持有，下穿空仓",
+        default_grid={"fast": [5], "slow": [20]},
+        signals=_ma_cross_signals,
+        validate=lambda c: int(c["fast"]) < int(c["slow"]),
+    ),
+    "momentum": Strategy(
+        name="momentum",
+        description="动量：过去 lookback 日涨幅超过 threshold 时持有",
+        default_grid={"lookback": [20], "threshold": [0.0]},
+        signals=_momentum_signals,
+        validate=lambda c: int(c["lookback"]) > 0,
+    ),
+    "rsi": Strategy(
+        name="rsi",
+        description="RSI 均值回归：RSI 低于 lower 买入，高于 upper 卖出",
+        default_grid={"window": [14], "lower": [30], "upper": [70]},
+        signals=_rsi_signals,
+        validate=lambda c: int(c["window"]) > 1 and float(c["lower"]) < float(c["upper"]),
+    ),
+}
+
+
+def get_strategy(name: str) -> Strategy:
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"不支持的策略: {name}，可选: {', '.join(STRATEGIES)}")
+
+
+def expand_grid(strategy: Strategy, params: Optional[Dict[str, Any]] = None,
+                max_combinations: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    展开参数网格（参数值可以是单值或列表，未提供的参数使用默认网格），过滤非法组合
+
+    Raises:
+        ValueError: 参数非法、没有合法组合，或组合数（过滤前）超过 max_combinations
+    """
+    grid = dict(strategy.default_grid)
+    for key, value in (params or {}).items():
+        if key not in grid:
+            raise ValueError(f"策略 {strategy.name} 不支持参数: {key}")
+        grid[key] = list(value) if isinstance(value, (list, tuple)) else [value]
+    keys = list(grid)
+    total = int(np.prod([len(grid[k]) for k in keys], dtype=np.float64))
+    if max_combinations is not None and total > max_combinations:
+        raise ValueError(f"参数组合数 {total} 超过上限 {max_combinations}")
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    combos = [c for c in combos if strategy.validate(c)]
+    if not combos:
+        raise ValueError("参数网格中没有合法的参数组合")
+    return combos
+
+
+# ---------------- 回测 ----------------
+
+@dataclass
+class GridResult:
+    """参数网格回测结果：每个组合的指标（按组合顺序）与最优组合的净值曲线"""
+    combos: List[Dict[str, Any]]
+    metrics: Dict[str, np.ndarray]
+    equity: Dict[int, np.ndarray] = field(default_factory=dict)
+    benchmark: Optional[np.ndarray] = None
+
+    def ranked(self, sort_by: str = "sharpe") -> List[int]:
+        """按指标降序的组合下标（max_drawdown 越小越好）"""
+        values = self.metrics[sort_by]
+        order = np.argsort(values if sort_by == "max_drawdown" else -values, kind="stable")
+        return order.tolist()
+
+    def rows(self, indices: Sequence[int]) -> List[Dict[str, Any]]:
+        return [
+            {"params": self.combos[i], **{name: float(self.metrics[name][i]) for name in METRIC_NAMES}}
+            for i in indices
+        ]
+
+
+def daily_returns(prices: np.ndarray) -> np.ndarray:
+    """逐日收益（价格缺失或未上市处记为 0）"""
+    returns = np.zeros_like(prices, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns[1:] = prices[1:] / prices[:-1] - 1
+    returns[~np.isfinite(returns)] = 0.0
+    return returns
+
+
+def portfolio_returns(
+    prices: np.ndarray,
+    strategy: Strategy,
+    combos: List[Dict[str, Any]],
+    fee_rate: float = 0.0,
+    returns: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    一批参数组合的等权组合逐日收益 (K, T) 与持仓矩阵 (K, T, S)
+
+    当日收盘信号、次日持有；换仓按换手率扣除手续费
+    """
+    if returns is None:
+        returns = daily_returns(prices)
+    signal = strategy.signals(prices, combos)
+    held = np.zeros_like(signal)
+    held[:, 1:] = signal[:, :-1]
+    turnover = np.abs(np.diff(held, axis=1, prepend=0.0))
+    return (held * returns - turnover * fee_rate).mean(axis=2), held
+
+
+def _metrics(port_returns: np.ndarray, equity: np.ndarray, held: np.ndarray, initial_capital: float) -> Dict[str, np.ndarray]:
+    """由组合收益 (K, T) 与净值计算各组合指标"""
+    periods = port_returns.shape[1]
+    total = equity[:, -1] / initial_capital - 1
+    peak = np.maximum.accumulate(equity, axis=1)
+    std = port_returns.std(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annualized = np.power(np.maximum(1 + total, 0), TRADING_DAYS_PER_YEAR / max(periods, 1)) - 1
+        sharpe = np.where(std > 0, port_returns.mean(axis=1) / std * np.sqrt(TRADING_DAYS_PER_YEAR), 0.0)
+    entries = (np.diff(held, axis=1) > 0).sum(axis=(1, 2))
+    return {
+        "total_return": total,
+        "annualized_return": annualized,
+        "max_drawdown": ((peak - equity) / peak).max(axis=1),
+        "volatility": std * np.sqrt(TRADING_DAYS_PER_YEAR),
+        "sharpe": sharpe,
+        "trades": entries.astype(np.float64),
+        "exposure": held.mean(axis=(1, 2)),
+    }
+
+
+def run_grid(
+    prices: np.ndarray,
+    strategy: Strategy,
+    combos: List[Dict[str, Any]],
+    initial_capital: float = 100000.0,
+    fee_rate: float = 0.0,
+    keep_top: int = 1,
+    sort_by: str = "sharpe",
+) -> GridResult:
+    """
+    对所有参数组合执行回测
+
+    Args:
+        prices: 收盘价矩阵 (交易日, 股票)，缺失为 NaN
+        strategy: 策略
+        combos: 参数组合（expand_grid 的结果）
+        initial_capital: 初始资金
+        fee_rate: 单边换手费率（按仓位变化比例扣除）
+        keep_top: 保留净值曲线的最优组合数量
+        sort_by: 排序指标
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim == 1:
+        prices = prices[:, None]
+    returns = daily_returns(prices)
+    periods, n_symbols = prices.shape
+
+    chunk = max(1, CHUNK_ELEMENTS // max(periods * n_symbols, 1))
+    metric_parts: Dict[str, List[np.ndarray]] = {name: [] for name in METRIC_NAMES}
+    keep_top = max(keep_top, 0)
+    # 只保留截至当前批次的最优 keep_top 条净值曲线：(排序键, 组合下标) -> 曲线
+    kept: Dict[Tuple[float, int], np.ndarray] = {}
+
+    for offset in range(0, len(combos), chunk):
+        batch = combos[offset:offset + chunk]
+        port_returns, held = portfolio_returns(prices, strategy, batch, fee_rate, returns)
+        equity = initial_capital * np.cumprod(1 + port_returns, axis=1)
+
+        batch_metrics = _metrics(port_returns, equity, held, initial_capital)
+        for name, values in batch_metrics.items():
+            metric_parts[name].append(values)
+        if keep_top:
+            # 与 GridResult.ranked 一致：降序（max_drawdown 升序），同值按组合顺序，NaN 排最后
+            score = batch_metrics[sort_by] if sort_by == "max_drawdown" else -batch_metrics[sort_by]
+            score = np.where(np.isnan(score), np.inf, score)
+            for j in np.argsort(score, kind="stable")[:keep_top]:
+                kept[(float(score[j]), offset + int(j))] = equity[j].copy()
+            for key in sorted(kept)[keep_top:]:
+                del kept[key]
+
+    result = GridResult(
+        combos=combos,
+        metrics={name: np.concatenate(parts) for name, parts in metric_parts.items()},
+        benchmark=initial_capital * np.cumprod(1 + returns.mean(axis=1)),
+    )
+    result.equity = {index: curve for (_, index), curve in sorted(kept.items())}
+    return result
+
+
+def downsample_indices(length: int, max_points: int, keep: Sequence[int] = ()) -> np.ndarray:
+    """等间隔抽样曲线下标（始终保留首尾及 keep 中的点，如净值最高/最低点）"""
+    if length <= max_points:
+        return np.arange(length)
+    picks = np.linspace(0, length - 1, max(max_points - len(keep), 2)).round().astype(int)
+    return np.unique(np.concatenate([picks, np.asarray(keep, dtype=int)]))
@@ -0,0 +1,440 @@
+"""
+回测稳健性任务（walk-forward / 蒙特卡洛）
+- 通过 QueueService 入队，由分析 Worker 取出执行（任务参数中 task_type=backtest）
+- 计算拆分为互相独立的子任务，在 spawn 进程池中并行执行；价格矩阵/收益序列放在共享内存中，
+  子进程按名称映射，避免每个子任务重复 pickle 大数组
+- 进度写入 RedisProgressTracker（与分析任务共用进度查询接口），结果持久化到 backtest_jobs 集合
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.backtest.bars import get_bar_store
+from app.services.backtest.engine import (
+    METRIC_NAMES,
+    downsample_indices,
+    daily_returns,
+    expand_grid,
+    get_strategy,
+    portfolio_returns,
+    run_grid,
+)
+from app.services.backtest.robustness import (
+    PATH_METRICS,
+    WalkForwardWindow,
+    bootstrap_metrics,
+    evaluate_window,
+    path_metrics,
+    summarize_distribution,
+    walk_forward_windows,
+)
+from app.services.progress.tracker import AnalysisStep, RedisProgressTracker
+from app.utils.timezone import now_tz
+
+logger = logging.getLogger(__name__)
+
+# 队列任务参数中的任务类型标记（Worker 据此分发）
+TASK_TYPE = "backtest"
+JOB_TYPES = ("walk_forward", "monte_carlo")
+JOB_COLLECTION = "backtest_jobs"
+# walk-forward 未指定开始日期时默认取最近 3 年
+WALK_FORWARD_DEFAULT_DAYS = 365 * 3
+HISTOGRAM_BINS = 20
+
+ProgressCallback = Callable[[int, int, str], None]
+
+
+# ---------------- 共享内存 ----------------
+
+def share_array(arr: np.ndarray) -> Tuple[shared_memory.SharedMemory, Dict[str, Any]]:
+    """把数组复制到共享内存，返回共享内存对象（调用方负责 close/unlink）与子进程映射用的描述"""
+    arr = np.ascontiguousarray(arr)
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    return shm, {"name": shm.name, "shape": arr.shape, "dtype": arr.dtype.str}
+
+
+def attach_array(spec: Dict[str, Any]) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """按描述映射共享内存中的数组（只读视图，用完需先释放数组引用再 close）"""
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    arr = np.ndarray(spec["shape"], dtype=np.dtype(spec["dtype"]), buffer=shm.buf)
+    arr.flags.writeable = False
+    return shm, arr
+
+
+# ---------------- 子进程任务（模块级函数，供 pickle） ----------------
+
+def _walk_forward_task(spec: Dict[str, Any], strategy: str, combos: List[Dict[str, Any]],
+                       window: Tuple[int, int, int, int], fee_rate: float, sort_by: str) -> Dict[str, Any]:
+    shm, prices = attach_array(spec)
+    try:
+        return evaluate_window(prices, get_strategy(strategy), combos, WalkForwardWindow(*window), fee_rate, sort_by)
+    finally:
+        del prices
+        shm.close()
+
+
+def _monte_carlo_task(spec: Dict[str, Any], n_paths: int, block_size: int,
+                      seed: np.random.SeedSequence) -> Dict[str, np.ndarray]:
+    shm, returns = attach_array(spec)
+    try:
+        return bootstrap_metrics(returns, n_paths, block_size, seed)
+    finally:
+        del returns
+        shm.close()
+
+
+# ---------------- 参数校验 ----------------
+
+def normalize_job_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    校验并补全任务参数（入队前调用，Worker 收到的参数均为合法值）
+
+    Raises:
+        ValueError: 任务类型/股票/策略/参数网格/排序指标非法
+    """
+    job = dict(payload)
+    if job.get("job_type") not in JOB_TYPES:
+        raise ValueError(f"不支持的回测任务类型: {job.get('job_type')}，可选: {', '.join(JOB_TYPES)}")
+    symbols = list(dict.fromkeys(job.get("symbols") or []))
+    if not symbols:
+        raise ValueError("symbols 不能为空")
+    if not all(isinstance(s, str) and s.isdigit() and len(s) == 6 for s in symbols):
+        raise ValueError("股票代码格式错误（仅支持6位A股代码）")
+    job["symbols"] = symbols
+    job.setdefault("strategy", "ma_cross")
+    job["combinations"] = len(expand_grid(get_strategy(job["strategy"]), job.get("params"),
+                                          max_combinations=settings.BACKTEST_MAX_COMBINATIONS))
+    job.setdefault("sort_by", "sharpe")
+    if job["sort_by"] not in METRIC_NAMES:
+        raise ValueError(f"不支持的排序指标: {job['sort_by']}")
+    job.setdefault("fee_rate", 0.0)
+    job.setdefault("initial_capital", 100000.0)
+    if job["job_type"] == "walk_forward":
+        job.setdefault("train_days", 252)
+        job.setdefault("test_days", 63)
+        job.setdefault("anchored", False)
+    else:
+        job.setdefault("n_paths", 1000)
+        job.setdefault("block_size", 20)
+    return job
+
+
+# ---------------- 进度 ----------------
+
+class BacktestProgressTracker(RedisProgressTracker):
+    """回测任务进度（复用分析任务的 Redis/文件进度存储，步骤与耗时估算按回测任务定义）"""
+
+    LOAD_WEIGHT = 0.1
+    COMPUTE_WEIGHT = 0.8
+
+    def __init__(self, task_id: str, job_type: str):
+        self.job_type = job_type
+        super().__init__(task_id, analysts=[], research_depth=job_type, llm_provider="")
+
+    def _generate_dynamic_steps(self) -> List[AnalysisStep]:
+        return [
+            AnalysisStep("📥 加载行情", "读取本地日线缓存，补齐缺失区间", "pending", self.LOAD_WEIGHT),
+            AnalysisStep("🧮 并行计算", "在进程池中执行前推窗口/重采样路径", "pending", self.COMPUTE_WEIGHT),
+            AnalysisStep("📊 汇总结果", "汇总各子任务结果并保存", "pending", 1 - self.LOAD_WEIGHT - self.COMPUTE_WEIGHT),
+        ]
+
+    def _get_base_total_time(self) -> float:
+        # 开始前无从估计，按 1 分钟初始化；之后按已完成比例外推
+        return 60.0
+
+    def _calculate_time_estimates(self) -> tuple[float, float, float]:
+        elapsed = time.time() - self.progress_data.get('start_time', time.time())
+        pct = self.progress_data.get('progress_percentage', 0)
+        if pct >= 100:
+            return elapsed, 0, elapsed
+        if pct <= self.LOAD_WEIGHT * 100:
+            return elapsed, self._get_base_total_time(), elapsed + self._get_base_total_time()
+        est_total = elapsed * 100 / pct
+        return elapsed, max(0, est_total - elapsed), est_total
+
+    def report(self, done: int, total: int, message: str) -> None:
+        """子任务完成回调：把完成比例映射到“并行计算”步骤的进度区间"""
+        pct = (self.LOAD_WEIGHT + self.COMPUTE_WEIGHT * done / max(total, 1)) * 100
+        self.update_progress({'progress_percentage': round(pct, 1), 'last_message': message})
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = super().to_dict()
+        data['job_type'] = self.job_type
+        data['last_message'] = self.progress_data.get('last_message')
+        return data
+
+
+# ---------------- 执行 ----------------
+
+class BacktestJobRunner:
+    """回测稳健性任务执行器（进程池懒创建，子进程异常退出后重建）"""
+
+    def __init__(self, max_workers: int = 2, mc_chunk_paths: int = 250):
+        self.max_workers = max_workers
+        self.mc_chunk_paths = mc_chunk_paths
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn：Worker 进程内有事件循环与多个连接，避免 fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _map(self, fn: Callable, calls: List[tuple], progress: Optional[ProgressCallback], label: str) -> List[Any]:
+        """并行执行子任务，每完成一个回调一次进度，结果按提交顺序返回"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        futures = [loop.run_in_executor(executor, fn, *args) for args in calls]
+        done = 0
+
+        def _on_done(future: asyncio.Future):
+            nonlocal done
+            if future.cancelled() or future.exception() is not None:
+                return
+            done += 1
+            if progress:
+                progress(done, len(futures), f"{label} {done}/{len(futures)}")
+
+        for f in futures:
+            f.add_done_callback(_on_done)
+        try:
+            return await asyncio.gather(*futures)
+        except BrokenProcessPool:
+            logger.warning("⚠️ 回测进程池已损坏，将重建")
+            self.shutdown()
+            raise
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
+
+    async def run(self, job: Dict[str, Any], closes: pd.DataFrame,
+                  progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        prices = closes.to_numpy(dtype=np.float64)
+        start = time.perf_counter()
+        if job["job_type"] == "walk_forward":
+            result = await self._run_walk_forward(job, prices, closes.index, progress)
+        else:
+            result = await self._run_monte_carlo(job, prices, closes.index, progress)
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"🧪 回测任务完成: {job['job_type']} {job['strategy']} × {closes.shape[1]} 只股票 × {len(closes)} 日, "
+            f"耗时 {elapsed:.2f}s"
+        )
+        result.update(job_type=job["job_type"], strategy=job["strategy"], symbols=list(closes.columns),
+                      elapsed_seconds=round(elapsed, 3))
+        return result
+
+    async def _run_walk_forward(self, job: Dict[str, Any], prices: np.ndarray, dates: pd.DatetimeIndex,
+                                progress: Optional[ProgressCallback]) -> Dict[str, Any]:
+        combos = expand_grid(get_strategy(job["strategy"]), job.get("params"))
+        windows = walk_forward_windows(len(prices), int(job["train_days"]), int(job["test_days"]), bool(job["anchored"]))
+        shm, spec = share_array(prices)
+        try:
+            calls = [
+                (spec, job["strategy"], combos, (w.index, w.train_start, w.train_end, w.test_end),
+                 float(job["fee_rate"]), job["sort_by"])
+                for w in windows
+            ]
+            results = await self._map(_walk_forward_task, calls, progress, "前推窗口")
+        finally:
+            shm.close()
+            shm.unlink()
+
+        labels = dates.strftime("%Y-%m-%d")
+        oos = np.concatenate([r.pop("oos_returns") for r in results])
+        first, last = windows[0].test_start, windows[-1].test_end
+        benchmark = daily_returns(prices[first - 1:last]).mean(axis=1)[1:]
+        for w, r in zip(windows, results):
+            r.update(train_start=labels[w.train_start], train_end=labels[w.train_end - 1],
+                     test_start=labels[w.test_start], test_end=labels[w.test_end - 1])
+
+        params_freq: Dict[str, Dict[str, Any]] = {}
+        for r in results:
+            key = repr(sorted(r["best_params"].items()))
+            params_freq.setdefault(key, {"params": r["best_params"], "windows": 0})["windows"] += 1
+
+        in_sample_mean = {m: float(np.mean([r["in_sample"][m] for r in results])) for m in PATH_METRICS}
+        return {
+            "windows": results,
+            "out_of_sample": {m: float(v[0]) for m, v in path_metrics(oos).items()},
+            "in_sample_mean": in_sample_mean,
+            "param_frequency": sorted(params_freq.values(), key=lambda x: -x["windows"]),
+            "chart_data": _equity_chart(oos, benchmark, labels[first:last], float(job["initial_capital"]),
+                                        int(job.get("max_points", 300))),
+        }
+
+    async def _run_monte_carlo(self, job: Dict[str, Any], prices: np.ndarray, dates: pd.DatetimeIndex,
+                               progress: Optional[ProgressCallback]) -> Dict[str, Any]:
+        strategy = get_strategy(job["strategy"])
+        combos = expand_grid(strategy, job.get("params"))
+        grid = await asyncio.to_thread(run_grid, prices, strategy, combos, float(job["initial_capital"]),
+                                       float(job["fee_rate"]), 0, job["sort_by"])
+        best = combos[grid.ranked(job["sort_by"])[0]]
+        returns = portfolio_returns(prices, strategy, [best], float(job["fee_rate"]))[0][0]
+
+        n_paths = int(job["n_paths"])
+        sizes = [min(self.mc_chunk_paths, n_paths - i) for i in range(0, n_paths, self.mc_chunk_paths)]
+        seeds = np.random.SeedSequence(job.get("seed")).spawn(len(sizes))
+        shm, spec = share_array(returns)
+        try:
+            calls = [(spec, size, int(job["block_size"]), seed) for size, seed in zip(sizes, seeds)]
+            chunks = await self._map(_monte_carlo_task, calls, progress, "重采样批次")
+        finally:
+            shm.close()
+            shm.unlink()
+
+        paths = {m: np.concatenate([c[m] for c in chunks]) for m in PATH_METRICS}
+        original = {m: float(v[0]) for m, v in path_metrics(returns).items()}
+        counts, edges = np.histogram(paths["total_return"], bins=HISTOGRAM_BINS)
+        return {
+            "best_params": best,
+            "n_paths": n_paths,
+            "original": original,
+            "distribution": {m: summarize_distribution(paths[m]) for m in PATH_METRICS},
+            "probability_of_loss": float((paths["total_return"] < 0).mean()),
+            # 原始回测在重采样分布中的分位（越接近 1 说明原始结果越依赖特定的行情顺序）
+            "original_percentile": {
+                m: float((paths[m] <= original[m]).mean()) for m in PATH_METRICS
+            },
+            "histogram": {"edges": edges.round(6).tolist(), "counts": counts.tolist()},
+        }
+
+
+def _equity_chart(returns: np.ndarray, benchmark: np.ndarray, labels, initial_capital: float,
+                  max_points: int) -> List[Dict[str, Any]]:
+    equity = initial_capital * np.cumprod(1 + returns)
+    bench = initial_capital * np.cumprod(1 + benchmark)
+    idx = downsample_indices(len(equity), max_points, keep=(int(np.argmax(equity)), int(np.argmin(equity))))
+    return [
+        {"date": labels[i], "value": round(float(equity[i]), 2), "benchmark": round(float(bench[i]), 2)}
+        for i in idx
+    ]
+
+
+_runner: Optional[BacktestJobRunner] = None
+
+
+def get_backtest_job_runner() -> BacktestJobRunner:
+    global _runner
+    if _runner is None:
+        _runner = BacktestJobRunner(
+            max_workers=int(getattr(settings, "BACKTEST_JOB_WORKERS", 2)),
+            mc_chunk_paths=int(getattr(settings, "BACKTEST_MC_CHUNK_PATHS", 250)),
+        )
+    return _runner
+
+
+def shutdown_backtest_job_runner():
+    if _runner is not None:
+        _runner.shutdown()
+
+
+# ---------------- 入队 / 执行 / 查询 ----------------
+
+async def submit_backtest_job(queue_service, user_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    校验参数并入队，同时登记任务记录（供报告页列表展示）
+
+    Raises:
+        ValueError: 参数非法或达到队列并发限制
+    """
+    from app.core.database import get_mongo_db
+
+    job = normalize_job_payload(payload)
+    task_id = await queue_service.enqueue_task(
+        user_id=user_id,
+        symbol=",".join(job["symbols"]),
+        params={"task_type": TASK_TYPE, **job},
+    )
+    now = now_tz()
+    # Worker 可能先于此处开始执行，使用 upsert + $setOnInsert 避免覆盖运行状态
+    await get_mongo_db()[JOB_COLLECTION].update_one(
+        {"job_id": task_id},
+        {"$setOnInsert": {"status": "queued", "user_id": user_id, "created_at": now},
+         "$set": {"job_type": job["job_type"], "request": job}},
+        upsert=True,
+    )
+    logger.info(f"🧪 回测任务已入队: {task_id} ({job['job_type']}, {len(job['symbols'])} 只股票)")
+    return {"job_id": task_id, "status": "queued", "job_type": job["job_type"]}
+
+
+async def execute_backtest_job(task_id: str, job: Dict[str, Any], user_id: Optional[str] = None) -> Dict[str, Any]:
+    """Worker 执行回测任务：加载行情 → 进程池计算 → 保存结果（失败时记录错误并抛出）"""
+    from app.core.database import get_mongo_db
+
+    jobs = get_mongo_db()[JOB_COLLECTION]
+    tracker = BacktestProgressTracker(task_id, job["job_type"])
+    await jobs.update_one(
+        {"job_id": task_id},
+        {"$set": {"status": "running", "started_at": now_tz()},
+         "$setOnInsert": {"user_id": user_id, "job_type": job["job_type"], "request": job, "created_at": now_tz()}},
+        upsert=True,
+    )
+    try:
+        tracker.update_progress({'progress_percentage': 1, 'last_message': "加载行情"})
+        default_days = WALK_FORWARD_DEFAULT_DAYS if job["job_type"] == "walk_forward" else 365
+        closes = await get_bar_store().get_closes(
+            job["symbols"], job.get("start_date"), job.get("end_date"), default_days=default_days,
+        )
+        tracker.update_progress({'progress_percentage': tracker.LOAD_WEIGHT * 100, 'last_message': "开始并行计算"})
+        result = await get_backtest_job_runner().run(job, closes, tracker.report)
+    except Exception as e:
+        logger.error(f"❌ 回测任务失败: {task_id} - {e}")
+        tracker.mark_failed(str(e))
+        await jobs.update_one(
+            {"job_id": task_id},
+            {"$set": {"status": "failed", "error": str(e), "completed_at": now_tz()}},
+        )
+        raise
+
+    await jobs.update_one(
+        {"job_id": task_id},
+        {"$set": {"status": "completed", "result": result, "completed_at": now_tz()}},
+    )
+    tracker.mark_completed()
+    return result
+
+
+async def get_backtest_job(job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """任务详情（含结果；运行中时附带进度）"""
+    from app.core.database import get_mongo_db
+    from app.services.progress.tracker import get_progress_by_id
+
+    doc = await get_mongo_db()[JOB_COLLECTION].find_one({"job_id": job_id, "user_id": user_id}, {"_id": 0})
+    if doc is None:
+        return None
+    if doc.get("status") in ("queued", "running"):
+        doc["progress"] = get_progress_by_id(job_id)
+    return doc
+
+
+async def list_backtest_jobs(user_id: str, limit: int = 20, job_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """任务列表（不含结果明细）"""
+    from app.core.database import get_mongo_db
+
+    query: Dict[str, Any] = {"user_id": user_id}
+    if job_type:
+        query["job_type"] = job_type
+    cursor = get_mongo_db()[JOB_COLLECTION].find(query, {"_id": 0, "result": 0}).sort("created_at", -1).limit(limit)
+    return await cursor.to_list(length=limit)
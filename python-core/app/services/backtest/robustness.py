@@ -0,0 +1,134 @@
+"""
+回测稳健性检验（纯计算，无 I/O，可在子进程中执行）
+- 滚动前推（walk-forward）：每个窗口在训练段做参数网格寻优，用最优参数在随后的测试段做样本外回测
+- 蒙特卡洛：对策略逐日收益做分块自助重采样（block bootstrap），得到收益/回撤/夏普的分布
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.backtest.engine import (
+    TRADING_DAYS_PER_YEAR,
+    Strategy,
+    portfolio_returns,
+    run_grid,
+)
+
+PATH_METRICS = ("total_return", "annualized_return", "max_drawdown", "sharpe")
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def path_metrics(returns: np.ndarray) -> Dict[str, np.ndarray]:
+    """逐日收益 (N, T) 的收益/回撤/夏普（按行计算，1 维输入视为单条路径）"""
+    returns = np.atleast_2d(np.asarray(returns, dtype=np.float64))
+    periods = returns.shape[1]
+    equity = np.cumprod(1 + returns, axis=1)
+    peak = np.maximum.accumulate(equity, axis=1)
+    total = equity[:, -1] - 1
+    std = returns.std(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annualized = np.power(np.maximum(1 + total, 0), TRADING_DAYS_PER_YEAR / max(periods, 1)) - 1
+        sharpe = np.where(std > 0, returns.mean(axis=1) / std * np.sqrt(TRADING_DAYS_PER_YEAR), 0.0)
+    return {
+        "total_return": total,
+        "annualized_return": annualized,
+        "max_drawdown": np.maximum(((peak - equity) / peak).max(axis=1), 0.0),
+        "sharpe": sharpe,
+    }
+
+
+def summarize_distribution(values: np.ndarray, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+    """分布摘要：均值、标准差与分位数"""
+    values = np.asarray(values, dtype=np.float64)
+    summary = {"mean": float(values.mean()), "std": float(values.std())}
+    for p, v in zip(percentiles, np.percentile(values, percentiles)):
+        summary[f"p{int(p)}"] = float(v)
+    return summary
+
+
+# ---------------- 滚动前推 ----------------
+
+@dataclass(frozen=True)
+class WalkForwardWindow:
+    """一个前推窗口（下标为交易日位置，左闭右开）"""
+    index: int
+    train_start: int
+    train_end: int
+    test_end: int
+
+    @property
+    def test_start(self) -> int:
+        return self.train_end
+
+
+def walk_forward_windows(periods: int, train_size: int, test_size: int, anchored: bool = False) -> List[WalkForwardWindow]:
+    """
+    切分前推窗口：测试段首尾相接覆盖样本外区间，最后一段不足 test_size 时截断
+
+    Args:
+        anchored: True 时训练段起点固定为 0（扩展窗口），否则为固定长度的滚动窗口
+    """
+    if train_size < 2 or test_size < 1:
+        raise ValueError("训练窗口至少 2 个交易日，测试窗口至少 1 个交易日")
+    if train_size + test_size > periods:
+        raise ValueError(f"数据长度 {periods} 日不足一个训练+测试窗口（{train_size}+{test_size}）")
+    windows = []
+    for train_end in range(train_size, periods, test_size):
+        windows.append(WalkForwardWindow(
+            index=len(windows),
+            train_start=0 if anchored else train_end - train_size,
+            train_end=train_end,
+            test_end=min(train_end + test_size, periods),
+        ))
+    return windows
+
+
+def evaluate_window(
+    prices: np.ndarray,
+    strategy: Strategy,
+    combos: List[Dict[str, Any]],
+    window: WalkForwardWindow,
+    fee_rate: float = 0.0,
+    sort_by: str = "sharpe",
+) -> Dict[str, Any]:
+    """
+    单个前推窗口：训练段寻优，测试段用最优参数回测
+
+    测试段的指标从训练段起点开始计算（指标预热只用到测试日之前的数据），只截取测试段的收益
+    """
+    train = prices[window.train_start:window.train_end]
+    grid = run_grid(train, strategy, combos, fee_rate=fee_rate, keep_top=0, sort_by=sort_by)
+    best = grid.ranked(sort_by)[0]
+
+    span = prices[window.train_start:window.test_end]
+    returns, _ = portfolio_returns(span, strategy, [combos[best]], fee_rate)
+    oos_returns = returns[0, window.test_start - window.train_start:]
+    return {
+        "window": window.index,
+        "best_params": combos[best],
+        "in_sample": {name: float(grid.metrics[name][best]) for name in PATH_METRICS},
+        "out_of_sample": {name: float(v[0]) for name, v in path_metrics(oos_returns).items()},
+        "oos_returns": oos_returns,
+    }
+
+
+# ---------------- 蒙特卡洛 ----------------
+
+def block_bootstrap_indices(periods: int, n_paths: int, block_size: int, rng: np.random.Generator) -> np.ndarray:
+    """循环分块自助重采样的下标矩阵 (n_paths, periods)：随机起点的连续块拼接，保留短期自相关"""
+    block_size = max(1, min(block_size, periods))
+    n_blocks = -(-periods // block_size)
+    starts = rng.integers(0, periods, size=(n_paths, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_size)) % periods
+    return idx.reshape(n_paths, -1)[:, :periods]
+
+
+def bootstrap_metrics(returns: np.ndarray, n_paths: int, block_size: int, seed: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """对逐日收益重采样 n_paths 条路径，返回每条路径的指标"""
+    returns = np.asarray(returns, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    idx = block_bootstrap_indices(len(returns), n_paths, block_size, rng)
+    return path_metrics(returns[idx])
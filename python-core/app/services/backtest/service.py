@@ -0,0 +1,106 @@
+"""
+回测服务：本地日线 + 向量化参数网格回测，输出汇总指标与抽样后的净值曲线
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.backtest.bars import get_bar_store
+from app.services.backtest.engine import (
+    METRIC_NAMES,
+    GridResult,
+    downsample_indices,
+    expand_grid,
+    get_strategy,
+    run_grid,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def build_report(
+    result: GridResult,
+    dates: pd.DatetimeIndex,
+    symbols: List[str],
+    sort_by: str = "sharpe",
+    top_n: int = 10,
+    max_points: int = 300,
+) -> Dict[str, Any]:
+    """组装回测结果：最优组合指标、前 N 个组合排名与抽样后的净值曲线"""
+    ranked = result.ranked(sort_by)
+    best = ranked[0]
+    equity = result.equity[best]
+    keep = (int(np.argmax(equity)), int(np.argmin(equity)))
+    idx = downsample_indices(len(dates), max_points, keep=keep)
+
+    date_labels = dates.strftime("%Y-%m-%d")
+    chart_data = [
+        {"date": date_labels[i], "value": round(float(equity[i]), 2), "benchmark": round(float(result.benchmark[i]), 2)}
+        for i in idx
+    ]
+    best_row = result.rows([best])[0]
+    return {
+        "symbols": symbols,
+        "combinations": len(result.combos),
+        "best_params": best_row["params"],
+        "metrics": {
+            "total_return": f"{best_row['total_return'] * 100:.2f}%",
+            "annualized_return": f"{best_row['annualized_return'] * 100:.2f}%",
+            "max_drawdown": f"{best_row['max_drawdown'] * 100:.2f}%",
+            "sharpe": round(best_row["sharpe"], 3),
+            "final_capital": round(float(equity[-1]), 2),
+        },
+        "ranking": [
+            {"params": row["params"], **{k: round(row[k], 6) for k in METRIC_NAMES}}
+            for row in result.rows(ranked[:top_n])
+        ],
+        "chart_data": chart_data,
+    }
+
+
+async def run_backtest(
+    symbols: List[str],
+    strategy: str = "ma_cross",
+    params: Optional[Dict[str, Any]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    initial_capital: float = 100000.0,
+    fee_rate: float = 0.0,
+    sort_by: str = "sharpe",
+    top_n: int = 10,
+    max_points: int = 300,
+) -> Dict[str, Any]:
+    """
+    执行一次参数网格回测
+
+    Raises:
+        ValueError: 策略/参数/排序指标非法、参数组合数超过上限或无行情数据
+    """
+    if sort_by not in METRIC_NAMES:
+        raise ValueError(f"不支持的排序指标: {sort_by}")
+    spec = get_strategy(strategy)
+    combos = expand_grid(spec, params, max_combinations=settings.BACKTEST_MAX_COMBINATIONS)
+
+    closes = await get_bar_store().get_closes(symbols, start_date, end_date)
+    start = time.perf_counter()
+    result = await asyncio.to_thread(
+        run_grid, closes.to_numpy(dtype=np.float64), spec, combos,
+        initial_capital, fee_rate, 1, sort_by,
+    )
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"📈 回测完成: {strategy} × {len(combos)} 组参数 × {closes.shape[1]} 只股票 × {len(closes)} 日, "
+        f"耗时 {elapsed:.3f}s"
+    )
+
+    report = build_report(result, closes.index, list(closes.columns), sort_by, top_n, max_points)
+    report["strategy"] = strategy
+    report["elapsed_seconds"] = round(elapsed, 3)
+    return report
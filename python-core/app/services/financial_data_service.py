@@ -229,6 +229,41 @@ class FinancialDataService:
         
         return results[0] if results else None
     
+    async def get_latest_report_periods(
+        self,
+        symbols: List[str],
+        data_source: str,
+        max_period: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        批量获取各股票在库中的最新报告期
+
+        Args:
+            symbols: 股票代码列表
+            data_source: 数据源
+            max_period: 只统计不晚于该报告期的记录（排除按当前季度兜底生成的未来报告期）
+
+        Returns:
+            {symbol: 最新报告期(YYYYMMDD)}
+        """
+        if self.db is None:
+            await self.initialize()
+
+        try:
+            match: Dict[str, Any] = {"symbol": {"$in": list(symbols)}, "data_source": data_source}
+            if max_period:
+                match["report_period"] = {"$lte": max_period}
+            pipeline = [
+                {"$match": match},
+                {"$group": {"_id": "$symbol", "latest_period": {"$max": "$report_period"}}},
+            ]
+            results = await self.db[self.collection_name].aggregate(pipeline).to_list(length=None)
+            return {r["_id"]: str(r["latest_period"]) for r in results if r.get("latest_period")}
+
+        except Exception as e:
+            logger.error(f"❌ 获取最新报告期失败: {e}")
+            return {}
+
     async def get_financial_statistics(self) -> Dict[str, Any]:
         """获取财务数据统计信息"""
         if self.db is None:
@@ -430,9 +465,13 @@ class FinancialDataService:
                 if isinstance(records, list) and records:
                     # 假设第一条记录是最新的
                     first_record = records[0]
-                    for date_field in ['报告期', '报告日期', 'date', '日期']:
+                    for date_field in ['报告期', '报告日期', 'REPORT_DATE', 'date', '日期']:
                         if date_field in first_record:
-                            return str(first_record[date_field]).replace('-', '')
+                            return str(first_record[date_field])[:10].replace('-', '')
+                    # 财务摘要为宽表，报告期在列名中（如 20240930）
+                    period_columns = [k for k in first_record if isinstance(k, str) and k.isdigit() and len(k) == 8]
+                    if period_columns:
+                        return max(period_columns)
         
         # 如果无法提取，使用当前季度
         return self._generate_current_period()
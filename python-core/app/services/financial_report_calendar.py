@@ -0,0 +1,195 @@
+"""
+财务报告期日历
+- 按A股定期报告的报告期（3/31、6/30、9/30、12/31）计算"当前可能存在的最新报告期"
+- 通过一次全市场业绩报表查询（AKShare stock_yjbb_em）获取某报告期已披露的公司列表，按报告期缓存
+- 财务同步前据此过滤股票：库中最新报告期已是最新、或后续报告期均未披露的股票直接跳过
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+REPORT_PERIODS = ("0331", "0630", "0930", "1231")
+
+
+def latest_possible_period(today: Optional[date] = None) -> str:
+    """今天之前最近一个已结束的报告期（YYYYMMDD），更新的报告期不可能已披露"""
+    today = today or date.today()
+    for mmdd in reversed(REPORT_PERIODS):
+        period_end = date(today.year, int(mmdd[:2]), int(mmdd[2:]))
+        if period_end < today:
+            return f"{today.year}{mmdd}"
+    return f"{today.year - 1}1231"
+
+
+def previous_period(period: str) -> str:
+    """上一个报告期"""
+    year, mmdd = int(period[:4]), period[4:]
+    idx = REPORT_PERIODS.index(mmdd)
+    if idx == 0:
+        return f"{year - 1}{REPORT_PERIODS[-1]}"
+    return f"{year}{REPORT_PERIODS[idx - 1]}"
+
+
+def periods_after(stored_period: str, target_period: str, max_periods: int = 4) -> Optional[List[str]]:
+    """
+    stored_period 之后、直到 target_period（含）的报告期列表（新到旧）
+
+    Returns:
+        报告期列表；间隔超过 max_periods 时返回 None（视为需要全量同步）
+    """
+    periods = []
+    period = target_period
+    while period > stored_period:
+        if len(periods) >= max_periods:
+            return None
+        periods.append(period)
+        period = previous_period(period)
+    return periods
+
+
+def _fetch_published_symbols_akshare(period: str) -> Set[str]:
+    """AKShare 业绩报表：某报告期已披露的全部公司"""
+    import akshare as ak
+
+    df = ak.stock_yjbb_em(date=period)
+    if df is None or df.empty or "股票代码" not in df.columns:
+        return set()
+    return set(df["股票代码"].astype(str).str.zfill(6))
+
+
+class FinancialReportCalendar:
+    """报告期感知：判断哪些股票可能有新的财务报告"""
+
+    def __init__(self, published_fetcher: Optional[Callable[[str], Set[str]]] = None,
+                 cache_ttl_seconds: int = 6 * 3600, failure_ttl_seconds: int = 300):
+        self.published_fetcher = published_fetcher or _fetch_published_symbols_akshare
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.failure_ttl_seconds = failure_ttl_seconds
+        # period -> (已披露公司集合, 获取时间)
+        self._published_cache: Dict[str, Tuple[Set[str], float]] = {}
+        # period -> 最近一次获取失败的时间（失败期内不重复请求）
+        self._failed_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get_published_symbols(self, period: str) -> Optional[Set[str]]:
+        """获取某报告期已披露的公司集合；获取失败返回 None"""
+        cached = self._published_cache.get(period)
+        if cached and time.time() - cached[1] < self.cache_ttl_seconds:
+            return cached[0]
+
+        lock = self._locks.setdefault(period, asyncio.Lock())
+        async with lock:
+            cached = self._published_cache.get(period)
+            if cached and time.time() - cached[1] < self.cache_ttl_seconds:
+                return cached[0]
+            if time.time() - self._failed_at.get(period, 0.0) < self.failure_ttl_seconds:
+                return None
+            try:
+                await self._acquire_rate_limit()
+                published = await asyncio.to_thread(self.published_fetcher, period)
+            except Exception as e:
+                logger.warning(f"⚠️ 获取 {period} 披露名单失败，相关股票将全部同步: {e}")
+                self._failed_at[period] = time.time()
+                return None
+            self._published_cache[period] = (published, time.time())
+            logger.info(f"📅 报告期 {period} 已披露 {len(published)} 家公司")
+            return published
+
+    @staticmethod
+    async def _acquire_rate_limit():
+        try:
+            from app.core.rate_limiter import RatePriority, get_akshare_rate_limiter
+            await get_akshare_rate_limiter().acquire(priority=RatePriority.BULK)
+        except Exception as e:
+            logger.debug(f"AKShare 限流器不可用: {e}")
+
+    async def filter_symbols(
+        self,
+        symbols: Iterable[str],
+        latest_periods: Dict[str, str],
+        today: Optional[date] = None,
+    ) -> Tuple[List[str], List[str]]:
+        """
+        按报告期过滤需要同步的股票
+
+        Args:
+            symbols: 候选股票
+            latest_periods: 库中各股票的最新报告期（YYYYMMDD）
+            today: 当前日期（默认今天）
+
+        Returns:
+            (需要同步的股票, 跳过的股票)
+        """
+        target = latest_possible_period(today)
+        to_sync: List[str] = []
+        skipped: List[str] = []
+
+        for symbol in symbols:
+            stored = latest_periods.get(symbol)
+            if not stored:
+                to_sync.append(symbol)
+                continue
+            newer = periods_after(stored, target)
+            if newer is None:
+                to_sync.append(symbol)
+                continue
+            if not newer:
+                skipped.append(symbol)
+                continue
+
+            needs_sync = False
+            for period in newer:
+                published = await self.get_published_symbols(period)
+                if published is None or symbol in published:
+                    needs_sync = True
+                    break
+            (to_sync if needs_sync else skipped).append(symbol)
+
+        return to_sync, skipped
+
+    async def select_symbols_to_sync(
+        self,
+        symbols: List[str],
+        data_source: str,
+        today: Optional[date] = None,
+    ) -> Tuple[List[str], List[str]]:
+        """
+        结合库中最新报告期过滤需要同步的股票（查询失败时全部同步）
+
+        Returns:
+            (需要同步的股票, 跳过的股票)
+        """
+        try:
+            from app.services.financial_data_service import get_financial_data_service
+
+            service = await get_financial_data_service()
+            latest_periods = await service.get_latest_report_periods(
+                symbols, data_source, max_period=latest_possible_period(today)
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 报告期过滤不可用，全部同步: {e}")
+            return list(symbols), []
+
+        to_sync, skipped = await self.filter_symbols(symbols, latest_periods, today)
+        logger.info(
+            f"📅 报告期过滤 ({data_source}): 需同步 {len(to_sync)} 只，跳过 {len(skipped)} 只"
+            f"（最新可能报告期 {latest_possible_period(today)}）"
+        )
+        return to_sync, skipped
+
+
+_financial_report_calendar: Optional[FinancialReportCalendar] = None
+
+
+def get_financial_report_calendar() -> FinancialReportCalendar:
+    """获取财务报告期日历（单例，披露名单在进程内共享缓存）"""
+    global _financial_report_calendar
+    if _financial_report_calendar is None:
+        _financial_report_calendar = FinancialReportCalendar()
+    return _financial_report_calendar
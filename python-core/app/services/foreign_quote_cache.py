@@ -0,0 +1,182 @@
+"""
+港股/美股实时行情热缓存
+- 进程内 TTL 字典（LRU 限制容量），重复请求不访问磁盘
+- 可选 Redis 二级缓存，多个 API 副本共享行情
+- 按市场配置新鲜期/过期期：新鲜期内直接返回；过期但仍在可用期内时返回旧值并后台刷新（stale-while-revalidate）
+- 同一股票的刷新请求在进程内共享一把锁，后台刷新并发数有上限
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ForeignQuoteCache:
+    """港股/美股实时行情缓存（内存 + 可选 Redis）"""
+
+    # 各市场 TTL（秒）：fresh 内视为最新，stale 内返回旧值并后台刷新，超过 stale 视为未命中
+    DEFAULT_TTL = {
+        "HK": {"fresh": 60, "stale": 600},
+        "US": {"fresh": 60, "stale": 600},
+    }
+
+    REDIS_KEY = "foreign_quote:{market}:{code}"
+
+    def __init__(self, ttl: Optional[Dict[str, Dict[str, int]]] = None,
+                 max_entries: int = 5000, max_background_refresh: int = 8,
+                 use_redis: bool = True):
+        self.ttl = ttl or self.DEFAULT_TTL
+        self.max_entries = max_entries
+        self.use_redis = use_redis
+
+        # (market, code) -> (行情数据, 获取时间戳)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._refreshing: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._refresh_semaphore = asyncio.Semaphore(max_background_refresh)
+
+        self.stats = {"memory_hits": 0, "redis_hits": 0, "stale_hits": 0, "misses": 0, "background_refreshes": 0}
+
+    def _ttl(self, market: str) -> Dict[str, int]:
+        return self.ttl.get(market) or self.DEFAULT_TTL["US"]
+
+    def _get_redis(self):
+        if not self.use_redis:
+            return None
+        try:
+            from app.core.database import get_redis_client
+            return get_redis_client()
+        except Exception:
+            return None
+
+    def lock_for(self, market: str, code: str) -> asyncio.Lock:
+        """获取某只股票的刷新锁（进程内共享，用于请求去重）"""
+        return self._locks[(market, code)]
+
+    def peek(self, market: str, code: str) -> Tuple[Optional[Dict[str, Any]], float]:
+        """只读内存层，返回 (数据副本, 距获取时间的秒数)，未命中返回 (None, inf)"""
+        entry = self._entries.get((market, code))
+        if entry is None:
+            return None, float("inf")
+        data, fetched_at = entry
+        return dict(data), time.time() - fetched_at
+
+    async def get(self, market: str, code: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        获取缓存行情
+
+        Returns:
+            (数据副本, 是否新鲜)；未命中或已超过可用期返回 (None, False)
+        """
+        ttl = self._ttl(market)
+        key = (market, code)
+
+        data, age = self.peek(market, code)
+        if data is not None and age < ttl["stale"]:
+            self._entries.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return data, age < ttl["fresh"]
+
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(self.REDIS_KEY.format(market=market, code=code))
+                if raw:
+                    payload = json.loads(raw)
+                    fetched_at = float(payload.get("ts", 0))
+                    age = time.time() - fetched_at
+                    if age < ttl["stale"]:
+                        self._store_memory(key, payload["data"], fetched_at)
+                        self.stats["redis_hits"] += 1
+                        return dict(payload["data"]), age < ttl["fresh"]
+            except Exception as e:
+                logger.debug(f"读取Redis行情缓存失败 {market}:{code}: {e}")
+
+        self.stats["misses"] += 1
+        return None, False
+
+    async def set(self, market: str, code: str, data: Dict[str, Any]):
+        """写入行情（内存 + Redis）"""
+        fetched_at = time.time()
+        self._store_memory((market, code), data, fetched_at)
+
+        redis = self._get_redis()
+        if redis is not None:
+            try:
+                await redis.setex(
+                    self.REDIS_KEY.format(market=market, code=code),
+                    self._ttl(market)["stale"],
+                    json.dumps({"data": data, "ts": fetched_at}, ensure_ascii=False, default=str),
+                )
+            except Exception as e:
+                logger.debug(f"写入Redis行情缓存失败 {market}:{code}: {e}")
+
+    def _store_memory(self, key: Tuple[str, str], data: Dict[str, Any], fetched_at: float):
+        self._entries[key] = (dict(data), fetched_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            old_key, _ = self._entries.popitem(last=False)
+            if old_key not in self._refreshing:
+                self._locks.pop(old_key, None)
+
+    def schedule_refresh(self, market: str, code: str,
+                         fetcher: Callable[[str, str], Awaitable[Any]]) -> bool:
+        """
+        后台刷新过期行情（同一股票只会有一个刷新任务）
+
+        Args:
+            fetcher: 刷新函数，签名 (market, code)，负责获取并写回缓存
+
+        Returns:
+            是否新建了刷新任务
+        """
+        key = (market, code)
+        task = self._refreshing.get(key)
+        if task is not None and not task.done():
+            return False
+
+        async def _refresh():
+            try:
+                async with self._refresh_semaphore:
+                    await fetcher(market, code)
+                    self.stats["background_refreshes"] += 1
+            except Exception as e:
+                logger.warning(f"⚠️ 后台刷新行情失败 {market}:{code}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(_refresh())
+        self.stats["stale_hits"] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.stats["memory_hits"] + self.stats["redis_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["redis_hits"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "refreshing": len(self._refreshing),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        """清空内存缓存"""
+        self._entries.clear()
+
+
+_foreign_quote_cache: Optional[ForeignQuoteCache] = None
+
+
+def get_foreign_quote_cache() -> ForeignQuoteCache:
+    """获取行情缓存（单例，进程内所有 ForeignStockService 实例共享）"""
+    global _foreign_quote_cache
+    if _foreign_quote_cache is None:
+        _foreign_quote_cache = ForeignQuoteCache()
+    return _foreign_quote_cache
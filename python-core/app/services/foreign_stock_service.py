@@ -18,6 +18,9 @@ from tradingagents.dataflows.cache import get_cache
 # 复用现有数据源提供者
 from tradingagents.dataflows.providers.hk.hk_stock import HKStockProvider
 
+# 实时行情热缓存（内存 + 可选 Redis，不写磁盘）
+from app.services.foreign_quote_cache import get_foreign_quote_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -54,6 +57,9 @@ class ForeignStockService:
         # 🔥 正在进行的请求缓存（用于共享结果）
         self._pending_requests = {}
 
+        # 🔥 实时行情热缓存（进程内共享，替代文件缓存）
+        self.quote_cache = get_foreign_quote_cache()
+
         logger.info("✅ ForeignStockService 初始化完成（已启用请求去重）")
     
     async def get_quote(self, market: str, code: str, force_refresh: bool = False) -> Dict:
@@ -70,16 +76,214 @@ class ForeignStockService:
         
         流程：
         1. 检查是否强制刷新
-        2. 从缓存获取（Redis → MongoDB → File）
+        2. 从行情热缓存获取（内存 → Redis），过期但可用时返回旧值并后台刷新
         3. 缓存未命中 → 调用数据源API（按优先级）
-        4. 保存到缓存
+        4. 保存到行情热缓存
         """
+        if market not in ('HK', 'US'):
+            raise ValueError(f"不支持的市场类型: {market}")
+
+        if not force_refresh:
+            cached, fresh = await self.quote_cache.get(market, code)
+            if cached is not None:
+                if not fresh:
+                    self.quote_cache.schedule_refresh(market, code, self._refresh_quote)
+                logger.debug(f"⚡ 从行情缓存获取{market}行情: {code} (fresh={fresh})")
+                return cached
+
+        return await self._fetch_quote(market, code, force_refresh)
+
+    async def _fetch_quote(self, market: str, code: str, force_refresh: bool = False) -> Dict:
+        """按市场调用数据源获取行情（带请求去重）"""
         if market == 'HK':
             return await self._get_hk_quote(code, force_refresh)
-        elif market == 'US':
-            return await self._get_us_quote(code, force_refresh)
-        else:
+        return await self._get_us_quote(code, force_refresh)
+
+    async def _refresh_quote(self, market: str, code: str) -> Dict:
+        """后台刷新过期行情"""
+        return await self._fetch_quote(market, code, force_refresh=True)
+
+    # 批量行情：无批量接口的数据源逐个获取时的并发上限
+    BATCH_QUOTE_CONCURRENCY = 5
+    # 批量行情：单次 yfinance 批量下载的最大代码数
+    BATCH_QUOTE_CHUNK_SIZE = 100
+
+    async def get_quotes(self, market: str, codes: List[str], force_refresh: bool = False) -> Dict[str, Dict]:
+        """
+        批量获取实时行情
+
+        Args:
+            market: 市场类型 (HK/US)
+            codes: 股票代码列表（自动去重）
+            force_refresh: 是否强制刷新（跳过缓存）
+
+        Returns:
+            {code: 行情数据}，获取失败的代码不包含在结果中
+
+        流程：
+        1. 逐个检查行情热缓存，新鲜命中直接返回，过期命中返回旧值并合并为一次后台批量刷新
+        2. 未命中的代码：首选数据源为 yfinance 时一次批量下载
+        3. 批量未覆盖的代码按单只流程获取（按优先级降级），并发数受限
+        """
+        if market not in ('HK', 'US'):
             raise ValueError(f"不支持的市场类型: {market}")
+
+        unique_codes = list(dict.fromkeys(c for c in codes if c))
+        results: Dict[str, Dict] = {}
+        misses: List[str] = []
+        stale: List[str] = []
+
+        for code in unique_codes:
+            if force_refresh:
+                misses.append(code)
+                continue
+            cached, fresh = await self.quote_cache.get(market, code)
+            if cached is None:
+                misses.append(code)
+            else:
+                results[code] = cached
+                if not fresh:
+                    stale.append(code)
+
+        if stale:
+            self.quote_cache.schedule_refresh(
+                market, ",".join(sorted(stale)),
+                lambda m, _key, codes=stale: self._fetch_quotes(m, codes)
+            )
+
+        if misses:
+            results.update(await self._fetch_quotes(market, misses))
+
+        logger.info(f"📊 批量获取{market}行情: 请求 {len(unique_codes)} 只, "
+                    f"缓存命中 {len(unique_codes) - len(misses)} 只, 获取 {len(misses)} 只, "
+                    f"成功 {len(results)} 只")
+        return results
+
+    async def _fetch_quotes(self, market: str, codes: List[str]) -> Dict[str, Dict]:
+        """批量获取行情并写入缓存（优先批量接口，其余有限并发逐个获取）"""
+        results: Dict[str, Dict] = {}
+
+        source_priority = await self._get_source_priority(market)
+        first_source = next(
+            (s.lower() for s in source_priority if s.lower() in ('yahoo_finance', 'yfinance', 'akshare', 'alpha_vantage', 'finnhub')),
+            'yahoo_finance'
+        )
+        if first_source in ('yahoo_finance', 'yfinance'):
+            for i in range(0, len(codes), self.BATCH_QUOTE_CHUNK_SIZE):
+                chunk = codes[i:i + self.BATCH_QUOTE_CHUNK_SIZE]
+                try:
+                    batch = await asyncio.to_thread(self._get_quotes_from_yfinance_batch, market, chunk)
+                except Exception as e:
+                    logger.warning(f"⚠️ yfinance批量获取{market}行情失败: {e}")
+                    continue
+                for code, quote_data in batch.items():
+                    formatted = self._format_batch_quote(market, code, quote_data, 'yfinance')
+                    await self.quote_cache.set(market, code, formatted)
+                    results[code] = formatted
+
+        remaining = [c for c in codes if c not in results]
+        if remaining:
+            semaphore = asyncio.Semaphore(self.BATCH_QUOTE_CONCURRENCY)
+
+            async def _fetch_one(code: str):
+                async with semaphore:
+                    try:
+                        return code, await self._fetch_quote(market, code, force_refresh=True)
+                    except Exception as e:
+                        logger.warning(f"⚠️ 获取{market}行情失败 ({code}): {e}")
+                        return code, None
+
+            for code, quote in await asyncio.gather(*(_fetch_one(c) for c in remaining)):
+                if quote:
+                    results[code] = quote
+
+        return results
+
+    def _get_quotes_from_yfinance_batch(self, market: str, codes: List[str]) -> Dict[str, Dict]:
+        """使用 yfinance 多代码下载一次获取多只股票的当日行情"""
+        import yfinance as yf
+
+        ticker_map = {
+            (self.hk_provider._normalize_hk_symbol(code) if market == 'HK' else code.upper()): code
+            for code in codes
+        }
+        df = yf.download(
+            list(ticker_map.keys()), period='1d', group_by='ticker',
+            threads=True, progress=False, auto_adjust=False
+        )
+        if df is None or df.empty:
+            return {}
+
+        multi = getattr(df.columns, 'nlevels', 1) > 1
+        results = {}
+        for ticker, code in ticker_map.items():
+            try:
+                if multi:
+                    if ticker not in df.columns.get_level_values(0):
+                        continue
+                    frame = df[ticker]
+                else:
+                    frame = df
+                frame = frame.dropna(subset=['Close'])
+                if frame.empty:
+                    continue
+                latest = frame.iloc[-1]
+                open_price = float(latest['Open'])
+                close_price = float(latest['Close'])
+                results[code] = {
+                    'price': close_price,
+                    'open': open_price,
+                    'high': float(latest['High']),
+                    'low': float(latest['Low']),
+                    'volume': int(latest['Volume']) if latest['Volume'] == latest['Volume'] else None,
+                    'change_percent': round((close_price - open_price) / open_price * 100, 2) if open_price else None,
+                    'trade_date': frame.index[-1].strftime('%Y-%m-%d'),
+                    'timestamp': frame.index[-1].strftime('%Y-%m-%d %H:%M:%S'),
+                }
+            except Exception as e:
+                logger.debug(f"解析yfinance批量行情失败 ({ticker}): {e}")
+        return results
+
+    def _format_batch_quote(self, market: str, code: str, quote_data: Dict, data_source: str) -> Dict:
+        """格式化批量行情（批量接口不返回名称，沿用缓存中的名称）"""
+        previous, _ = self.quote_cache.peek(market, code)
+        if previous and previous.get('name'):
+            quote_data.setdefault('name', previous['name'])
+        if market == 'HK':
+            return self._format_hk_quote(quote_data, code, data_source)
+        return {
+            'code': code,
+            'name': quote_data.get('name', f'美股{code}'),
+            'market': 'US',
+            'price': quote_data.get('price'),
+            'open': quote_data.get('open'),
+            'high': quote_data.get('high'),
+            'low': quote_data.get('low'),
+            'volume': quote_data.get('volume'),
+            'change_percent': quote_data.get('change_percent'),
+            'trade_date': quote_data.get('trade_date'),
+            'currency': quote_data.get('currency', 'USD'),
+            'source': data_source,
+            'updated_at': datetime.now().isoformat()
+        }
+
+    async def _get_deduplicated_quote(self, market: str, code: str, force_refresh: bool) -> Optional[Dict]:
+        """
+        在持有刷新锁后再次检查缓存
+        等待锁期间其他请求可能已经完成了获取，1秒内的结果即使强制刷新也直接复用
+        """
+        cached, age = self.quote_cache.peek(market, code)
+        if cached is None:
+            return None
+        if age < 1:
+            logger.info(f"⚡ [去重] 使用并发请求的结果: {code} (缓存时间: {age:.2f}秒前)")
+            return cached
+        if not force_refresh:
+            cached, fresh = await self.quote_cache.get(market, code)
+            if cached is not None and fresh:
+                logger.info(f"⚡ [去重后] 从缓存获取{market}行情: {code}")
+                return cached
+        return None
     
     async def get_basic_info(self, market: str, code: str, force_refresh: bool = False) -> Dict:
         """
@@ -128,50 +332,14 @@ class ForeignStockService:
         🔥 按照数据库配置的数据源优先级调用API
         🔥 防止并发请求重复调用API
         """
-        # 1. 检查缓存（除非强制刷新）
-        if not force_refresh:
-            cache_key = self.cache.find_cached_stock_data(
-                symbol=code,
-                data_source="hk_realtime_quote"
-            )
-
-            if cache_key:
-                cached_data = self.cache.load_stock_data(cache_key)
-                if cached_data:
-                    logger.info(f"⚡ 从缓存获取港股行情: {code}")
-                    return self._parse_cached_data(cached_data, 'HK', code)
-
-        # 2. 🔥 请求去重：使用锁确保同一股票同时只有一个API调用
-        request_key = f"HK_quote_{code}_{force_refresh}"
-        lock = self._request_locks[request_key]
+        # 🔥 请求去重：使用进程内共享锁确保同一股票同时只有一个API调用
+        lock = self.quote_cache.lock_for('HK', code)
 
         async with lock:
             # 🔥 再次检查缓存（可能在等待锁的过程中，其他请求已经完成并缓存了数据）
-            # 即使 force_refresh=True，也要检查是否有其他并发请求刚刚完成
-            cache_key = self.cache.find_cached_stock_data(
-                symbol=code,
-                data_source="hk_realtime_quote"
-            )
-            if cache_key:
-                cached_data = self.cache.load_stock_data(cache_key)
-                if cached_data:
-                    # 检查缓存时间，如果是最近1秒内的，说明是并发请求刚刚缓存的
-                    try:
-                        data_dict = json.loads(cached_data) if isinstance(cached_data, str) else cached_data
-                        updated_at = data_dict.get('updated_at', '')
-                        if updated_at:
-                            cache_time = datetime.fromisoformat(updated_at)
-                            time_diff = (datetime.now() - cache_time).total_seconds()
-                            if time_diff < 1:  # 1秒内的缓存，说明是并发请求刚刚完成的
-                                logger.info(f"⚡ [去重] 使用并发请求的结果: {code} (缓存时间: {time_diff:.2f}秒前)")
-                                return self._parse_cached_data(cached_data, 'HK', code)
-                    except Exception as e:
-                        logger.debug(f"检查缓存时间失败: {e}")
-
-                    # 如果不是强制刷新，使用缓存
-                    if not force_refresh:
-                        logger.info(f"⚡ [去重后] 从缓存获取港股行情: {code}")
-                        return self._parse_cached_data(cached_data, 'HK', code)
+            cached = await self._get_deduplicated_quote('HK', code, force_refresh)
+            if cached is not None:
+                return cached
 
             logger.info(f"🔄 开始获取港股行情: {code} (force_refresh={force_refresh})")
 
@@ -226,12 +394,8 @@ class ForeignStockService:
             # 5. 格式化数据
             formatted_data = self._format_hk_quote(quote_data, code, data_source)
 
-            # 6. 保存到缓存
-            self.cache.save_stock_data(
-                symbol=code,
-                data=json.dumps(formatted_data, ensure_ascii=False),
-                data_source="hk_realtime_quote"
-            )
+            # 6. 保存到行情热缓存
+            await self.quote_cache.set('HK', code, formatted_data)
             logger.info(f"💾 港股行情已缓存: {code}")
 
             return formatted_data
@@ -299,49 +463,14 @@ class ForeignStockService:
         🔥 按照数据库配置的数据源优先级调用API
         🔥 防止并发请求重复调用API
         """
-        # 1. 检查缓存（除非强制刷新）
-        if not force_refresh:
-            cache_key = self.cache.find_cached_stock_data(
-                symbol=code,
-                data_source="us_realtime_quote"
-            )
-
-            if cache_key:
-                cached_data = self.cache.load_stock_data(cache_key)
-                if cached_data:
-                    logger.info(f"⚡ 从缓存获取美股行情: {code}")
-                    return self._parse_cached_data(cached_data, 'US', code)
-
-        # 2. 🔥 请求去重：使用锁确保同一股票同时只有一个API调用
-        request_key = f"US_quote_{code}_{force_refresh}"
-        lock = self._request_locks[request_key]
+        # 🔥 请求去重：使用进程内共享锁确保同一股票同时只有一个API调用
+        lock = self.quote_cache.lock_for('US', code)
 
         async with lock:
             # 🔥 再次检查缓存（可能在等待锁的过程中，其他请求已经完成并缓存了数据）
-            cache_key = self.cache.find_cached_stock_data(
-                symbol=code,
-                data_source="us_realtime_quote"
-            )
-            if cache_key:
-                cached_data = self.cache.load_stock_data(cache_key)
-                if cached_data:
-                    # 检查缓存时间，如果是最近1秒内的，说明是并发请求刚刚缓存的
-                    try:
-                        data_dict = json.loads(cached_data) if isinstance(cached_data, str) else cached_data
-                        updated_at = data_dict.get('updated_at', '')
-                        if updated_at:
-                            cache_time = datetime.fromisoformat(updated_at)
-                            time_diff = (datetime.now() - cache_time).total_seconds()
-                            if time_diff < 1:  # 1秒内的缓存，说明是并发请求刚刚完成的
-                                logger.info(f"⚡ [去重] 使用并发请求的结果: {code} (缓存时间: {time_diff:.2f}秒前)")
-                                return self._parse_cached_data(cached_data, 'US', code)
-                    except Exception as e:
-                        logger.debug(f"检查缓存时间失败: {e}")
-
-                    # 如果不是强制刷新，使用缓存
-                    if not force_refresh:
-                        logger.info(f"⚡ [去重后] 从缓存获取美股行情: {code}")
-                        return self._parse_cached_data(cached_data, 'US', code)
+            cached = await self._get_deduplicated_quote('US', code, force_refresh)
+            if cached is not None:
+                return cached
 
             logger.info(f"🔄 开始获取美股行情: {code} (force_refresh={force_refresh})")
 
@@ -411,12 +540,8 @@ class ForeignStockService:
                 'updated_at': datetime.now().isoformat()
             }
 
-            # 6. 保存到缓存
-            self.cache.save_stock_data(
-                symbol=code,
-                data=json.dumps(formatted_data, ensure_ascii=False),
-                data_source="us_realtime_quote"
-            )
+            # 6. 保存到行情热缓存
+            await self.quote_cache.set('US', code, formatted_data)
             logger.info(f"💾 美股行情已缓存: {code}")
 
             return formatted_data
@@ -0,0 +1,329 @@
+"""
+盘中分钟K线聚合
+- 由 QuotesIngestionService 每次采集的全市场快照驱动，不额外调用上游接口
+- 为每只股票同时维护 1/5/15 分钟的当前K线，跨越时间边界时收盘并进入待写队列
+- 成交量/成交额按快照中的当日累计值做差分得到；数据源轮换时各源口径不同，差分基准按 (股票, 数据源) 分别维护，
+  只与同一数据源的上一次累计值做差；该差值覆盖的时间段与其他数据源已计入的部分重叠，
+  因此按时间比例只取自该股票上一次快照（任意数据源）以来的部分
+- 只有连续竞价时段（9:30-11:30、13:00-15:00）内的快照参与K线，午休与收盘后缓冲期的快照只推进差分基准
+- 已收盘K线批量写入 intraday_bars 集合（TTL 自动过期）；数据库不可用时待写K线有数量上限，超出丢弃最旧的
+- 注意：K线粒度受采集间隔限制，采集间隔大于K线周期时部分K线会缺失
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, time as dtime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.core.database import get_mongo_db
+
+logger = logging.getLogger(__name__)
+
+
+class IntradayBarAggregator:
+    """全市场盘中分钟K线聚合器（进程内）"""
+
+    INTERVALS = (1, 5, 15)  # 分钟
+    # 连续竞价时段 [开始, 结束)
+    SESSIONS = ((dtime(9, 30), dtime(11, 30)), (dtime(13, 0), dtime(15, 0)))
+
+    def __init__(self, collection_name: str = "intraday_bars",
+                 intervals: Tuple[int, ...] = INTERVALS,
+                 retention_days: Optional[int] = None,
+                 max_pending_bars: Optional[int] = None):
+        self.collection_name = collection_name
+        self.intervals = tuple(intervals)
+        self.retention_days = retention_days if retention_days is not None else settings.QUOTES_INTRADAY_BAR_RETENTION_DAYS
+        self.max_pending_bars = max_pending_bars if max_pending_bars is not None else settings.QUOTES_INTRADAY_MAX_PENDING_BARS
+        self.tz = ZoneInfo(settings.TIMEZONE)
+
+        # (code, interval) -> 当前未收盘K线
+        self._open_bars: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        # 已收盘、待写入的K线
+        self._closed_bars: List[Dict[str, Any]] = []
+        # (code, 数据源) -> (trade_date, 累计成交量, 累计成交额, 快照时间)，用于差分
+        self._cumulative: Dict[Tuple[str, Optional[str]], Tuple[str, float, float, datetime]] = {}
+        # code -> (trade_date, 快照时间)：该股票最近一次快照（任意数据源）
+        self._last_seen: Dict[str, Tuple[str, datetime]] = {}
+        self._last_source: Optional[str] = None
+        self._indexes_ready = False
+
+        self.stats = {"snapshots": 0, "bars_closed": 0, "bars_flushed": 0, "flush_errors": 0,
+                      "bars_dropped": 0, "off_session_snapshots": 0, "source_switches": 0}
+
+    def _in_session(self, ts: datetime) -> bool:
+        t = ts.astimezone(self.tz).time() if ts.tzinfo else ts.time()
+        return any(start <= t < end for start, end in self.SESSIONS)
+
+    def _bucket_start(self, ts: datetime, interval: int) -> datetime:
+        minute = ts.minute - ts.minute % interval
+        return ts.replace(minute=minute, second=0, microsecond=0)
+
+    def _localize(self, dt: Optional[datetime]) -> Optional[datetime]:
+        """统一为本地时区的 aware 时间（MongoDB 返回的是 naive UTC；查询参数的 naive 时间按本地时间处理）"""
+        if dt is None:
+            return None
+        if dt.tzinfo is None:
+            return dt.replace(tzinfo=self.tz)
+        return dt.astimezone(self.tz)
+
+    def _from_db(self, bar: Dict[str, Any]) -> Dict[str, Any]:
+        for field in ("start", "end"):
+            dt = bar.get(field)
+            if isinstance(dt, datetime) and dt.tzinfo is None:
+                bar[field] = dt.replace(tzinfo=ZoneInfo("UTC")).astimezone(self.tz)
+        return bar
+
+    @staticmethod
+    def _to_float(value) -> Optional[float]:
+        if value is None:
+            return None
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        return None if value != value else value  # NaN -> None
+
+    def _diff_cumulative(self, code: str, trade_date: str,
+                         volume: Optional[float], amount: Optional[float],
+                         source: Optional[str], ts: datetime) -> Tuple[float, float]:
+        """
+        根据当日累计量计算本次快照的增量
+
+        与同一数据源的上一次累计值做差（首次观测该数据源时只建立基准，跨交易日时累计值从 0 开始）；
+        期间其他数据源已计入的时间段按时间比例扣除，轮换数据源时总量不重复累加
+        """
+        volume = volume or 0.0
+        amount = amount or 0.0
+        prev = self._cumulative.get((code, source))
+        last_seen = self._last_seen.get(code)
+        self._cumulative[(code, source)] = (trade_date, volume, amount, ts)
+        self._last_seen[code] = (trade_date, ts)
+        if prev is None:
+            return 0.0, 0.0
+
+        prev_date, prev_volume, prev_amount, prev_ts = prev
+        if prev_date != trade_date:
+            # 新交易日：累计值从 0 开始，差分区间从开盘算起
+            d_volume, d_amount = volume, amount
+            span_start = datetime.combine(ts.date(), self.SESSIONS[0][0], tzinfo=ts.tzinfo)
+        else:
+            # 累计值回退（数据源重置）时按新的基准处理
+            d_volume = volume - prev_volume if volume >= prev_volume else 0.0
+            d_amount = amount - prev_amount if amount >= prev_amount else 0.0
+            span_start = prev_ts
+
+        if last_seen is not None and last_seen[0] == trade_date and span_start < last_seen[1] < ts:
+            # 其他数据源在 [span_start, last_seen] 内的成交已计入，只保留之后的部分
+            ratio = (ts - last_seen[1]) / (ts - span_start)
+            d_volume *= ratio
+            d_amount *= ratio
+        return d_volume, d_amount
+
+    def add_snapshot(self, snapshot: Dict[str, Dict[str, Any]], trade_date: str,
+                     ts: Optional[datetime] = None, source: Optional[str] = None) -> int:
+        """
+        接收一份全市场快照
+
+        Args:
+            snapshot: code6 -> 行情字段（close/volume/amount 为必要字段，volume/amount 为当日累计）
+            trade_date: 交易日
+            ts: 快照时间（默认当前时间）
+            source: 快照数据源（成交量差分基准按数据源分别维护）
+
+        Returns:
+            本次收盘的K线数量
+        """
+        ts = ts or datetime.now(self.tz)
+        closed_before = len(self._closed_bars)
+        self.close_due(ts)
+        in_session = self._in_session(ts)
+        if not in_session:
+            self.stats["off_session_snapshots"] += 1
+        if snapshot:
+            if self._last_source is not None and self._last_source != source:
+                self.stats["source_switches"] += 1
+            self._last_source = source
+
+        for code, q in snapshot.items():
+            price = self._to_float(q.get("close"))
+            if not code or price is None or price <= 0:
+                continue
+            d_volume, d_amount = self._diff_cumulative(
+                code, trade_date, self._to_float(q.get("volume")), self._to_float(q.get("amount")), source, ts
+            )
+            if not in_session:
+                # 午休/收盘后的快照不开新K线，只推进差分基准（避免其成交量计入下一时段的首根K线）
+                continue
+            for interval in self.intervals:
+                start = self._bucket_start(ts, interval)
+                key = (code, interval)
+                bar = self._open_bars.get(key)
+                if bar is not None and bar["start"] != start:
+                    self._close(key)
+                    bar = None
+                if bar is None:
+                    self._open_bars[key] = {
+                        "code": code,
+                        "interval": interval,
+                        "trade_date": trade_date,
+                        "start": start,
+                        "end": start + timedelta(minutes=interval),
+                        "open": price,
+                        "high": price,
+                        "low": price,
+                        "close": price,
+                        "volume": d_volume,
+                        "amount": d_amount,
+                        "ticks": 1,
+                    }
+                else:
+                    bar["high"] = max(bar["high"], price)
+                    bar["low"] = min(bar["low"], price)
+                    bar["close"] = price
+                    bar["volume"] += d_volume
+                    bar["amount"] += d_amount
+                    bar["ticks"] += 1
+
+        self.stats["snapshots"] += 1
+        return len(self._closed_bars) - closed_before
+
+    def _close(self, key: Tuple[str, int]):
+        bar = self._open_bars.pop(key, None)
+        if bar is not None:
+            self._closed_bars.append(bar)
+            self.stats["bars_closed"] += 1
+
+    def close_due(self, now: Optional[datetime] = None) -> int:
+        """收盘所有结束时间已过的K线（如午休、收盘后不再有快照时）"""
+        now = now or datetime.now(self.tz)
+        due = [key for key, bar in self._open_bars.items() if bar["end"] <= now]
+        for key in due:
+            self._close(key)
+        return len(due)
+
+    def get_open_bar(self, code: str, interval: int) -> Optional[Dict[str, Any]]:
+        """获取某只股票当前未收盘的K线（副本）"""
+        bar = self._open_bars.get((code, interval))
+        return dict(bar) if bar else None
+
+    async def ensure_indexes(self) -> None:
+        if self._indexes_ready:
+            return
+        db = get_mongo_db()
+        coll = db[self.collection_name]
+        try:
+            await coll.create_index([("code", 1), ("interval", 1), ("start", 1)], unique=True)
+            await coll.create_index("start", expireAfterSeconds=int(self.retention_days * 86400))
+            self._indexes_ready = True
+        except Exception as e:
+            logger.warning(f"创建分钟K线索引失败（忽略）: {e}")
+
+    async def flush(self) -> int:
+        """把已收盘K线批量写入数据库，返回写入数量；写入失败的K线保留到下次重试"""
+        if not self._closed_bars:
+            return 0
+        bars, self._closed_bars = self._closed_bars, []
+        await self.ensure_indexes()
+
+        ops = [
+            UpdateOne(
+                {"code": bar["code"], "interval": bar["interval"], "start": bar["start"]},
+                {"$set": bar},
+                upsert=True,
+            )
+            for bar in bars
+        ]
+        try:
+            db = get_mongo_db()
+            await db[self.collection_name].bulk_write(ops, ordered=False)
+        except Exception as e:
+            self._closed_bars = bars + self._closed_bars
+            self.stats["flush_errors"] += 1
+            logger.warning(f"⚠️ 分钟K线写入失败，{len(bars)} 根K线将在下次重试: {e}")
+            self._trim_pending()
+            return 0
+
+        self.stats["bars_flushed"] += len(bars)
+        logger.info(f"🕯️ 分钟K线入库 {len(bars)} 根")
+        return len(bars)
+
+    def _trim_pending(self) -> int:
+        """待写K线超过上限时丢弃最旧的，返回丢弃数量"""
+        overflow = len(self._closed_bars) - self.max_pending_bars
+        if overflow <= 0:
+            return 0
+        del self._closed_bars[:overflow]
+        self.stats["bars_dropped"] += overflow
+        logger.warning(f"⚠️ 待写分钟K线超过上限 {self.max_pending_bars}，丢弃最旧的 {overflow} 根")
+        return overflow
+
+    async def get_bars(self, code: str, interval: int,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       limit: int = 500, include_open: bool = True) -> List[Dict[str, Any]]:
+        """
+        查询分钟K线（按开始时间升序）
+
+        Args:
+            code: 6位股票代码
+            interval: K线周期（分钟），取值见 INTERVALS
+            start/end: 开始时间范围（闭区间），默认不限
+            limit: 最多返回条数（取最近的 limit 根）
+            include_open: 是否附带当前未收盘的K线
+        """
+        if interval not in self.intervals:
+            raise ValueError(f"不支持的K线周期: {interval}，可选 {list(self.intervals)}")
+
+        start, end = self._localize(start), self._localize(end)
+        query: Dict[str, Any] = {"code": code, "interval": interval}
+        time_range: Dict[str, Any] = {}
+        if start:
+            time_range["$gte"] = start
+        if end:
+            time_range["$lte"] = end
+        if time_range:
+            query["start"] = time_range
+
+        db = get_mongo_db()
+        cursor = db[self.collection_name].find(query, {"_id": 0}).sort("start", -1).limit(limit)
+        bars = [self._from_db(bar) for bar in await cursor.to_list(length=limit)]
+        bars.reverse()
+
+        # 尚未写库的K线（已收盘待写 + 当前K线）
+        seen = {bar["start"] for bar in bars}
+        pending = [b for b in self._closed_bars if b["code"] == code and b["interval"] == interval]
+        if include_open:
+            open_bar = self._open_bars.get((code, interval))
+            if open_bar:
+                pending.append(open_bar)
+        for bar in pending:
+            if bar["start"] in seen:
+                continue
+            if (start and bar["start"] < start) or (end and bar["start"] > end):
+                continue
+            bars.append(dict(bar))
+        bars.sort(key=lambda b: b["start"])
+        return bars[-limit:]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "open_bars": len(self._open_bars),
+            "pending_bars": len(self._closed_bars),
+            "tracked_codes": len(self._cumulative),
+        }
+
+
+_intraday_bar_aggregator: Optional[IntradayBarAggregator] = None
+
+
+def get_intraday_bar_aggregator() -> IntradayBarAggregator:
+    """获取分钟K线聚合器（单例，行情采集与查询接口共享）"""
+    global _intraday_bar_aggregator
+    if _intraday_bar_aggregator is None:
+        _intraday_bar_aggregator = IntradayBarAggregator()
+    return _intraday_bar_aggregator
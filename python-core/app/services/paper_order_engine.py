@@ -0,0 +1,664 @@
+"""
+纸上交易撮合引擎
+- 成交用单条条件原子更新完成：买入 $inc 扣款带现金下限条件，卖出按持仓数量条件扣减，
+  同一用户并发下单不会透支资金或超卖持仓（不依赖副本集事务）
+- 限价单/止损单写入 paper_orders，撮合进程（APP_ROLE=all/scheduler）按轮询间隔从数据库同步订单簿，
+  其他进程（如 API 进程）提交的挂单也会被撮合；按 market_quotes 变更流（不支持时回退为轮询）触发成交
+- 成交前以 open → filling 的条件更新认领（记录 claimed_by/claimed_at），保证只成交一次；
+  只有认领超时的 filling 订单才会被放回 open，不会抢走其他存活进程正在成交的订单
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# 每个市场的初始资金配置
+INITIAL_CASH_BY_MARKET = {
+    "CNY": 1_000_000.0,   # A股：100万人民币
+    "HKD": 1_000_000.0,   # 港股：100万港币
+    "USD": 100_000.0      # 美股：10万美元
+}
+
+CURRENCY_BY_MARKET = {"CN": "CNY", "HK": "HKD", "US": "USD"}
+ORDER_TYPES = ("market", "limit", "stop")
+# 单机 MongoDB 不支持变更流时的错误码
+CHANGE_STREAM_UNSUPPORTED_CODES = {40573}
+
+
+class OrderRejected(Exception):
+    """订单被拒绝（资金/持仓不足、价格不可用、参数非法）"""
+
+
+def calculate_commission(market: str, side: str, amount: float, rules: Optional[Dict[str, Any]]) -> float:
+    """计算手续费"""
+    if not rules or "commission" not in rules:
+        return 0.0
+
+    commission_config = rules["commission"]
+    commission = 0.0
+
+    # 佣金
+    comm_rate = commission_config.get("rate", 0.0)
+    comm_min = commission_config.get("min", 0.0)
+    commission += max(amount * comm_rate, comm_min)
+
+    # 印花税（仅卖出）
+    if side == "sell" and "stamp_duty_rate" in commission_config:
+        commission += amount * commission_config["stamp_duty_rate"]
+
+    # 其他费用（港股）
+    if market == "HK":
+        if "transaction_levy_rate" in commission_config:
+            commission += amount * commission_config["transaction_levy_rate"]
+        if "trading_fee_rate" in commission_config:
+            commission += amount * commission_config["trading_fee_rate"]
+        if "settlement_fee_rate" in commission_config:
+            commission += amount * commission_config["settlement_fee_rate"]
+
+    # SEC费用（美股，仅卖出）
+    if market == "US" and side == "sell" and "sec_fee_rate" in commission_config:
+        commission += amount * commission_config["sec_fee_rate"]
+
+    return round(commission, 2)
+
+
+def is_triggered(order: Dict[str, Any], price: float) -> bool:
+    """
+    挂单是否触发
+
+    - 限价买：价格 <= 限价；限价卖：价格 >= 限价
+    - 止损买：价格 >= 触发价；止损卖：价格 <= 触发价
+    """
+    buy = order["side"] == "buy"
+    if order["order_type"] == "limit":
+        limit = float(order["limit_price"])
+        return price <= limit if buy else price >= limit
+    if order["order_type"] == "stop":
+        stop = float(order["stop_price"])
+        return price >= stop if buy else price <= stop
+    return True
+
+
+class OrderBook:
+    """进程内挂单簿（按 (market, code) 索引）"""
+
+    def __init__(self):
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        self._by_symbol: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self._orders
+
+    def order_ids(self) -> Set[str]:
+        return set(self._orders)
+
+    def add(self, order: Dict[str, Any]):
+        self._orders[order["order_id"]] = order
+        self._by_symbol[(order["market"], order["code"])].add(order["order_id"])
+
+    def remove(self, order_id: str) -> Optional[Dict[str, Any]]:
+        order = self._orders.pop(order_id, None)
+        if order is not None:
+            key = (order["market"], order["code"])
+            ids = self._by_symbol.get(key)
+            if ids is not None:
+                ids.discard(order_id)
+                if not ids:
+                    del self._by_symbol[key]
+        return order
+
+    def has_symbol(self, market: str, code: str) -> bool:
+        return (market, code) in self._by_symbol
+
+    def symbols(self, markets: Optional[Iterable[str]] = None) -> List[Tuple[str, str]]:
+        wanted = set(markets) if markets is not None else None
+        return [key for key in self._by_symbol if wanted is None or key[0] in wanted]
+
+    def pop_triggered(self, market: str, code: str, price: float) -> List[Dict[str, Any]]:
+        """取出在该价格下触发的挂单（按下单时间先后）"""
+        ids = self._by_symbol.get((market, code), ())
+        hits = [self._orders[i] for i in ids if is_triggered(self._orders[i], price)]
+        hits.sort(key=lambda o: o.get("created_at", ""))
+        for order in hits:
+            self.remove(order["order_id"])
+        return hits
+
+
+class PaperOrderEngine:
+    """纸上交易撮合引擎"""
+
+    def __init__(self, db=None, pricing=None, rules_ttl_seconds: float = 60.0, poll_seconds: float = 5.0,
+                 claim_timeout_seconds: float = 120.0, max_backoff_seconds: float = 60.0):
+        self._db = db
+        self._pricing = pricing
+        self.rules_ttl_seconds = rules_ttl_seconds
+        self.poll_seconds = poll_seconds
+        self.claim_timeout_seconds = claim_timeout_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        # 认领标识：区分同一订单由哪个进程成交
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.book = OrderBook()
+        self._rules_cache: Dict[str, Tuple[Optional[Dict[str, Any]], float]] = {}
+        self._matcher_tasks: List[asyncio.Task] = []
+        self._matching = False
+        self.stats = {"filled": 0, "rejected": 0, "triggered": 0, "claim_conflicts": 0,
+                      "stale_claims_reset": 0, "stream_restarts": 0}
+
+    def _get_db(self):
+        if self._db is not None:
+            return self._db
+        from app.core.database import get_mongo_db
+        return get_mongo_db()
+
+    def _get_pricing(self):
+        if self._pricing is None:
+            from app.services.paper_pricing_service import get_paper_pricing_service
+            self._pricing = get_paper_pricing_service()
+        return self._pricing
+
+    # ---------------- 账户 / 规则 ----------------
+
+    async def get_or_create_account(self, user_id: str) -> Dict[str, Any]:
+        """获取或创建账户（多货币）"""
+        db = self._get_db()
+        acc = await db["paper_accounts"].find_one({"user_id": user_id})
+        if not acc:
+            now = datetime.utcnow().isoformat()
+            acc = {
+                "user_id": user_id,
+                # 多货币现金账户
+                "cash": dict(INITIAL_CASH_BY_MARKET),
+                # 多货币已实现盈亏
+                "realized_pnl": {"CNY": 0.0, "HKD": 0.0, "USD": 0.0},
+                # 账户设置
+                "settings": {
+                    "auto_currency_conversion": False,
+                    "default_market": "CN"
+                },
+                "created_at": now,
+                "updated_at": now,
+            }
+            # upsert：并发首次下单只创建一个账户
+            await db["paper_accounts"].update_one(
+                {"user_id": user_id},
+                {"$setOnInsert": {k: v for k, v in acc.items() if k != "user_id"}},
+                upsert=True,
+            )
+            acc = await db["paper_accounts"].find_one({"user_id": user_id})
+        else:
+            # 兼容旧账户结构：如果 cash 或 realized_pnl 仍为标量，迁移为多货币对象
+            updates: Dict[str, Any] = {}
+            try:
+                cash_val = acc.get("cash")
+                if not isinstance(cash_val, dict):
+                    base_cash = float(cash_val or 0.0)
+                    updates["cash"] = {"CNY": base_cash, "HKD": 0.0, "USD": 0.0}
+
+                pnl_val = acc.get("realized_pnl")
+                if not isinstance(pnl_val, dict):
+                    base_pnl = float(pnl_val or 0.0)
+                    updates["realized_pnl"] = {"CNY": base_pnl, "HKD": 0.0, "USD": 0.0}
+
+                if updates:
+                    updates["updated_at"] = datetime.utcnow().isoformat()
+                    await db["paper_accounts"].update_one({"user_id": user_id}, {"$set": updates})
+                    # 重新读取迁移后的账户
+                    acc = await db["paper_accounts"].find_one({"user_id": user_id})
+            except Exception as e:
+                logger.error(f"❌ 账户结构迁移失败 user_id={user_id}: {e}")
+        return acc
+
+    async def get_market_rules(self, market: str) -> Optional[Dict[str, Any]]:
+        """获取市场规则配置（短期缓存，规则极少变化）"""
+        cached = self._rules_cache.get(market)
+        if cached is not None and time.time() - cached[1] < self.rules_ttl_seconds:
+            return cached[0]
+        rules_doc = await self._get_db()["paper_market_rules"].find_one({"market": market})
+        rules = rules_doc.get("rules", {}) if rules_doc else None
+        self._rules_cache[market] = (rules, time.time())
+        return rules
+
+    async def _locked_quantity(self, user_id: str, code: str, market: str) -> int:
+        """T+1 锁定数量：A股当天买入的数量不能卖出"""
+        if market != "CN":
+            return 0
+        rules = await self.get_market_rules(market)
+        if not rules or rules.get("t_plus", 0) <= 0:
+            return 0
+        today = datetime.utcnow().date().isoformat()
+        pipeline = [
+            {"$match": {"user_id": user_id, "code": code, "side": "buy", "timestamp": {"$gte": today}}},
+            {"$group": {"_id": None, "total": {"$sum": "$quantity"}}}
+        ]
+        today_buy = await self._get_db()["paper_trades"].aggregate(pipeline).to_list(1)
+        return int(today_buy[0]["total"]) if today_buy else 0
+
+    async def available_quantity(self, user_id: str, code: str, market: str) -> int:
+        """获取可用数量（考虑T+1限制）"""
+        pos = await self._get_db()["paper_positions"].find_one({"user_id": user_id, "code": code}, {"quantity": 1})
+        if not pos:
+            return 0
+        return max(0, int(pos.get("quantity", 0)) - await self._locked_quantity(user_id, code, market))
+
+    # ---------------- 原子成交 ----------------
+
+    async def _debit_cash(self, user_id: str, currency: str, amount: float, now_iso: str):
+        """扣款：仅当余额足够时扣减（单条条件更新）"""
+        accounts = self._get_db()["paper_accounts"]
+        update = {"$inc": {f"cash.{currency}": -amount}, "$set": {"updated_at": now_iso}}
+        guard = {"user_id": user_id, f"cash.{currency}": {"$gte": amount}}
+        res = await accounts.update_one(guard, update)
+        if res.modified_count:
+            return
+        # 未扣款：可能是账户不存在/旧结构，补建（迁移）后重试一次
+        acc = await self.get_or_create_account(user_id)
+        res = await accounts.update_one(guard, update)
+        if not res.modified_count:
+            cash = acc.get("cash", {}) if acc else {}
+            available = float(cash.get(currency, 0.0)) if isinstance(cash, dict) else 0.0
+            raise OrderRejected(f"可用{currency}不足：需要 {amount:.2f}，可用 {available:.2f}")
+
+    async def _add_position(self, user_id: str, code: str, market: str, currency: str,
+                            qty: int, price: float, now_iso: str):
+        """加仓：加权平均成本在服务端用聚合管道更新中计算，不存在时插入"""
+        old_qty = {"$ifNull": ["$quantity", 0]}
+        new_qty = {"$add": [old_qty, qty]}
+        if market == "CN":
+            # A股T+1：新买入的不可用，保持原有可用数量
+            available = {"$ifNull": ["$available_qty", old_qty]}
+        else:
+            available = new_qty
+        await self._get_db()["paper_positions"].update_one(
+            {"user_id": user_id, "code": code},
+            [{"$set": {
+                "market": {"$ifNull": ["$market", market]},
+                "currency": {"$ifNull": ["$currency", currency]},
+                "frozen_qty": {"$ifNull": ["$frozen_qty", 0]},
+                "avg_cost": {"$round": [{"$divide": [
+                    {"$add": [{"$multiply": [{"$ifNull": ["$avg_cost", 0]}, old_qty]}, price * qty]},
+                    new_qty,
+                ]}, 4]},
+                "available_qty": available,
+                "quantity": new_qty,
+                "updated_at": now_iso,
+            }}],
+            upsert=True,
+        )
+
+    async def _reduce_position(self, user_id: str, code: str, market: str, qty: int, now_iso: str) -> Dict[str, Any]:
+        """减仓：仅当 持仓 - T+1锁定 >= 卖出数量 时扣减，返回扣减前的持仓"""
+        positions = self._get_db()["paper_positions"]
+        locked = await self._locked_quantity(user_id, code, market)
+        before = await positions.find_one_and_update(
+            {"user_id": user_id, "code": code, "quantity": {"$gte": qty + locked}},
+            [{"$set": {
+                "quantity": {"$subtract": ["$quantity", qty]},
+                "available_qty": {"$max": [0, {"$subtract": [{"$ifNull": ["$available_qty", "$quantity"]}, qty]}]},
+                "updated_at": now_iso,
+            }}],
+            return_document=ReturnDocument.BEFORE,
+        )
+        if before is None:
+            available = await self.available_quantity(user_id, code, market)
+            raise OrderRejected(f"可用持仓不足：需要 {qty}，可用 {available}")
+        if int(before.get("quantity", 0)) == qty:
+            # 清仓：条件删除，避免误删并发买入后的持仓
+            await positions.delete_one({"_id": before["_id"], "quantity": 0})
+        return before
+
+    async def apply_fill(self, user_id: str, code: str, market: str, side: str, qty: int,
+                         price: float) -> Dict[str, Any]:
+        """
+        应用一笔成交（资金与持仓），返回成交明细
+
+        Raises:
+            OrderRejected: 资金或可用持仓不足
+        """
+        currency = CURRENCY_BY_MARKET.get(market, "CNY")
+        notional = round(price * qty, 2)
+        commission = calculate_commission(market, side, notional, await self.get_market_rules(market))
+        now_iso = datetime.utcnow().isoformat()
+        pnl = 0.0
+
+        if side == "buy":
+            total_cost = round(notional + commission, 2)
+            await self._debit_cash(user_id, currency, total_cost, now_iso)
+            try:
+                await self._add_position(user_id, code, market, currency, qty, price, now_iso)
+            except Exception:
+                # 持仓写入失败：退回已扣资金
+                await self._get_db()["paper_accounts"].update_one(
+                    {"user_id": user_id}, {"$inc": {f"cash.{currency}": total_cost}})
+                raise
+        else:
+            before = await self._reduce_position(user_id, code, market, qty, now_iso)
+            pnl = round((price - float(before.get("avg_cost", 0.0))) * qty, 2)
+            await self._get_db()["paper_accounts"].update_one(
+                {"user_id": user_id},
+                {
+                    "$inc": {f"cash.{currency}": round(notional - commission, 2), f"realized_pnl.{currency}": pnl},
+                    "$set": {"updated_at": now_iso},
+                },
+            )
+        self.stats["filled"] += 1
+        return {"currency": currency, "price": price, "amount": notional, "commission": commission,
+                "pnl": pnl, "filled_at": now_iso}
+
+    async def _record_trade(self, order: Dict[str, Any], fill: Dict[str, Any]):
+        trade_doc = {
+            "user_id": order["user_id"],
+            "code": order["code"],
+            "market": order["market"],
+            "currency": fill["currency"],
+            "side": order["side"],
+            "quantity": order["quantity"],
+            "price": fill["price"],
+            "amount": fill["amount"],
+            "commission": fill["commission"],
+            "pnl": fill["pnl"] if order["side"] == "sell" else 0.0,
+            "timestamp": fill["filled_at"],
+            "order_id": order["order_id"],
+        }
+        if order.get("analysis_id"):
+            trade_doc["analysis_id"] = order["analysis_id"]
+        await self._get_db()["paper_trades"].insert_one(trade_doc)
+
+    # ---------------- 下单 / 撤单 ----------------
+
+    async def submit_order(self, user_id: str, code: str, market: str, side: str, qty: int,
+                           order_type: str = "market", limit_price: Optional[float] = None,
+                           stop_price: Optional[float] = None, analysis_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        提交订单：市价单按最新价即时成交；限价/止损单进入订单簿（已满足条件时立即成交）
+
+        Raises:
+            OrderRejected: 参数非法、价格不可用、资金或持仓不足
+        """
+        if order_type not in ORDER_TYPES:
+            raise OrderRejected(f"不支持的订单类型: {order_type}")
+        if order_type == "limit" and not (limit_price and limit_price > 0):
+            raise OrderRejected("限价单需要提供有效的 limit_price")
+        if order_type == "stop" and not (stop_price and stop_price > 0):
+            raise OrderRejected("止损单需要提供有效的 stop_price")
+
+        now_iso = datetime.utcnow().isoformat()
+        order = {
+            "order_id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "code": code,
+            "market": market,
+            "currency": CURRENCY_BY_MARKET.get(market, "CNY"),
+            "side": side,
+            "quantity": qty,
+            "order_type": order_type,
+            "created_at": now_iso,
+        }
+        if order_type == "limit":
+            order["limit_price"] = float(limit_price)
+        if order_type == "stop":
+            order["stop_price"] = float(stop_price)
+        if analysis_id:
+            order["analysis_id"] = analysis_id
+
+        price = await self._get_pricing().get_price(code, market)
+        if order_type == "market":
+            if price is None or price <= 0:
+                raise OrderRejected(f"无法获取股票 {code} ({market}) 的最新价格")
+            fill = await self.apply_fill(user_id, code, market, side, qty, price)
+            order.update(status="filled", price=price, amount=fill["amount"],
+                         commission=fill["commission"], filled_at=fill["filled_at"])
+            await asyncio.gather(
+                self._get_db()["paper_orders"].insert_one(dict(order)),
+                self._record_trade(order, fill),
+            )
+            return order
+
+        # 挂单：卖出挂单提前检查持仓，买入挂单的资金在成交时校验
+        if side == "sell" and await self.available_quantity(user_id, code, market) < qty:
+            raise OrderRejected(f"可用持仓不足：需要 {qty}")
+        order["status"] = "open"
+        await self._get_db()["paper_orders"].insert_one(dict(order))
+        if price is not None and is_triggered(order, price):
+            return await self._fill_open_order(order, price)
+        # 未运行撮合的进程（如 APP_ROLE=api）不持有订单簿，由撮合进程从数据库同步
+        if self._matching:
+            self.book.add(order)
+        return order
+
+    async def cancel_order(self, user_id: str, order_id: str) -> bool:
+        """撤销挂单（仅 open 状态可撤）"""
+        res = await self._get_db()["paper_orders"].update_one(
+            {"order_id": order_id, "user_id": user_id, "status": "open"},
+            {"$set": {"status": "cancelled", "cancelled_at": datetime.utcnow().isoformat()}},
+        )
+        self.book.remove(order_id)
+        return bool(res.modified_count)
+
+    # ---------------- 撮合 ----------------
+
+    async def _fill_open_order(self, order: Dict[str, Any], price: float) -> Dict[str, Any]:
+        """成交一笔已触发的挂单（先认领，认领失败说明已被撤销或由其他进程成交）"""
+        orders = self._get_db()["paper_orders"]
+        claimed = await orders.find_one_and_update(
+            {"order_id": order["order_id"], "status": "open"},
+            {"$set": {"status": "filling", "claimed_by": self.instance_id,
+                      "claimed_at": datetime.utcnow().isoformat()}},
+            projection={"_id": 0},
+        )
+        if claimed is None:
+            self.stats["claim_conflicts"] += 1
+            return order
+
+        self.stats["triggered"] += 1
+        try:
+            fill = await self.apply_fill(order["user_id"], order["code"], order["market"], order["side"],
+                                         int(order["quantity"]), price)
+        except OrderRejected as e:
+            self.stats["rejected"] += 1
+            logger.info(f"📋 挂单成交被拒绝: {order['order_id']} {order['code']} - {e}")
+            update = {"status": "rejected", "reject_reason": str(e), "rejected_at": datetime.utcnow().isoformat()}
+            await orders.update_one({"order_id": order["order_id"]}, {"$set": update})
+            return {**order, **update}
+        except Exception:
+            # 未知错误：释放本进程的认领，放回 open 状态等待下次触发
+            await orders.update_one(
+                {"order_id": order["order_id"], "claimed_by": self.instance_id},
+                {"$set": {"status": "open"}, "$unset": {"claimed_by": "", "claimed_at": ""}},
+            )
+            if self._matching:
+                self.book.add(order)
+            raise
+
+        update = {"status": "filled", "price": price, "amount": fill["amount"],
+                  "commission": fill["commission"], "filled_at": fill["filled_at"]}
+        await asyncio.gather(
+            orders.update_one({"order_id": order["order_id"]}, {"$set": update}),
+            self._record_trade(order, fill),
+        )
+        logger.info(f"✅ 挂单成交: {order['order_type']} {order['side']} {order['code']} × {order['quantity']} @ {price}")
+        return {**order, **update}
+
+    async def on_price(self, market: str, code: str, price: Any):
+        """行情更新：成交该股票所有已触发的挂单"""
+        try:
+            price = float(price)
+        except (TypeError, ValueError):
+            return
+        if price <= 0:
+            return
+        for order in self.book.pop_triggered(market, code, price):
+            try:
+                await self._fill_open_order(order, price)
+            except Exception as e:
+                logger.error(f"❌ 挂单撮合失败: {order['order_id']} - {e}")
+
+    async def load_open_orders(self) -> int:
+        """
+        从数据库同步订单簿
+
+        - 认领超过 claim_timeout_seconds 仍处于 filling 的订单（进程异常退出遗留）放回 open；
+          未超时的认领属于其他存活进程，不做处理
+        - 加载全部 open 挂单（含其他进程提交的），移除已撤销/已成交的
+        """
+        orders = self._get_db()["paper_orders"]
+        cutoff = (datetime.utcnow() - timedelta(seconds=self.claim_timeout_seconds)).isoformat()
+        res = await orders.update_many(
+            {"status": "filling", "$or": [{"claimed_at": {"$lt": cutoff}}, {"claimed_at": {"$exists": False}}]},
+            {"$set": {"status": "open"}, "$unset": {"claimed_by": "", "claimed_at": ""}},
+        )
+        if res.modified_count:
+            self.stats["stale_claims_reset"] += res.modified_count
+            logger.warning(f"⚠️ 回收超时未完成的挂单认领 {res.modified_count} 笔")
+
+        docs = await orders.find(
+            {"status": "open", "order_type": {"$in": ["limit", "stop"]}}, {"_id": 0}
+        ).to_list(None)
+        open_ids = set()
+        for doc in docs:
+            order_id = doc.get("order_id")
+            if not order_id:
+                continue
+            open_ids.add(order_id)
+            if order_id not in self.book:
+                self.book.add(doc)
+        for order_id in self.book.order_ids() - open_ids:
+            self.book.remove(order_id)
+        return len(self.book)
+
+    async def ensure_indexes(self):
+        db = self._get_db()
+        try:
+            await db["paper_orders"].create_index([("order_id", 1)], unique=True, sparse=True)
+            await db["paper_orders"].create_index([("status", 1)])
+            # 持仓 upsert 依赖 (user_id, code) 唯一
+            await db["paper_positions"].create_index([("user_id", 1), ("code", 1)], unique=True)
+        except Exception as e:
+            logger.warning(f"⚠️ 创建纸上交易索引失败: {e}")
+
+    async def start_matcher(self):
+        """启动挂单撮合：定期同步订单簿；A股优先使用 market_quotes 变更流，港股/美股（及不支持变更流时的A股）轮询取价"""
+        await self.ensure_indexes()
+        self._matching = True
+        loaded = await self.load_open_orders()
+        logger.info(f"📋 纸上交易撮合已启动，加载挂单 {loaded} 笔")
+        self._matcher_tasks = [
+            asyncio.create_task(self._sync_open_orders()),
+            asyncio.create_task(self._poll_quotes(("HK", "US"))),
+            asyncio.create_task(self._watch_quotes()),
+        ]
+
+    async def stop_matcher(self):
+        self._matching = False
+        for task in self._matcher_tasks:
+            task.cancel()
+        await asyncio.gather(*self._matcher_tasks, return_exceptions=True)
+        self._matcher_tasks = []
+
+    async def _sync_open_orders(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.load_open_orders()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ 同步挂单簿失败: {e}")
+
+    async def _watch_quotes(self):
+        """
+        A股挂单按 market_quotes 变更流撮合
+
+        - 订单簿中没有A股挂单时关闭变更流（updateLookup 会为每次行情写入回查整条文档）
+        - 变更流异常（网络中断、游标失效等）按指数退避重连，使用 resume token 接续
+        - MongoDB 不支持变更流时改为轮询
+        """
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        resume_token = None
+        backoff = min(1.0, self.max_backoff_seconds)
+        while True:
+            if not self.book.symbols(("CN",)):
+                # 暂停期间的行情不再需要回放
+                resume_token = None
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            try:
+                async with self._get_db()["market_quotes"].watch(
+                    pipeline, full_document="updateLookup", resume_after=resume_token,
+                    max_await_time_ms=int(self.poll_seconds * 1000),
+                ) as stream:
+                    logger.info("📡 挂单撮合使用 market_quotes 变更流")
+                    backoff = min(1.0, self.max_backoff_seconds)
+                    while self.book.symbols(("CN",)):
+                        change = await stream.try_next()
+                        if change is None:
+                            continue
+                        resume_token = stream.resume_token
+                        doc = change.get("fullDocument") or {}
+                        code = doc.get("code") or doc.get("symbol")
+                        if code and self.book.has_symbol("CN", code):
+                            await self.on_price("CN", code, doc.get("close"))
+                    logger.info("📡 无A股挂单，暂停 market_quotes 变更流")
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                    # 单机 MongoDB 不支持变更流
+                    logger.info(f"📡 market_quotes 变更流不可用，A股挂单改为轮询撮合: {e}")
+                    await self._poll_quotes(("CN",))
+                    return
+                # resume token 失效等服务端错误：丢弃 token 从当前位置重新监听
+                resume_token = None
+                self.stats["stream_restarts"] += 1
+                logger.warning(f"⚠️ market_quotes 变更流异常，{backoff:.0f}s 后重连: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff_seconds)
+            except Exception as e:
+                self.stats["stream_restarts"] += 1
+                logger.warning(f"⚠️ market_quotes 变更流中断，{backoff:.0f}s 后重连: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff_seconds)
+
+    async def _poll_quotes(self, markets: Tuple[str, ...]):
+        while True:
+            try:
+                symbols = self.book.symbols(markets)
+                if symbols:
+                    prices = await self._get_pricing().get_prices((code, market) for market, code in symbols)
+                    for (market, code), price in prices.items():
+                        if price is not None:
+                            await self.on_price(market, code, price)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ 挂单轮询撮合异常: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+
+_paper_order_engine: Optional[PaperOrderEngine] = None
+
+
+def get_paper_order_engine() -> PaperOrderEngine:
+    """获取纸上交易撮合引擎（单例，订单簿在进程内共享）"""
+    global _paper_order_engine
+    if _paper_order_engine is None:
+        from app.core.config import settings
+        _paper_order_engine = PaperOrderEngine(
+            poll_seconds=float(getattr(settings, "PAPER_ORDER_POLL_SECONDS", 5.0)),
+            claim_timeout_seconds=float(getattr(settings, "PAPER_ORDER_CLAIM_TIMEOUT_SECONDS", 120.0)),
+        )
+    return _paper_order_engine
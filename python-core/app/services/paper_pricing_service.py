@@ -0,0 +1,216 @@
+"""
+纸上交易持仓估值
+- 批量取价：A股每次一条 $in 查询（market_quotes，缺失的再查一次 stock_basic_info），港股/美股每个市场一次批量行情调用
+- 进程内短期价格缓存，多个请求共享（账户页/持仓页频繁刷新时不重复访问数据库与外部行情）
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PriceKey = Tuple[str, str]  # (market, code)
+
+
+def _positive_float(value: Any) -> Optional[float]:
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    return price if price > 0 else None
+
+
+class PaperPricingService:
+    """纸上交易批量取价服务（带短期价格缓存）"""
+
+    def __init__(self, db=None, ttl_seconds: float = 5.0, max_entries: int = 10000):
+        self._db = db
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # (market, code) -> (价格, 获取时间戳)
+        self._cache: "OrderedDict[PriceKey, Tuple[float, float]]" = OrderedDict()
+        self._foreign_service = None
+        self.stats = {"hits": 0, "misses": 0, "db_queries": 0, "foreign_batches": 0}
+
+    def _get_db(self):
+        if self._db is not None:
+            return self._db
+        from app.core.database import get_mongo_db
+        return get_mongo_db()
+
+    def _get_foreign_service(self):
+        # ForeignStockService 初始化较重（数据源提供者、缓存后端），进程内复用一个实例
+        if self._foreign_service is None:
+            from app.services.foreign_stock_service import ForeignStockService
+            self._foreign_service = ForeignStockService(db=self._get_db())
+        return self._foreign_service
+
+    # ---------------- 缓存 ----------------
+
+    def _cached(self, key: PriceKey, now: float) -> Optional[float]:
+        entry = self._cache.get(key)
+        if entry is None or now - entry[1] > self.ttl_seconds:
+            return None
+        return entry[0]
+
+    def _remember(self, key: PriceKey, price: float, now: float):
+        self._cache[key] = (price, now)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, market: Optional[str] = None, code: Optional[str] = None):
+        """清除缓存（不传参数时全部清除）"""
+        if market is None:
+            self._cache.clear()
+        else:
+            self._cache.pop((market, code), None)
+
+    # ---------------- 取价 ----------------
+
+    async def get_price(self, code: str, market: str) -> Optional[float]:
+        return (await self.get_prices([(code, market)])).get((market, code))
+
+    async def get_prices(self, items: Iterable[Tuple[str, str]]) -> Dict[PriceKey, Optional[float]]:
+        """
+        批量获取最新价
+
+        Args:
+            items: (code, market) 列表，market 为 CN/HK/US
+
+        Returns:
+            {(market, code): 价格}，获取失败的价格为 None
+        """
+        now = time.time()
+        result: Dict[PriceKey, Optional[float]] = {}
+        misses: Dict[str, List[str]] = {}
+        for code, market in items:
+            key = (market, code)
+            if key in result:
+                continue
+            price = self._cached(key, now)
+            result[key] = price
+            if price is None:
+                misses.setdefault(market, []).append(code)
+        self.stats["hits"] += sum(1 for v in result.values() if v is not None)
+        self.stats["misses"] += sum(len(codes) for codes in misses.values())
+        if not misses:
+            return result
+
+        lookups = []
+        for market, codes in misses.items():
+            if market == "CN":
+                lookups.append(self._fetch_cn_prices(codes))
+            elif market in ("HK", "US"):
+                lookups.append(self._fetch_foreign_prices(market, codes))
+            else:
+                logger.error(f"❌ 无法获取股票价格: 不支持的市场 {market} ({len(codes)} 只)")
+
+        fetched_at = time.time()
+        for market, prices in await asyncio.gather(*lookups):
+            for code, price in prices.items():
+                result[(market, code)] = price
+                self._remember((market, code), price, fetched_at)
+        return result
+
+    async def _fetch_cn_prices(self, codes: List[str]) -> Tuple[str, Dict[str, float]]:
+        """A股：market_quotes 一次 $in 查询，缺失的再从 stock_basic_info.current_price 补齐"""
+        db = self._get_db()
+        prices: Dict[str, float] = {}
+        wanted = set(codes)
+
+        for collection, field in (("market_quotes", "close"), ("stock_basic_info", "current_price")):
+            remaining = [c for c in codes if c not in prices]
+            if not remaining:
+                break
+            self.stats["db_queries"] += 1
+            try:
+                docs = await db[collection].find(
+                    {"$or": [{"code": {"$in": remaining}}, {"symbol": {"$in": remaining}}]},
+                    {"_id": 0, "code": 1, "symbol": 1, field: 1},
+                ).to_list(None)
+            except Exception as e:
+                logger.warning(f"⚠️ 批量查询 {collection} 价格失败: {e}")
+                continue
+            for doc in docs:
+                price = _positive_float(doc.get(field))
+                if price is None:
+                    continue
+                for code in (doc.get("code"), doc.get("symbol")):
+                    if code in wanted and code not in prices:
+                        prices[code] = price
+
+        missing = wanted - prices.keys()
+        if missing:
+            logger.error(f"❌ 无法从数据库获取A股价格: {', '.join(sorted(missing))}")
+        return "CN", prices
+
+    async def _fetch_foreign_prices(self, market: str, codes: List[str]) -> Tuple[str, Dict[str, float]]:
+        """港股/美股：ForeignStockService 批量行情（内部先查行情热缓存，未命中的批量下载）"""
+        self.stats["foreign_batches"] += 1
+        prices: Dict[str, float] = {}
+        try:
+            quotes = await self._get_foreign_service().get_quotes(market, codes)
+        except Exception as e:
+            logger.error(f"❌ 批量获取{market}股价格失败: {e}")
+            return market, prices
+        for code, quote in quotes.items():
+            price = _positive_float(quote.get("price") or quote.get("current_price") or quote.get("close"))
+            if price is not None:
+                prices[code] = price
+        missing = set(codes) - prices.keys()
+        if missing:
+            logger.error(f"❌ 无法获取{market}股价格: {', '.join(sorted(missing))}")
+        return market, prices
+
+    # ---------------- 估值 ----------------
+
+    async def value_positions(self, positions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+        """
+        持仓估值
+
+        Returns:
+            (持仓明细列表, 按货币汇总的持仓市值)
+        """
+        prices = await self.get_prices((p.get("code"), p.get("market", "CN")) for p in positions)
+        value_by_currency = {"CNY": 0.0, "HKD": 0.0, "USD": 0.0}
+        detailed: List[Dict[str, Any]] = []
+        for p in positions:
+            code = p.get("code")
+            market = p.get("market", "CN")
+            currency = p.get("currency", "CNY")
+            qty = int(p.get("quantity", 0))
+            avg_cost = float(p.get("avg_cost", 0.0))
+            last = prices.get((market, code))
+            mkt_value = round((last or 0.0) * qty, 2)
+            value_by_currency[currency] = value_by_currency.get(currency, 0.0) + mkt_value
+            detailed.append({
+                "code": code,
+                "market": market,
+                "currency": currency,
+                "quantity": qty,
+                "available_qty": p.get("available_qty", qty),
+                "avg_cost": avg_cost,
+                "last_price": last,
+                "market_value": mkt_value,
+                "unrealized_pnl": None if last is None else round((last - avg_cost) * qty, 2),
+            })
+        return detailed, value_by_currency
+
+
+_paper_pricing_service: Optional[PaperPricingService] = None
+
+
+def get_paper_pricing_service() -> PaperPricingService:
+    """获取纸上交易取价服务（单例，价格缓存在进程内所有请求间共享）"""
+    global _paper_pricing_service
+    if _paper_pricing_service is None:
+        from app.core.config import settings
+        _paper_pricing_service = PaperPricingService(
+            ttl_seconds=float(getattr(settings, "PAPER_PRICE_CACHE_TTL_SECONDS", 5.0)),
+        )
+    return _paper_pricing_service
@@ -418,6 +418,43 @@ class RedisProgressTracker:
         except Exception as e:
             logger.error(f"[RedisProgress] save progress failed: {self.task_id} - {e}")
 
+    # LLM 增量输出在进度数据中保留的尾部字符数
+    LLM_STREAM_TAIL_CHARS = 2000
+    # LLM 增量输出持久化的最小间隔（秒），推送不受此限制
+    LLM_STREAM_SAVE_INTERVAL = 1.0
+
+    def update_llm_stream(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        记录 LLM 增量输出并推送给订阅者
+
+        event 由 tradingagents.llm_adapters.streaming 按频率合并后产生：
+        {"node": 节点名, "delta": 增量文本, "chars": 已输出字符数, "final": 是否结束}
+        """
+        try:
+            node = event.get('node')
+            stream = self.progress_data.get('llm_stream') or {}
+            if stream.get('node') != node:
+                stream = {'node': node, 'text': ''}
+            stream['text'] = (stream.get('text', '') + (event.get('delta') or ''))[-self.LLM_STREAM_TAIL_CHARS:]
+            stream['chars'] = event.get('chars', 0)
+            stream['final'] = bool(event.get('final'))
+            stream['updated_at'] = time.time()
+            self.progress_data['llm_stream'] = stream
+
+            # 推送增量（Redis pubsub → SSE）
+            if self.use_redis and self.redis_client:
+                payload = {'type': 'llm_stream', 'task_id': self.task_id, **event, 'timestamp': stream['updated_at']}
+                self.redis_client.publish(f"task_progress:{self.task_id}", json.dumps(payload, ensure_ascii=False))
+
+            # 持久化按间隔节流，轮询接口仍能看到最近输出
+            now = time.time()
+            if stream['final'] or now - getattr(self, '_last_stream_save', 0.0) >= self.LLM_STREAM_SAVE_INTERVAL:
+                self._last_stream_save = now
+                self._save_progress()
+        except Exception as e:
+            logger.debug(f"[RedisProgress] update llm stream failed: {self.task_id} - {e}")
+        return self.progress_data
+
     def mark_completed(self) -> Dict[str, Any]:
         try:
             self.progress_data['progress_percentage'] = 100
@@ -464,7 +501,8 @@ class RedisProgressTracker:
                 'estimated_total_time': self.progress_data.get('estimated_total_time', 0),
                 'progress_percentage': self.progress_data.get('progress_percentage', 0),
                 'status': self.progress_data.get('status', 'pending'),
-                'current_step': self.progress_data.get('current_step')
+                'current_step': self.progress_data.get('current_step'),
+                'llm_stream': self.progress_data.get('llm_stream')
             }
         except Exception as e:
             logger.error(f"[RedisProgress] to_dict failed: {self.task_id} - {e}")
@@ -1,4 +1,8 @@
+import asyncio
+import json
 import logging
+import math
+import time
 from datetime import datetime, time as dtime, timedelta
 from typing import Dict, Optional, Tuple, List
 from zoneinfo import ZoneInfo
@@ -9,6 +13,7 @@ from pymongo import UpdateOne
 from app.core.config import settings
 from app.core.database import get_mongo_db
 from app.services.data_sources.manager import DataSourceManager
+from app.services.intraday_bar_aggregator import get_intraday_bar_aggregator
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +28,16 @@ class QuotesIngestionService:
     - 智能限流：Tushare免费用户每小时最多2次，付费用户自动切换到高频模式（5秒）
     - 休市时间：跳过任务，保持上次收盘数据；必要时执行一次性兜底补数
     - 字段：code(6位)、close、pct_chg、amount、open、high、low、pre_close、trade_date、updated_at
+    - 增量入库：与内存中的上一份快照比对，只写入发生变化的股票；定期全量重写一次用于对账
+    - 变更推送：每次采集的 (code, 变化字段) 发布到 Redis 频道，筛选/前端可订阅而无需轮询 market_quotes
+    - 分钟K线：快照同时喂给 IntradayBarAggregator，聚合 1/5/15 分钟K线写入 intraday_bars
     """
 
+    # 参与比对和入库的行情字段
+    QUOTE_FIELDS = ("close", "pct_chg", "amount", "volume", "open", "high", "low", "pre_close")
+    # 单条变更消息最多包含的股票数（避免单条 Redis 消息过大）
+    CHANGE_FEED_CHUNK_SIZE = 1000
+
     def __init__(self, collection_name: str = "market_quotes") -> None:
         from collections import deque
 
@@ -44,6 +57,15 @@ class QuotesIngestionService:
         self._rotation_sources = ["tushare", "akshare_eastmoney", "akshare_sina"]
         self._rotation_index = 0  # 当前轮换索引
 
+        # 增量入库相关属性
+        self._last_snapshot: Dict[str, Dict] = {}  # 上次成功写入的快照 code -> {字段: 值}
+        self._last_snapshot_trade_date: Optional[str] = None
+        self._last_full_write_at: Optional[datetime] = None  # 上次全量写入时间
+        self._change_feed_seq = 0  # 变更消息序号（订阅端可据此发现丢消息）
+
+        # 盘中分钟K线聚合（进程内共享）
+        self.bar_aggregator = get_intraday_bar_aggregator() if settings.QUOTES_INTRADAY_BARS_ENABLED else None
+
     @staticmethod
     def _normalize_stock_code(code: str) -> str:
         """
@@ -364,11 +386,72 @@ class QuotesIngestionService:
         except Exception:
             return True
 
-    async def _bulk_upsert(self, quotes_map: Dict[str, Dict], trade_date: str, source: Optional[str] = None) -> None:
+    @staticmethod
+    def _clean_value(value):
+        """把 numpy 标量转为 Python 原生类型，NaN 统一视为 None（保证快照比对稳定）"""
+        if value is None:
+            return None
+        if hasattr(value, "item"):
+            try:
+                value = value.item()
+            except (ValueError, TypeError):
+                pass
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        return value
+
+    def _extract_quote_fields(self, q: Dict) -> Dict:
+        return {field: self._clean_value(q.get(field)) for field in self.QUOTE_FIELDS}
+
+    @staticmethod
+    def _diff_quote(prev: Optional[Dict], row: Dict) -> Dict:
+        """返回相对上一份快照发生变化的字段；无上一份快照时返回全部字段"""
+        if prev is None:
+            return dict(row)
+        return {k: v for k, v in row.items() if prev.get(k) != v}
+
+    def _needs_full_write(self, trade_date: str, now: datetime) -> bool:
+        """判断本次是否需要全量写入（无快照、交易日切换或到达对账间隔）"""
+        if not self._last_snapshot or trade_date != self._last_snapshot_trade_date:
+            return True
+        interval = settings.QUOTES_DELTA_FULL_REFRESH_SECONDS
+        if interval <= 0 or self._last_full_write_at is None:
+            return True
+        return (now - self._last_full_write_at).total_seconds() >= interval
+
+    def reset_snapshot(self) -> None:
+        """清空内存快照，下一次入库将全量写入"""
+        self._last_snapshot = {}
+        self._last_snapshot_trade_date = None
+        self._last_full_write_at = None
+
+    async def _bulk_upsert(
+        self,
+        quotes_map: Dict[str, Dict],
+        trade_date: str,
+        source: Optional[str] = None,
+        only_changed: bool = False,
+    ) -> Dict[str, Dict]:
+        """
+        批量写入行情
+
+        Args:
+            quotes_map: code -> 行情字段
+            trade_date: 交易日
+            source: 数据源名称
+            only_changed: 只写入相对上一份快照发生变化的股票（交易日切换或到达对账间隔时仍全量写入）
+
+        Returns:
+            相对上一份快照的变更 {code6: {变化字段: 新值}}
+        """
         db = get_mongo_db()
         coll = db[self.collection_name]
         ops = []
         updated_at = datetime.now(self.tz)
+        full_write = not only_changed or self._needs_full_write(trade_date, updated_at)
+
+        snapshot: Dict[str, Dict] = {}
+        changes: Dict[str, Dict] = {}
         for code, q in quotes_map.items():
             if not code:
                 continue
@@ -377,10 +460,17 @@ class QuotesIngestionService:
             if not code6:
                 continue
 
+            row = self._extract_quote_fields(q)
+            snapshot[code6] = row
+            delta = self._diff_quote(self._last_snapshot.get(code6), row)
+            if delta:
+                changes[code6] = delta
+            elif not full_write:
+                continue
+
             # 🔥 日志：记录写入的成交量值
-            volume = q.get("volume")
             if code6 in ["300750", "000001", "600000"]:  # 只记录几个示例股票
-                logger.info(f"📊 [写入market_quotes] {code6} - volume={volume}, amount={q.get('amount')}, source={source}")
+                logger.info(f"📊 [写入market_quotes] {code6} - volume={row['volume']}, amount={row['amount']}, source={source}")
 
             ops.append(
                 UpdateOne(
@@ -388,14 +478,7 @@ class QuotesIngestionService:
                     {"$set": {
                         "code": code6,
                         "symbol": code6,  # 添加 symbol 字段，与 code 保持一致
-                        "close": q.get("close"),
-                        "pct_chg": q.get("pct_chg"),
-                        "amount": q.get("amount"),
-                        "volume": volume,
-                        "open": q.get("open"),
-                        "high": q.get("high"),
-                        "low": q.get("low"),
-                        "pre_close": q.get("pre_close"),
+                        **row,
                         "trade_date": trade_date,
                         "updated_at": updated_at,
                     }},
@@ -403,12 +486,103 @@ class QuotesIngestionService:
                 )
             )
         if not ops:
-            logger.info("无可写入的数据，跳过")
-            return
-        result = await coll.bulk_write(ops, ordered=False)
+            if snapshot:
+                logger.info(f"⏭️ 行情无变化，跳过入库 source={source}, codes={len(snapshot)}")
+            else:
+                logger.info("无可写入的数据，跳过")
+            return changes
+
+        try:
+            result = await coll.bulk_write(ops, ordered=False)
+        except Exception:
+            # 写入结果未知，丢弃快照，下次全量写入
+            self.reset_snapshot()
+            raise
+
+        # 合并快照：本次未返回的股票保留旧值
+        self._last_snapshot.update(snapshot)
+        self._last_snapshot_trade_date = trade_date
+        if full_write:
+            self._last_full_write_at = updated_at
+
         logger.info(
-            f"✅ 行情入库完成 source={source}, matched={result.matched_count}, upserted={len(result.upserted_ids) if result.upserted_ids else 0}, modified={result.modified_count}"
+            f"✅ 行情入库完成 source={source}, mode={'full' if full_write else 'delta'}, "
+            f"written={len(ops)}/{len(snapshot)}, changed={len(changes)}, "
+            f"matched={result.matched_count}, upserted={len(result.upserted_ids) if result.upserted_ids else 0}, modified={result.modified_count}"
         )
+        return changes
+
+    async def _publish_changes(self, changes: Dict[str, Dict], trade_date: str, source: Optional[str]) -> int:
+        """
+        发布行情变更到 Redis 频道（按 CHANGE_FEED_CHUNK_SIZE 分片）
+
+        消息格式：
+            {"type": "quotes_delta", "seq": 序号, "trade_date": ..., "source": ..., "ts": 时间戳,
+             "part": 分片序号, "parts": 分片总数, "changes": {code: {字段: 新值}}}
+
+        Returns:
+            发布的消息数
+        """
+        if not changes or not settings.QUOTES_CHANGE_FEED_ENABLED:
+            return 0
+        try:
+            from app.core.database import get_redis_client
+            redis = get_redis_client()
+        except Exception as e:
+            logger.debug(f"Redis 不可用，跳过行情变更推送: {e}")
+            return 0
+
+        self._change_feed_seq += 1
+        codes = list(changes.keys())
+        chunk = self.CHANGE_FEED_CHUNK_SIZE
+        parts = (len(codes) + chunk - 1) // chunk
+        ts = time.time()
+        published = 0
+        try:
+            for part in range(parts):
+                batch = codes[part * chunk:(part + 1) * chunk]
+                message = {
+                    "type": "quotes_delta",
+                    "seq": self._change_feed_seq,
+                    "trade_date": trade_date,
+                    "source": source,
+                    "ts": ts,
+                    "part": part + 1,
+                    "parts": parts,
+                    "changes": {code: changes[code] for code in batch},
+                }
+                await redis.publish(
+                    settings.QUOTES_CHANGE_FEED_CHANNEL,
+                    json.dumps(message, ensure_ascii=False, default=str),
+                )
+                published += 1
+        except Exception as e:
+            logger.warning(f"⚠️ 行情变更推送失败（忽略）: {e}")
+        else:
+            logger.info(f"📡 已推送行情变更 {len(codes)} 只股票（{published} 条消息）")
+        return published
+
+    async def _aggregate_bars(self, quotes_map: Dict[str, Dict], trade_date: str,
+                              source: Optional[str] = None) -> None:
+        """用本次快照更新分钟K线，并写入已收盘的K线"""
+        if self.bar_aggregator is None:
+            return
+        try:
+            snapshot = {self._normalize_stock_code(code): q for code, q in quotes_map.items()}
+            self.bar_aggregator.add_snapshot(snapshot, trade_date, datetime.now(self.tz), source=source)
+            await self.bar_aggregator.flush()
+        except Exception as e:
+            logger.warning(f"⚠️ 分钟K线聚合失败（忽略）: {e}")
+
+    async def _flush_bars(self) -> None:
+        """收盘所有已到期的分钟K线并写入"""
+        if self.bar_aggregator is None:
+            return
+        try:
+            self.bar_aggregator.close_due(datetime.now(self.tz))
+            await self.bar_aggregator.flush()
+        except Exception as e:
+            logger.warning(f"⚠️ 分钟K线写入失败（忽略）: {e}")
 
     async def backfill_from_historical_data(self) -> None:
         """
@@ -601,10 +775,13 @@ class QuotesIngestionService:
         核心逻辑：
         1. 检测 Tushare 权限（首次运行）
         2. 按轮换顺序尝试获取行情：Tushare → AKShare东方财富 → AKShare新浪财经
-        3. 任意一个接口成功即入库，失败则跳过本次采集
+        3. 任意一个接口成功即入库（只写入变化的股票），失败则跳过本次采集
+        4. 将变更发布到 Redis 频道
         """
         # 非交易时段处理
         if not self._is_trading_time():
+            # 收盘/午休后写入剩余的分钟K线
+            await self._flush_bars()
             if settings.QUOTES_BACKFILL_ON_OFFHOURS:
                 await self.backfill_last_close_snapshot_if_needed()
             else:
@@ -615,7 +792,7 @@ class QuotesIngestionService:
             # 首次运行：检测 Tushare 权限
             if settings.QUOTES_AUTO_DETECT_TUSHARE_PERMISSION and not self._tushare_permission_checked:
                 logger.info("🔍 首次运行，检测 Tushare rt_k 接口权限...")
-                has_premium = self._check_tushare_permission()
+                has_premium = await asyncio.to_thread(self._check_tushare_permission)
 
                 if has_premium:
                     logger.info(
@@ -630,8 +807,10 @@ class QuotesIngestionService:
             # 获取下一个数据源
             source_type, akshare_api = self._get_next_source()
 
-            # 尝试获取行情
-            quotes_map, source_name = self._fetch_quotes_from_source(source_type, akshare_api)
+            # 尝试获取行情（数据源调用是阻塞的，放到线程中执行，避免阻塞事件循环）
+            quotes_map, source_name = await asyncio.to_thread(
+                self._fetch_quotes_from_source, source_type, akshare_api
+            )
 
             if not quotes_map:
                 logger.warning(f"⚠️ {source_name or source_type} 未获取到行情数据，跳过本次入库")
@@ -647,12 +826,19 @@ class QuotesIngestionService:
             # 获取交易日
             try:
                 manager = DataSourceManager()
-                trade_date = manager.find_latest_trade_date_with_fallback() or datetime.now(self.tz).strftime("%Y%m%d")
+                trade_date = await asyncio.to_thread(manager.find_latest_trade_date_with_fallback)
+                trade_date = trade_date or datetime.now(self.tz).strftime("%Y%m%d")
             except Exception:
                 trade_date = datetime.now(self.tz).strftime("%Y%m%d")
 
-            # 入库
-            await self._bulk_upsert(quotes_map, trade_date, source_name)
+            # 增量入库：只写入发生变化的股票
+            changes = await self._bulk_upsert(quotes_map, trade_date, source_name, only_changed=True)
+
+            # 推送变更
+            await self._publish_changes(changes, trade_date, source_name)
+
+            # 聚合分钟K线
+            await self._aggregate_bars(quotes_map, trade_date, source_name or source_type)
 
             # 记录成功状态
             await self._record_sync_status(
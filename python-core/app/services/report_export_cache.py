@@ -0,0 +1,291 @@
+"""
+报告导出缓存
+- PDF/DOCX 渲染结果按 (报告内容哈希, 格式, 模板版本) 缓存到磁盘，重复下载直接返回文件
+- 缓存总大小有上限，超出时按最近访问时间（文件 mtime）淘汰
+- 渲染在独立进程池中执行，不阻塞 API 工作线程；同一报告同一格式的并发请求只渲染一次
+- 分析完成后可预渲染，首次下载即命中缓存
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from app.utils.report_exporter import ReportExporter
+
+logger = logging.getLogger(__name__)
+
+# 格式 -> ReportExporter 渲染方法
+EXPORT_RENDERERS = {
+    "pdf": "generate_pdf_report",
+    "docx": "generate_docx_report",
+}
+
+
+def _render_export(fmt: str, payload: Dict[str, Any]) -> bytes:
+    """在进程池子进程中渲染报告（模块级函数，供 pickle）"""
+    from app.utils.report_exporter import report_exporter
+
+    return getattr(report_exporter, EXPORT_RENDERERS[fmt])(payload)
+
+
+def render_payload(report_doc: Dict[str, Any]) -> Dict[str, Any]:
+    """提取参与渲染的字段（哈希与跨进程传输都只使用这部分）"""
+    return {k: report_doc[k] for k in ReportExporter.RENDER_FIELDS if k in report_doc}
+
+
+def content_hash(report_doc: Dict[str, Any]) -> str:
+    """报告内容哈希（与 _id、时间戳等元数据无关，内容相同的报告共享缓存）"""
+    raw = json.dumps(render_payload(report_doc), ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ReportExportCache:
+    """报告导出磁盘缓存（内容寻址 + LRU 容量上限 + 进程池渲染）"""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int,
+        max_workers: int = 2,
+        renderer: Optional[Callable[[str, Dict[str, Any]], bytes]] = None,
+        min_evict_age_seconds: float = 60.0,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        # 自定义渲染函数（测试用）在默认线程池中执行；默认使用进程池
+        self._renderer = renderer or _render_export
+        self._use_process_pool = renderer is None
+        # 刚写入/刚命中的文件可能正在被下载，淘汰时跳过
+        self.min_evict_age_seconds = min_evict_age_seconds
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._prewarm_tasks: Set[asyncio.Task] = set()
+        # 缓存目录当前大小（首次写入时扫描目录初始化）
+        self._total_bytes: Optional[int] = None
+        self._stats = {"hits": 0, "misses": 0, "renders": 0, "evictions": 0, "errors": 0}
+
+    # ---------------- 缓存路径 ----------------
+
+    def cache_path(self, report_doc: Dict[str, Any], fmt: str) -> Path:
+        digest = content_hash(report_doc)
+        return self.cache_dir / digest[:2] / f"{digest}.v{ReportExporter.TEMPLATE_VERSION}.{fmt}"
+
+    def lookup(self, report_doc: Dict[str, Any], fmt: str) -> Optional[Path]:
+        """查找已缓存的导出文件；命中时刷新 mtime 作为 LRU 访问时间"""
+        path = self.cache_path(report_doc, fmt)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    # ---------------- 渲染 ----------------
+
+    async def get_or_render(self, report_doc: Dict[str, Any], fmt: str) -> Path:
+        """
+        获取报告导出文件路径（命中缓存直接返回，否则渲染后写入缓存）
+
+        Raises:
+            ValueError: 不支持的格式
+            Exception: 渲染失败（保留导出器原始异常信息）
+        """
+        if fmt not in EXPORT_RENDERERS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+
+        cached = self.lookup(report_doc, fmt)
+        if cached is not None:
+            self._stats["hits"] += 1
+            return cached
+        self._stats["misses"] += 1
+
+        path = self.cache_path(report_doc, fmt)
+        key = str(path)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            data = await self._render(fmt, render_payload(report_doc))
+            await asyncio.to_thread(self._store, path, data)
+            future.set_result(path)
+            return path
+        except Exception as e:
+            self._stats["errors"] += 1
+            future.set_exception(e)
+            # 无其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _render(self, fmt: str, payload: Dict[str, Any]) -> bytes:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            data = await loop.run_in_executor(self._get_executor(), self._renderer, fmt, payload)
+        except BrokenProcessPool:
+            # 子进程异常退出：丢弃进程池，下次请求重建
+            logger.warning("⚠️ 报告渲染进程池已损坏，将重建")
+            self._shutdown_executor()
+            raise
+        self._stats["renders"] += 1
+        logger.info(
+            f"🖨️ 报告渲染完成: {payload.get('stock_symbol', 'unknown')} {fmt}, "
+            f"{len(data)} 字节, 耗时 {time.perf_counter() - start:.2f}s"
+        )
+        return data
+
+    def _get_executor(self) -> Optional[Executor]:
+        if not self._use_process_pool:
+            return None
+        if self._executor is None:
+            # spawn：避免在多线程的 API 进程中 fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _shutdown_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # ---------------- 预渲染 ----------------
+
+    async def prewarm(self, report_doc: Dict[str, Any], formats: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        预渲染报告导出文件（失败只记录日志）
+
+        Returns:
+            成功缓存的格式列表
+        """
+        done = []
+        for fmt in formats if formats is not None else self.available_formats():
+            try:
+                await self.get_or_render(report_doc, fmt)
+                done.append(fmt)
+            except Exception as e:
+                logger.warning(f"⚠️ 预渲染 {report_doc.get('stock_symbol', 'unknown')} {fmt} 失败: {e}")
+        return done
+
+    def schedule_prewarm(self, report_doc: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """在后台调度预渲染（保留任务引用，防止被垃圾回收）"""
+        formats = self.available_formats()
+        if not formats:
+            return None
+        task = asyncio.create_task(self.prewarm(render_payload(report_doc), formats))
+        self._prewarm_tasks.add(task)
+        task.add_done_callback(self._prewarm_tasks.discard)
+        return task
+
+    @staticmethod
+    def available_formats() -> List[str]:
+        """当前环境可渲染的格式"""
+        from app.utils.report_exporter import report_exporter
+
+        formats = []
+        if report_exporter.pdfkit_available:
+            formats.append("pdf")
+        if report_exporter.pandoc_available:
+            formats.append("docx")
+        return formats
+
+    # ---------------- 写入与淘汰 ----------------
+
+    def _store(self, path: Path, data: bytes) -> Path:
+        """原子写入缓存文件（临时文件 + rename），超出容量时淘汰"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._scan())
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        self._total_bytes += len(data)
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+        return path
+
+    def _scan(self) -> List[tuple]:
+        """扫描缓存目录，返回 [(mtime, size, path)]"""
+        entries = []
+        if not self.cache_dir.exists():
+            return entries
+        for path in self.cache_dir.glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self):
+        """按 mtime 从旧到新删除，直到总大小不超过上限"""
+        entries = sorted(self._scan(), key=lambda e: e[0])
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.min_evict_age_seconds
+        evicted = 0
+        for mtime, size, path in entries:
+            if total <= self.max_bytes or mtime > cutoff:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        self._total_bytes = total
+        if evicted:
+            self._stats["evictions"] += evicted
+            logger.info(f"🧹 报告导出缓存淘汰 {evicted} 个文件，当前 {total / 1024 / 1024:.1f} MB")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "inflight": len(self._inflight),
+        }
+
+
+_report_export_cache: Optional[ReportExportCache] = None
+
+
+def get_report_export_cache() -> ReportExportCache:
+    """获取报告导出缓存（单例）"""
+    global _report_export_cache
+    if _report_export_cache is None:
+        from app.core.config import settings
+
+        _report_export_cache = ReportExportCache(
+            cache_dir=settings.REPORT_EXPORT_CACHE_DIR,
+            max_bytes=settings.REPORT_EXPORT_CACHE_MAX_MB * 1024 * 1024,
+            max_workers=settings.REPORT_EXPORT_WORKERS,
+        )
+    return _report_export_cache
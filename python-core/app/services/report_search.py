@@ -0,0 +1,219 @@
+"""
+分析报告检索
+- search_tokens：由股票代码/名称/分析ID/摘要生成的 n-gram 词元（多键索引），支持中文子串检索
+- 列表分页使用 (created_at, _id) 游标，避免大偏移量 skip
+- 总数按上限计数，超过上限时返回估算值
+- 股票名称批量异步查询（一次 $in 查询 + 进程内缓存）
+"""
+from __future__ import annotations
+
+import base64
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core.database import get_mongo_db
+
+logger = logging.getLogger(__name__)
+
+REPORTS_COLLECTION = "analysis_reports"
+# 摘要只取前若干字符生成词元，控制索引体积
+SUMMARY_TOKEN_CHARS = 200
+# 计数上限：超过后 total 为估算值
+COUNT_LIMIT = 10000
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize_text(text: Any) -> str:
+    return _WHITESPACE_RE.sub("", str(text or "")).lower()
+
+
+def _ngrams(text: str, n: int = 2) -> List[str]:
+    if len(text) < n:
+        return [text] if text else []
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+
+def build_search_tokens(doc: Dict[str, Any]) -> List[str]:
+    """根据报告文档生成检索词元（完整代码/ID + 各字段的二元组）"""
+    tokens = set()
+    for field in ("stock_symbol", "stock_name", "analysis_id"):
+        value = _normalize_text(doc.get(field))
+        if value:
+            tokens.add(value)
+            tokens.update(_ngrams(value))
+    tokens.update(_ngrams(_normalize_text(doc.get("summary"))[:SUMMARY_TOKEN_CHARS]))
+    return sorted(tokens)
+
+
+def report_size(reports: Any) -> int:
+    """报告内容大小估算（写入时保存，列表页无需读取完整报告）"""
+    return len(str(reports or {}))
+
+
+def build_keyword_query(keyword: str) -> Optional[Dict[str, Any]]:
+    """
+    关键词转查询条件
+
+    - 两个字符及以上：要求包含关键词的全部二元组（走 search_tokens 索引；二元组不连续时可能有少量近似命中）
+    - 单个字符：按股票代码/名称前缀匹配
+    """
+    normalized = _normalize_text(keyword)
+    if not normalized:
+        return None
+    if len(normalized) == 1:
+        prefix = re.escape(keyword.strip())
+        return {"$or": [
+            {"stock_symbol": {"$regex": f"^{prefix}", "$options": "i"}},
+            {"stock_name": {"$regex": f"^{prefix}"}},
+        ]}
+    return {"search_tokens": {"$all": _ngrams(normalized)}}
+
+
+def encode_cursor(created_at: datetime, oid: ObjectId) -> str:
+    raw = f"{created_at.isoformat()}|{oid}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """解析分页游标，格式非法时抛出 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, oid = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), ObjectId(oid)
+    except Exception as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+
+def apply_cursor(query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    """在查询条件上追加 (created_at, _id) 倒序游标条件"""
+    if not cursor:
+        return query
+    created_at, oid = decode_cursor(cursor)
+    keyset = {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": oid}},
+    ]}
+    return {"$and": [query, keyset]} if query else keyset
+
+
+async def count_reports(db, query: Dict[str, Any]) -> Tuple[int, bool]:
+    """
+    统计报告数量
+
+    Returns:
+        (数量, 是否精确)；无筛选条件时使用集合元数据估算，超过 COUNT_LIMIT 时返回上限
+    """
+    coll = db[REPORTS_COLLECTION]
+    if not query:
+        return await coll.estimated_document_count(), False
+    count = await coll.count_documents(query, limit=COUNT_LIMIT + 1)
+    if count > COUNT_LIMIT:
+        return COUNT_LIMIT, False
+    return count, True
+
+
+# 股票名称缓存（code -> name）
+_stock_name_cache: Dict[str, str] = {}
+
+
+async def get_stock_names(codes: Iterable[str]) -> Dict[str, str]:
+    """
+    批量获取股票名称（缓存 -> 一次 $in 查询，按数据源优先级取值），查不到时返回代码本身
+    """
+    codes = [c for c in dict.fromkeys(codes) if c]
+    result = {c: _stock_name_cache[c] for c in codes if c in _stock_name_cache}
+    missing = [c for c in codes if c not in result]
+    if not missing:
+        return result
+
+    code6_map = {str(c).zfill(6): c for c in missing}
+    try:
+        from app.core.unified_config import UnifiedConfigManager
+
+        configs = await UnifiedConfigManager().get_data_source_configs_async()
+        priority = [
+            ds.type.lower() for ds in configs
+            if ds.enabled and ds.type.lower() in ['tushare', 'akshare', 'baostock']
+        ] or ['tushare', 'akshare', 'baostock']
+
+        db = get_mongo_db()
+        keys = list(code6_map.keys())
+        cursor = db.stock_basic_info.find(
+            {"$or": [{"symbol": {"$in": keys}}, {"code": {"$in": keys}}]},
+            {"_id": 0, "code": 1, "symbol": 1, "name": 1, "source": 1},
+        )
+        best: Dict[str, Tuple[int, str]] = {}
+        async for doc in cursor:
+            name = doc.get("name")
+            code6 = doc.get("code") if doc.get("code") in code6_map else doc.get("symbol")
+            if not name or code6 not in code6_map:
+                continue
+            source = str(doc.get("source") or "").lower()
+            # 无 source 字段的旧数据优先级最低
+            rank = priority.index(source) if source in priority else len(priority)
+            if code6 not in best or rank < best[code6][0]:
+                best[code6] = (rank, name)
+
+        for code6, original in code6_map.items():
+            name = best[code6][1] if code6 in best else original
+            _stock_name_cache[original] = name
+            result[original] = name
+    except Exception as e:
+        logger.warning(f"⚠️ 批量获取股票名称失败: {e}")
+        for original in missing:
+            result[original] = original
+
+    return result
+
+
+async def get_stock_name_async(code: str) -> str:
+    """获取单只股票名称（异步）"""
+    return (await get_stock_names([code])).get(code, code)
+
+
+async def ensure_report_search_ready(batch_size: int = 500) -> int:
+    """
+    创建报告列表索引，并为缺少 search_tokens 的历史报告回填词元和 report_size
+
+    Returns:
+        回填的文档数量
+    """
+    db = get_mongo_db()
+    coll = db[REPORTS_COLLECTION]
+    try:
+        await coll.create_index([("created_at", -1), ("_id", -1)], name="created_at_id_desc")
+        await coll.create_index([("stock_symbol", 1), ("created_at", -1), ("_id", -1)], name="symbol_created_at_id")
+        await coll.create_index([("market_type", 1), ("created_at", -1), ("_id", -1)], name="market_created_at_id")
+        await coll.create_index([("search_tokens", 1)], name="search_tokens")
+    except Exception as e:
+        logger.warning(f"⚠️ 创建报告索引失败（忽略）: {e}")
+
+    projection = {"stock_symbol": 1, "stock_name": 1, "analysis_id": 1, "summary": 1, "reports": 1}
+    backfilled = 0
+    try:
+        while True:
+            docs = await coll.find({"search_tokens": {"$exists": False}}, projection).limit(batch_size).to_list(length=batch_size)
+            if not docs:
+                break
+            ops = [
+                UpdateOne({"_id": d["_id"]}, {"$set": {
+                    "search_tokens": build_search_tokens(d),
+                    "report_size": report_size(d.get("reports")),
+                }})
+                for d in docs
+            ]
+            await coll.bulk_write(ops, ordered=False)
+            backfilled += len(ops)
+    except Exception as e:
+        logger.warning(f"⚠️ 回填报告检索词元失败（已回填 {backfilled} 条）: {e}")
+        return backfilled
+
+    if backfilled:
+        logger.info(f"✅ 已为 {backfilled} 条历史报告回填检索词元")
+    return backfilled
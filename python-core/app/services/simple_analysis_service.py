@@ -7,7 +7,7 @@ import asyncio
 import uuid
 import logging
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import TYPE_CHECKING, Dict, Any, Optional, List
 from pathlib import Path
 import sys
 
@@ -19,8 +19,9 @@ sys.path.insert(0, str(project_root))
 from tradingagents.utils.logging_init import init_logging
 init_logging()
 
-from tradingagents.graph.trading_graph import TradingAgentsGraph
 from tradingagents.default_config import DEFAULT_CONFIG
+from tradingagents.utils.metrics import get_metrics_registry, set_queue_depth, track_task
+from app.services.analysis_profiler import profile_analysis
 from app.models.analysis import (
     AnalysisTask, AnalysisStatus, SingleAnalysisRequest, AnalysisParameters
 )
@@ -33,15 +34,15 @@ from app.services.memory_state_manager import get_memory_state_manager, TaskStat
 from app.services.redis_progress_tracker import RedisProgressTracker, get_progress_by_id
 from app.services.progress_log_handler import register_analysis_tracker, unregister_analysis_tracker
 
-# 股票基础信息获取（用于补充显示名称）
-try:
+if TYPE_CHECKING:
+    # 分析图在创建实例时才导入（LLM SDK 与数据源导入开销较大，不计入 API 冷启动）
+    from tradingagents.graph.trading_graph import TradingAgentsGraph
+
+
+def _get_stock_info_safe(stock_code: str):
+    """获取股票基础信息的安全封装（数据源管理器首次使用时才初始化）"""
     from tradingagents.dataflows.data_source_manager import get_data_source_manager
-    _data_source_manager = get_data_source_manager()
-    def _get_stock_info_safe(stock_code: str):
-        """获取股票基础信息的安全封装"""
-        return _data_source_manager.get_stock_basic_info(stock_code)
-except Exception:
-    _get_stock_info_safe = None
+    return get_data_source_manager().get_stock_basic_info(stock_code)
 
 # 设置日志
 logger = logging.getLogger("app.services.simple_analysis_service")
@@ -658,10 +659,9 @@ class SimpleAnalysisService:
             return self._stock_name_cache[code]
         name = None
         try:
-            if _get_stock_info_safe:
-                info = _get_stock_info_safe(code)
-                if isinstance(info, dict):
-                    name = info.get("name")
+            info = _get_stock_info_safe(code)
+            if isinstance(info, dict):
+                name = info.get("name")
         except Exception as e:
             logger.warning(f"⚠️ 获取股票名称失败: {code} - {e}")
         if not name:
@@ -704,7 +704,7 @@ class SimpleAnalysisService:
             logger.warning(f"⚠️ 生成新的用户ID: {new_object_id}")
             return PyObjectId(new_object_id)
 
-    def _get_trading_graph(self, config: Dict[str, Any]) -> TradingAgentsGraph:
+    def _get_trading_graph(self, config: Dict[str, Any]) -> "TradingAgentsGraph":
         """获取或创建TradingAgents实例
 
         ⚠️ 注意：为了避免并发执行时的数据混淆，每次都创建新实例
@@ -717,6 +717,7 @@ class SimpleAnalysisService:
         # 不再使用缓存，因为 TradingAgentsGraph 有可变的实例变量
         logger.info(f"🔧 创建新的TradingAgents实例（并发安全模式）...")
 
+        from tradingagents.graph.trading_graph import TradingAgentsGraph
         trading_graph = TradingAgentsGraph(
             selected_analysts=config.get("selected_analysts", ["market", "fundamentals"]),
             debug=config.get("debug", False),
@@ -1060,6 +1061,10 @@ class SimpleAnalysisService:
             # 从日志监控中注销
             unregister_analysis_tracker(task_id)
 
+    def collect_metrics(self):
+        """指标采集：共享线程池中等待执行的分析任务数"""
+        set_queue_depth("analysis_pool", "queued", self._thread_pool._work_queue.qsize())
+
     async def _execute_analysis_sync(
         self,
         task_id: str,
@@ -1071,18 +1076,40 @@ class SimpleAnalysisService:
         # 🔧 使用共享线程池，支持多个任务并发执行
         # 不再每次创建新的线程池，避免串行执行
         loop = asyncio.get_event_loop()
+        # 记录主事件循环，供线程中的 LLM 增量输出推送到 WebSocket
+        self._main_loop = loop
         logger.info(f"🚀 [线程池] 提交分析任务到共享线程池: {task_id} - {request.stock_code}")
-        result = await loop.run_in_executor(
-            self._thread_pool,  # 使用共享线程池
-            self._run_analysis_sync,
-            task_id,
-            user_id,
-            request,
-            progress_tracker
-        )
+        with track_task("analysis"):
+            result = await loop.run_in_executor(
+                self._thread_pool,  # 使用共享线程池
+                self._run_analysis_sync_profiled,
+                task_id,
+                user_id,
+                request,
+                progress_tracker
+            )
         logger.info(f"✅ [线程池] 分析任务执行完成: {task_id}")
         return result
 
+    def _run_analysis_sync_profiled(
+        self,
+        task_id: str,
+        user_id: str,
+        request: SingleAnalysisRequest,
+        progress_tracker: Optional[RedisProgressTracker] = None
+    ) -> Dict[str, Any]:
+        """在线程池中执行分析；命中剖析策略时采样本线程，摘要写入 performance_metrics.profile"""
+        requested = bool(request.parameters and request.parameters.enable_profiling)
+        with profile_analysis(
+            task_id, requested, user_id=user_id, source="api", stock_code=request.stock_code
+        ) as profile:
+            result = self._run_analysis_sync(task_id, user_id, request, progress_tracker)
+        if profile and isinstance(result, dict):
+            metrics = dict(result.get("performance_metrics") or {})
+            metrics["profile"] = profile
+            result["performance_metrics"] = metrics
+        return result
+
     def _run_analysis_sync(
         self,
         task_id: str,
@@ -1496,14 +1523,33 @@ class SimpleAnalysisService:
                 except Exception as e:
                     logger.error(f"❌ Graph进度回调失败: {e}", exc_info=True)
 
+            main_loop = getattr(self, '_main_loop', None)
+
+            def graph_token_callback(event: Dict[str, Any]):
+                """接收 LLM 增量输出（已按 10次/秒 合并），转发到进度跟踪器（SSE）和 WebSocket"""
+                if progress_tracker:
+                    progress_tracker.update_llm_stream(event)
+                if main_loop is not None and not main_loop.is_closed():
+                    try:
+                        from app.services.websocket_manager import get_websocket_manager
+                        asyncio.run_coroutine_threadsafe(
+                            get_websocket_manager().send_progress_update(
+                                task_id, {"type": "llm_stream", "task_id": task_id, **event}
+                            ),
+                            main_loop
+                        )
+                    except Exception as ws_err:
+                        logger.debug(f"LLM增量输出WebSocket推送失败: {ws_err}")
+
             logger.info(f"🚀 准备调用 trading_graph.propagate，progress_callback={graph_progress_callback}")
 
-            # 执行实际分析，传递进度回调和task_id
+            # 执行实际分析，传递进度回调、增量输出回调和task_id
             state, decision = trading_graph.propagate(
                 request.stock_code,
                 analysis_date,
                 progress_callback=graph_progress_callback,
-                task_id=task_id
+                task_id=task_id,
+                token_callback=graph_token_callback
             )
 
             logger.info(f"✅ trading_graph.propagate 执行完成")
@@ -2621,6 +2667,11 @@ class SimpleAnalysisService:
                 "performance_metrics": result.get("performance_metrics", {})
             }
 
+            # 列表检索字段：n-gram 词元与报告大小
+            from app.services.report_search import build_search_tokens, report_size
+            document["search_tokens"] = build_search_tokens(document)
+            document["report_size"] = report_size(reports)
+
             # 保存到analysis_reports集合（与web目录保持一致）
             result_insert = await db.analysis_reports.insert_one(document)
 
@@ -2649,6 +2700,15 @@ class SimpleAnalysisService:
                     }}}
                 )
                 logger.info(f"💾 分析结果已保存 (web风格): {task_id}")
+
+                # 后台预渲染 PDF/DOCX，首次下载即命中导出缓存
+                from app.core.config import settings
+                if settings.REPORT_EXPORT_PREWARM:
+                    try:
+                        from app.services.report_export_cache import get_report_export_cache
+                        get_report_export_cache().schedule_prewarm(document)
+                    except Exception as e:
+                        logger.warning(f"⚠️ 调度报告预渲染失败: {e}")
             else:
                 logger.error("❌ MongoDB插入失败")
 
@@ -2903,6 +2963,7 @@ def get_simple_analysis_service() -> SimpleAnalysisService:
     if _analysis_service is None:
         logger.info("🔧 [单例] 创建新的 SimpleAnalysisService 实例")
         _analysis_service = SimpleAnalysisService()
+        get_metrics_registry().register_collector(_analysis_service.collect_metrics)
     else:
         logger.info(f"🔧 [单例] 返回现有的 SimpleAnalysisService 实例: {id(_analysis_service)}")
     return _analysis_service
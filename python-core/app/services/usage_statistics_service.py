@@ -6,10 +6,24 @@
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
-from collections import defaultdict
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
 
 from app.core.database import get_mongo_db
 from app.models.config import UsageRecord, UsageStatistics
+from tradingagents.utils.usage_rollups import (
+    BACKFILL_SOURCE_QUERY,
+    ROLLED_UP_FIELD,
+    ROLLUP_COLLECTION,
+    RollupAccumulator,
+    backfill_claim,
+    backfill_claimed,
+    backfill_done,
+    backfill_owner,
+    backfill_release,
+    rollup_window_query,
+    summarize_rollups,
+)
 
 logger = logging.getLogger("app.services.usage_statistics_service")
 
@@ -20,15 +34,25 @@ class UsageStatisticsService:
     def __init__(self):
         # 使用 tradingagents 的集合名称
         self.collection_name = "token_usage"
+        # 小时/日汇总（与 tradingagents MongoDBStorage 共用）
+        self.rollup_collection_name = ROLLUP_COLLECTION
     
     async def add_usage_record(self, record: UsageRecord) -> bool:
-        """添加使用记录"""
+        """添加使用记录（同时以 $inc upsert 更新小时/日汇总）"""
         try:
             db = get_mongo_db()
             collection = db[self.collection_name]
 
             record_dict = record.model_dump(exclude={"id"})
-            result = await collection.insert_one(record_dict)
+            inserted = await collection.insert_one(record_dict)
+
+            accumulator = RollupAccumulator()
+            accumulator.add(record_dict)
+            ops = [UpdateOne(f, u, upsert=True) for f, u in accumulator.drain()]
+            if ops:
+                await db[self.rollup_collection_name].bulk_write(ops, ordered=False)
+            # 汇总累加成功后才标记原始记录；汇总失败时记录保持未标记，由历史回填计入
+            await collection.update_one({"_id": inserted.inserted_id}, {"$set": {ROLLED_UP_FIELD: True}})
 
             logger.info(f"✅ 添加使用记录成功: {record.provider}/{record.model_name}")
             return True
@@ -82,105 +106,20 @@ class UsageStatisticsService:
         provider: Optional[str] = None,
         model_name: Optional[str] = None
     ) -> UsageStatistics:
-        """获取使用统计"""
+        """获取使用统计（读取小时/日汇总，查询量与天数成正比）"""
         try:
             db = get_mongo_db()
-            collection = db[self.collection_name]
-            
+
             # 计算时间范围
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
-            
-            # 构建查询条件
-            query = {
-                "timestamp": {
-                    "$gte": start_date.isoformat(),
-                    "$lte": end_date.isoformat()
-                }
-            }
-            if provider:
-                query["provider"] = provider
-            if model_name:
-                query["model_name"] = model_name
-            
-            # 获取所有记录
-            cursor = collection.find(query)
-            records = []
-            async for doc in cursor:
-                records.append(doc)
-            
-            # 统计数据
-            stats = UsageStatistics()
-            stats.total_requests = len(records)
-
-            # 按货币统计成本
-            cost_by_currency = defaultdict(float)
-
-            by_provider = defaultdict(lambda: {
-                "requests": 0,
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "cost": 0.0,
-                "cost_by_currency": defaultdict(float)
-            })
-            by_model = defaultdict(lambda: {
-                "requests": 0,
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "cost": 0.0,
-                "cost_by_currency": defaultdict(float)
-            })
-            by_date = defaultdict(lambda: {
-                "requests": 0,
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "cost": 0.0,
-                "cost_by_currency": defaultdict(float)
-            })
 
-            for record in records:
-                cost = record.get("cost", 0.0)
-                currency = record.get("currency", "CNY")
-
-                # 总计
-                stats.total_input_tokens += record.get("input_tokens", 0)
-                stats.total_output_tokens += record.get("output_tokens", 0)
-                stats.total_cost += cost  # 保留向后兼容
-                cost_by_currency[currency] += cost
-
-                # 按供应商统计
-                provider_key = record.get("provider", "unknown")
-                by_provider[provider_key]["requests"] += 1
-                by_provider[provider_key]["input_tokens"] += record.get("input_tokens", 0)
-                by_provider[provider_key]["output_tokens"] += record.get("output_tokens", 0)
-                by_provider[provider_key]["cost"] += cost
-                by_provider[provider_key]["cost_by_currency"][currency] += cost
-
-                # 按模型统计
-                model_key = f"{record.get('provider', 'unknown')}/{record.get('model_name', 'unknown')}"
-                by_model[model_key]["requests"] += 1
-                by_model[model_key]["input_tokens"] += record.get("input_tokens", 0)
-                by_model[model_key]["output_tokens"] += record.get("output_tokens", 0)
-                by_model[model_key]["cost"] += cost
-                by_model[model_key]["cost_by_currency"][currency] += cost
-
-                # 按日期统计
-                timestamp = record.get("timestamp", "")
-                if timestamp:
-                    date_key = timestamp[:10]  # YYYY-MM-DD
-                    by_date[date_key]["requests"] += 1
-                    by_date[date_key]["input_tokens"] += record.get("input_tokens", 0)
-                    by_date[date_key]["output_tokens"] += record.get("output_tokens", 0)
-                    by_date[date_key]["cost"] += cost
-                    by_date[date_key]["cost_by_currency"][currency] += cost
-
-            # 转换 defaultdict 为普通 dict（包括嵌套的 cost_by_currency）
-            stats.cost_by_currency = dict(cost_by_currency)
-            stats.by_provider = {k: {**v, "cost_by_currency": dict(v["cost_by_currency"])} for k, v in by_provider.items()}
-            stats.by_model = {k: {**v, "cost_by_currency": dict(v["cost_by_currency"])} for k, v in by_model.items()}
-            stats.by_date = {k: {**v, "cost_by_currency": dict(v["cost_by_currency"])} for k, v in by_date.items()}
-            
-            logger.info(f"✅ 获取使用统计成功: {stats.total_requests} 条记录")
+            query = rollup_window_query(start_date, end_date, provider=provider, model_name=model_name)
+            docs = await db[self.rollup_collection_name].find(query, {"_id": 0}).to_list(length=None)
+            summary = summarize_rollups(docs)
+
+            stats = UsageStatistics(**summary)
+            logger.info(f"✅ 获取使用统计成功: {stats.total_requests} 条记录（{len(docs)} 个汇总文档）")
             return stats
         except Exception as e:
             logger.error(f"❌ 获取使用统计失败: {e}")
@@ -224,6 +163,10 @@ class UsageStatisticsService:
                 "timestamp": {"$lt": cutoff_date.isoformat()}
             })
             
+            await db[self.rollup_collection_name].delete_many({
+                "bucket": {"$lt": cutoff_date.strftime("%Y-%m-%d")}
+            })
+
             deleted_count = result.deleted_count
             logger.info(f"✅ 删除旧记录成功: {deleted_count} 条")
             return deleted_count
@@ -232,6 +175,57 @@ class UsageStatisticsService:
             return 0
 
 
+    async def ensure_rollups(self, batch_size: int = 5000) -> int:
+        """
+        创建汇总索引；由尚未汇总的历史原始记录生成汇总
+
+        回填前以条件 upsert 认领标记文档，与其他 app 副本及 tradingagents MongoDBStorage 互斥，
+        只有认领成功的一方执行回填；回填失败时释放标记，崩溃遗留的超时标记可被重新认领
+
+        Returns:
+            写入的汇总文档数量
+        """
+        db = get_mongo_db()
+        rollups = db[self.rollup_collection_name]
+        try:
+            await rollups.create_index(
+                [("granularity", 1), ("bucket", 1), ("provider", 1),
+                 ("model_name", 1), ("user_id", 1), ("currency", 1)],
+                unique=True, name="rollup_key",
+            )
+            owner = backfill_owner("app")
+            try:
+                result = await rollups.update_one(*backfill_claim(owner), upsert=True)
+            except DuplicateKeyError:
+                return 0
+            if not backfill_claimed(result):
+                return 0
+        except Exception as e:
+            logger.warning(f"⚠️ 认领使用汇总回填失败（忽略）: {e}")
+            return 0
+
+        try:
+            accumulator = RollupAccumulator()
+            projection = {"_id": 0, "timestamp": 1, "provider": 1, "model_name": 1,
+                          "user_id": 1, "currency": 1, "input_tokens": 1, "output_tokens": 1, "cost": 1}
+            cursor = db[self.collection_name].find(BACKFILL_SOURCE_QUERY, projection).batch_size(batch_size)
+            async for doc in cursor:
+                accumulator.add(doc)
+            ops = [UpdateOne(f, u, upsert=True) for f, u in accumulator.drain()]
+            if ops:
+                await rollups.bulk_write(ops, ordered=False)
+                logger.info(f"✅ 已由历史使用记录生成 {len(ops)} 个汇总文档")
+            await rollups.update_one(*backfill_done(len(ops)))
+            return len(ops)
+        except Exception as e:
+            logger.warning(f"⚠️ 生成使用汇总失败（忽略）: {e}")
+            try:
+                await rollups.delete_one(backfill_release(owner))
+            except Exception as release_error:
+                logger.warning(f"⚠️ 释放使用汇总回填标记失败: {release_error}")
+            return 0
+
+
 # 创建全局实例
 usage_statistics_service = UsageStatisticsService()
 
@@ -64,6 +64,11 @@ except Exception as e:
 class ReportExporter:
     """报告导出器 - 支持 Markdown、Word、PDF 格式"""
 
+    # 模板版本：修改 Markdown 结构、HTML 样式或 pandoc/pdfkit 参数时递增，使导出缓存失效
+    TEMPLATE_VERSION = "1"
+    # 参与渲染的报告字段（导出缓存按这些字段计算内容哈希）
+    RENDER_FIELDS = ("stock_symbol", "analysis_date", "analysts", "research_depth", "reports", "summary")
+
     def __init__(self):
         self.export_available = EXPORT_AVAILABLE
         self.pandoc_available = PANDOC_AVAILABLE
@@ -1,2 +1,24 @@
-"""Worker package for analysis and related background jobs."""
+"""Worker package for analysis and related background jobs.
 
+数据源同步服务的延迟入口：路由从这里引用服务工厂，首次调用时才导入对应同步服务
+（连带 tushare/akshare/baostock SDK），API 进程启动时不再加载这些模块。
+"""
+
+from tradingagents.utils.lazy_import import lazy_callable
+
+# Tushare
+get_tushare_sync_service = lazy_callable("app.worker.tushare_sync_service:get_tushare_sync_service")
+get_tushare_init_service = lazy_callable("app.worker.tushare_init_service:get_tushare_init_service")
+
+# AKShare
+get_akshare_sync_service = lazy_callable("app.worker.akshare_sync_service:get_akshare_sync_service")
+get_akshare_init_service = lazy_callable("app.worker.akshare_init_service:get_akshare_init_service")
+
+# BaoStock
+BaoStockSyncService = lazy_callable("app.worker.baostock_sync_service:BaoStockSyncService")
+BaoStockInitService = lazy_callable("app.worker.baostock_init_service:BaoStockInitService")
+
+# 多数据源
+get_multi_period_sync_service = lazy_callable("app.worker.multi_period_sync_service:get_multi_period_sync_service")
+get_financial_sync_service = lazy_callable("app.worker.financial_data_sync_service:get_financial_sync_service")
+get_news_data_sync_service = lazy_callable("app.worker.news_data_sync_service:get_news_data_sync_service")
@@ -751,12 +751,13 @@ class AKShareSyncService:
             # 出错时返回30天前，确保不漏数据
             return (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
 
-    async def sync_financial_data(self, symbols: List[str] = None) -> Dict[str, Any]:
+    async def sync_financial_data(self, symbols: List[str] = None, incremental: Optional[bool] = None) -> Dict[str, Any]:
         """
         同步财务数据
 
         Args:
             symbols: 指定股票代码列表
+            incremental: 是否按报告期跳过没有新报告的股票；None 表示同步全部股票时启用、指定股票时不启用
 
         Returns:
             同步结果统计
@@ -770,9 +771,13 @@ class AKShareSyncService:
             "start_time": datetime.utcnow(),
             "end_time": None,
             "duration": 0,
+            "skipped_count": 0,
             "errors": []
         }
 
+        if incremental is None:
+            incremental = symbols is None
+
         try:
             # 1. 确定要同步的股票列表
             if symbols is None:
@@ -794,6 +799,13 @@ class AKShareSyncService:
                 return stats
 
             stats["total_processed"] = len(symbols)
+
+            # 报告期过滤：跳过没有新报告期的股票
+            if incremental:
+                from app.services.financial_report_calendar import get_financial_report_calendar
+                symbols, skipped = await get_financial_report_calendar().select_symbols_to_sync(symbols, "akshare")
+                stats["skipped_count"] = len(skipped)
+
             logger.info(f"📊 准备同步 {len(symbols)} 只股票的财务数据")
 
             # 2. 批量处理
@@ -823,6 +835,7 @@ class AKShareSyncService:
             logger.info(f"📊 总计: {stats['total_processed']}只股票, "
                        f"成功: {stats['success_count']}, "
                        f"错误: {stats['error_count']}, "
+                       f"跳过: {stats['skipped_count']}, "
                        f"耗时: {stats['duration']:.2f}秒")
 
             return stats
@@ -7,6 +7,7 @@ import asyncio
 import logging
 import signal
 import sys
+import time
 import uuid
 import traceback
 from datetime import datetime
@@ -19,12 +20,15 @@ sys.path.insert(0, str(project_root))
 
 from app.services.queue_service import get_queue_service
 from app.services.analysis_service import get_analysis_service
+from app.services.backtest.jobs import TASK_TYPE as BACKTEST_TASK_TYPE, execute_backtest_job, shutdown_backtest_job_runner
 from app.core.database import init_database, close_database
 from app.core.redis_client import init_redis, close_redis
 from app.core.config import settings
 from app.models.analysis import AnalysisTask, AnalysisParameters
 from app.services.config_provider import provider as config_provider
 from app.services.queue import DEFAULT_USER_CONCURRENT_LIMIT, GLOBAL_CONCURRENT_LIMIT, VISIBILITY_TIMEOUT_SECONDS
+from app.services.analysis_profiler import profile_analysis
+from tradingagents.utils.metrics import record_task_duration, start_metrics_server
 
 logger = logging.getLogger(__name__)
 
@@ -140,6 +144,9 @@ class AnalysisWorker:
 
         self.current_task = task_id
         success = False
+        task_kind = "queue_analysis"
+        started = time.perf_counter()
+        profile = None
 
         try:
             # 构建分析任务对象
@@ -148,6 +155,14 @@ class AnalysisWorker:
                 import json
                 parameters_dict = json.loads(parameters_dict)
 
+            # 回测稳健性任务（walk-forward / 蒙特卡洛）
+            if parameters_dict.get("task_type") == BACKTEST_TASK_TYPE:
+                task_kind = "backtest"
+                await execute_backtest_job(task_id, parameters_dict, user_id=user_id)
+                success = True
+                logger.info(f"✅ 回测任务完成: {task_id}")
+                return
+
             parameters = AnalysisParameters(**parameters_dict)
 
             task = AnalysisTask(
@@ -158,11 +173,14 @@ class AnalysisWorker:
                 parameters=parameters
             )
 
-            # 执行分析
-            result = await get_analysis_service().execute_analysis_task(
-                task,
-                progress_callback=self._progress_callback
-            )
+            # 执行分析（命中剖析策略时采样事件循环线程）
+            with profile_analysis(
+                task_id, parameters.enable_profiling, user_id=user_id, source="worker", stock_code=stock_code
+            ) as profile:
+                result = await get_analysis_service().execute_analysis_task(
+                    task,
+                    progress_callback=self._progress_callback
+                )
 
             success = True
             logger.info(f"✅ 任务完成: {task_id} - 耗时: {result.execution_time:.2f}秒")
@@ -172,6 +190,11 @@ class AnalysisWorker:
             logger.error(traceback.format_exc())
 
         finally:
+            record_task_duration(task_kind, "completed" if success else "failed", time.perf_counter() - started)
+
+            if profile:
+                await self._save_profile_ref(task_id, profile)
+
             # 确认任务完成
             try:
                 await self.queue_service.ack_task(task_id, success)
@@ -180,6 +203,17 @@ class AnalysisWorker:
 
             self.current_task = None
 
+    async def _save_profile_ref(self, task_id: str, profile: Dict[str, Any]):
+        """把剖析摘要写入任务文档的 performance_metrics.profile"""
+        try:
+            from app.core.database import get_mongo_db
+            await get_mongo_db().analysis_tasks.update_one(
+                {"task_id": task_id},
+                {"$set": {"performance_metrics.profile": profile}}
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 保存剖析摘要失败: {task_id} - {e}")
+
     def _progress_callback(self, progress: int, message: str):
         """进度回调函数"""
         logger.debug(f"任务进度 {self.current_task}: {progress}% - {message}")
@@ -231,6 +265,9 @@ class AnalysisWorker:
         """清理资源"""
         logger.info(f"🧹 清理Worker资源: {self.worker_id}")
 
+        # 关闭回测进程池
+        shutdown_backtest_job_runner()
+
         try:
             # 清理心跳记录
             from app.core.redis_client import get_redis_service
@@ -256,6 +293,10 @@ async def main():
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
 
+    # Worker 不提供 HTTP 接口：独立线程暴露任务耗时、LLM、数据源与缓存指标
+    if settings.METRICS_ENABLED:
+        start_metrics_server(settings.WORKER_METRICS_PORT, settings.METRICS_HOST)
+
     # 创建并启动Worker
     worker = AnalysisWorker()
 
@@ -11,6 +11,7 @@ from dataclasses import dataclass, field
 
 from app.core.database import get_mongo_db
 from app.services.financial_data_service import get_financial_data_service
+from app.services.financial_report_calendar import get_financial_report_calendar
 from tradingagents.dataflows.providers.china.tushare import get_tushare_provider
 from tradingagents.dataflows.providers.china.akshare import get_akshare_provider
 from tradingagents.dataflows.providers.china.baostock import get_baostock_provider
@@ -78,7 +79,8 @@ class FinancialDataSyncService:
         data_sources: List[str] = None,
         report_types: List[str] = None,
         batch_size: int = 50,
-        delay_seconds: float = 1.0
+        delay_seconds: float = 1.0,
+        incremental: Optional[bool] = None
     ) -> Dict[str, FinancialSyncStats]:
         """
         同步财务数据
@@ -89,6 +91,7 @@ class FinancialDataSyncService:
             report_types: 报告类型列表 ["quarterly", "annual"]
             batch_size: 批处理大小
             delay_seconds: API调用延迟
+            incremental: 是否按报告期跳过没有新报告的股票；None 表示同步全部股票时启用、指定股票时不启用
             
         Returns:
             各数据源的同步统计结果
@@ -104,6 +107,9 @@ class FinancialDataSyncService:
         
         logger.info(f"🔄 开始财务数据同步: 数据源={data_sources}, 报告类型={report_types}")
         
+        if incremental is None:
+            incremental = symbols is None
+
         # 获取股票列表
         if symbols is None:
             symbols = await self._get_stock_symbols()
@@ -129,7 +135,8 @@ class FinancialDataSyncService:
                 symbols=symbols,
                 report_types=report_types,
                 batch_size=batch_size,
-                delay_seconds=delay_seconds
+                delay_seconds=delay_seconds,
+                incremental=incremental
             )
             
             results[data_source] = stats
@@ -146,7 +153,8 @@ class FinancialDataSyncService:
         symbols: List[str],
         report_types: List[str],
         batch_size: int,
-        delay_seconds: float
+        delay_seconds: float,
+        incremental: bool = False
     ) -> FinancialSyncStats:
         """同步单个数据源的财务数据"""
         stats = FinancialSyncStats()
@@ -161,6 +169,11 @@ class FinancialDataSyncService:
             stats.skipped_count = len(symbols)
             stats.end_time = datetime.now(timezone.utc)
             return stats
+
+        # 报告期过滤：跳过没有新报告期的股票
+        if incremental:
+            symbols, skipped = await get_financial_report_calendar().select_symbols_to_sync(symbols, data_source)
+            stats.skipped_count += len(skipped)
         
         # 批量处理股票
         for i in range(0, len(symbols), batch_size):
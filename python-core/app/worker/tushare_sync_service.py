@@ -13,7 +13,7 @@ from app.services.historical_data_service import get_historical_data_service
 from app.services.news_data_service import get_news_data_service
 from app.core.database import get_mongo_db
 from app.core.config import settings
-from app.core.rate_limiter import get_tushare_rate_limiter
+from app.core.rate_limiter import get_tushare_rate_limiter, RatePriority
 from app.utils.timezone import now_tz
 
 logger = logging.getLogger(__name__)
@@ -637,7 +637,7 @@ class TushareSyncService:
                         break
 
                     # 速率限制
-                    await self.rate_limiter.acquire()
+                    await self.rate_limiter.acquire(priority=RatePriority.BULK)
 
                     # 确定该股票的起始日期
                     symbol_start_date = start_date
@@ -877,7 +877,7 @@ class TushareSyncService:
             for i, symbol in enumerate(symbols):
                 try:
                     # 速率限制
-                    await self.rate_limiter.acquire()
+                    await self.rate_limiter.acquire(priority=RatePriority.BULK)
 
                     # 获取财务数据（指定获取期数）
                     financial_data = await self.provider.get_financial_data(symbol, limit=limit)
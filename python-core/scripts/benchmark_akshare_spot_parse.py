@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+全市场快照解析微基准
+对比 AKShareProvider._parse_spot_quotes（按列转换）与原先 iterrows + 逐格转换的耗时
+
+用法:
+    python scripts/benchmark_akshare_spot_parse.py [--rows 5500] [--repeat 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tradingagents.dataflows.providers.china.akshare import AKShareProvider
+
+
+def build_snapshot(rows: int) -> pd.DataFrame:
+    """构造与 stock_zh_a_spot 结构一致的模拟快照（含少量非法值）"""
+    rng = np.random.default_rng(42)
+    prefixes = np.array(["sh", "sz", "bj"])[rng.integers(0, 3, rows)]
+    codes = [f"{p}{i:06d}" for p, i in zip(prefixes, range(rows))]
+    df = pd.DataFrame({
+        "代码": codes,
+        "名称": [f"股票{i}" for i in range(rows)],
+        "最新价": rng.uniform(1, 200, rows),
+        "涨跌额": rng.normal(0, 1, rows),
+        "涨跌幅": rng.normal(0, 2, rows),
+        "成交量": rng.integers(0, 10**8, rows).astype(float),
+        "成交额": rng.uniform(0, 1e10, rows),
+        "今开": rng.uniform(1, 200, rows),
+        "最高": rng.uniform(1, 200, rows),
+        "最低": rng.uniform(1, 200, rows),
+        "昨收": rng.uniform(1, 200, rows),
+        "换手率": rng.uniform(0, 20, rows),
+        "量比": rng.uniform(0, 5, rows),
+        "市盈率-动态": rng.uniform(-50, 200, rows),
+        "市净率": rng.uniform(0, 20, rows),
+        "总市值": rng.uniform(1e9, 1e12, rows),
+        "流通市值": rng.uniform(1e9, 1e12, rows),
+    }).astype({"最新价": object})
+    # 停牌股票的最新价为 "-"
+    df.loc[df.sample(frac=0.02, random_state=1).index, "最新价"] = "-"
+    return df
+
+
+def parse_iterrows(provider: AKShareProvider, spot_df: pd.DataFrame, codes):
+    """原实现：iterrows + _safe_float/_safe_int（仅保留数值转换部分作为对照）"""
+    code_mapping = {}
+    for code in codes:
+        code_mapping[code] = code
+        for prefix in ['sh', 'sz', 'bj']:
+            code_mapping[f"{prefix}{code}"] = code
+    quotes_map = {}
+    for _, row in spot_df.iterrows():
+        matched_code = code_mapping.get(str(row.get("代码", "")))
+        if not matched_code:
+            continue
+        quote = {"name": str(row.get("名称", f"股票{matched_code}")),
+                 "volume": provider._safe_int(row.get("成交量", 0))}
+        for field, column in AKShareProvider.SPOT_FLOAT_COLUMNS.items():
+            quote[field] = provider._safe_float(row.get(column, None))
+        quote["full_symbol"] = provider._get_full_symbol(matched_code)
+        quote["market_info"] = provider._get_market_info(matched_code)
+        quotes_map[matched_code] = quote
+    return quotes_map
+
+
+def timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全市场快照解析微基准")
+    parser.add_argument("--rows", type=int, default=5500, help="快照行数")
+    parser.add_argument("--repeat", type=int, default=20, help="重复次数（取最快一次）")
+    args = parser.parse_args()
+
+    provider = object.__new__(AKShareProvider)
+    spot_df = build_snapshot(args.rows)
+    codes = [c[2:] for c in spot_df["代码"]]
+
+    vectorized = timeit(lambda: provider._parse_spot_quotes(spot_df, codes), args.repeat)
+    legacy = timeit(lambda: parse_iterrows(provider, spot_df, codes), max(1, args.repeat // 4))
+
+    print(f"快照行数: {args.rows}")
+    print(f"iterrows 逐格转换: {legacy * 1000:.1f} ms/次")
+    print(f"按列转换:          {vectorized * 1000:.1f} ms/次")
+    print(f"加速比:            {legacy / vectorized:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+回测参数网格微基准
+在模拟行情上测量 run_grid 对数百个参数组合的整体耗时
+
+用法:
+    python scripts/benchmark_backtest_grid.py [--days 750] [--symbols 10] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.backtest.engine import expand_grid, get_strategy, run_grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回测参数网格微基准")
+    parser.add_argument("--days", type=int, default=750, help="交易日数量")
+    parser.add_argument("--symbols", type=int, default=10, help="组合股票数量")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数（取最快一次）")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    prices = 10 * np.cumprod(1 + rng.normal(0, 0.02, (args.days, args.symbols)), axis=0)
+
+    cases = {
+        "ma_cross": {"fast": list(range(3, 31)), "slow": list(range(10, 121, 5))},
+        "momentum": {"lookback": list(range(5, 125, 5)), "threshold": [0.0, 0.02, 0.05, 0.1, 0.15]},
+        "rsi": {"window": [6, 9, 14, 21, 28], "lower": [15, 20, 25, 30, 35], "upper": [65, 70, 75, 80, 85]},
+    }
+    print(f"模拟行情: {args.days} 日 × {args.symbols} 只股票")
+    for name, params in cases.items():
+        strategy = get_strategy(name)
+        combos = expand_grid(strategy, params)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            run_grid(prices, strategy, combos, fee_rate=0.0005, keep_top=10)
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:<10} {len(combos):>4} 组参数: {best:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
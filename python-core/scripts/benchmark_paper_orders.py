@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+纸上交易撮合引擎并发基准
+同一用户并发提交市价买单，测量吞吐（orders/sec），并校验资金不透支、成交笔数与可用资金一致
+
+需要可用的 MongoDB（读取 .env / 环境变量中的 MONGODB_* 配置），数据写入独立的基准库，结束后删除
+
+用法:
+    python scripts/benchmark_paper_orders.py [--orders 2000] [--concurrency 64] [--affordable 1500]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.services.paper_order_engine import OrderRejected, PaperOrderEngine
+
+PRICE = 10.0
+QTY = 100
+
+
+class _FixedPricing:
+    """固定价格（基准只测成交路径，不访问行情）"""
+
+    async def get_price(self, code, market):
+        return PRICE
+
+    async def get_prices(self, items):
+        return {(market, code): PRICE for code, market in items}
+
+
+async def run(args):
+    client = AsyncIOMotorClient(settings.MONGO_URI, maxPoolSize=max(args.concurrency, 10))
+    db = client[args.database]
+    await client.drop_database(args.database)
+    engine = PaperOrderEngine(db=db, pricing=_FixedPricing())
+    await engine.ensure_indexes()
+
+    user_id = "bench-user"
+    await engine.get_or_create_account(user_id)
+    # 资金恰好够成交 affordable 笔，其余必须被拒绝
+    await db["paper_accounts"].update_one({"user_id": user_id}, {"$set": {"cash.CNY": PRICE * QTY * args.affordable}})
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    outcome = {"filled": 0, "rejected": 0}
+
+    async def _order(i):
+        async with semaphore:
+            try:
+                await engine.submit_order(user_id, f"{600000 + i % args.symbols}", "CN", "buy", QTY)
+                outcome["filled"] += 1
+            except OrderRejected:
+                outcome["rejected"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_order(i) for i in range(args.orders)))
+    elapsed = time.perf_counter() - start
+
+    acc = await db["paper_accounts"].find_one({"user_id": user_id})
+    held = sum(p["quantity"] for p in await db["paper_positions"].find({"user_id": user_id}).to_list(None))
+    trades = await db["paper_trades"].count_documents({"user_id": user_id})
+
+    print(f"订单: {args.orders} 笔, 并发: {args.concurrency}, 股票: {args.symbols} 只")
+    print(f"耗时: {elapsed:.2f}s, 吞吐: {args.orders / elapsed:.0f} orders/sec")
+    print(f"成交: {outcome['filled']}, 拒绝: {outcome['rejected']}, 成交记录: {trades}")
+    print(f"剩余资金: {acc['cash']['CNY']:.2f}, 持仓股数: {held}")
+
+    expected = min(args.orders, args.affordable)
+    ok = (outcome["filled"] == expected == trades and acc["cash"]["CNY"] >= 0
+          and held == expected * QTY)
+    print("✅ 资金与持仓一致，无透支" if ok else "❌ 校验失败")
+
+    if not args.keep:
+        await client.drop_database(args.database)
+    client.close()
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="纸上交易撮合引擎并发基准")
+    parser.add_argument("--orders", type=int, default=2000, help="订单总数")
+    parser.add_argument("--concurrency", type=int, default=64, help="并发下单数")
+    parser.add_argument("--affordable", type=int, default=1500, help="初始资金可成交的订单数")
+    parser.add_argument("--symbols", type=int, default=20, help="涉及的股票数量")
+    parser.add_argument("--database", default=f"{settings.MONGODB_DATABASE}_paper_bench", help="基准使用的数据库")
+    parser.add_argument("--keep", action="store_true", help="保留基准数据")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
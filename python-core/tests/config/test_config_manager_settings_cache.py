@@ -0,0 +1,51 @@
+import importlib
+import json
+import os
+
+# 包级别导出了同名实例 config_manager，需直接取子模块
+cm = importlib.import_module("tradingagents.config.config_manager")
+
+
+def _manager(tmp_path, monkeypatch):
+    monkeypatch.setenv("USE_MONGODB_STORAGE", "false")
+    monkeypatch.setattr(cm, "SETTINGS_CHECK_INTERVAL", 0.0)
+    return cm.ConfigManager(str(tmp_path))
+
+
+def test_load_settings_returns_copy_and_reuses_snapshot(tmp_path, monkeypatch):
+    manager = _manager(tmp_path, monkeypatch)
+    generation = manager.settings_generation
+
+    settings = manager.load_settings()
+    settings["default_model"] = "changed"
+
+    assert manager.get_setting("default_model") != "changed"
+    assert manager.settings_generation == generation
+
+
+def test_save_settings_and_file_change_invalidate_snapshot(tmp_path, monkeypatch):
+    manager = _manager(tmp_path, monkeypatch)
+
+    settings = manager.load_settings()
+    settings["cost_alert_threshold"] = 5.0
+    generation = manager.settings_generation
+    manager.save_settings(settings)
+    assert manager.get_setting("cost_alert_threshold") == 5.0
+    assert manager.settings_generation == generation + 1
+
+    # 外部修改文件（mtime 变化）后自动重新加载
+    path = tmp_path / "settings.json"
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["cost_alert_threshold"] = 7.0
+    path.write_text(json.dumps(data), encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert manager.get_setting("cost_alert_threshold") == 7.0
+
+
+def test_env_override_change_reloads(tmp_path, monkeypatch):
+    manager = _manager(tmp_path, monkeypatch)
+    monkeypatch.setenv("TRADINGAGENTS_LOG_LEVEL", "DEBUG")
+    assert manager.get_setting("log_level") == "DEBUG"
+    monkeypatch.setenv("TRADINGAGENTS_LOG_LEVEL", "WARNING")
+    assert manager.get_setting("log_level") == "WARNING"
@@ -29,8 +29,9 @@ json = true
 
     # Assert: console handler uses SimpleJsonFormatter
     logger = logging.getLogger("webapi")
-    # find console handler
-    console_handlers = [h for h in logger.handlers if isinstance(h, logging.StreamHandler)]
+    # find console handler (handlers may be moved behind the async queue handler)
+    handlers = [t for h in logger.handlers for t in getattr(h, "targets", [h])]
+    console_handlers = [h for h in handlers if isinstance(h, logging.StreamHandler)]
     assert console_handlers, "no console handler found"
     formatter_names = {h.formatter.__class__.__name__ for h in console_handlers if h.formatter}
     assert "SimpleJsonFormatter" in formatter_names
@@ -0,0 +1,68 @@
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.core.process_role import get_process_role, runs_scheduler, serves_http
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# 冷启动不应加载的重量级模块（数据源 SDK、分析图与 LLM SDK）
+HEAVY_MODULES = (
+    "akshare",
+    "tushare",
+    "baostock",
+    "yfinance",
+    "tradingagents.graph.trading_graph",
+    "tradingagents.dataflows.interface",
+    "langchain_openai",
+)
+# 累计导入耗时上限（秒）：延迟导入前 app.main 约 16s（含导入期连接 MongoDB 超时），api 约 5s
+IMPORT_BUDGET_SECONDS = {"app.main": 6.0, "api": 4.0}
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def _importtime(module):
+    """用 -X importtime 在子进程中导入模块，返回 {模块名: 累计微秒}"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=300,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    return cumulative
+
+
+@pytest.mark.parametrize("module", ["app.main", "api"])
+def test_cold_import_skips_heavy_modules(module):
+    cumulative = _importtime(module)
+    loaded = [name for name in HEAVY_MODULES if name in cumulative]
+    assert not loaded, f"{module} 导入时加载了: {loaded}"
+    assert cumulative[module] / 1e6 < IMPORT_BUDGET_SECONDS[module]
+
+
+def test_lazy_provider_exports_resolve_on_access():
+    import tradingagents.dataflows.providers.china as china
+
+    assert "AKShareProvider" in dir(china)
+    assert china.AKSHARE_AVAILABLE is (china.AKShareProvider is not None)
+    assert "AKShareProvider" in vars(china)  # 解析后写回包命名空间
+    with pytest.raises(AttributeError):
+        china.NoSuchProvider
+
+
+def test_process_roles():
+    assert get_process_role(" API ") == "api"
+    assert serves_http("all") and runs_scheduler("all")
+    assert serves_http("api") and not runs_scheduler("api")
+    assert runs_scheduler("scheduler") and not serves_http("scheduler")
+    assert not serves_http("worker") and not runs_scheduler("worker")
+    with pytest.raises(ValueError):
+        get_process_role("web")
@@ -0,0 +1,88 @@
+import asyncio
+
+
+def test_distributed_limiter_falls_back_to_local_window(monkeypatch):
+    import app.core.database as db_mod
+    from app.core.rate_limiter import AKShareRateLimiter, RatePriority
+
+    def _no_redis():
+        raise RuntimeError("Redis客户端未初始化")
+
+    monkeypatch.setattr(db_mod, "get_redis_client", _no_redis, raising=True)
+
+    limiter = AKShareRateLimiter(max_calls=2, time_window=0.2)
+
+    async def _run():
+        await limiter.acquire(priority=RatePriority.INTERACTIVE)
+        await limiter.acquire(priority=RatePriority.BULK)
+        await limiter.acquire(priority=RatePriority.BULK)
+
+    asyncio.run(_run())
+
+    stats = limiter.get_stats()
+    assert stats["total_calls"] == 3
+    assert stats["redis_fallbacks"] == 3
+    assert stats["priorities"]["interactive"]["calls"] == 1
+    assert stats["priorities"]["bulk"]["calls"] == 2
+    # 第三次调用必须等待窗口释放
+    assert stats["priorities"]["bulk"]["max_wait"] > 0.1
+
+
+def test_distributed_limiter_bulk_respects_reserve(monkeypatch):
+    from app.core.rate_limiter import DistributedRateLimiter, RatePriority
+
+    limiter = DistributedRateLimiter(max_calls=100, time_window=60, name="t")
+    assert limiter._reserve_tokens(RatePriority.INTERACTIVE) == 0
+    assert limiter._reserve_tokens(RatePriority.BULK) > limiter._reserve_tokens(RatePriority.NORMAL)
+
+
+def test_redis_failure_backs_off_to_local_limiter(monkeypatch):
+    import app.core.database as db_mod
+    from app.core.rate_limiter import AKShareRateLimiter, RatePriority
+
+    attempts = []
+
+    def _no_redis():
+        attempts.append(1)
+        raise RuntimeError("Redis连接超时")
+
+    monkeypatch.setattr(db_mod, "get_redis_client_sync", _no_redis, raising=True)
+
+    limiter = AKShareRateLimiter(max_calls=100, time_window=60)
+    for _ in range(5):
+        limiter.acquire_sync(priority=RatePriority.INTERACTIVE)
+
+    # 首次失败后进入退避期，后续调用不再尝试 Redis
+    assert len(attempts) == 1
+    assert limiter.get_stats()["redis_fallbacks"] == 5
+
+    limiter._redis_retry_at = 0.0
+    limiter.acquire_sync(priority=RatePriority.INTERACTIVE)
+    assert len(attempts) == 2
+
+
+def test_unified_fetch_charges_resolved_provider_bucket(monkeypatch):
+    from app.core import rate_limiter
+    from tradingagents.dataflows import data_source_manager
+
+    charged = []
+
+    class _Limiter:
+        def __init__(self, name):
+            self.name = name
+
+        def acquire_sync(self, priority):
+            charged.append((self.name, priority))
+
+    monkeypatch.setattr(rate_limiter, "get_tushare_rate_limiter", lambda **_: _Limiter("tushare"))
+    monkeypatch.setattr(rate_limiter, "get_akshare_rate_limiter", lambda: _Limiter("akshare"))
+    monkeypatch.setattr(rate_limiter, "get_baostock_rate_limiter", lambda: _Limiter("baostock"))
+
+    data_source_manager._acquire_source_rate_limit("akshare")
+    data_source_manager._acquire_source_rate_limit("baostock")
+    data_source_manager._acquire_source_rate_limit("mongodb")
+
+    assert charged == [
+        ("akshare", rate_limiter.RatePriority.INTERACTIVE),
+        ("baostock", rate_limiter.RatePriority.INTERACTIVE),
+    ]
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from tradingagents.dataflows.providers.china.akshare import AKShareProvider
+
+
+def _provider():
+    # 跳过 __init__，避免初始化 akshare 连接
+    return object.__new__(AKShareProvider)
+
+
+def test_parse_spot_quotes_matches_prefixed_codes_and_coerces_values():
+    spot_df = pd.DataFrame({
+        "代码": ["sh600000", "sz000001", "bj830799", "sh600519"],
+        "名称": ["浦发银行", "平安银行", "艾融软件", "贵州茅台"],
+        "最新价": [9.8, "10.5", "-", None],
+        "成交量": [123456.0, 2000.9, None, 1.0],
+        "成交额": [1.2e8, 3.4e8, 0, 5.6e9],
+        "总市值": [2.9e11, None, 1.0e9, 2.1e12],
+    })
+
+    quotes = _provider()._parse_spot_quotes(spot_df, ["600000", "000001", "830799"])
+
+    assert set(quotes) == {"600000", "000001", "830799"}
+    assert quotes["600000"]["price"] == 9.8
+    assert quotes["600000"]["volume"] == 123456
+    assert quotes["600000"]["total_mv"] == 2900.0
+    assert quotes["600000"]["full_symbol"] == "600000.SS"
+    assert quotes["000001"]["price"] == 10.5
+    assert quotes["000001"]["volume"] == 2000
+    assert quotes["000001"]["total_mv"] is None
+    # 非法值/缺失值按 0 处理，缺失的列同样为 0
+    assert quotes["830799"]["price"] == 0.0
+    assert quotes["830799"]["volume"] == 0
+    assert quotes["830799"]["pe"] == 0.0
+    assert isinstance(quotes["600000"]["amount"], float)
+
+
+def test_parse_spot_quotes_prefers_exact_code_match():
+    spot_df = pd.DataFrame({"代码": ["600000", "sh600036"], "最新价": [9.8, 40.1]})
+    quotes = _provider()._parse_spot_quotes(spot_df, ["600000", "sh600036"])
+    assert set(quotes) == {"600000", "sh600036"}
+    assert quotes["600000"]["name"] == "股票600000"
+    assert quotes["sh600036"]["price"] == 40.1
+
+
+def test_parse_spot_quotes_without_code_column():
+    assert _provider()._parse_spot_quotes(pd.DataFrame({"名称": ["x"]}), ["600000"]) == {}
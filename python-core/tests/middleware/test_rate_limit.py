@@ -0,0 +1,45 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.rate_limit import LocalRateGuard, RateLimitMiddleware
+
+
+def test_local_guard_rejects_when_local_window_full():
+    guard = LocalRateGuard(window_seconds=60)
+    for i in range(3):
+        assert guard.check("u|/t", limit=3, now=100.0 + i) == 0
+        guard.record("u|/t", limit=3, now=100.0 + i)
+
+    # 本地窗口已满，必须等到最早一次请求滑出窗口
+    assert guard.check("u|/t", limit=3, now=110.0) == 50.0
+    assert guard.check("u|/t", limit=3, now=161.0) == 0
+
+
+def test_local_guard_block_until():
+    guard = LocalRateGuard(window_seconds=60)
+    guard.block("u|/t", 5, now=0.0)
+    assert guard.check("u|/t", limit=10, now=1.0) == 4.0
+    assert guard.check("u|/t", limit=10, now=6.0) == 0
+
+
+def test_rate_limit_uses_route_template(monkeypatch):
+    import app.middleware.rate_limit as rl_mod
+
+    seen = []
+
+    async def _fake_check(self, user_id, endpoint, check_quota=True):
+        seen.append(endpoint)
+
+    monkeypatch.setattr(rl_mod.RateLimitMiddleware, "check_rate_limit", _fake_check, raising=True)
+
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware)
+
+    @app.get("/api/reports/{report_id}")
+    async def report(report_id: str):
+        return {"id": report_id}
+
+    client = TestClient(app)
+    assert client.get("/api/reports/a1").status_code == 200
+    assert client.get("/api/reports/b2").status_code == 200
+    assert seen == ["/api/reports/{report_id}", "/api/reports/{report_id}"]
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import analysis_profiler
+from app.services.analysis_profiler import AnalysisProfileStore, profile_analysis, should_profile
+from tradingagents.utils.sampling_profiler import SamplingProfiler
+
+
+def _busy_leaf(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(200))
+
+
+def _busy_caller(seconds):
+    _busy_leaf(seconds)
+
+
+def _profile(seconds=0.2):
+    with SamplingProfiler(interval=0.002) as profiler:
+        _busy_caller(seconds)
+    return profiler
+
+
+def test_sampler_records_target_thread_stacks():
+    profiler = _profile()
+    assert profiler.sample_count > 10
+
+    lines = profiler.to_collapsed().splitlines()
+    hot = [line for line in lines if "_busy_leaf" in line]
+    assert hot and all(int(line.rsplit(" ", 1)[1]) > 0 for line in lines)
+    stack = hot[0].rsplit(" ", 1)[0].split(";")
+    assert stack[0] == "MainThread"
+    assert stack.index(next(f for f in stack if f.startswith("_busy_caller"))) < \
+        stack.index(next(f for f in stack if f.startswith("_busy_leaf")))
+    assert all("sampling-profiler" not in line for line in lines)
+
+    summary = profiler.summary(top=500)
+    assert summary["samples"] == profiler.sample_count
+    assert summary["top_inclusive"][0]["percent"] > 90
+    assert any(item["frame"].startswith("_busy_caller") for item in summary["top_inclusive"])
+
+
+def test_speedscope_export_is_consistent():
+    profiler = _profile(0.1)
+    doc = profiler.to_speedscope("t")
+    frames = doc["shared"]["frames"]
+    prof = doc["profiles"][0]
+    assert prof["type"] == "sampled" and len(prof["samples"]) == len(prof["weights"])
+    assert all(0 <= i < len(frames) for sample in prof["samples"] for i in sample)
+    assert abs(prof["endValue"] - sum(prof["weights"])) < 1e-3
+    assert 0.05 < prof["endValue"] < 1.0
+
+
+def test_should_profile_policy():
+    assert should_profile("any", requested=True, sample_rate=0.0)
+    assert not should_profile("any", sample_rate=0.0)
+    assert should_profile("any", sample_rate=1.0)
+    picked = [should_profile(f"task-{i}", sample_rate=0.25) for i in range(2000)]
+    assert 0.18 < sum(picked) / len(picked) < 0.32
+    assert picked == [should_profile(f"task-{i}", sample_rate=0.25) for i in range(2000)]
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction):
+        self.docs = sorted(self.docs, key=lambda d: d[key], reverse=direction < 0)
+        return self
+
+    def skip(self, n):
+        return _Cursor(self.docs[n:])
+
+    def limit(self, n):
+        return _Cursor(self.docs[:n])
+
+    def __iter__(self):
+        return iter(self.docs)
+
+    async def to_list(self, length=None):
+        return self.docs[:length]
+
+
+class _Profiles:
+    """analysis_profiles 内存集合；同步写入（pymongo）与异步查询（motor）共用同一份数据"""
+
+    def __init__(self):
+        self.docs = []
+        self._next_id = 0
+
+    @staticmethod
+    def _matches(doc, query):
+        for key, cond in query.items():
+            if isinstance(cond, dict) and "$in" in cond:
+                if doc.get(key) not in cond["$in"]:
+                    return False
+            elif doc.get(key) != cond:
+                return False
+        return True
+
+    @staticmethod
+    def _project(doc, projection):
+        included = [k for k, v in projection.items() if v and k != "_id"]
+        if included:
+            out = {}
+            for path in included:
+                head, _, tail = path.partition(".")
+                if head in doc:
+                    out[head] = {tail: doc[head][tail]} if tail and tail in doc[head] else doc[head]
+            return out
+        return {k: v for k, v in doc.items() if projection.get(k, 1)}
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def replace_one(self, query, doc, upsert=False):
+        self.docs = [d for d in self.docs if not self._matches(d, query)]
+        self._next_id += 1
+        self.docs.append({"_id": self._next_id, **doc})
+
+    def find(self, query, projection=None):
+        return _Cursor([self._project(d, projection or {}) for d in self.docs if self._matches(d, query)])
+
+    def delete_many(self, query):
+        self.docs = [d for d in self.docs if not self._matches(d, query)]
+
+    async def find_one(self, query, projection=None):
+        docs = self.find(query, projection).docs
+        return docs[0] if docs else None
+
+
+def _store(max_profiles=200):
+    profiles = _Profiles()
+    db = {"analysis_profiles": profiles}
+    return AnalysisProfileStore(max_profiles=max_profiles, sync_db=db, db=db), profiles
+
+
+def test_store_save_list_prune():
+    store, profiles = _store(max_profiles=2)
+    profiler = _profile(0.05)
+    for i, task_id in enumerate(["t1", "t2", "t3"]):
+        info = store.save(task_id, profiler, {"user_id": "u1" if i else "u2", "source": "api"})
+        profiles.docs[-1]["created_at"] = f"2025-01-01T00:00:0{i}"
+
+    assert info["download"]["collapsed"] == "/api/profiles/t3/download?format=collapsed"
+    assert [item["task_id"] for item in asyncio.run(store.list())] == ["t3", "t2"]
+    listed = asyncio.run(store.list())[0]
+    assert "top_self" not in listed and "data" not in listed
+    assert asyncio.run(store.get("t3"))["top_self"]
+    assert asyncio.run(store.get("t1")) is None and asyncio.run(store.load_file("t1", "speedscope")) is None
+
+    name, content = asyncio.run(store.load_file("t2", "speedscope"))
+    assert name == "t2.speedscope.json" and json.loads(content)["profiles"]
+    assert asyncio.run(store.load_file("../t2", "collapsed")) is None
+    assert asyncio.run(store.load_file("t2", "svg")) is None
+    with pytest.raises(ValueError):
+        store.save("../escape", profiler)
+
+
+def test_store_filters_by_owner(monkeypatch):
+    from app.routers import profiles as profiles_router
+
+    store, _ = _store()
+    profiler = _profile(0.05)
+    store.save("mine", profiler, {"user_id": "u1"})
+    store.save("theirs", profiler, {"user_id": "u2"})
+    monkeypatch.setattr(profiles_router, "get_profile_store", lambda: store)
+
+    user = {"id": "u1", "is_admin": False}
+    listed = asyncio.run(profiles_router.list_profiles(limit=50, current_user=user))
+    assert [item["task_id"] for item in listed["data"]["items"]] == ["mine"]
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(profiles_router.get_profile("theirs", current_user=user))
+    assert exc.value.status_code == 404
+    with pytest.raises(HTTPException):
+        asyncio.run(profiles_router.download_profile("theirs", format="collapsed", current_user=user))
+
+    response = asyncio.run(profiles_router.download_profile("mine", format="collapsed", current_user=user))
+    assert b"_busy_leaf" in response.body and "mine.collapsed.txt" in response.headers["content-disposition"]
+
+    admin = {"id": "root", "is_admin": True}
+    listed = asyncio.run(profiles_router.list_profiles(limit=50, current_user=admin))
+    assert {item["task_id"] for item in listed["data"]["items"]} == {"mine", "theirs"}
+
+
+def test_profile_analysis_saves_on_error(monkeypatch):
+    store, profiles = _store()
+    monkeypatch.setattr(analysis_profiler, "_profile_store", store)
+
+    with profile_analysis("skipped", requested=False) as profile:
+        pass
+    assert profile is None
+
+    with pytest.raises(RuntimeError):
+        with profile_analysis("failed", requested=True, user_id="u1", source="api") as profile:
+            _busy_caller(0.05)
+            raise RuntimeError("boom")
+    assert profile["task_id"] == "failed" and profile["source"] == "api" and profile["samples"] > 0
+    assert profiles.docs[0]["user_id"] == "u1" and profiles.docs[0]["data"]["collapsed"]
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from app.services.backtest.engine import (
+    downsample_indices,
+    expand_grid,
+    get_strategy,
+    hold_state,
+    rolling_mean,
+    run_grid,
+)
+
+
+def _prices(periods=120, symbols=3, seed=7):
+    rng = np.random.default_rng(seed)
+    prices = 10 * np.cumprod(1 + rng.normal(0, 0.02, (periods, symbols)), axis=0)
+    prices[:15, -1] = np.nan  # 最后一只股票晚上市
+    return prices
+
+
+def test_expand_grid_filters_invalid_combos():
+    combos = expand_grid(get_strategy("ma_cross"), {"fast": [5, 20], "slow": [10, 20, 30]})
+    assert {(c["fast"], c["slow"]) for c in combos} == {(5, 10), (5, 20), (5, 30), (20, 30)}
+    with pytest.raises(ValueError):
+        expand_grid(get_strategy("ma_cross"), {"unknown": 1})
+
+
+def test_rolling_mean_and_hold_state():
+    arr = np.arange(6, dtype=float)[:, None]
+    assert np.allclose(rolling_mean(arr, 3)[2:, 0], [1, 2, 3, 4])
+    assert np.isnan(rolling_mean(arr, 3)[:2]).all()
+
+    entry = np.array([[False], [True], [False], [False], [True], [False]])
+    exit_ = np.array([[False], [False], [False], [True], [False], [False]])
+    assert hold_state(entry, exit_)[:, 0].tolist() == [0, 1, 1, 0, 1, 1]
+
+
+def test_grid_matches_single_symbol_loop():
+    prices = _prices(symbols=2)[:, :1]
+    result = run_grid(prices, get_strategy("ma_cross"), [{"fast": 5, "slow": 20}], initial_capital=1000, keep_top=1)
+
+    fast, slow = rolling_mean(prices, 5)[:, 0], rolling_mean(prices, 20)[:, 0]
+    equity, position = 1000.0, 0.0
+    for t in range(1, len(prices)):
+        equity *= 1 + position * (prices[t, 0] / prices[t - 1, 0] - 1)
+        position = 1.0 if fast[t] > slow[t] else 0.0
+    assert result.equity[0][-1] == pytest.approx(equity, rel=1e-9)
+
+
+def test_basket_grid_ranks_all_combos():
+    prices = _prices()
+    strategy = get_strategy("rsi")
+    combos = expand_grid(strategy, {"window": [6, 14], "lower": [20, 30], "upper": [70, 80]})
+    result = run_grid(prices, strategy, combos, fee_rate=0.001, keep_top=2)
+
+    assert len(result.metrics["sharpe"]) == len(combos) == 8
+    best, second = result.ranked("sharpe")[:2]
+    assert result.metrics["sharpe"][best] >= result.metrics["sharpe"][second]
+    assert set(result.equity) == {best, second}
+    assert np.isfinite(result.benchmark).all()
+
+
+def test_chunked_grid_keeps_only_top_curves(monkeypatch):
+    import app.services.backtest.engine as engine
+
+    prices = _prices()
+    strategy = get_strategy("momentum")
+    combos = expand_grid(strategy, {"lookback": list(range(5, 45, 3))})
+    full = run_grid(prices, strategy, combos, keep_top=3)
+
+    # 每批只容纳 2 个组合：逐批合并后的最优曲线与整体计算一致
+    monkeypatch.setattr(engine, "CHUNK_ELEMENTS", prices.size * 2)
+    chunked = run_grid(prices, strategy, combos, keep_top=3)
+    assert list(chunked.equity) == full.ranked()[:3] == list(full.equity)
+    for i, curve in chunked.equity.items():
+        assert np.allclose(curve, full.equity[i])
+    assert run_grid(prices, strategy, combos, keep_top=0).equity == {}
+
+
+def test_expand_grid_rejects_oversized_grid():
+    strategy = get_strategy("ma_cross")
+    params = {"fast": list(range(1, 101)), "slow": list(range(101, 201))}
+    with pytest.raises(ValueError, match="超过上限"):
+        expand_grid(strategy, params, max_combinations=5000)
+    assert len(expand_grid(strategy, {"fast": [5], "slow": [20, 60]}, max_combinations=2)) == 2
+
+
+def test_downsample_keeps_extremes():
+    idx = downsample_indices(1000, 50, keep=(3, 997))
+    assert idx[0] == 0 and idx[-1] == 999
+    assert 3 in idx and 997 in idx and len(idx) <= 52
@@ -0,0 +1,87 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.backtest.engine import get_strategy, portfolio_returns
+from app.services.backtest.jobs import BacktestJobRunner, normalize_job_payload
+from app.services.backtest.robustness import (
+    bootstrap_metrics,
+    evaluate_window,
+    walk_forward_windows,
+)
+
+
+def _closes(periods=400, symbols=2, seed=3):
+    rng = np.random.default_rng(seed)
+    prices = 10 * np.cumprod(1 + rng.normal(0.0005, 0.02, (periods, symbols)), axis=0)
+    index = pd.bdate_range("2022-01-03", periods=periods)
+    return pd.DataFrame(prices, index=index, columns=[f"00000{i + 1}" for i in range(symbols)])
+
+
+def test_walk_forward_windows_cover_out_of_sample():
+    windows = walk_forward_windows(100, train_size=40, test_size=25)
+    assert [(w.train_start, w.test_start, w.test_end) for w in windows] == [(0, 40, 65), (25, 65, 90), (50, 90, 100)]
+    assert all(w.train_start == 0 for w in walk_forward_windows(100, 40, 25, anchored=True))
+    with pytest.raises(ValueError):
+        walk_forward_windows(50, 40, 25)
+
+
+def test_window_oos_uses_only_test_slice():
+    prices = _closes().to_numpy()
+    strategy = get_strategy("ma_cross")
+    combos = [{"fast": 5, "slow": 20}, {"fast": 10, "slow": 30}]
+    window = walk_forward_windows(len(prices), 120, 60)[1]
+    result = evaluate_window(prices, strategy, combos, window)
+
+    assert len(result["oos_returns"]) == window.test_end - window.test_start
+    # 截断到测试段末尾的数据不影响测试段收益（无未来函数）
+    truncated = evaluate_window(prices[:window.test_end], strategy, combos, window)
+    assert np.allclose(result["oos_returns"], truncated["oos_returns"])
+
+
+def test_bootstrap_is_reproducible():
+    returns = np.random.default_rng(0).normal(0, 0.01, 250)
+    a = bootstrap_metrics(returns, 50, 10, seed=42)
+    b = bootstrap_metrics(returns, 50, 10, seed=42)
+    assert np.array_equal(a["total_return"], b["total_return"])
+    assert (a["max_drawdown"] >= 0).all()
+
+
+def test_runner_executes_jobs_on_process_pool():
+    closes = _closes()
+    runner = BacktestJobRunner(max_workers=2, mc_chunk_paths=100)
+    progress = []
+    try:
+        wf = normalize_job_payload({
+            "job_type": "walk_forward", "symbols": list(closes.columns),
+            "params": {"fast": [5, 10], "slow": [20, 40]}, "train_days": 120, "test_days": 60,
+        })
+        result = asyncio.run(runner.run(wf, closes, lambda done, total, msg: progress.append((done, total))))
+        assert len(result["windows"]) == 5
+        assert progress[-1] == (5, 5)
+        assert result["chart_data"][0]["date"] == result["windows"][0]["test_start"]
+
+        mc = normalize_job_payload({
+            "job_type": "monte_carlo", "symbols": list(closes.columns),
+            "params": {"fast": 5, "slow": 20}, "n_paths": 250, "seed": 7,
+        })
+        first = asyncio.run(runner.run(mc, closes))
+        second = asyncio.run(runner.run(mc, closes))
+    finally:
+        runner.shutdown()
+
+    assert first["n_paths"] == 250 and sum(first["histogram"]["counts"]) == 250
+    assert first["distribution"] == second["distribution"]
+    base = portfolio_returns(closes.to_numpy(), get_strategy("ma_cross"), [{"fast": 5, "slow": 20}])[0][0]
+    assert first["original"]["total_return"] == pytest.approx(np.prod(1 + base) - 1)
+
+
+def test_normalize_rejects_invalid_jobs():
+    with pytest.raises(ValueError):
+        normalize_job_payload({"job_type": "grid", "symbols": ["000001"]})
+    with pytest.raises(ValueError):
+        normalize_job_payload({"job_type": "monte_carlo", "symbols": ["AAPL"]})
+    with pytest.raises(ValueError):
+        normalize_job_payload({"job_type": "monte_carlo", "symbols": ["000001"], "params": {"fast": 30, "slow": 10}})
@@ -0,0 +1,63 @@
+import asyncio
+from datetime import date
+
+from app.services.financial_report_calendar import (
+    FinancialReportCalendar,
+    latest_possible_period,
+    periods_after,
+)
+
+
+def test_latest_possible_period():
+    assert latest_possible_period(date(2025, 1, 15)) == "20241231"
+    assert latest_possible_period(date(2025, 4, 1)) == "20250331"
+    assert latest_possible_period(date(2025, 3, 31)) == "20241231"
+    assert latest_possible_period(date(2025, 11, 2)) == "20250930"
+
+
+def test_periods_after():
+    assert periods_after("20250331", "20250331") == []
+    assert periods_after("20240930", "20250331") == ["20250331", "20241231"]
+    assert periods_after("20200331", "20250331") is None
+
+
+def test_filter_symbols_skips_up_to_date_and_unpublished():
+    fetched = []
+
+    def _fetcher(period):
+        fetched.append(period)
+        return {"20250331": {"000001"}, "20241231": {"000001", "300750"}}[period]
+
+    calendar = FinancialReportCalendar(published_fetcher=_fetcher)
+    latest = {
+        "000001": "20241231",  # 已披露一季报 -> 同步
+        "600000": "20241231",  # 一季报未披露 -> 跳过
+        "600036": "20250331",  # 已是最新 -> 跳过
+        "300750": "20240930",  # 已披露年报 -> 同步
+    }
+    symbols = ["000001", "600000", "600036", "300750", "688981"]  # 688981 库中无数据 -> 同步
+
+    to_sync, skipped = asyncio.run(calendar.filter_symbols(symbols, latest, today=date(2025, 4, 20)))
+
+    assert to_sync == ["000001", "300750", "688981"]
+    assert skipped == ["600000", "600036"]
+    # 每个报告期的披露名单只获取一次
+    assert sorted(fetched) == ["20241231", "20250331"]
+
+
+def test_filter_symbols_syncs_when_disclosure_list_unavailable():
+    calls = []
+
+    def _fetcher(period):
+        calls.append(period)
+        raise RuntimeError("upstream down")
+
+    calendar = FinancialReportCalendar(published_fetcher=_fetcher)
+    to_sync, skipped = asyncio.run(
+        calendar.filter_symbols(["000001", "600000"], {"000001": "20241231", "600000": "20241231"},
+                                today=date(2025, 4, 20))
+    )
+    assert to_sync == ["000001", "600000"]
+    assert skipped == []
+    # 失败后在失败冷却期内不重复请求
+    assert calls == ["20250331"]
@@ -0,0 +1,43 @@
+import asyncio
+
+
+def test_get_quotes_serves_cache_and_batches_misses(monkeypatch):
+    from app.services.foreign_quote_cache import ForeignQuoteCache
+    from app.services.foreign_stock_service import ForeignStockService
+
+    service = ForeignStockService.__new__(ForeignStockService)
+    service.quote_cache = ForeignQuoteCache(use_redis=False)
+    service.db = None
+
+    batch_calls = []
+    single_calls = []
+
+    async def _priority(self, market):
+        return ["yahoo_finance", "finnhub"]
+
+    def _batch(self, market, codes):
+        batch_calls.append(list(codes))
+        # 模拟批量接口漏掉 MSFT
+        return {c: {"price": 10.0, "open": 9.0, "high": 11.0, "low": 8.0, "volume": 100}
+                for c in codes if c != "MSFT"}
+
+    async def _single(self, market, code, force_refresh=False):
+        single_calls.append(code)
+        return {"code": code, "market": market, "price": 1.0}
+
+    monkeypatch.setattr(ForeignStockService, "_get_source_priority", _priority, raising=True)
+    monkeypatch.setattr(ForeignStockService, "_get_quotes_from_yfinance_batch", _batch, raising=True)
+    monkeypatch.setattr(ForeignStockService, "_fetch_quote", _single, raising=True)
+
+    async def _run():
+        await service.quote_cache.set("US", "AAPL", {"code": "AAPL", "market": "US", "price": 200.0})
+        quotes = await service.get_quotes("US", ["AAPL", "NVDA", "MSFT", "NVDA"])
+        assert quotes["AAPL"]["price"] == 200.0
+        assert quotes["NVDA"]["price"] == 10.0
+        assert quotes["MSFT"]["price"] == 1.0
+
+    asyncio.run(_run())
+
+    # 缓存命中的代码不再请求，重复代码只请求一次，批量漏掉的才逐个获取
+    assert batch_calls == [["NVDA", "MSFT"]]
+    assert single_calls == ["MSFT"]
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+
+def test_quote_cache_fresh_stale_and_miss():
+    from app.services.foreign_quote_cache import ForeignQuoteCache
+
+    cache = ForeignQuoteCache(ttl={"HK": {"fresh": 10, "stale": 100}}, use_redis=False)
+
+    async def _run():
+        assert await cache.get("HK", "00700") == (None, False)
+
+        await cache.set("HK", "00700", {"code": "00700", "price": 300.0})
+        data, fresh = await cache.get("HK", "00700")
+        assert fresh and data["price"] == 300.0
+
+        # 模拟 50 秒前获取：过期但仍可用
+        entry, _ = cache._entries[("HK", "00700")]
+        cache._entries[("HK", "00700")] = (entry, time.time() - 50)
+        data, fresh = await cache.get("HK", "00700")
+        assert data is not None and not fresh
+
+        # 超过可用期视为未命中
+        cache._entries[("HK", "00700")] = (entry, time.time() - 500)
+        assert await cache.get("HK", "00700") == (None, False)
+
+    asyncio.run(_run())
+
+
+def test_quote_cache_background_refresh_is_deduplicated():
+    from app.services.foreign_quote_cache import ForeignQuoteCache
+
+    cache = ForeignQuoteCache(use_redis=False)
+    calls = []
+
+    async def _fetcher(market, code):
+        calls.append((market, code))
+        await asyncio.sleep(0.01)
+        await cache.set(market, code, {"code": code, "price": 1.0})
+
+    async def _run():
+        assert cache.schedule_refresh("US", "AAPL", _fetcher) is True
+        assert cache.schedule_refresh("US", "AAPL", _fetcher) is False
+        await asyncio.sleep(0.05)
+        data, fresh = await cache.get("US", "AAPL")
+        assert fresh and data["price"] == 1.0
+
+    asyncio.run(_run())
+    assert calls == [("US", "AAPL")]
+    assert cache.get_stats()["background_refreshes"] == 1
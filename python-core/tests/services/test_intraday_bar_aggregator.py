@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.services.intraday_bar_aggregator import IntradayBarAggregator
+
+
+TZ = ZoneInfo("Asia/Shanghai")
+
+
+def _ts(h, m, s=0):
+    return datetime(2025, 1, 2, h, m, s, tzinfo=TZ)
+
+
+def test_snapshots_build_ohlcv_bars():
+    agg = IntradayBarAggregator(intervals=(1, 5), retention_days=1)
+    agg.add_snapshot({"000001": {"close": 10.0, "volume": 1000, "amount": 1.0e4}}, "20250102", _ts(9, 31, 5))
+    agg.add_snapshot({"000001": {"close": 10.4, "volume": 1300, "amount": 1.3e4}}, "20250102", _ts(9, 31, 40))
+    agg.add_snapshot({"000001": {"close": 9.9, "volume": 1500, "amount": 1.5e4}}, "20250102", _ts(9, 32, 10))
+
+    # 第一根 1 分钟K线已收盘；首次观测只建立成交量基准
+    closed = [b for b in agg._closed_bars if b["interval"] == 1]
+    assert len(closed) == 1
+    bar = closed[0]
+    assert (bar["open"], bar["high"], bar["low"], bar["close"]) == (10.0, 10.4, 10.0, 10.4)
+    assert bar["volume"] == 300
+    assert bar["ticks"] == 2
+
+    five = agg.get_open_bar("000001", 5)
+    assert five["start"] == _ts(9, 30)
+    assert (five["high"], five["low"], five["close"]) == (10.4, 9.9, 9.9)
+    assert five["volume"] == 500
+
+
+def test_close_due_and_flush(monkeypatch):
+    import app.services.intraday_bar_aggregator as mod
+
+    written = []
+
+    class _FakeColl:
+        async def create_index(self, *args, **kwargs):
+            return "ok"
+
+        async def bulk_write(self, ops, ordered=False):
+            written.extend(ops)
+
+    class _FakeDB:
+        def __getitem__(self, name):
+            return _FakeColl()
+
+    monkeypatch.setattr(mod, "get_mongo_db", lambda: _FakeDB(), raising=True)
+
+    agg = IntradayBarAggregator(intervals=(1, 15), retention_days=1)
+    agg.add_snapshot({"000001": {"close": 10.0, "volume": 100}, "600000": {"close": 0}}, "20250102", _ts(11, 29))
+
+    # 午休后没有新快照，到期K线由 close_due 收盘
+    assert agg.close_due(_ts(13, 0)) == 2
+    assert asyncio.run(agg.flush()) == 2
+    assert len(written) == 2
+    assert agg.get_stats()["pending_bars"] == 0
+
+
+def test_new_trade_date_counts_cumulative_from_zero():
+    agg = IntradayBarAggregator(intervals=(1,), retention_days=1)
+    agg.add_snapshot({"000001": {"close": 10.0, "volume": 5000}}, "20250102", _ts(14, 59))
+    agg.add_snapshot({"000001": {"close": 10.1, "volume": 200}}, "20250103", datetime(2025, 1, 3, 9, 30, tzinfo=TZ))
+    assert agg.get_open_bar("000001", 1)["volume"] == 200
+
+
+def test_alternating_sources_keep_per_source_baselines():
+    agg = IntradayBarAggregator(intervals=(1,), retention_days=1)
+    sources = ("tushare", "akshare_eastmoney", "akshare_sina")
+    # 默认开启数据源轮换：每次采集换一个数据源，累计成交量每 10 秒增加 100
+    for k in range(12):
+        ts = datetime(2025, 1, 2, 10, 0, 0, tzinfo=TZ) + timedelta(seconds=10 * k)
+        agg.add_snapshot({"000001": {"close": 10.0, "volume": 10000 + 100 * k, "amount": 1.0e5 + 1000 * k}},
+                         "20250102", ts, source=sources[k % 3])
+
+    # 前三次快照分别建立各数据源的基准；之后每次只计入距上一次快照的 10 秒
+    closed = agg._closed_bars[0]
+    assert closed["start"] == _ts(10, 0)
+    assert closed["volume"] == pytest.approx(300) and closed["amount"] == pytest.approx(3000)
+    bar = agg.get_open_bar("000001", 1)
+    assert bar["volume"] == pytest.approx(600) and bar["ticks"] == 6
+    assert agg.get_stats()["source_switches"] == 11
+
+
+def test_off_session_snapshots_do_not_open_bars():
+    agg = IntradayBarAggregator(intervals=(1, 5), retention_days=1)
+    agg.add_snapshot({"000001": {"close": 10.0, "volume": 1000}}, "20250102", _ts(11, 29, 30))
+    agg.add_snapshot({"000001": {"close": 10.1, "volume": 1500}}, "20250102", _ts(11, 31))
+    agg.add_snapshot({"000001": {"close": 10.2, "volume": 1800}}, "20250102", _ts(13, 0, 10))
+
+    starts = sorted({b["start"] for b in agg._closed_bars})
+    assert starts == [_ts(11, 25), _ts(11, 29)]
+    # 午休快照的成交量只推进基准，不计入下午首根K线
+    assert agg.get_open_bar("000001", 1)["volume"] == 300
+
+    agg.add_snapshot({"000001": {"close": 10.3, "volume": 2500}}, "20250102", _ts(15, 6))
+    assert agg.get_open_bar("000001", 1) is None
+    assert agg.get_stats()["off_session_snapshots"] == 2
+
+
+def test_pending_bars_are_capped_while_flush_fails(monkeypatch):
+    import app.services.intraday_bar_aggregator as mod
+
+    class _DownColl:
+        async def create_index(self, *args, **kwargs):
+            return "ok"
+
+        async def bulk_write(self, ops, ordered=False):
+            raise ConnectionError("mongo down")
+
+    monkeypatch.setattr(mod, "get_mongo_db", lambda: {"intraday_bars": _DownColl()}, raising=True)
+
+    agg = IntradayBarAggregator(intervals=(1,), retention_days=1, max_pending_bars=3)
+    for minute in range(31, 37):
+        agg.add_snapshot({"000001": {"close": 10.0, "volume": minute}}, "20250102", _ts(9, minute))
+        asyncio.run(agg.flush())
+
+    stats = agg.get_stats()
+    assert stats["pending_bars"] == 3 and stats["bars_dropped"] == 2
+    assert [b["start"] for b in agg._closed_bars] == [_ts(9, 33), _ts(9, 34), _ts(9, 35)]
@@ -0,0 +1,263 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.paper_order_engine import OrderBook, OrderRejected, PaperOrderEngine, is_triggered
+
+
+class _Accounts:
+    """只实现引擎用到的现金条件扣款语义"""
+
+    def __init__(self, cash):
+        self.doc = {"user_id": "u1", "cash": {"CNY": cash}, "realized_pnl": {"CNY": 0.0}}
+
+    async def find_one(self, query, projection=None):
+        return self.doc
+
+    async def update_one(self, query, update, upsert=False):
+        for key, cond in query.items():
+            if key.startswith("cash.") and self.doc["cash"][key[5:]] < cond["$gte"]:
+                return SimpleNamespace(modified_count=0)
+        for key, delta in update.get("$inc", {}).items():
+            group, cur = key.split(".")
+            self.doc[group][cur] = self.doc[group].get(cur, 0.0) + delta
+        return SimpleNamespace(modified_count=1)
+
+
+def _matches(doc, query):
+    """只实现引擎查询用到的操作符：相等、$lt、$in、$exists、$or"""
+    for key, cond in query.items():
+        if key == "$or":
+            if not any(_matches(doc, sub) for sub in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = doc.get(key)
+            if "$exists" in cond and (key in doc) != cond["$exists"]:
+                return False
+            if "$lt" in cond and not (value is not None and value < cond["$lt"]):
+                return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+        elif doc.get(key) != cond:
+            return False
+    return True
+
+
+def _apply(doc, update):
+    doc.update(update.get("$set", {}))
+    for key in update.get("$unset", {}):
+        doc.pop(key, None)
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class _Orders:
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_one(self, doc):
+        self.docs[doc["order_id"]] = dict(doc)
+
+    async def find_one_and_update(self, query, update, projection=None):
+        doc = self.docs.get(query["order_id"])
+        if doc is None or not _matches(doc, query):
+            return None
+        _apply(doc, update)
+        return dict(doc)
+
+    async def update_one(self, query, update):
+        doc = self.docs.get(query["order_id"])
+        if doc is None or not _matches(doc, query):
+            return SimpleNamespace(modified_count=0)
+        _apply(doc, update)
+        return SimpleNamespace(modified_count=1)
+
+    async def update_many(self, query, update):
+        hits = [doc for doc in self.docs.values() if _matches(doc, query)]
+        for doc in hits:
+            _apply(doc, update)
+        return SimpleNamespace(modified_count=len(hits))
+
+    def find(self, query, projection=None):
+        return _Cursor([dict(doc) for doc in self.docs.values() if _matches(doc, query)])
+
+
+class _Recorder:
+    def __init__(self):
+        self.calls = []
+
+    async def update_one(self, *args, **kwargs):
+        self.calls.append(args)
+        return SimpleNamespace(modified_count=1)
+
+    async def insert_one(self, doc):
+        self.calls.append(doc)
+
+    async def find_one(self, *args, **kwargs):
+        return None
+
+
+class _Pricing:
+    def __init__(self, price):
+        self.price = price
+
+    async def get_price(self, code, market):
+        return self.price
+
+
+def _engine(cash=10_000.0, price=10.0, db=None, **kwargs):
+    db = db or {
+        "paper_accounts": _Accounts(cash),
+        "paper_orders": _Orders(),
+        "paper_positions": _Recorder(),
+        "paper_trades": _Recorder(),
+        "paper_market_rules": _Recorder(),
+    }
+    return PaperOrderEngine(db=db, pricing=_Pricing(price), **kwargs), db
+
+
+def test_trigger_rules_and_book_order():
+    assert is_triggered({"side": "buy", "order_type": "limit", "limit_price": 10}, 9.9)
+    assert not is_triggered({"side": "sell", "order_type": "limit", "limit_price": 10}, 9.9)
+    assert is_triggered({"side": "sell", "order_type": "stop", "stop_price": 10}, 9.9)
+    assert not is_triggered({"side": "buy", "order_type": "stop", "stop_price": 10}, 9.9)
+
+    book = OrderBook()
+    for i, limit in enumerate([9.0, 10.0, 11.0]):
+        book.add({"order_id": f"o{i}", "market": "CN", "code": "000001", "side": "buy",
+                  "order_type": "limit", "limit_price": limit, "created_at": f"t{i}"})
+    assert [o["order_id"] for o in book.pop_triggered("CN", "000001", 10.0)] == ["o1", "o2"]
+    assert len(book) == 1 and book.has_symbol("CN", "000001")
+
+
+def test_buy_rejected_without_touching_position():
+    engine, db = _engine(cash=500.0)
+    with pytest.raises(OrderRejected):
+        asyncio.run(engine.submit_order("u1", "000001", "CN", "buy", 100))
+    assert db["paper_positions"].calls == [] and db["paper_accounts"].doc["cash"]["CNY"] == 500.0
+
+
+def test_limit_order_fills_once_when_triggered():
+    engine, db = _engine(cash=10_000.0, price=10.5)
+    order = asyncio.run(engine.submit_order("u1", "000001", "CN", "buy", 100, order_type="limit", limit_price=10.0))
+    assert order["status"] == "open" and len(engine.book) == 0
+    assert asyncio.run(engine.load_open_orders()) == 1
+
+    async def _ticks():
+        await engine.on_price("CN", "000001", 10.2)
+        await engine.on_price("CN", "000001", 9.8)
+        await engine.on_price("CN", "000001", 9.7)
+
+    asyncio.run(_ticks())
+    stored = db["paper_orders"].docs[order["order_id"]]
+    assert stored["status"] == "filled" and stored["price"] == 9.8
+    assert db["paper_accounts"].doc["cash"]["CNY"] == pytest.approx(10_000.0 - 980.0)
+    assert len(db["paper_trades"].calls) == 1 and len(engine.book) == 0
+
+
+def test_order_submitted_by_api_engine_is_filled_by_matcher_engine():
+    api_engine, db = _engine(cash=10_000.0, price=10.5)
+    matcher, _ = _engine(db=db)
+
+    async def _run():
+        await matcher.load_open_orders()
+        order = await api_engine.submit_order("u1", "000001", "CN", "buy", 100, order_type="limit", limit_price=10.0)
+        cancelled = await api_engine.submit_order("u1", "000002", "CN", "buy", 100, order_type="limit", limit_price=5.0)
+        await api_engine.cancel_order("u1", cancelled["order_id"])
+        assert len(api_engine.book) == 0
+
+        await matcher.load_open_orders()
+        assert order["order_id"] in matcher.book and cancelled["order_id"] not in matcher.book
+        await matcher.on_price("CN", "000001", 9.9)
+        return order
+
+    order = asyncio.run(_run())
+    stored = db["paper_orders"].docs[order["order_id"]]
+    assert stored["status"] == "filled" and stored["claimed_by"] == matcher.instance_id
+    assert db["paper_accounts"].doc["cash"]["CNY"] == pytest.approx(10_000.0 - 990.0)
+
+
+def test_only_stale_claims_are_reopened():
+    engine, db = _engine(claim_timeout_seconds=60)
+    orders = db["paper_orders"]
+    base = {"user_id": "u1", "code": "000001", "market": "CN", "side": "buy", "quantity": 100,
+            "order_type": "limit", "limit_price": 10.0, "created_at": "t"}
+    fresh = datetime.utcnow().isoformat()
+    stale = (datetime.utcnow() - timedelta(seconds=600)).isoformat()
+    orders.docs = {
+        "live": {**base, "order_id": "live", "status": "filling", "claimed_by": "other", "claimed_at": fresh},
+        "dead": {**base, "order_id": "dead", "status": "filling", "claimed_by": "gone", "claimed_at": stale},
+        "legacy": {**base, "order_id": "legacy", "status": "filling"},
+    }
+
+    assert asyncio.run(engine.load_open_orders()) == 2
+    assert orders.docs["live"]["status"] == "filling" and orders.docs["live"]["claimed_by"] == "other"
+    assert orders.docs["dead"]["status"] == "open" and "claimed_by" not in orders.docs["dead"]
+    assert engine.stats["stale_claims_reset"] == 2
+
+
+class _Stream:
+    def __init__(self, changes):
+        self.changes = list(changes)
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def try_next(self):
+        if not self.changes:
+            await asyncio.sleep(0.01)
+            return None
+        change = self.changes.pop(0)
+        self.resume_token = {"_data": change["_id"]}
+        return change
+
+
+class _Quotes:
+    """第一次监听网络中断，之后推送行情"""
+
+    def __init__(self):
+        self.calls = []
+
+    def watch(self, pipeline, **kwargs):
+        self.calls.append(kwargs)
+        if len(self.calls) == 1:
+            raise ConnectionError("network down")
+        return _Stream([
+            {"_id": "a", "fullDocument": {"code": "000002", "close": 1.0}},
+            {"_id": "b", "fullDocument": {"code": "000001", "close": 9.9}},
+        ])
+
+
+def test_quote_stream_pauses_without_cn_orders_and_retries_after_errors():
+    engine, db = _engine(price=10.5, poll_seconds=0.01, max_backoff_seconds=0.01)
+    db["market_quotes"] = _Quotes()
+
+    async def _run():
+        watcher = asyncio.create_task(engine._watch_quotes())
+        await asyncio.sleep(0.05)
+        assert db["market_quotes"].calls == []  # 没有A股挂单时不打开变更流
+
+        await engine.submit_order("u1", "000001", "CN", "buy", 100, order_type="limit", limit_price=10.0)
+        await engine.load_open_orders()
+        for _ in range(100):
+            if len(engine.book) == 0:
+                break
+            await asyncio.sleep(0.01)
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+
+    asyncio.run(_run())
+    assert engine.stats["stream_restarts"] == 1 and len(db["market_quotes"].calls) == 2
+    assert [d["status"] for d in db["paper_orders"].docs.values()] == ["filled"]
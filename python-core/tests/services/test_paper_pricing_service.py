@@ -0,0 +1,80 @@
+import asyncio
+
+from app.services.paper_pricing_service import PaperPricingService
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length=None):
+        return self._docs
+
+
+class _Coll:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        codes = set(query["$or"][0]["code"]["$in"])
+        return _Cursor([d for d in self.docs if d.get("code") in codes or d.get("symbol") in codes])
+
+
+class _DB:
+    def __init__(self, quotes, basics):
+        self.colls = {"market_quotes": _Coll(quotes), "stock_basic_info": _Coll(basics)}
+
+    def __getitem__(self, name):
+        return self.colls[name]
+
+
+class _Foreign:
+    def __init__(self):
+        self.calls = []
+
+    async def get_quotes(self, market, codes):
+        self.calls.append((market, list(codes)))
+        return {c: {"price": 100.0} for c in codes if c != "BAD"}
+
+
+def _service(ttl=60.0):
+    db = _DB(
+        quotes=[{"code": "000001", "close": 10.5}, {"code": "600000", "close": 0}],
+        basics=[{"code": "600000", "current_price": 8.2}],
+    )
+    svc = PaperPricingService(db=db, ttl_seconds=ttl)
+    svc._foreign_service = _Foreign()
+    return svc, db
+
+
+def test_value_positions_batches_per_market():
+    svc, db = _service()
+    positions = [
+        {"code": "000001", "market": "CN", "currency": "CNY", "quantity": 100, "avg_cost": 10.0},
+        {"code": "600000", "market": "CN", "currency": "CNY", "quantity": 200, "avg_cost": 9.0},
+        {"code": "AAPL", "market": "US", "currency": "USD", "quantity": 10, "avg_cost": 90.0},
+        {"code": "BAD", "market": "US", "currency": "USD", "quantity": 5, "avg_cost": 1.0},
+        {"code": "00700", "market": "HK", "currency": "HKD", "quantity": 100, "avg_cost": 300.0},
+    ]
+    detailed, value = asyncio.run(svc.value_positions(positions))
+
+    assert [p["last_price"] for p in detailed] == [10.5, 8.2, 100.0, None, 100.0]
+    assert value == {"CNY": 1050.0 + 1640.0, "HKD": 10000.0, "USD": 1000.0}
+    assert detailed[3]["unrealized_pnl"] is None and detailed[3]["market_value"] == 0.0
+    # A股：market_quotes 一次 + stock_basic_info 补齐一次；港/美股各一次批量行情
+    assert len(db["market_quotes"].queries) == 1 and len(db["stock_basic_info"].queries) == 1
+    assert sorted(m for m, _ in svc._foreign_service.calls) == ["HK", "US"]
+
+
+def test_price_cache_shared_across_requests():
+    svc, db = _service()
+    asyncio.run(svc.get_prices([("000001", "CN"), ("AAPL", "US")]))
+    assert asyncio.run(svc.get_price("000001", "CN")) == 10.5
+    assert len(db["market_quotes"].queries) == 1
+    assert len(svc._foreign_service.calls) == 1
+
+    svc.ttl_seconds = 0
+    asyncio.run(svc.get_price("000001", "CN"))
+    assert len(db["market_quotes"].queries) == 2
@@ -0,0 +1,110 @@
+import asyncio
+
+
+class _FakeResult:
+    def __init__(self, n):
+        self.matched_count = 0
+        self.modified_count = 0
+        self.upserted_ids = {i: None for i in range(n)}
+
+
+class _FakeColl:
+    def __init__(self):
+        self.calls = []
+
+    async def bulk_write(self, ops, ordered=False):
+        self.calls.append(ops)
+        return _FakeResult(len(ops))
+
+
+class _FakeDB:
+    def __init__(self):
+        self.coll = _FakeColl()
+
+    def __getitem__(self, name):
+        return self.coll
+
+
+def _setup(monkeypatch):
+    import app.services.quotes_ingestion_service as qis_mod
+
+    fake_db = _FakeDB()
+    monkeypatch.setattr(qis_mod, "get_mongo_db", lambda: fake_db, raising=True)
+    monkeypatch.setattr(qis_mod.settings, "QUOTES_DELTA_FULL_REFRESH_SECONDS", 1800, raising=False)
+    return qis_mod.QuotesIngestionService(), fake_db
+
+
+def test_identical_tick_writes_nothing(monkeypatch):
+    svc, fake_db = _setup(monkeypatch)
+    quotes = {
+        "000001": {"close": 10.1, "pct_chg": 0.1, "amount": 1.0e8},
+        "sh600000": {"close": 9.8, "pct_chg": -0.3, "amount": 7.5e7},
+    }
+
+    async def _run():
+        first = await svc._bulk_upsert(quotes, "20250102", "fake", only_changed=True)
+        second = await svc._bulk_upsert(quotes, "20250102", "fake", only_changed=True)
+        return first, second
+
+    first, second = asyncio.run(_run())
+    assert len(fake_db.coll.calls) == 1
+    assert len(fake_db.coll.calls[0]) == 2
+    assert set(first) == {"000001", "600000"}
+    assert second == {}
+
+
+def test_only_changed_codes_are_written(monkeypatch):
+    svc, fake_db = _setup(monkeypatch)
+    tick1 = {
+        "000001": {"close": 10.1, "volume": 100, "amount": float("nan")},
+        "600000": {"close": 9.8, "volume": 200},
+    }
+    tick2 = {
+        "000001": {"close": 10.2, "volume": 150, "amount": float("nan")},
+        "600000": {"close": 9.8, "volume": 200},
+    }
+
+    async def _run():
+        await svc._bulk_upsert(tick1, "20250102", "fake", only_changed=True)
+        return await svc._bulk_upsert(tick2, "20250102", "fake", only_changed=True)
+
+    changes = asyncio.run(_run())
+    assert changes == {"000001": {"close": 10.2, "volume": 150}}
+    ops = fake_db.coll.calls[-1]
+    assert len(ops) == 1
+    assert ops[0]._filter == {"code": "000001"}
+
+
+def test_trade_date_switch_forces_full_write(monkeypatch):
+    svc, fake_db = _setup(monkeypatch)
+    quotes = {"000001": {"close": 10.1}, "600000": {"close": 9.8}}
+
+    async def _run():
+        await svc._bulk_upsert(quotes, "20250102", "fake", only_changed=True)
+        await svc._bulk_upsert(quotes, "20250103", "fake", only_changed=True)
+
+    asyncio.run(_run())
+    assert [len(ops) for ops in fake_db.coll.calls] == [2, 2]
+
+
+def test_change_feed_is_chunked(monkeypatch):
+    svc, _ = _setup(monkeypatch)
+    import app.core.database as db_mod
+
+    published = []
+
+    class _FakeRedis:
+        async def publish(self, channel, message):
+            published.append((channel, message))
+
+    monkeypatch.setattr(db_mod, "get_redis_client", lambda: _FakeRedis(), raising=True)
+    monkeypatch.setattr(svc, "CHANGE_FEED_CHUNK_SIZE", 2, raising=False)
+
+    changes = {f"{i:06d}": {"close": float(i)} for i in range(5)}
+    count = asyncio.run(svc._publish_changes(changes, "20250102", "fake"))
+    assert count == 3
+    import json
+    parts = [json.loads(m) for _, m in published]
+    assert [p["part"] for p in parts] == [1, 2, 3]
+    assert sum(len(p["changes"]) for p in parts) == 5
+    assert all(p["seq"] == 1 for p in parts)
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import time
+
+from app.services.report_export_cache import ReportExportCache, content_hash
+
+
+def _doc(summary="看好", **extra):
+    return {"stock_symbol": "600036", "analysis_date": "2025-01-02", "summary": summary,
+            "reports": {"market_report": "内容"}, **extra}
+
+
+def test_content_hash_ignores_metadata():
+    assert content_hash(_doc(_id="a", created_at=1)) == content_hash(_doc(_id="b", created_at=2))
+    assert content_hash(_doc("看好")) != content_hash(_doc("看空"))
+
+
+def test_render_once_then_hit_and_dedupe_concurrent(tmp_path):
+    calls = []
+
+    def renderer(fmt, payload):
+        calls.append(fmt)
+        time.sleep(0.05)
+        return f"{fmt}:{payload['summary']}".encode()
+
+    cache = ReportExportCache(str(tmp_path), max_bytes=10**6, renderer=renderer)
+
+    async def run():
+        paths = await asyncio.gather(*[cache.get_or_render(_doc(), "pdf") for _ in range(3)])
+        again = await cache.get_or_render(_doc(_id="other"), "pdf")
+        return paths, again
+
+    paths, again = asyncio.run(run())
+    assert calls == ["pdf"]
+    assert len(set(paths)) == 1 and again == paths[0]
+    assert paths[0].read_bytes() == "pdf:看好".encode()
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = ReportExportCache(str(tmp_path), max_bytes=250, renderer=lambda fmt, p: b"x" * 100,
+                              min_evict_age_seconds=0)
+
+    async def run():
+        first = await cache.get_or_render(_doc("a"), "pdf")
+        second = await cache.get_or_render(_doc("b"), "pdf")
+        old = time.time() - 100
+        os.utime(first, (old, old))
+        os.utime(second, (old - 10, old - 10))
+        # 命中 first 刷新其访问时间，写入第三个文件时应淘汰 second
+        await cache.get_or_render(_doc("a"), "pdf")
+        third = await cache.get_or_render(_doc("c"), "pdf")
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first.exists() and third.exists()
+    assert not second.exists()
+    assert cache.get_stats()["total_bytes"] == 200
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.services.report_search import (
+    apply_cursor,
+    build_keyword_query,
+    build_search_tokens,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def test_search_tokens_cover_code_name_and_summary():
+    tokens = build_search_tokens({
+        "stock_symbol": "600036",
+        "stock_name": "招商银行",
+        "analysis_id": "abc_1",
+        "summary": "业绩 稳健",
+    })
+    assert "600036" in tokens
+    assert {"招商", "商银", "银行"} <= set(tokens)
+    assert "业绩" in tokens and "绩稳" in tokens
+
+
+def test_keyword_query_matches_tokens():
+    doc_tokens = set(build_search_tokens({"stock_symbol": "600036", "stock_name": "招商银行"}))
+    query = build_keyword_query("商银")
+    assert set(query["search_tokens"]["$all"]) <= doc_tokens
+    assert set(build_keyword_query("0036")["search_tokens"]["$all"]) <= doc_tokens
+    assert build_keyword_query("  ") is None
+    assert "$or" in build_keyword_query("6")
+
+
+def test_cursor_roundtrip_and_keyset_query():
+    created_at = datetime(2025, 1, 2, 3, 4, 5, 678000)
+    oid = ObjectId()
+    cursor = encode_cursor(created_at, oid)
+    assert decode_cursor(cursor) == (created_at, oid)
+
+    query = apply_cursor({"market_type": "A股"}, cursor)
+    assert query["$and"][0] == {"market_type": "A股"}
+    assert query["$and"][1]["$or"][1] == {"created_at": created_at, "_id": {"$lt": oid}}
+    assert apply_cursor({}, None) == {}
+
+
+def test_invalid_cursor_raises():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
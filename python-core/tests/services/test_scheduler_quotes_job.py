@@ -12,7 +12,7 @@ def test_scheduler_adds_quotes_job(monkeypatch):
         create_task_called=False,
     )
 
-    # Fake QuotesIngestionService used by app.main during startup
+    # Fake QuotesIngestionService used by the scheduler jobs during startup
     class _FakeQuotesIngestion:
         async def ensure_indexes(self):
             state.ensure_indexes_called = True
@@ -37,8 +37,9 @@ def test_scheduler_adds_quotes_job(monkeypatch):
         def shutdown(self, wait=False):
             return None
 
-    # Patch scheduler and service in app.main before startup runs
+    # Patch scheduler and service before startup runs (jobs are wired in app.services.scheduler_jobs)
     import app.main as main_mod
+    import app.services.scheduler_jobs as jobs_mod
 
     fake_scheduler = _FakeScheduler()
 
@@ -52,21 +53,16 @@ def test_scheduler_adds_quotes_job(monkeypatch):
             pass
         return None
 
-    # Patch blocking init/close DB and basic sync service
+    # Patch blocking init/close DB
     async def _noop_async(*args, **kwargs):
         return None
 
-    class _FakeBasicsService:
-        async def run_full_sync(self, force: bool = False):
-            return None
-
     monkeypatch.setattr(main_mod, "init_db", _noop_async, raising=True)
     monkeypatch.setattr(main_mod, "close_db", _noop_async, raising=True)
-    monkeypatch.setattr(main_mod, "get_basics_sync_service", lambda: _FakeBasicsService(), raising=True)
 
     # Patch scheduler, quotes service and asyncio.create_task
-    monkeypatch.setattr(main_mod, "AsyncIOScheduler", lambda *args, **kwargs: fake_scheduler, raising=True)
-    monkeypatch.setattr(main_mod, "QuotesIngestionService", _FakeQuotesIngestion, raising=True)
+    monkeypatch.setattr(jobs_mod, "AsyncIOScheduler", lambda *args, **kwargs: fake_scheduler, raising=True)
+    monkeypatch.setattr("app.services.quotes_ingestion_service.QuotesIngestionService", _FakeQuotesIngestion, raising=True)
     monkeypatch.setattr(main_mod.asyncio, "create_task", _fake_asyncio_create_task, raising=True)
 
     # Directly drive the lifespan to avoid importing full router stack
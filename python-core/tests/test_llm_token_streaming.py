@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+from tradingagents.llm_adapters.streaming import (
+    TokenStreamSink,
+    forward_stream_chunks,
+    get_token_sink,
+    stream_tokens_to,
+)
+
+
+def test_sink_coalesces_deltas_by_rate():
+    events = []
+    sink = TokenStreamSink(events.append, max_updates_per_second=1)
+
+    sink.emit("Market Analyst", "a")   # 首次立即推送
+    sink.emit("Market Analyst", "b")   # 间隔内合并
+    sink.emit("Market Analyst", "c")
+    sink.finish("Market Analyst")
+
+    assert [e["delta"] for e in events] == ["a", "bc"]
+    assert events[-1]["final"] is True
+    assert events[-1]["chars"] == 3
+    assert sink.get_stats()["chars_by_node"] == {"Market Analyst": 3}
+
+
+def test_forward_stream_chunks_only_when_sink_registered():
+    chunks = [SimpleNamespace(text="你好"), SimpleNamespace(text="世界")]
+    run_manager = SimpleNamespace(metadata={"langgraph_node": "Trader"})
+
+    # 未注册 sink：原样透传
+    assert get_token_sink() is None
+    assert list(forward_stream_chunks(iter(chunks), run_manager)) == chunks
+
+    events = []
+    with stream_tokens_to(events.append, max_updates_per_second=1000):
+        assert list(forward_stream_chunks(iter(chunks), run_manager)) == chunks
+
+    assert get_token_sink() is None
+    assert "".join(e["delta"] for e in events) == "你好世界"
+    assert all(e["node"] == "Trader" for e in events)
@@ -0,0 +1,84 @@
+import contextvars
+import logging
+import threading
+import time
+
+from tradingagents.utils import async_logging
+from tradingagents.utils.async_logging import AsyncQueueHandler, flush_queue_logging, install_queue_logging
+
+request_id = contextvars.ContextVar("request_id", default="-")
+
+
+class _SlowHandler(logging.Handler):
+    def __init__(self, delay=0.0, gate=None):
+        super().__init__()
+        self.delay = delay
+        self.gate = gate
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        if self.gate is not None:
+            self.gate.wait(2)
+        time.sleep(self.delay)
+        self.threads.add(threading.current_thread().name)
+        self.records.append((record.levelname, record.getMessage(), getattr(record, "request_id", None)))
+
+
+class _ContextFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+def test_handlers_run_on_listener_thread_with_caller_context():
+    logger = logging.getLogger("test_async_logging.basic")
+    logger.propagate = False
+    slow = _SlowHandler(delay=0.05)
+    slow.addFilter(_ContextFilter())
+    debug_only = _SlowHandler()
+    debug_only.setLevel(logging.WARNING)
+    logger.handlers = [slow, debug_only]
+    logger.setLevel(logging.INFO)
+
+    assert install_queue_logging(logger)
+    assert len(logger.handlers) == 1 and isinstance(logger.handlers[0], AsyncQueueHandler)
+
+    request_id.set("req-1")
+    start = time.time()
+    for i in range(5):
+        logger.info("第 %d 条", i)
+    logger.warning("告警")
+    assert time.time() - start < 0.1  # 调用线程不等待慢处理器
+    assert flush_queue_logging()
+
+    assert [m for _, m, _ in slow.records] == [f"第 {i} 条" for i in range(5)] + ["告警"]
+    assert {rid for _, _, rid in slow.records} == {"req-1"}
+    assert threading.current_thread().name not in slow.threads
+    assert [m for _, m, _ in debug_only.records] == ["告警"]
+
+
+def test_full_queue_drops_info_but_keeps_warnings():
+    dispatcher = async_logging._LogDispatcher(maxsize=2)
+    gate = threading.Event()
+    target = _SlowHandler(gate=gate)
+    logger = logging.getLogger("test_async_logging.drop")
+    logger.propagate = False
+    logger.handlers = [AsyncQueueHandler(dispatcher.queue, [target], dispatcher)]
+    logger.setLevel(logging.INFO)
+    try:
+        logger.info("占用监听线程")
+        time.sleep(0.05)
+        logger.info("info-1")
+        logger.info("info-2")
+        logger.info("info-3")  # 队列已满，直接丢弃
+        logger.error("error-1")  # 丢弃最旧的 info-1 后入队
+        assert dispatcher.dropped == 2
+        gate.set()
+        assert dispatcher.flush()
+        messages = [m for _, m, _ in target.records]
+        assert [m for m in messages if "日志队列" not in m] == ["占用监听线程", "info-2", "error-1"]
+        assert any("已丢弃 2 条日志" in m for m in messages)
+    finally:
+        gate.set()
+        dispatcher.stop()
@@ -0,0 +1,70 @@
+import time
+
+from langchain_core.tools import tool
+
+from tradingagents.agents.utils.tool_memo import memoize_tool_results, memoize_toolkit
+from tradingagents.graph.prefetch import DataPrefetcher, build_prefetch_plan
+
+CALLS = []
+
+
+@tool
+def get_stock_market_data_unified(ticker: str, start_date: str, end_date: str) -> str:
+    """测试用行情工具"""
+    CALLS.append(("market", ticker, start_date, end_date))
+    time.sleep(0.2)
+    return f"market:{ticker}"
+
+
+@tool
+def get_stock_fundamentals_unified(ticker: str, start_date: str = None, end_date: str = None, curr_date: str = None) -> str:
+    """测试用基本面工具"""
+    CALLS.append(("fundamentals", ticker, start_date, end_date, curr_date))
+    time.sleep(0.2)
+    return f"fundamentals:{ticker}"
+
+
+@tool
+def get_stock_sentiment_unified(ticker: str, curr_date: str) -> str:
+    """测试用情绪工具"""
+    CALLS.append(("social", ticker, curr_date))
+    raise RuntimeError("情绪数据源不可用")
+
+
+class _Toolkit:
+    get_stock_market_data_unified = staticmethod(get_stock_market_data_unified)
+    get_stock_fundamentals_unified = staticmethod(get_stock_fundamentals_unified)
+    get_stock_sentiment_unified = staticmethod(get_stock_sentiment_unified)
+
+
+def test_prefetch_overlaps_and_serves_analyst_calls():
+    CALLS.clear()
+    toolkit = _Toolkit()
+    memoize_toolkit(toolkit)
+    plan = build_prefetch_plan(toolkit, "000001", "2025-01-13", ["market", "fundamentals", "social"])
+    assert [name for name, _ in plan] == ["market", "fundamentals", "social"]
+
+    with memoize_tool_results():
+        prefetcher = DataPrefetcher().start(plan)
+        time.sleep(0.3)  # 模拟首个 LLM 调用耗时，此时预取已完成
+        # 与市场/基本面分析师实际调用参数一致
+        start = time.time()
+        assert toolkit.get_stock_market_data_unified.invoke(
+            {"ticker": "000001", "start_date": "2025-01-13", "end_date": "2025-01-13"}) == "market:000001"
+        assert toolkit.get_stock_fundamentals_unified.invoke(
+            {"ticker": "000001", "start_date": "2025-01-03", "end_date": "2025-01-13", "curr_date": "2025-01-13"}
+        ) == "fundamentals:000001"
+        assert time.time() - start < 0.1
+        stats = prefetcher.finish()
+
+    assert [c[0] for c in CALLS].count("market") == 1 and [c[0] for c in CALLS].count("fundamentals") == 1
+    assert stats["tasks"] == 3 and stats["failed"] == 1 and stats["completed"] == 2
+    assert stats["prefetched"] == 2 and stats["used"] == 2 and stats["unused"] == 0
+    assert stats["hidden_seconds"] >= 0.3
+
+
+def test_prefetch_skipped_without_memo():
+    toolkit = _Toolkit()
+    memoize_toolkit(toolkit)
+    prefetcher = DataPrefetcher().start(build_prefetch_plan(toolkit, "000001", "2025-01-13", ["market"]))
+    assert prefetcher.finish()["tasks"] == 0
@@ -0,0 +1,88 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_openai import ChatOpenAI
+
+from tradingagents.llm_adapters import response_cache
+from tradingagents.llm_adapters.openai_compatible_base import ChatDeepSeekOpenAI
+from tradingagents.llm_adapters.response_cache import LLMResponseCache, SQLiteCacheBackend, build_cache_key
+
+
+def _result(text="分析结论", tool_calls=None):
+    message = AIMessage(
+        content=text,
+        tool_calls=tool_calls or [],
+        usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150},
+    )
+    return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"token_usage": {"total_tokens": 150}})
+
+
+def _cache(tmp_path, **kwargs):
+    return LLMResponseCache(SQLiteCacheBackend(str(tmp_path / "llm.sqlite3"), **kwargs), ttl_seconds=60)
+
+
+def test_key_ignores_volatile_ids():
+    llm = ChatDeepSeekOpenAI(api_key="sk-test-0123456789", temperature=0.1)
+    call = {"name": "get_stock_market_data_unified", "args": {"ticker": "000001"}}
+    first = [
+        SystemMessage(content="你是分析师"),
+        AIMessage(content="", tool_calls=[{**call, "id": "call_a"}], id="run-1"),
+        ToolMessage(content="行情数据", tool_call_id="call_a"),
+    ]
+    second = [
+        SystemMessage(content="你是分析师"),
+        AIMessage(content="", tool_calls=[{**call, "id": "call_b"}], id="run-2"),
+        ToolMessage(content="行情数据", tool_call_id="call_b"),
+    ]
+    assert build_cache_key(llm, first, None, {}) == build_cache_key(llm, second, None, {})
+    assert build_cache_key(llm, first, None, {}) != build_cache_key(llm, first, None, {"tools": [{"name": "x"}]})
+    assert build_cache_key(llm, first, None, {}) != build_cache_key(llm, first, None, {"temperature": 0.0})
+
+
+def test_roundtrip_marks_hit_and_counts_saved_tokens(tmp_path):
+    cache = _cache(tmp_path)
+    cache.store("k", _result(tool_calls=[{"name": "t", "args": {"a": 1}, "id": "call_old"}]))
+
+    hit = cache.lookup("k")
+    message = hit.generations[0].message
+    assert message.content == "分析结论" and message.tool_calls[0]["args"] == {"a": 1}
+    assert message.tool_calls[0]["id"] != "call_old"
+    assert message.usage_metadata["total_tokens"] == 0 and message.response_metadata["llm_cache_hit"]
+    assert cache.lookup("missing") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+    assert stats["saved_tokens"] == 150 and stats["entries"] == 1
+
+
+def test_sqlite_evicts_least_recently_used(tmp_path):
+    backend = SQLiteCacheBackend(str(tmp_path / "llm.sqlite3"), max_entries=2)
+    backend.set("a", "1", 60)
+    backend.set("b", "2", 60)
+    backend.get("a")
+    backend.set("c", "3", 60)
+    assert backend.get("b") is None and backend.get("a") == "1" and backend.get("c") == "3"
+
+    backend.set("expired", "x", -1)
+    assert backend.get("expired") is None
+
+
+def test_adapter_skips_provider_call_on_hit(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    monkeypatch.setattr(response_cache, "_llm_response_cache", cache)
+    monkeypatch.setattr(response_cache, "_llm_response_cache_initialized", True)
+    calls = []
+
+    def _fake_generate(self, messages, stop=None, run_manager=None, **kwargs):
+        calls.append(messages)
+        return _result()
+
+    monkeypatch.setattr(ChatOpenAI, "_generate", _fake_generate)
+    llm = ChatDeepSeekOpenAI(api_key="sk-test-0123456789", temperature=0.1)
+    prompt = [HumanMessage(content="总结 000001 基本面")]
+    assert llm.invoke(prompt).content == llm.invoke(prompt).content == "分析结论"
+    assert len(calls) == 1
+
+    hot = ChatDeepSeekOpenAI(api_key="sk-test-0123456789", temperature=0.9)
+    hot.invoke(prompt)
+    hot.invoke(prompt)
+    assert len(calls) == 3 and cache.stats()["skipped"] == 2
@@ -0,0 +1,144 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from tradingagents.utils import metrics
+from tradingagents.utils.metrics import (
+    MetricsRegistry,
+    get_metrics_registry,
+    record_llm_call,
+    track_cache_lookup,
+    track_data_source,
+    track_task,
+)
+
+
+@pytest.fixture(autouse=True)
+def _reset_registry():
+    get_metrics_registry().reset()
+    yield
+    get_metrics_registry().reset()
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("demo_total", "示例计数", ("source",)).inc(2, source='a"b')
+    hist = registry.histogram("demo_seconds", "示例耗时", ("op",), buckets=(0.1, 1.0))
+    hist.observe(0.05, op="x")
+    hist.observe(0.5, op="x")
+    hist.observe(5, op="x")
+    registry.register_collector(lambda: registry.gauge("demo_depth", "示例深度").set(3))
+
+    text = registry.render()
+    assert '# TYPE demo_total counter' in text
+    assert 'demo_total{source="a\\"b"} 2' in text
+    assert 'demo_seconds_bucket{op="x",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{op="x",le="1"} 2' in text
+    assert 'demo_seconds_bucket{op="x",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{op="x"} 3' in text
+    assert "demo_depth 3" in text
+    with pytest.raises(ValueError):
+        registry.counter("demo_total", "示例计数", ("other",))
+
+
+def test_data_source_status_and_cache_tiers():
+    @track_data_source("tushare", "stock_data")
+    def fetch(result):
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    fetch("| 日期 | 收盘 |")
+    fetch("❌ 未获取到数据")
+    fetch([])
+    with pytest.raises(RuntimeError):
+        fetch(RuntimeError("timeout"))
+
+    requests = get_metrics_registry().counter(
+        "tradingagents_data_source_requests_total", "", ("provider", "operation", "status"))
+    assert requests.value(provider="tushare", operation="stock_data", status="ok") == 1
+    assert requests.value(provider="tushare", operation="stock_data", status="error") == 2
+    assert requests.value(provider="tushare", operation="stock_data", status="empty") == 1
+    latency = get_metrics_registry().histogram(
+        "tradingagents_data_source_latency_seconds", "", ("provider", "operation"))
+    assert latency.snapshot(provider="tushare", operation="stock_data")["count"] == 4
+
+    @track_cache_lookup("redis")
+    def load(key):
+        return {"hit": 1}.get(key)
+
+    load("hit"), load("miss"), load("hit")
+    cache = get_metrics_registry().counter("tradingagents_cache_requests_total", "", ("tier", "result"))
+    assert cache.value(tier="redis", result="hit") == 2
+    assert cache.value(tier="redis", result="miss") == 1
+
+
+def test_llm_tokens_and_task_duration():
+    message = AIMessage(content="ok", usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150})
+    record_llm_call("dashscope", "qwen-plus", 1.2, ChatResult(generations=[ChatGeneration(message=message)]))
+    record_llm_call("dashscope", "qwen-plus", 0.0, status="cache_hit")
+
+    registry = get_metrics_registry()
+    tokens = registry.counter("tradingagents_llm_tokens_total", "", ("provider", "model", "type"))
+    assert tokens.value(provider="dashscope", model="qwen-plus", type="input") == 120
+    assert tokens.value(provider="dashscope", model="qwen-plus", type="output") == 30
+    calls = registry.counter("tradingagents_llm_requests_total", "", ("provider", "model", "status"))
+    assert calls.value(provider="dashscope", model="qwen-plus", status="cache_hit") == 1
+
+    with pytest.raises(ValueError):
+        with track_task("analysis"):
+            raise ValueError("boom")
+    with track_task("analysis"):
+        pass
+    duration = registry.histogram("tradingagents_task_duration_seconds", "", ("kind", "status"), buckets=metrics.TASK_BUCKETS)
+    assert duration.snapshot(kind="analysis", status="failed")["count"] == 1
+    assert duration.snapshot(kind="analysis", status="completed")["count"] == 1
+    assert registry.gauge("tradingagents_tasks_in_progress", "", ("kind",)).value(kind="analysis") == 0
+
+
+def test_metrics_endpoint(monkeypatch):
+    from app.routers import metrics as metrics_router
+
+    class _Queue:
+        async def stats(self):
+            return {"queued": 4, "processing": 1, "completed": 9, "failed": 0}
+
+    monkeypatch.setattr("app.services.queue_service.get_queue_service", lambda: _Queue())
+    app = FastAPI()
+    app.include_router(metrics_router.router)
+
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'tradingagents_queue_depth{queue="analysis",state="queued"} 4' in response.text
+    assert 'tradingagents_queue_depth{queue="analysis",state="processing"} 1' in response.text
+
+
+def test_standalone_metrics_server_for_worker_processes():
+    import socket
+    import urllib.request
+    from urllib.error import HTTPError
+
+    from tradingagents.utils.metrics import record_task_duration, start_metrics_server
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = start_metrics_server(port, "127.0.0.1")
+    try:
+        record_task_duration("queue_analysis", "completed", 42.0)
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as resp:
+            body = resp.read().decode("utf-8")
+            assert resp.headers["Content-Type"] == metrics.CONTENT_TYPE
+        assert 'tradingagents_task_duration_seconds_count{kind="queue_analysis",status="completed"} 1' in body
+        with pytest.raises(HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/other", timeout=5)
+
+        # 端口被占用或未配置时不启动，不影响进程
+        assert start_metrics_server(port, "127.0.0.1") is None
+        assert start_metrics_server(0) is None
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,107 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.graph import END, START, MessagesState, StateGraph
+from langgraph.prebuilt import ToolNode
+
+from tradingagents.agents.utils.tool_memo import (
+    get_tool_memo,
+    memoize_tool,
+    memoize_tool_results,
+    memoize_toolkit,
+)
+
+CALLS = []
+
+
+@tool
+def fetch_prices(ticker: str, start_date: str) -> str:
+    """测试用行情工具"""
+    CALLS.append((ticker, start_date))
+    time.sleep(0.05)
+    return f"{ticker}@{start_date}"
+
+
+@tool
+def flaky(ticker: str) -> str:
+    """测试用失败工具"""
+    CALLS.append(ticker)
+    raise RuntimeError("数据源不可用")
+
+
+class _Toolkit:
+    fetch_prices = staticmethod(fetch_prices)
+
+
+@pytest.fixture(autouse=True)
+def _reset_calls():
+    CALLS.clear()
+
+
+def test_passthrough_outside_run_and_reuse_inside():
+    proxy = memoize_tool(fetch_prices)
+    assert proxy.name == "fetch_prices" and proxy.args_schema is fetch_prices.args_schema
+
+    proxy.invoke({"ticker": "000001", "start_date": "2025-01-02"})
+    proxy.invoke({"ticker": "000001", "start_date": "2025-01-02"})
+    assert len(CALLS) == 2 and get_tool_memo() is None
+
+    with memoize_tool_results() as memo:
+        assert proxy.invoke({"ticker": "000001", "start_date": "2025-01-02"}) == "000001@2025-01-02"
+        assert proxy.invoke({"start_date": "2025-01-02 ", "ticker": "000001"}) == "000001@2025-01-02"
+        proxy.invoke({"ticker": "600000", "start_date": "2025-01-02"})
+    assert len(CALLS) == 4
+    stats = memo.get_stats()
+    assert stats["calls"] == 3 and stats["executed"] == 2 and stats["saved_calls"] == 1
+    assert stats["by_tool"]["fetch_prices"]["saved"] == 1
+
+
+def test_concurrent_identical_calls_share_one_fetch():
+    proxy = memoize_tool(fetch_prices)
+    with memoize_tool_results() as memo:
+        barrier = threading.Barrier(4)
+
+        def _call(_):
+            barrier.wait()
+            return proxy.invoke({"ticker": "AAPL", "start_date": "2025-01-02"})
+
+        # 与 LangGraph 一样，工作线程继承提交时的上下文
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, _call, i) for i in range(4)]
+            results = [f.result() for f in futures]
+    assert results == ["AAPL@2025-01-02"] * 4
+    assert len(CALLS) == 1 and memo.get_stats()["saved_calls"] == 3
+
+
+def test_errors_are_not_memoized():
+    proxy = memoize_tool(flaky)
+    with memoize_tool_results():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                proxy.invoke({"ticker": "000001"})
+    assert len(CALLS) == 2
+
+
+def test_toolkit_instance_and_tool_node_use_proxies():
+    toolkit = _Toolkit()
+    assert memoize_toolkit(toolkit) == 1 and memoize_toolkit(toolkit) == 0
+    assert _Toolkit.fetch_prices is fetch_prices
+
+    workflow = StateGraph(MessagesState)
+    workflow.add_node("tools", ToolNode([toolkit.fetch_prices]))
+    workflow.add_edge(START, "tools")
+    workflow.add_edge("tools", END)
+    graph = workflow.compile()
+    message = AIMessage(content="", tool_calls=[
+        {"name": "fetch_prices", "args": {"ticker": "000001", "start_date": "2025-01-02"}, "id": f"call_{i}"}
+        for i in range(2)
+    ])
+    with memoize_tool_results() as memo:
+        out = graph.invoke({"messages": [message]})
+    assert [m.content for m in out["messages"][1:]] == ["000001@2025-01-02"] * 2
+    assert len(CALLS) == 1 and memo.get_stats()["saved_calls"] == 1
@@ -0,0 +1,64 @@
+from langchain_core.tools import tool
+
+from tradingagents.agents.utils import tool_output_compactor as compactor
+from tradingagents.agents.utils.tool_output_compactor import (
+    compact_text,
+    compacting_tool,
+    estimate_tokens,
+    token_budget_for_model,
+    track_tool_output_compaction,
+)
+
+
+def _bars_report(days=365):
+    lines = ["# 000001 行情数据", "", "| 日期 | 收盘 | 成交量 |", "|---|---|---|"]
+    for i in range(days):
+        lines.append(f"| 2025-{1 + i // 31:02d}-{1 + i % 28:02d} | {10 + i * 0.01:.2f} | {1000 + i} |")
+    lines += ["", "最新价格: 13.64", "PE: 8.5, PB: 0.9"]
+    return "\n".join(lines)
+
+
+def test_estimate_tokens_counts_cjk_separately(monkeypatch):
+    monkeypatch.setattr(compactor, "_encoding", None)
+    monkeypatch.setattr(compactor, "_encoding_loaded", True)
+    assert estimate_tokens("市盈率") == 3
+    assert estimate_tokens("abcdefgh") == 2
+
+
+def test_table_keeps_recent_rows_and_summary():
+    text = _bars_report()
+    out = compact_text(text, budget=600)
+    assert estimate_tokens(out) <= 600 < estimate_tokens(text)
+    assert "共 365 行" in out and "收盘 首=10 末=13.64" in out
+    assert out.count("| 2025-") <= 20 and "| 13.64 |" in out
+    assert "PE: 8.5" in out
+
+
+def test_news_keeps_top_items():
+    text = "\n".join(f"### 新闻{i}\n{'公司公告内容' * 30}" for i in range(40))
+    out = compact_text(text, budget=1500, tool_name="get_stock_news_unified")
+    assert "### 新闻0" in out and "### 新闻39" not in out and "条新闻已省略" in out
+    assert estimate_tokens(out) <= 1500
+
+
+def test_budget_capped_by_context_window():
+    assert token_budget_for_model("qwen-turbo", 6000) == 2048
+    assert token_budget_for_model("qwen-turbo-latest", 6000) == 2048
+    assert token_budget_for_model("deepseek-chat", 6000) == 6000
+    assert token_budget_for_model("unknown-model", 3000) == 3000
+
+
+def test_compacting_tool_records_tokens_saved_per_node():
+    @tool
+    def get_stock_market_data_unified(ticker: str) -> str:
+        """测试用行情工具"""
+        return _bars_report()
+
+    proxy = compacting_tool(get_stock_market_data_unified, "tools_market", 600)
+    with track_tool_output_compaction() as tracker:
+        out = proxy.invoke({"ticker": "000001"})
+        proxy.invoke({"ticker": "000001"})
+    stats = tracker.get_stats()["by_node"]["tools_market"]
+    assert stats["calls"] == 2 and stats["compacted"] == 2
+    assert stats["tokens_after"] == 2 * estimate_tokens(out)
+    assert stats["tokens_saved"] == stats["tokens_before"] - stats["tokens_after"] > 0
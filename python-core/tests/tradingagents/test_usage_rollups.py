@@ -0,0 +1,255 @@
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+from tradingagents.utils.usage_rollups import (
+    RollupAccumulator,
+    rollup_window_query,
+    summarize_rollups,
+)
+
+
+def _record(ts, provider="dashscope", model="qwen-plus", cost=0.5, currency="CNY"):
+    return {"timestamp": ts, "provider": provider, "model_name": model, "input_tokens": 100,
+            "output_tokens": 50, "cost": cost, "currency": currency}
+
+
+def test_accumulator_merges_records_into_hour_and_day_buckets():
+    acc = RollupAccumulator()
+    acc.add(_record("2025-01-02T09:10:00+08:00"))
+    acc.add(_record("2025-01-02T09:40:00+08:00"))
+    acc.add(_record("2025-01-02T10:05:00+08:00"))
+
+    ops = {(f["granularity"], f["bucket"]): u["$inc"] for f, u in acc.drain()}
+    assert ops[("hour", "2025-01-02T09")]["requests"] == 2
+    assert ops[("hour", "2025-01-02T10")]["requests"] == 1
+    assert ops[("day", "2025-01-02")] == {"requests": 3, "input_tokens": 300, "output_tokens": 150, "cost": 1.5}
+    assert len(acc) == 0
+
+
+def test_window_query_reads_hours_for_first_day_then_days():
+    query = rollup_window_query(datetime(2025, 1, 1, 15, 30), datetime(2025, 1, 8, 15, 30), provider="openai")
+    hour_cond, day_cond = query["$or"]
+    assert hour_cond["bucket"] == {"$gte": "2025-01-01T15", "$lt": "2025-01-02"}
+    assert day_cond["bucket"] == {"$gte": "2025-01-02", "$lte": "2025-01-08"}
+    assert query["provider"] == "openai"
+
+
+def test_summarize_matches_raw_record_statistics():
+    docs = [
+        {"granularity": "hour", "bucket": "2025-01-01T15", "provider": "openai", "model_name": "gpt-4o",
+         "currency": "USD", "requests": 2, "input_tokens": 10, "output_tokens": 5, "cost": 0.2},
+        {"granularity": "day", "bucket": "2025-01-02", "provider": "dashscope", "model_name": "qwen-plus",
+         "currency": "CNY", "requests": 3, "input_tokens": 30, "output_tokens": 15, "cost": 1.5},
+    ]
+    summary = summarize_rollups(docs)
+    assert summary["total_requests"] == 5
+    assert summary["cost_by_currency"] == {"USD": 0.2, "CNY": 1.5}
+    assert summary["by_model"]["openai/gpt-4o"]["requests"] == 2
+    assert set(summary["by_date"]) == {"2025-01-01", "2025-01-02"}
+
+
+class _Result:
+    def __init__(self, upserted_id=None, modified_count=0, inserted_id=None):
+        self.upserted_id = upserted_id
+        self.modified_count = modified_count
+        self.inserted_id = inserted_id
+
+
+class _Coll:
+    """内存集合：支持回填与写入用到的查询/更新操作，_id 重复时抛 DuplicateKeyError"""
+
+    def __init__(self):
+        self.docs = []
+        self.fail_bulk = False
+
+    @staticmethod
+    def _match(doc, query):
+        for key, cond in query.items():
+            if isinstance(cond, dict):
+                if "$ne" in cond and doc.get(key) == cond["$ne"]:
+                    return False
+                if "$exists" in cond and (key in doc) != cond["$exists"]:
+                    return False
+                if "$lt" in cond and not (key in doc and doc[key] < cond["$lt"]):
+                    return False
+                if "$in" in cond and doc.get(key) not in cond["$in"]:
+                    return False
+            elif doc.get(key) != cond:
+                return False
+        return True
+
+    def find(self, query, projection=None):
+        return [dict(d) for d in self.docs if self._match(d, query)]
+
+    def insert_one(self, doc):
+        doc.setdefault("_id", f"raw-{len(self.docs)}")
+        self.docs.append(dict(doc))
+        return _Result(inserted_id=doc["_id"])
+
+    def _update(self, doc, update):
+        for key, value in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + value
+        doc.update(update.get("$set", {}))
+
+    def update_one(self, query, update, upsert=False):
+        for doc in self.docs:
+            if self._match(doc, query):
+                self._update(doc, update)
+                return _Result(modified_count=1)
+        if not upsert:
+            return _Result()
+        doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+        if "_id" in doc and any(d.get("_id") == doc["_id"] for d in self.docs):
+            raise DuplicateKeyError("E11000 duplicate key")
+        doc.update(update.get("$setOnInsert", {}))
+        self._update(doc, update)
+        doc.setdefault("_id", len(self.docs))
+        self.docs.append(doc)
+        return _Result(upserted_id=doc["_id"])
+
+    def update_many(self, query, update):
+        for doc in self.docs:
+            if self._match(doc, query):
+                self._update(doc, update)
+
+    def delete_one(self, query):
+        for doc in self.docs:
+            if self._match(doc, query):
+                self.docs.remove(doc)
+                return
+
+    def bulk_write(self, ops, ordered=False):
+        if self.fail_bulk:
+            raise RuntimeError("rollup write failed")
+        for op in ops:
+            self.update_one(op._filter, op._doc, upsert=op._upsert)
+
+
+class _AsyncCursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _AsyncColl:
+    def __init__(self, coll):
+        self.coll = coll
+
+    async def create_index(self, *args, **kwargs):
+        return "rollup_key"
+
+    def find(self, query, projection=None):
+        return _AsyncCursor(self.coll.find(query, projection))
+
+    async def insert_one(self, doc):
+        return self.coll.insert_one(doc)
+
+    async def update_one(self, *args, **kwargs):
+        return self.coll.update_one(*args, **kwargs)
+
+    async def bulk_write(self, ops, ordered=False):
+        self.coll.bulk_write(ops, ordered)
+
+    async def delete_one(self, query):
+        self.coll.delete_one(query)
+
+
+def test_backfill_runs_once_across_owners_and_skips_live_records(monkeypatch):
+    import asyncio
+
+    from app.models.config import UsageRecord
+    from app.services import usage_statistics_service as uss
+    from tradingagents.config.mongodb_storage import MongoDBStorage
+
+    raw, rollups = _Coll(), _Coll()
+    raw.docs = [_record("2025-01-02T09:10:00+08:00"), _record("2025-01-02T09:40:00+08:00")]
+    db = {"token_usage": _AsyncColl(raw), "token_usage_rollups": _AsyncColl(rollups)}
+    monkeypatch.setattr(uss, "get_mongo_db", lambda: db)
+    service = uss.UsageStatisticsService()
+
+    # 回填开始前已有一条写入时同步累加汇总的记录
+    live = UsageRecord(timestamp="2025-01-02T09:50:00+08:00", provider="dashscope", model_name="qwen-plus",
+                       input_tokens=100, output_tokens=50, cost=0.5, session_id="s")
+    assert asyncio.run(service.add_usage_record(live))
+
+    storages = []
+    for _ in range(2):
+        storage = MongoDBStorage.__new__(MongoDBStorage)
+        storage.collection, storage.rollup_collection = raw, rollups
+        storages.append(storage)
+
+    storages[0]._backfill_rollups()
+    assert asyncio.run(service.ensure_rollups()) == 0
+    storages[1]._backfill_rollups()
+
+    day = next(d for d in rollups.docs if d.get("granularity") == "day")
+    assert day["requests"] == 3 and day["cost"] == 1.5
+    marker = next(d for d in rollups.docs if d.get("_id") == "backfill")
+    assert marker["owner"].startswith("tradingagents:") and marker["rollups"] == 2
+
+
+def _storage(raw, rollups):
+    from tradingagents.config.mongodb_storage import MongoDBStorage
+
+    storage = MongoDBStorage.__new__(MongoDBStorage)
+    storage.collection, storage.rollup_collection = raw, rollups
+    return storage
+
+
+def test_failed_rollup_write_leaves_record_for_backfill(monkeypatch):
+    import asyncio
+
+    from app.models.config import UsageRecord
+    from app.services import usage_statistics_service as uss
+
+    raw, rollups = _Coll(), _Coll()
+    db = {"token_usage": _AsyncColl(raw), "token_usage_rollups": _AsyncColl(rollups)}
+    monkeypatch.setattr(uss, "get_mongo_db", lambda: db)
+
+    rollups.fail_bulk = True
+    record = UsageRecord(timestamp="2025-01-02T09:50:00+08:00", provider="dashscope", model_name="qwen-plus",
+                         input_tokens=100, output_tokens=50, cost=0.5, session_id="s")
+    assert not asyncio.run(uss.UsageStatisticsService().add_usage_record(record))
+    assert "_rolled_up" not in raw.docs[0]
+
+    rollups.fail_bulk = False
+    _storage(raw, rollups)._backfill_rollups()
+    day = next(d for d in rollups.docs if d.get("granularity") == "day")
+    assert day["requests"] == 1 and day["cost"] == 0.5
+
+
+def test_backfill_marker_is_released_on_error_and_reclaimed_when_stale():
+    from tradingagents.utils.usage_rollups import BACKFILL_STALE_SECONDS
+
+    raw, rollups = _Coll(), _Coll()
+    raw.docs = [_record("2025-01-02T09:10:00+08:00")]
+
+    # 回填出错：释放标记，下一个进程可以重试
+    rollups.fail_bulk = True
+    _storage(raw, rollups)._backfill_rollups()
+    assert not any(d.get("_id") == "backfill" for d in rollups.docs)
+
+    # 认领方崩溃遗留的未完成标记：未超时时跳过，超时后重新认领
+    rollups.fail_bulk = False
+    started = datetime.now(timezone.utc) - timedelta(seconds=60)
+    rollups.docs.append({"_id": "backfill", "granularity": "backfill", "owner": "dead", "started_at": started})
+    _storage(raw, rollups)._backfill_rollups()
+    assert not any(d.get("granularity") == "day" for d in rollups.docs)
+
+    rollups.docs[0]["started_at"] = started - timedelta(seconds=BACKFILL_STALE_SECONDS)
+    _storage(raw, rollups)._backfill_rollups()
+    marker = next(d for d in rollups.docs if d.get("_id") == "backfill")
+    assert marker["owner"].startswith("tradingagents:") and marker["rollups"] == 2
+    assert next(d for d in rollups.docs if d.get("granularity") == "day")["requests"] == 1
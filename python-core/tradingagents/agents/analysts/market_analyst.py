@@ -274,7 +274,7 @@ CRITICAL: ONLY CHINESE OUTPUT. LATIN CHARACTERS (A-Z) ARE STRICTLY FORBIDDEN.
         # 打印LLM响应
         logger.info(f"📊 [市场分析师] ========== LLM响应开始 ==========")
         logger.info(f"📊 [市场分析师] 响应类型: {type(result).__name__}")
-        logger.info(f"📊 [市场分析师] 响应内容: {str(result.content)[:1000]}...")
+        logger.info("📊 [市场分析师] 响应内容: %.1000s...", result.content)
         if hasattr(result, 'tool_calls') and result.tool_calls:
             logger.info(f"📊 [市场分析师] 工具调用: {result.tool_calls}")
         logger.info(f"📊 [市场分析师] ========== LLM响应结束 ==========")
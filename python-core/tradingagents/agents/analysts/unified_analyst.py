@@ -119,13 +119,14 @@ def create_unified_analyst(llm, toolkit):
             logger.info(f"🎯 [统一分析-两阶段] 开始分析 {ticker} - {date_str}")
 
             # ==================== 步骤1：获取原始数据 ====================
+            # 工具是 LangChain StructuredTool，需要 .invoke(参数字典) 调用；propagate 已并发预取时直接复用结果
             logger.info(f"📊 [数据获取] 开始获取4类数据...")
 
             # 1. 市场数据
             market_data = "市场数据暂无"
             try:
-                market_data = toolkit.get_stock_market_data_unified(
-                    ticker=ticker, start_date=date_str, end_date=date_str
+                market_data = toolkit.get_stock_market_data_unified.invoke(
+                    {"ticker": ticker, "start_date": date_str, "end_date": date_str}
                 )
                 logger.info(f"✅ [市场数据] 获取成功，长度: {len(str(market_data))}字符")
             except Exception as e:
@@ -134,8 +135,8 @@ def create_unified_analyst(llm, toolkit):
             # 2. 基本面数据
             fundamentals_data = "基本面数据暂无"
             try:
-                fundamentals_data = toolkit.get_stock_fundamentals_unified(
-                    ticker=ticker, start_date=date_str, end_date=date_str
+                fundamentals_data = toolkit.get_stock_fundamentals_unified.invoke(
+                    {"ticker": ticker, "start_date": date_str, "end_date": date_str}
                 )
                 logger.info(f"✅ [基本面数据] 获取成功，长度: {len(str(fundamentals_data))}字符")
             except Exception as e:
@@ -154,8 +155,8 @@ def create_unified_analyst(llm, toolkit):
             # 4. 情绪数据
             sentiment_data = "情绪数据暂无"
             try:
-                sentiment_data = toolkit.get_stock_sentiment_unified(
-                    ticker=ticker, curr_date=date_str
+                sentiment_data = toolkit.get_stock_sentiment_unified.invoke(
+                    {"ticker": ticker, "curr_date": date_str}
                 )
                 logger.info(f"✅ [情绪数据] 获取成功，长度: {len(str(sentiment_data))}字符")
             except Exception as e:
@@ -870,7 +870,7 @@ class Toolkit:
 
                     # 🔍 调试：打印返回数据的前500字符
                     logger.info(f"🔍 [基本面工具调试] A股价格数据返回长度: {len(current_price_data)}")
-                    logger.info(f"🔍 [基本面工具调试] A股价格数据前500字符:\n{current_price_data[:500]}")
+                    logger.info("🔍 [基本面工具调试] A股价格数据前500字符:\n%.500s", current_price_data)
 
                     result_data.append(f"## A股当前价格信息\n{current_price_data}")
                 except Exception as e:
@@ -889,7 +889,7 @@ class Toolkit:
 
                     # 🔍 调试：打印返回数据的前500字符
                     logger.info(f"🔍 [基本面工具调试] A股基本面数据返回长度: {len(fundamentals_data)}")
-                    logger.info(f"🔍 [基本面工具调试] A股基本面数据前500字符:\n{fundamentals_data[:500]}")
+                    logger.info("🔍 [基本面工具调试] A股基本面数据前500字符:\n%.500s", fundamentals_data)
 
                     result_data.append(f"## A股基本面财务数据\n{fundamentals_data}")
                 except Exception as e:
@@ -913,7 +913,7 @@ class Toolkit:
 
                     # 🔍 调试：打印返回数据的前500字符
                     logger.info(f"🔍 [基本面工具调试] 港股数据返回长度: {len(hk_data)}")
-                    logger.info(f"🔍 [基本面工具调试] 港股数据前500字符:\n{hk_data[:500]}")
+                    logger.info("🔍 [基本面工具调试] 港股数据前500字符:\n%.500s", hk_data)
 
                     # 检查数据质量
                     if hk_data and len(hk_data) > 100 and "❌" not in hk_data:
@@ -1094,7 +1094,7 @@ class Toolkit:
 
                     # 🔍 调试：打印返回数据的前500字符
                     logger.info(f"🔍 [市场工具调试] A股数据返回长度: {len(stock_data)}")
-                    logger.info(f"🔍 [市场工具调试] A股数据前500字符:\n{stock_data[:500]}")
+                    logger.info("🔍 [市场工具调试] A股数据前500字符:\n%.500s", stock_data)
 
                     result_data.append(f"## A股市场数据\n{stock_data}")
                 except Exception as e:
@@ -1111,7 +1111,7 @@ class Toolkit:
 
                     # 🔍 调试：打印返回数据的前500字符
                     logger.info(f"🔍 [市场工具调试] 港股数据返回长度: {len(hk_data)}")
-                    logger.info(f"🔍 [市场工具调试] 港股数据前500字符:\n{hk_data[:500]}")
+                    logger.info("🔍 [市场工具调试] 港股数据前500字符:\n%.500s", hk_data)
 
                     result_data.append(f"## 港股市场数据\n{hk_data}")
                 except Exception as e:
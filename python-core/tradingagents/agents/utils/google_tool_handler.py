@@ -213,7 +213,9 @@ class GoogleToolCallHandler:
                     logger.warning(f"[{analyst_name}] ⚠️ 未找到工具: {tool_name}")
                     logger.debug(f"[{analyst_name}] ⚠️ 工具名称不匹配，期望: {tool_name}, 可用: {available_tools}")
                 
-                # 创建工具消息
+                # 创建工具消息（按模型 token 预算压缩工具输出）
+                from tradingagents.agents.utils.tool_output_compactor import compact_for_llm
+                tool_result = compact_for_llm(str(tool_result), tool_name, analyst_name, llm)
                 tool_message = ToolMessage(
                     content=str(tool_result),
                     tool_call_id=tool_id
@@ -0,0 +1,187 @@
+"""
+单次分析内的工具结果复用
+- propagate 期间通过 memoize_tool_results() 注册 ToolResultMemo（基于 contextvars，LangGraph 的工作线程会继承）
+- memoize_toolkit() 把 Toolkit 实例上的工具替换为带复用的代理：ToolNode、Google 工具调用循环、分析师直接调用都经过它
+- 键为 (工具名, 规范化参数)；相同调用并发进行时只执行一次，其余调用等待同一结果（in-flight 去重）
+- 不在分析上下文内时代理直接透传；异常不缓存，后续调用会重新执行
+- 预取阶段（tradingagents.graph.prefetch）在 prefetching() 上下文内调用工具，预取结果被分析师复用时统计隐藏的工具耗时
+"""
+
+import contextvars
+import json
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from tradingagents.utils.logging_manager import get_logger
+from tradingagents.utils.metrics import record_cache_lookup
+logger = get_logger('agents')
+
+
+def normalize_tool_args(args: Any) -> str:
+    """参数规范化：键排序、字符串去首尾空白、忽略 None 值"""
+    if isinstance(args, dict):
+        args = {
+            k: v.strip() if isinstance(v, str) else v
+            for k, v in args.items() if v is not None
+        }
+    elif isinstance(args, str):
+        args = args.strip()
+    return json.dumps(args, ensure_ascii=False, sort_keys=True, default=str)
+
+
+_prefetching: contextvars.ContextVar[bool] = contextvars.ContextVar("tool_memo_prefetching", default=False)
+
+
+@contextmanager
+def prefetching():
+    """标记当前上下文内的工具调用来自预取阶段"""
+    token = _prefetching.set(True)
+    try:
+        yield
+    finally:
+        _prefetching.reset(token)
+
+
+class ToolResultMemo:
+    """一次分析运行内的工具结果缓存（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Future] = {}
+        self._elapsed: Dict[Tuple[str, str], float] = {}
+        self._by_tool: Dict[str, Dict[str, float]] = {}
+        # 预取的键 -> 被分析师复用的次数
+        self._prefetched: Dict[Tuple[str, str], int] = {}
+        self._prefetch = {"used": 0, "hidden_seconds": 0.0}
+
+    def _tool_stats(self, tool_name: str) -> Dict[str, float]:
+        return self._by_tool.setdefault(tool_name, {"calls": 0, "executed": 0, "saved": 0, "saved_seconds": 0.0})
+
+    def call(self, tool_name: str, args: Any, fn: Callable[[], Any]) -> Any:
+        """执行或复用一次工具调用"""
+        key = (tool_name, normalize_tool_args(args))
+        with self._lock:
+            stats = self._tool_stats(tool_name)
+            stats["calls"] += 1
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._entries[key] = future
+                stats["executed"] += 1
+                if _prefetching.get():
+                    self._prefetched[key] = 0
+        record_cache_lookup("tool_memo", not owner)
+
+        if not owner:
+            wait_start = time.time()
+            result = future.result()
+            with self._lock:
+                # 节省的时间按原始执行耗时估算，扣除本次等待（in-flight 共享时等待的部分并未节省）
+                saved = max(0.0, self._elapsed.get(key, 0.0) - (time.time() - wait_start))
+                stats["saved"] += 1
+                stats["saved_seconds"] += saved
+                if key in self._prefetched and not _prefetching.get():
+                    self._prefetched[key] += 1
+                    self._prefetch["used"] += 1
+                    self._prefetch["hidden_seconds"] += saved
+            logger.info(f"♻️ [工具复用] {tool_name} 复用本次分析内的结果")
+            return result
+
+        start = time.time()
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._entries.pop(key, None)
+                self._prefetched.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._elapsed[key] = time.time() - start
+        future.set_result(result)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息（总调用次数、实际执行次数、复用次数、估算节省的时间）"""
+        with self._lock:
+            by_tool = {name: dict(s) for name, s in self._by_tool.items()}
+        for s in by_tool.values():
+            s["saved_seconds"] = round(s["saved_seconds"], 2)
+        return {
+            "calls": sum(s["calls"] for s in by_tool.values()),
+            "executed": sum(s["executed"] for s in by_tool.values()),
+            "saved_calls": sum(s["saved"] for s in by_tool.values()),
+            "saved_seconds": round(sum(s["saved_seconds"] for s in by_tool.values()), 2),
+            "by_tool": by_tool,
+        }
+
+    def get_prefetch_stats(self) -> Dict[str, Any]:
+        """预取统计：预取成功的调用数、被复用次数、未被使用的预取数、隐藏的工具耗时"""
+        with self._lock:
+            return {
+                "prefetched": len(self._prefetched),
+                "used": self._prefetch["used"],
+                "unused": sum(1 for n in self._prefetched.values() if n == 0),
+                "hidden_seconds": round(self._prefetch["hidden_seconds"], 2),
+            }
+
+
+_tool_memo: contextvars.ContextVar[Optional[ToolResultMemo]] = contextvars.ContextVar("tool_result_memo", default=None)
+
+
+def get_tool_memo() -> Optional[ToolResultMemo]:
+    """获取当前上下文的工具结果缓存（未注册时返回 None）"""
+    return _tool_memo.get()
+
+
+@contextmanager
+def memoize_tool_results(enabled: bool = True) -> Iterator[Optional[ToolResultMemo]]:
+    """在上下文内启用工具结果复用；enabled 为 False 时不启用"""
+    if not enabled:
+        yield None
+        return
+    memo = ToolResultMemo()
+    token = _tool_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _tool_memo.reset(token)
+
+
+def memoize_tool(tool: BaseTool) -> BaseTool:
+    """为工具创建复用代理（名称、描述、参数 schema 与原工具一致）"""
+
+    def _run(**kwargs):
+        memo = get_tool_memo()
+        if memo is None:
+            return tool.invoke(kwargs)
+        return memo.call(tool.name, kwargs, lambda: tool.invoke(kwargs))
+
+    proxy = StructuredTool.from_function(
+        func=_run,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        infer_schema=False,
+    )
+    proxy.metadata = {**(tool.metadata or {}), "memoized": True}
+    return proxy
+
+
+def memoize_toolkit(toolkit) -> int:
+    """把 Toolkit 实例上的全部工具替换为复用代理（只影响该实例），返回替换的工具数"""
+    count = 0
+    for name in dir(type(toolkit)):
+        if name.startswith("_"):
+            continue
+        attr = getattr(toolkit, name, None)
+        if isinstance(attr, BaseTool) and not (attr.metadata or {}).get("memoized"):
+            setattr(toolkit, name, memoize_tool(attr))
+            count += 1
+    return count
@@ -0,0 +1,310 @@
+"""
+工具输出按 token 预算压缩
+- 统一行情/基本面/新闻工具返回的 Markdown 往往很长，整体写入分析师消息历史后，后续每轮 LLM 调用都要重复付出这些 prompt token
+- 按结构逐级压缩，直到不超过预算：
+  1. 表格 / CSV 行情：保留最近 N 行，较早的行汇总为数值列统计（首/末/最小/最大/均值）
+  2. 新闻列表：只保留前 k 条（新闻工具按时间/相关度排序）
+  3. 关键指标：保留标题与包含 PE/PB/ROE/价格等关键指标的行
+  4. 仍超出时按 token 截断
+- token 数优先用 tiktoken 计算，编码文件不可用（如离线环境）时退回按中文字符/英文字符分别估算
+- 预算：tool_output_token_budget 配置（默认 6000），且不超过模型上下文窗口的 1/4
+- propagate 期间通过 track_tool_output_compaction() 按节点统计节省的 token
+"""
+
+import contextvars
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+DEFAULT_TOOL_OUTPUT_TOKEN_BUDGET = 6000
+
+# 模型名前缀 -> 上下文窗口（token），按最长前缀匹配
+MODEL_CONTEXT_TOKENS = {
+    "qwen-turbo": 8192,
+    "qwen-plus": 131072,
+    "qwen-max": 32768,
+    "qwen-long": 1000000,
+    "deepseek": 65536,
+    "glm-4": 128000,
+    "ernie": 8192,
+    "gpt-3.5": 16385,
+    "gpt-4o": 128000,
+    "gpt-4": 8192,
+    "o4-mini": 200000,
+    "gemini": 1000000,
+    "claude": 200000,
+}
+
+KEY_METRIC_KEYWORDS = (
+    "PE", "PB", "PS", "ROE", "ROA", "EPS", "市盈率", "市净率", "市销率", "净资产收益率",
+    "毛利率", "净利率", "负债率", "营收", "营业收入", "净利润", "现金流", "股息", "市值",
+    "最新价", "最新价格", "涨跌", "目标价", "估值", "MA5", "MA20", "MACD", "RSI",
+)
+
+NEWS_ITEM_RE = re.compile(r"^\s*(#{2,4}\s+|\d{1,3}[.、)]\s*|【)")
+_CJK_RE = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+# ---------------- token 估算 ----------------
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """tiktoken 编码（只尝试加载一次，失败后一直使用估算）"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logger.debug(f"tiktoken 不可用，使用字符估算 token: {e}")
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本 token 数"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # 中文约 1 字符/token，其余（英文、数字、符号）约 4 字符/token
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def token_budget_for_model(model_name: Optional[str], budget: Optional[int] = None) -> int:
+    """模型的工具输出 token 预算：配置预算与上下文窗口 1/4 取小"""
+    if budget is None:
+        from tradingagents.agents.utils.agent_utils import Toolkit
+        budget = int(Toolkit._config.get("tool_output_token_budget", DEFAULT_TOOL_OUTPUT_TOKEN_BUDGET))
+    name = (model_name or "").lower().split("/")[-1]
+    matches = [prefix for prefix in MODEL_CONTEXT_TOKENS if name.startswith(prefix)]
+    if matches:
+        budget = min(budget, MODEL_CONTEXT_TOKENS[max(matches, key=len)] // 4)
+    return budget
+
+
+# ---------------- 结构化压缩 ----------------
+
+def _split_blocks(lines: List[str]) -> List[Tuple[str, List[str]]]:
+    """按结构切分为 table / csv / text 块"""
+    blocks: List[Tuple[str, List[str]]] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.lstrip().startswith("|"):
+            j = i
+            while j < len(lines) and lines[j].lstrip().startswith("|"):
+                j += 1
+            blocks.append(("table", lines[i:j]))
+            i = j
+            continue
+        commas = line.count(",")
+        if commas >= 2:
+            j = i
+            while j < len(lines) and lines[j].count(",") == commas:
+                j += 1
+            if j - i >= 4:
+                blocks.append(("csv", lines[i:j]))
+                i = j
+                continue
+        if blocks and blocks[-1][0] == "text":
+            blocks[-1][1].append(line)
+        else:
+            blocks.append(("text", [line]))
+        i += 1
+    return blocks
+
+
+def _to_number(cell: str) -> Optional[float]:
+    cell = cell.strip().replace(",", "").replace("¥", "").replace("$", "").rstrip("%")
+    try:
+        return float(cell)
+    except ValueError:
+        return None
+
+
+def _column_summary(header: List[str], rows: List[List[str]], max_columns: int = 6) -> str:
+    """数值列统计（首/末/最小/最大/均值）"""
+    parts = []
+    for col, name in enumerate(header):
+        values = [_to_number(r[col]) for r in rows if col < len(r)]
+        if not values or any(v is None for v in values):
+            continue
+        parts.append(
+            f"{name.strip()} 首={values[0]:g} 末={values[-1]:g} 最小={min(values):g} "
+            f"最大={max(values):g} 均值={sum(values) / len(values):.4g}"
+        )
+        if len(parts) >= max_columns:
+            break
+    return "；".join(parts)
+
+
+def _compact_rows(block: List[str], kind: str, keep_rows: int) -> List[str]:
+    if kind == "table":
+        has_separator = len(block) > 1 and set(block[1].replace("|", "").strip()) <= set("-: ")
+        head = block[:2] if has_separator else block[:1]
+        split = lambda line: line.strip().strip("|").split("|")
+    else:
+        head = block[:1]
+        split = lambda line: line.split(",")
+    rows = block[len(head):]
+    if len(rows) <= keep_rows:
+        return block
+    summary = _column_summary(split(head[0]), [split(r) for r in rows])
+    note = f"（共 {len(rows)} 行，已省略较早的 {len(rows) - keep_rows} 行"
+    note += f"；全部行统计：{summary}）" if summary else "）"
+    return [note] + head + rows[-keep_rows:]
+
+
+def _top_news(lines: List[str], top_k: int) -> List[str]:
+    """保留前 top_k 条新闻（条目以标题/编号/【开头）"""
+    starts = [i for i, line in enumerate(lines) if NEWS_ITEM_RE.match(line)]
+    if len(starts) <= top_k:
+        return lines
+    cut = starts[top_k]
+    return lines[:cut] + [f"（其余 {len(starts) - top_k} 条新闻已省略）"]
+
+
+def _key_lines(lines: List[str]) -> List[str]:
+    """只保留标题、表头与包含关键指标的行"""
+    kept = []
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith(("#", "（共", "（其余")) or any(k in stripped for k in KEY_METRIC_KEYWORDS):
+            kept.append(line)
+    return kept
+
+
+def _truncate(text: str, budget: int) -> str:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:budget])
+    # 估算模式：按比例截断后逐步收缩
+    cut = max(1, int(len(text) * budget / max(estimate_tokens(text), 1)))
+    while cut > 1 and estimate_tokens(text[:cut]) > budget:
+        cut = int(cut * 0.9)
+    return text[:cut]
+
+
+def compact_text(text: str, budget: int, tool_name: str = "") -> str:
+    """把文本压缩到 budget token 以内（未超出预算时原样返回）"""
+    if budget <= 0 or estimate_tokens(text) <= budget:
+        return text
+    is_news = "news" in tool_name or "新闻" in tool_name
+    blocks = _split_blocks(text.splitlines())
+
+    candidate = text
+    for level in (20, 10, 5):
+        lines: List[str] = []
+        for kind, block in blocks:
+            lines.extend(_compact_rows(block, kind, level) if kind in ("table", "csv") else block)
+        if is_news:
+            lines = _top_news(lines, level)
+        candidate = "\n".join(lines)
+        if estimate_tokens(candidate) <= budget:
+            return candidate
+
+    key_only = "\n".join(_key_lines(candidate.splitlines()))
+    if key_only and estimate_tokens(key_only) <= budget:
+        return key_only + "\n（已按 token 预算仅保留关键指标）"
+    base = key_only if not is_news and key_only else candidate
+    return _truncate(base, budget) + "\n...（已按 token 预算截断）"
+
+
+# ---------------- 运行内统计 ----------------
+
+class CompactionTracker:
+    """按节点统计工具输出压缩前后的 token"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_node: Dict[str, Dict[str, int]] = {}
+
+    def record(self, node: str, before: int, after: int):
+        with self._lock:
+            s = self._by_node.setdefault(node, {"calls": 0, "compacted": 0, "tokens_before": 0, "tokens_after": 0})
+            s["calls"] += 1
+            s["compacted"] += int(after < before)
+            s["tokens_before"] += before
+            s["tokens_after"] += after
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_node = {node: {**s, "tokens_saved": s["tokens_before"] - s["tokens_after"]} for node, s in self._by_node.items()}
+        return {
+            "tokens_saved": sum(s["tokens_saved"] for s in by_node.values()),
+            "by_node": by_node,
+        }
+
+
+_tracker: contextvars.ContextVar[Optional[CompactionTracker]] = contextvars.ContextVar("tool_output_compaction", default=None)
+
+
+@contextmanager
+def track_tool_output_compaction(enabled: bool = True) -> Iterator[Optional[CompactionTracker]]:
+    """在上下文内统计工具输出压缩；enabled 为 False 时不启用"""
+    if not enabled:
+        yield None
+        return
+    tracker = CompactionTracker()
+    token = _tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _tracker.reset(token)
+
+
+def compact_tool_output(result: Any, tool_name: str, node: str, budget: int) -> Any:
+    """压缩一次工具输出并记录统计（非字符串结果原样返回）"""
+    if not isinstance(result, str):
+        return result
+    before = estimate_tokens(result)
+    compacted = compact_text(result, budget, tool_name) if before > budget else result
+    after = estimate_tokens(compacted) if compacted is not result else before
+    tracker = _tracker.get()
+    if tracker is not None:
+        tracker.record(node, before, after)
+    if after < before:
+        logger.info(f"✂️ [工具输出压缩] {node}/{tool_name}: {before} -> {after} tokens (预算 {budget})")
+    return compacted
+
+
+def compact_for_llm(result: Any, tool_name: str, node: str, llm: Any) -> Any:
+    """按 llm 的模型预算压缩工具输出（tool_output_compaction 关闭时原样返回）"""
+    from tradingagents.agents.utils.agent_utils import Toolkit
+    if not Toolkit._config.get("tool_output_compaction", True):
+        return result
+    return compact_tool_output(result, tool_name, node, token_budget_for_model(getattr(llm, "model_name", None)))
+
+
+def compacting_tool(tool: BaseTool, node: str, budget: int) -> BaseTool:
+    """为工具创建压缩代理（名称、描述、参数 schema 与原工具一致）"""
+
+    def _run(**kwargs):
+        return compact_tool_output(tool.invoke(kwargs), tool.name, node, budget)
+
+    proxy = StructuredTool.from_function(
+        func=_run,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        infer_schema=False,
+    )
+    proxy.metadata = {**(tool.metadata or {}), "compacted": True}
+    return proxy
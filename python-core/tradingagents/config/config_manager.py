@@ -12,6 +12,8 @@
 import json
 import os
 import re
+import threading
+import time
 import warnings
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -58,6 +60,22 @@ except Exception as e:
     MongoDBStorage = None
 
 
+# settings 中可由环境变量覆盖的字段 -> 环境变量名
+_SETTINGS_ENV_VARS = {
+    "finnhub_api_key": "FINNHUB_API_KEY",
+    "reddit_client_id": "REDDIT_CLIENT_ID",
+    "reddit_client_secret": "REDDIT_CLIENT_SECRET",
+    "reddit_user_agent": "REDDIT_USER_AGENT",
+    "results_dir": "TRADINGAGENTS_RESULTS_DIR",
+    "log_level": "TRADINGAGENTS_LOG_LEVEL",
+    "data_dir": "TRADINGAGENTS_DATA_DIR",  # 数据目录环境变量
+    "cache_dir": "TRADINGAGENTS_CACHE_DIR",  # 缓存目录环境变量
+}
+
+# 设置快照有效期（秒）：期间读取设置不访问文件系统
+SETTINGS_CHECK_INTERVAL = 1.0
+
+
 class ConfigManager:
     """配置管理器"""
     
@@ -67,9 +85,20 @@ class ConfigManager:
 
         self.models_file = self.config_dir / "models.json"
         self.pricing_file = self.config_dir / "pricing.json"
-        self.usage_file = self.config_dir / "usage.json"
+        # 使用记录：追加写入的 JSONL；旧版 JSON 数组文件在首次访问时迁移
+        self.usage_file = self.config_dir / "usage.jsonl"
+        self.legacy_usage_file = self.config_dir / "usage.json"
+        self._usage_lock = threading.Lock()
+        self._usage_line_count: Optional[int] = None
         self.settings_file = self.config_dir / "settings.json"
 
+        # 设置内存快照（按文件 mtime/大小与环境变量失效）
+        self._settings_lock = threading.RLock()
+        self._settings_snapshot: Optional[Dict[str, Any]] = None
+        self._settings_signature: Optional[tuple] = None
+        self._settings_checked_at = 0.0
+        self._settings_generation = 0
+
         # 加载.env文件（保持向后兼容）
         self._load_env_file()
 
@@ -307,8 +336,7 @@ class ConfigManager:
                 models = [ModelConfig(**item) for item in data]
 
                 # 获取设置
-                settings = self.load_settings()
-                openai_enabled = settings.get("openai_enabled", False)
+                openai_enabled = self.get_setting("openai_enabled", False)
 
                 # 合并.env中的API密钥（优先级更高）
                 for model in models:
@@ -363,26 +391,69 @@ class ConfigManager:
         except Exception as e:
             logger.error(f"保存定价配置失败: {e}")
     
+    def _migrate_legacy_usage_file(self):
+        """将旧版 usage.json（JSON 数组）转换为 usage.jsonl"""
+        if self.usage_file.exists() or not self.legacy_usage_file.exists():
+            return
+        try:
+            with open(self.legacy_usage_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.save_usage_records([UsageRecord(**item) for item in data])
+            self.legacy_usage_file.rename(self.legacy_usage_file.with_name("usage.json.migrated"))
+            logger.info(f"✅ 使用记录已迁移为 JSONL: {len(data)} 条")
+        except Exception as e:
+            logger.error(f"迁移旧版使用记录失败: {e}")
+
     def load_usage_records(self) -> List[UsageRecord]:
         """加载使用记录"""
+        self._migrate_legacy_usage_file()
+        records = []
         try:
             if not self.usage_file.exists():
                 return []
             with open(self.usage_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return [UsageRecord(**item) for item in data]
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        records.append(UsageRecord(**json.loads(line)))
+                    except Exception:
+                        # 进程中断可能留下不完整的末行
+                        continue
         except Exception as e:
             logger.error(f"加载使用记录失败: {e}")
-            return []
+        return records
     
     def save_usage_records(self, records: List[UsageRecord]):
-        """保存使用记录"""
+        """保存使用记录（整体重写，用于迁移与压缩）"""
         try:
-            data = [asdict(record) for record in records]
-            with open(self.usage_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            tmp_file = self.usage_file.with_suffix(".jsonl.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+            os.replace(tmp_file, self.usage_file)
+            self._usage_line_count = len(records)
         except Exception as e:
             logger.error(f"保存使用记录失败: {e}")
+
+    def _append_usage_record(self, record: UsageRecord):
+        """追加一条使用记录；超过 max_usage_records 的 20% 后压缩为最近的 max_usage_records 条"""
+        max_records = self.get_setting("max_usage_records", 10000)
+        with self._usage_lock:
+            self._migrate_legacy_usage_file()
+            if self._usage_line_count is None:
+                self._usage_line_count = 0
+                if self.usage_file.exists():
+                    with open(self.usage_file, 'r', encoding='utf-8') as f:
+                        self._usage_line_count = sum(1 for line in f if line.strip())
+
+            with open(self.usage_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+            self._usage_line_count += 1
+
+            if self._usage_line_count > max_records * 1.2:
+                self.save_usage_records(self.load_usage_records()[-max_records:])
     
     def add_usage_record(self, provider: str, model_name: str, input_tokens: int,
                         output_tokens: int, session_id: str, analysis_type: str = "stock_analysis"):
@@ -424,18 +495,12 @@ class ConfigManager:
 
             logger.info(f"📄 [Token记录] 使用 JSON 文件存储: {self.usage_file}")
 
-        # 回退到JSON文件存储
-        records = self.load_usage_records()
-        records.append(record)
-
-        # 限制记录数量
-        settings = self.load_settings()
-        max_records = settings.get("max_usage_records", 10000)
-        if len(records) > max_records:
-            records = records[-max_records:]
-
-        self.save_usage_records(records)
-        logger.info(f"✅ [Token记录] JSON 文件保存成功: {self.usage_file}")
+        # 回退到JSONL文件存储（追加写入）
+        try:
+            self._append_usage_record(record)
+            logger.info(f"✅ [Token记录] JSONL 文件保存成功: {self.usage_file}")
+        except Exception as e:
+            logger.error(f"保存使用记录失败: {e}")
         return record
     
     def calculate_cost(self, provider: str, model_name: str, input_tokens: int, output_tokens: int) -> tuple[float, str]:
@@ -463,7 +528,59 @@ class ConfigManager:
         return 0.0, "CNY"
     
     def load_settings(self) -> Dict[str, Any]:
-        """加载设置，合并.env中的配置"""
+        """加载设置，合并.env中的配置（返回内存快照的副本，调用方可自由修改）"""
+        return dict(self._get_settings_snapshot())
+
+    def get_setting(self, key: str, default: Any = None) -> Any:
+        """读取单个设置项（直接查内存快照，适合热路径）"""
+        return self._get_settings_snapshot().get(key, default)
+
+    @property
+    def settings_generation(self) -> int:
+        """设置快照版本号：每次重新加载或保存后递增，调用方可据此判断本地缓存是否过期"""
+        self._get_settings_snapshot()
+        return self._settings_generation
+
+    def invalidate_settings(self):
+        """使设置快照失效（下次读取时重新加载）"""
+        with self._settings_lock:
+            self._settings_snapshot = None
+
+    def _settings_file_signature(self) -> Optional[tuple]:
+        try:
+            st = self.settings_file.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _settings_env_signature() -> tuple:
+        return tuple(os.getenv(name, "") for name in _SETTINGS_ENV_VARS.values()) + (os.getenv("OPENAI_ENABLED", ""),)
+
+    def _get_settings_snapshot(self) -> Dict[str, Any]:
+        """
+        获取设置快照
+
+        快照在 SETTINGS_CHECK_INTERVAL 秒内直接复用；超过间隔后检查 settings.json 的
+        mtime/大小与相关环境变量，有变化才重新解析
+        """
+        snapshot = self._settings_snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._settings_checked_at < SETTINGS_CHECK_INTERVAL:
+            return snapshot
+
+        with self._settings_lock:
+            signature = (self._settings_file_signature(), self._settings_env_signature())
+            if self._settings_snapshot is None or signature != self._settings_signature:
+                self._settings_snapshot = self._read_settings()
+                # 首次创建默认设置时文件签名已变化，重新取一次
+                self._settings_signature = (self._settings_file_signature(), signature[1])
+                self._settings_generation += 1
+            self._settings_checked_at = now
+            return self._settings_snapshot
+
+    def _read_settings(self) -> Dict[str, Any]:
+        """从 settings.json 与环境变量读取设置"""
         try:
             if self.settings_file.exists():
                 with open(self.settings_file, 'r', encoding='utf-8') as f:
@@ -484,21 +601,15 @@ class ConfigManager:
                     "auto_create_dirs": True,
                     "openai_enabled": False,
                 }
-                self.save_settings(settings)
+                self._write_settings_file(settings)
         except Exception as e:
             logger.error(f"加载设置失败: {e}")
             settings = {}
 
         # 合并.env中的其他配置
         env_settings = {
-            "finnhub_api_key": os.getenv("FINNHUB_API_KEY", ""),
-            "reddit_client_id": os.getenv("REDDIT_CLIENT_ID", ""),
-            "reddit_client_secret": os.getenv("REDDIT_CLIENT_SECRET", ""),
-            "reddit_user_agent": os.getenv("REDDIT_USER_AGENT", ""),
-            "results_dir": os.getenv("TRADINGAGENTS_RESULTS_DIR", ""),
-            "log_level": os.getenv("TRADINGAGENTS_LOG_LEVEL", "INFO"),
-            "data_dir": os.getenv("TRADINGAGENTS_DATA_DIR", ""),  # 数据目录环境变量
-            "cache_dir": os.getenv("TRADINGAGENTS_CACHE_DIR", ""),  # 缓存目录环境变量
+            key: os.getenv(name, "INFO" if key == "log_level" else "")
+            for key, name in _SETTINGS_ENV_VARS.items()
         }
 
         # 添加OpenAI相关配置
@@ -536,7 +647,11 @@ class ConfigManager:
         }
 
     def save_settings(self, settings: Dict[str, Any]):
-        """保存设置"""
+        """保存设置（同时使内存快照失效）"""
+        self._write_settings_file(settings)
+        self.invalidate_settings()
+
+    def _write_settings_file(self, settings: Dict[str, Any]):
         try:
             with open(self.settings_file, 'w', encoding='utf-8') as f:
                 json.dump(settings, f, ensure_ascii=False, indent=2)
@@ -622,8 +737,7 @@ class ConfigManager:
     
     def get_data_dir(self) -> str:
         """获取数据目录路径"""
-        settings = self.load_settings()
-        data_dir = settings.get("data_dir")
+        data_dir = self.get_setting("data_dir")
         if not data_dir:
             # 如果没有配置，使用默认路径
             data_dir = os.path.join(os.path.expanduser("~"), "Documents", "TradingAgents", "data")
@@ -672,8 +786,7 @@ class ConfigManager:
     
     def is_openai_enabled(self) -> bool:
         """检查OpenAI模型是否启用"""
-        settings = self.load_settings()
-        return settings.get("openai_enabled", False)
+        return self.get_setting("openai_enabled", False)
     
     def get_openai_config_status(self) -> Dict[str, Any]:
         """获取OpenAI配置状态"""
@@ -702,8 +815,7 @@ class TokenTracker:
             session_id = f"session_{datetime.now(ZoneInfo(get_timezone_name())).strftime('%Y%m%d_%H%M%S')}"
 
         # 检查是否启用成本跟踪
-        settings = self.config_manager.load_settings()
-        cost_tracking_enabled = settings.get("enable_cost_tracking", True)
+        cost_tracking_enabled = self.config_manager.get_setting("enable_cost_tracking", True)
 
         if not cost_tracking_enabled:
             return None
@@ -726,8 +838,7 @@ class TokenTracker:
 
     def _check_cost_alert(self, current_cost: float):
         """检查成本警告"""
-        settings = self.config_manager.load_settings()
-        threshold = settings.get("cost_alert_threshold", 100.0)
+        threshold = self.config_manager.get_setting("cost_alert_threshold", 100.0)
 
         # 获取今日总成本
         today_stats = self.config_manager.get_usage_statistics(1)
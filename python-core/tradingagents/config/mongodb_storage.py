@@ -4,12 +4,27 @@ MongoDB存储适配器
 用于将token使用记录存储到MongoDB数据库
 """
 
+import atexit
 import os
+import threading
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from typing import Dict, List, Optional, Any
 from dataclasses import asdict
 from .usage_models import UsageRecord
+from tradingagents.utils.usage_rollups import (
+    BACKFILL_SOURCE_QUERY,
+    ROLLED_UP_FIELD,
+    ROLLUP_COLLECTION,
+    RollupAccumulator,
+    backfill_claim,
+    backfill_claimed,
+    backfill_done,
+    backfill_owner,
+    backfill_release,
+    rollup_window_query,
+    summarize_rollups,
+)
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
@@ -17,8 +32,8 @@ from tradingagents.config.runtime_settings import get_timezone_name
 logger = get_logger('agents')
 
 try:
-    from pymongo import MongoClient
-    from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+    from pymongo import MongoClient, UpdateOne
+    from pymongo.errors import ConnectionFailure, DuplicateKeyError, ServerSelectionTimeoutError
     MONGODB_AVAILABLE = True
 except ImportError:
     MONGODB_AVAILABLE = False
@@ -45,13 +60,25 @@ class MongoDBStorage:
         self.database_name = database_name
         self.collection_name = "token_usage"
         
+        self.rollup_collection_name = ROLLUP_COLLECTION
+
         self.client = None
         self.db = None
         self.collection = None
+        self.rollup_collection = None
         self._connected = False
-        
+
+        # 写入缓冲：攒够 flush_size 条或等待 flush_interval 秒后批量写入原始记录与汇总
+        self.flush_size = int(os.getenv("TOKEN_USAGE_FLUSH_SIZE", "20"))
+        self.flush_interval = float(os.getenv("TOKEN_USAGE_FLUSH_INTERVAL_SECONDS", "5"))
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+
         # 尝试连接
         self._connect()
+        atexit.register(self.flush)
     
     def _connect(self):
         """连接到MongoDB"""
@@ -73,9 +100,11 @@ class MongoDBStorage:
             
             self.db = self.client[self.database_name]
             self.collection = self.db[self.collection_name]
+            self.rollup_collection = self.db[self.rollup_collection_name]
             
             # 创建索引以提高查询性能
             self._create_indexes()
+            self._backfill_rollups()
             
             self._connected = True
             logger.info(f"✅ MongoDB连接成功: {self.database_name}.{self.collection_name}")
@@ -103,52 +132,120 @@ class MongoDBStorage:
             
             # 创建分析类型索引
             self.collection.create_index("analysis_type")
+
+            # 汇总文档唯一键与按时间桶查询索引
+            self.rollup_collection.create_index([
+                ("granularity", 1), ("bucket", 1), ("provider", 1),
+                ("model_name", 1), ("user_id", 1), ("currency", 1)
+            ], unique=True, name="rollup_key")
             
         except Exception as e:
             logger.error(f"创建MongoDB索引失败: {e}")
+
+    def _backfill_rollups(self):
+        """由尚未汇总的历史原始记录一次性生成汇总（与 app 启动任务通过标记文档互斥）"""
+        owner = backfill_owner("tradingagents")
+        try:
+            try:
+                result = self.rollup_collection.update_one(*backfill_claim(owner), upsert=True)
+            except DuplicateKeyError:
+                return
+            if not backfill_claimed(result):
+                return
+        except Exception as e:
+            logger.error(f"认领Token使用汇总回填失败: {e}")
+            return
+        try:
+            accumulator = RollupAccumulator()
+            projection = {"_id": 0, "timestamp": 1, "provider": 1, "model_name": 1,
+                          "user_id": 1, "currency": 1, "input_tokens": 1, "output_tokens": 1, "cost": 1}
+            for doc in self.collection.find(BACKFILL_SOURCE_QUERY, projection):
+                accumulator.add(doc)
+            ops = [UpdateOne(f, u, upsert=True) for f, u in accumulator.drain()]
+            if ops:
+                self.rollup_collection.bulk_write(ops, ordered=False)
+            self.rollup_collection.update_one(*backfill_done(len(ops)))
+            logger.info(f"✅ 已由历史Token记录生成 {len(ops)} 个汇总文档")
+        except Exception as e:
+            logger.error(f"生成Token使用汇总失败: {e}")
+            try:
+                self.rollup_collection.delete_one(backfill_release(owner))
+            except Exception as release_error:
+                logger.error(f"释放Token使用汇总回填标记失败: {release_error}")
     
     def is_connected(self) -> bool:
         """检查是否连接到MongoDB"""
         return self._connected
     
     def save_usage_record(self, record: UsageRecord) -> bool:
-        """保存单个使用记录到MongoDB"""
+        """保存单个使用记录（写入缓冲，批量落库并更新汇总）"""
         if not self._connected:
             logger.warning(f"⚠️ [MongoDB存储] 未连接，无法保存记录")
             return False
 
-        try:
-            # 转换为字典格式
-            record_dict = asdict(record)
+        # 转换为字典格式
+        record_dict = asdict(record)
 
-            # 添加MongoDB特有的字段
-            record_dict['_created_at'] = datetime.now(ZoneInfo(get_timezone_name()))
+        # 添加MongoDB特有的字段
+        record_dict['_created_at'] = datetime.now(ZoneInfo(get_timezone_name()))
 
-            # 🔍 详细日志
-            logger.debug(f"📊 [MongoDB存储] 准备插入记录: {record.provider}/{record.model_name}, session={record.session_id}")
-            logger.debug(f"   数据库: {self.database_name}, 集合: {self.collection_name}")
+        with self._buffer_lock:
+            self._buffer.append(record_dict)
+            pending = len(self._buffer)
+            if pending < self.flush_size and self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
 
-            # 插入记录
-            result = self.collection.insert_one(record_dict)
+        logger.debug(f"📊 [MongoDB存储] 记录已缓冲: {record.provider}/{record.model_name}, ¥{record.cost:.4f}, 待写入 {pending} 条")
 
-            if result.inserted_id:
-                logger.info(f"✅ [MongoDB存储] 记录已保存: ID={result.inserted_id}, {record.provider}/{record.model_name}, ¥{record.cost:.4f}")
+        if pending >= self.flush_size:
+            return self.flush()
+        return True
+
+    def flush(self) -> bool:
+        """将缓冲的记录批量写入原始集合，并以 $inc upsert 更新小时/日汇总"""
+        with self._flush_lock:
+            with self._buffer_lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                batch, self._buffer = self._buffer, []
+            if not batch or not self._connected:
                 return True
-            else:
-                logger.error(f"❌ [MongoDB存储] 插入失败：未返回插入ID")
+
+            try:
+                self.collection.insert_many(batch, ordered=False)
+            except Exception as e:
+                logger.error(f"❌ [MongoDB存储] 批量保存 {len(batch)} 条记录失败，保留到下次写入: {e}")
+                with self._buffer_lock:
+                    # 连接长时间不可用时限制缓冲大小
+                    self._buffer = (batch + self._buffer)[-self.flush_size * 50:]
                 return False
 
-        except Exception as e:
-            logger.error(f"❌ [MongoDB存储] 保存记录失败: {e}")
-            import traceback
-            logger.error(f"   堆栈: {traceback.format_exc()}")
-            return False
+            accumulator = RollupAccumulator()
+            for record_dict in batch:
+                accumulator.add(record_dict)
+            try:
+                ops = [UpdateOne(f, u, upsert=True) for f, u in accumulator.drain()]
+                self.rollup_collection.bulk_write(ops, ordered=False)
+                # 汇总累加成功后才标记原始记录，失败的记录留给历史回填
+                self.collection.update_many(
+                    {"_id": {"$in": [record_dict["_id"] for record_dict in batch]}},
+                    {"$set": {ROLLED_UP_FIELD: True}},
+                )
+            except Exception as e:
+                logger.error(f"❌ [MongoDB存储] 更新Token使用汇总失败: {e}")
+
+            logger.info(f"✅ [MongoDB存储] 已批量保存 {len(batch)} 条记录")
+            return True
     
     def load_usage_records(self, limit: int = 10000, days: int = None) -> List[UsageRecord]:
         """从MongoDB加载使用记录"""
         if not self._connected:
             return []
-        
+
+        self.flush()
         try:
             # 构建查询条件
             query = {}
@@ -165,6 +262,7 @@ class MongoDBStorage:
                 # 移除MongoDB特有的字段
                 doc.pop('_id', None)
                 doc.pop('_created_at', None)
+                doc.pop(ROLLED_UP_FIELD, None)
                 
                 # 转换为UsageRecord对象
                 try:
@@ -180,52 +278,27 @@ class MongoDBStorage:
             logger.error(f"从MongoDB加载记录失败: {e}")
             return []
     
+    def _load_rollups(self, days: int) -> Optional[Dict[str, Any]]:
+        """读取最近 N 天的汇总文档并合并（先落库缓冲中的记录）"""
+        self.flush()
+        end = datetime.now(ZoneInfo(get_timezone_name()))
+        query = rollup_window_query(end - timedelta(days=days), end)
+        return summarize_rollups(self.rollup_collection.find(query, {"_id": 0}))
+
     def get_usage_statistics(self, days: int = 30) -> Dict[str, Any]:
-        """从MongoDB获取使用统计"""
+        """从MongoDB获取使用统计（读取小时/日汇总）"""
         if not self._connected:
             return {}
         
         try:
-            from datetime import timedelta
-            cutoff_date = datetime.now() - timedelta(days=days)
-            
-            # 聚合查询
-            pipeline = [
-                {
-                    '$match': {
-                        'timestamp': {'$gte': cutoff_date.isoformat()}
-                    }
-                },
-                {
-                    '$group': {
-                        '_id': None,
-                        'total_cost': {'$sum': '$cost'},
-                        'total_input_tokens': {'$sum': '$input_tokens'},
-                        'total_output_tokens': {'$sum': '$output_tokens'},
-                        'total_requests': {'$sum': 1}
-                    }
-                }
-            ]
-            
-            result = list(self.collection.aggregate(pipeline))
-            
-            if result:
-                stats = result[0]
-                return {
-                    'period_days': days,
-                    'total_cost': round(stats.get('total_cost', 0), 4),
-                    'total_input_tokens': stats.get('total_input_tokens', 0),
-                    'total_output_tokens': stats.get('total_output_tokens', 0),
-                    'total_requests': stats.get('total_requests', 0)
-                }
-            else:
-                return {
-                    'period_days': days,
-                    'total_cost': 0,
-                    'total_input_tokens': 0,
-                    'total_output_tokens': 0,
-                    'total_requests': 0
-                }
+            summary = self._load_rollups(days)
+            return {
+                'period_days': days,
+                'total_cost': round(summary['total_cost'], 4),
+                'total_input_tokens': summary['total_input_tokens'],
+                'total_output_tokens': summary['total_output_tokens'],
+                'total_requests': summary['total_requests']
+            }
                 
         except Exception as e:
             logger.error(f"获取MongoDB统计失败: {e}")
@@ -237,58 +310,35 @@ class MongoDBStorage:
             return {}
         
         try:
-            from datetime import timedelta
-            cutoff_date = datetime.now() - timedelta(days=days)
-            
-            # 按供应商聚合
-            pipeline = [
-                {
-                    '$match': {
-                        'timestamp': {'$gte': cutoff_date.isoformat()}
-                    }
-                },
-                {
-                    '$group': {
-                        '_id': '$provider',
-                        'cost': {'$sum': '$cost'},
-                        'input_tokens': {'$sum': '$input_tokens'},
-                        'output_tokens': {'$sum': '$output_tokens'},
-                        'requests': {'$sum': 1}
-                    }
-                }
-            ]
-            
-            results = list(self.collection.aggregate(pipeline))
-            
-            provider_stats = {}
-            for result in results:
-                provider = result['_id']
-                provider_stats[provider] = {
-                    'cost': round(result.get('cost', 0), 4),
-                    'input_tokens': result.get('input_tokens', 0),
-                    'output_tokens': result.get('output_tokens', 0),
-                    'requests': result.get('requests', 0)
+            summary = self._load_rollups(days)
+            return {
+                provider: {
+                    'cost': round(stats['cost'], 4),
+                    'input_tokens': stats['input_tokens'],
+                    'output_tokens': stats['output_tokens'],
+                    'requests': stats['requests']
                 }
-            
-            return provider_stats
+                for provider, stats in summary['by_provider'].items()
+            }
             
         except Exception as e:
             logger.error(f"获取供应商统计失败: {e}")
             return {}
     
     def cleanup_old_records(self, days: int = 90) -> int:
-        """清理旧记录"""
+        """清理旧记录（同时清理对应时间段的汇总）"""
         if not self._connected:
             return 0
         
         try:
-            from datetime import timedelta
-
             cutoff_date = datetime.now() - timedelta(days=days)
             
             result = self.collection.delete_many({
                 'timestamp': {'$lt': cutoff_date.isoformat()}
             })
+            self.rollup_collection.delete_many({
+                'bucket': {'$lt': cutoff_date.strftime('%Y-%m-%d')}
+            })
             
             deleted_count = result.deleted_count
             if deleted_count > 0:
@@ -302,6 +352,7 @@ class MongoDBStorage:
     
     def close(self):
         """关闭MongoDB连接"""
+        self.flush()
         if self.client:
             self.client.close()
             self._connected = False
@@ -20,6 +20,7 @@ class UsageRecord:
     currency: str = "CNY"  # 货币单位
     session_id: str = ""  # 会话ID
     analysis_type: str = "stock_analysis"  # 分析类型
+    user_id: str = ""  # 用户ID（汇总统计维度）
 
 
 @dataclass
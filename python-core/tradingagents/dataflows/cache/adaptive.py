@@ -15,6 +15,7 @@ from typing import Any, Dict, Optional, Union
 import pandas as pd
 
 from tradingagents.config.database_manager import get_database_manager
+from tradingagents.utils.metrics import record_cache_lookup
 
 class AdaptiveCacheSystem:
     """自适应缓存系统"""
@@ -283,12 +284,17 @@ class AdaptiveCacheSystem:
         elif self.primary_backend == "file":
             cache_data = self._load_from_file(cache_key)
         
+        tier = self.primary_backend
+
         # 如果主要后端失败，尝试降级
         if not cache_data and self.fallback_enabled:
             self.logger.debug(f"主要后端({self.primary_backend})加载失败，尝试文件缓存")
+            record_cache_lookup(tier, False)
             cache_data = self._load_from_file(cache_key)
+            tier = "file"
         
         if not cache_data:
+            record_cache_lookup(tier, False)
             return None
         
         # 检查缓存是否有效（仅对文件缓存，数据库缓存有自己的TTL机制）
@@ -299,8 +305,10 @@ class AdaptiveCacheSystem:
             
             if not self._is_cache_valid(cache_data['timestamp'], ttl_seconds):
                 self.logger.debug(f"文件缓存已过期: {cache_key}")
+                record_cache_lookup(tier, False)
                 return None
         
+        record_cache_lookup(tier, True)
         return cache_data['data']
     
     def find_cached_data(self, symbol: str, start_date: str = "", end_date: str = "", 
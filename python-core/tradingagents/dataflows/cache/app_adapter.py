@@ -21,11 +21,14 @@ try:
 except Exception:  # pragma: no cover - 弱依赖
     get_mongodb_client = None  # type: ignore
 
+from tradingagents.utils.metrics import track_cache_lookup
+
 
 BASICS_COLLECTION = "stock_basic_info"
 QUOTES_COLLECTION = "market_quotes"
 
 
+@track_cache_lookup("app_mongo")
 def get_basics_from_cache(stock_code: Optional[str] = None) -> Optional[Dict[str, Any] | List[Dict[str, Any]]]:
     """从 app 的 stock_basic_info 读取基础信息。"""
     if get_mongodb_client is None:
@@ -70,6 +73,7 @@ def get_basics_from_cache(stock_code: Optional[str] = None) -> Optional[Dict[str
         return None
 
 
+@track_cache_lookup("app_mongo")
 def get_market_quote_dataframe(symbol: str) -> Optional[pd.DataFrame]:
     """从 app 的 market_quotes 读取单只股票的最新一条快照，并转为 DataFrame。"""
     if get_mongodb_client is None:
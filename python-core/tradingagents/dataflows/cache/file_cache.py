@@ -15,6 +15,7 @@ import hashlib
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
+from tradingagents.utils.metrics import track_cache_lookup
 logger = get_logger('agents')
 
 
@@ -331,6 +332,7 @@ class StockDataCache:
         logger.info(f"💾 {desc}已缓存: {symbol} ({data_source}) -> {cache_key}")
         return cache_key
     
+    @track_cache_lookup("file")
     def load_stock_data(self, cache_key: str) -> Optional[Union[pd.DataFrame, str]]:
         """从缓存加载股票数据"""
         metadata = self._load_metadata(cache_key)
@@ -491,6 +493,7 @@ class StockDataCache:
         logger.info(f"💼 {desc}已缓存: {symbol} ({data_source}) -> {cache_key}")
         return cache_key
     
+    @track_cache_lookup("file")
     def load_fundamentals_data(self, cache_key: str) -> Optional[str]:
         """从缓存加载基本面数据"""
         metadata = self._load_metadata(cache_key)
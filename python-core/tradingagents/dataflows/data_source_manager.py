@@ -24,6 +24,38 @@ logger = setup_dataflow_logging()
 # 导入统一数据源编码
 from tradingagents.constants import DataSourceCode
 
+# 数据源调用指标
+from tradingagents.utils.metrics import record_data_source_call, record_data_source_fallback, track_data_source
+
+
+def _acquire_source_rate_limit(source: str) -> None:
+    """
+    按实际调用的数据源获取 app 层共享令牌桶（交互式优先级）
+
+    在数据源确定之后调用，避免降级到 AKShare/BaoStock 的请求占用 Tushare 配额；
+    独立使用 tradingagents（无 app 层）时直接返回
+    """
+    try:
+        from app.core import rate_limiter
+        if source == "tushare":
+            from app.core.config import settings
+            limiter = rate_limiter.get_tushare_rate_limiter(
+                tier=getattr(settings, "TUSHARE_TIER", "standard"),
+                safety_margin=float(getattr(settings, "TUSHARE_RATE_LIMIT_SAFETY_MARGIN", 0.8)),
+            )
+        elif source == "akshare":
+            limiter = rate_limiter.get_akshare_rate_limiter()
+        elif source == "baostock":
+            limiter = rate_limiter.get_baostock_rate_limiter()
+        else:
+            return
+    except Exception:
+        return
+    try:
+        limiter.acquire_sync(priority=rate_limiter.RatePriority.INTERACTIVE)
+    except Exception as e:
+        logger.debug(f"⚠️ {source} 共享速率限制器不可用: {e}")
+
 
 class ChinaDataSource(Enum):
     """
@@ -1154,7 +1186,10 @@ class DataSourceManager:
             adapter = get_mongodb_cache_adapter()
 
             # 从MongoDB获取指定周期的历史数据
+            fetch_start = time.perf_counter()
             df = adapter.get_historical_data(symbol, start_date, end_date, period=period)
+            record_data_source_call("mongodb", "stock_data", time.perf_counter() - fetch_start,
+                                    "ok" if df is not None and not df.empty else "empty")
 
             if df is not None and not df.empty:
                 logger.info(f"✅ [数据来源: MongoDB缓存] 成功获取{period}数据: {symbol} ({len(df)}条记录)")
@@ -1180,6 +1215,7 @@ class DataSourceManager:
             # MongoDB异常，降级到其他数据源
             return self._try_fallback_sources(symbol, start_date, end_date, period)
 
+    @track_data_source("tushare", "stock_data")
     def _get_tushare_data(self, symbol: str, start_date: str, end_date: str, period: str = "daily") -> str:
         """使用Tushare获取多周期数据 - 使用provider + 统一缓存"""
         logger.debug(f"📊 [Tushare] 调用参数: symbol={symbol}, start_date={start_date}, end_date={end_date}, period={period}")
@@ -1239,6 +1275,7 @@ class DataSourceManager:
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
 
+            _acquire_source_rate_limit("tushare")
             data = loop.run_until_complete(provider.get_historical_data(symbol, start_date, end_date))
 
             if data is not None and not data.empty:
@@ -1272,6 +1309,7 @@ class DataSourceManager:
             logger.error(f"❌ [DataSourceManager详细日志] 异常堆栈: {traceback.format_exc()}")
             raise
 
+    @track_data_source("akshare", "stock_data")
     def _get_akshare_data(self, symbol: str, start_date: str, end_date: str, period: str = "daily") -> str:
         """使用AKShare获取多周期数据 - 包含技术指标计算"""
         logger.debug(f"📊 [AKShare] 调用参数: symbol={symbol}, start_date={start_date}, end_date={end_date}, period={period}")
@@ -1294,6 +1332,7 @@ class DataSourceManager:
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
 
+            _acquire_source_rate_limit("akshare")
             data = loop.run_until_complete(provider.get_historical_data(symbol, start_date, end_date, period))
 
             duration = time.time() - start_time
@@ -1320,6 +1359,7 @@ class DataSourceManager:
             logger.error(f"❌ [AKShare] 调用失败: {e}, 耗时={duration:.2f}s", exc_info=True)
             return f"❌ AKShare获取{symbol}数据失败: {e}"
 
+    @track_data_source("baostock", "stock_data")
     def _get_baostock_data(self, symbol: str, start_date: str, end_date: str, period: str = "daily") -> str:
         """使用BaoStock获取多周期数据 - 包含技术指标计算"""
         # 使用BaoStock的统一接口
@@ -1338,6 +1378,7 @@ class DataSourceManager:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
 
+        _acquire_source_rate_limit("baostock")
         data = loop.run_until_complete(provider.get_historical_data(symbol, start_date, end_date, period))
 
         if data is not None and not data.empty:
@@ -1411,6 +1452,7 @@ class DataSourceManager:
 
                     if "❌" not in result:
                         logger.info(f"✅ [备用数据源-{source.value}] 成功获取{period}数据: {symbol}")
+                        record_data_source_fallback("stock_data", self.current_source.value, source.value)
                         return result, source.value  # 返回结果和实际使用的数据源
                     else:
                         logger.warning(f"⚠️ [备用数据源-{source.value}] 返回错误结果: {symbol}")
@@ -1420,6 +1462,7 @@ class DataSourceManager:
                     continue
 
         logger.error(f"❌ [所有数据源失败] 无法获取{period}数据: {symbol}")
+        record_data_source_fallback("stock_data", self.current_source.value, "none")
         return f"❌ 所有数据源都无法获取{symbol}的{period}数据", None
 
     def get_stock_info(self, symbol: str) -> Dict:
@@ -1634,6 +1677,7 @@ class DataSourceManager:
                 # 检查是否获取到有效信息
                 if result.get('name') and result['name'] != f'股票{symbol}':
                     logger.info(f"✅ [数据来源: 备用数据源] 降级成功获取股票信息: {source_name}")
+                    record_data_source_fallback("stock_info", self.current_source.value, source.value)
                     return result
                 else:
                     logger.warning(f"⚠️ [数据来源: {source_name}] 返回无效信息")
@@ -1644,8 +1688,10 @@ class DataSourceManager:
 
         # 所有数据源都失败，返回默认值
         logger.error(f"❌ 所有数据源都无法获取{symbol}的股票信息")
+        record_data_source_fallback("stock_info", self.current_source.value, "none")
         return {'symbol': symbol, 'name': f'股票{symbol}', 'source': 'unknown'}
 
+    @track_data_source("akshare", "stock_info")
     def _get_akshare_stock_info(self, symbol: str) -> Dict:
         """使用AKShare获取股票基本信息
 
@@ -1705,6 +1751,7 @@ class DataSourceManager:
             logger.error(f"❌ [股票信息] AKShare获取失败: {symbol}, 错误: {e}")
             return {'symbol': symbol, 'name': f'股票{symbol}', 'source': 'akshare', 'error': str(e)}
 
+    @track_data_source("baostock", "stock_info")
     def _get_baostock_stock_info(self, symbol: str) -> Dict:
         """使用BaoStock获取股票基本信息"""
         try:
@@ -1795,7 +1842,10 @@ class DataSourceManager:
             adapter = get_mongodb_cache_adapter()
 
             # 从 MongoDB 获取财务数据
+            fetch_start = time.perf_counter()
             financial_data = adapter.get_financial_data(symbol)
+            record_data_source_call("mongodb", "fundamentals", time.perf_counter() - fetch_start,
+                                    "ok" if financial_data is not None and len(financial_data) > 0 else "empty")
 
             # 检查数据类型和内容
             if financial_data is not None:
@@ -1833,11 +1883,13 @@ class DataSourceManager:
             # MongoDB 异常，降级到其他数据源
             return self._try_fallback_fundamentals(symbol)
 
+    @track_data_source("tushare", "fundamentals")
     def _get_tushare_fundamentals(self, symbol: str) -> str:
         """从 Tushare 获取基本面数据 - 暂时不可用，需要实现"""
         logger.warning(f"⚠️ Tushare基本面数据功能暂时不可用")
         return f"⚠️ Tushare基本面数据功能暂时不可用，请使用其他数据源"
 
+    @track_data_source("akshare", "fundamentals")
     def _get_akshare_fundamentals(self, symbol: str) -> str:
         """从 AKShare 生成基本面分析"""
         logger.debug(f"📊 [AKShare] 调用参数: symbol={symbol}")
@@ -2038,6 +2090,7 @@ class DataSourceManager:
 
                     if result and "❌" not in result:
                         logger.info(f"✅ [数据来源: 备用数据源] 降级成功获取基本面: {source.value}")
+                        record_data_source_fallback("fundamentals", self.current_source.value, source.value)
                         return result
                     else:
                         logger.warning(f"⚠️ 备用数据源{source.value}返回错误结果")
@@ -2048,6 +2101,7 @@ class DataSourceManager:
 
         # 所有数据源都失败，生成基本分析
         logger.warning(f"⚠️ [数据来源: 生成分析] 所有数据源失败，生成基本分析: {symbol}")
+        record_data_source_fallback("fundamentals", self.current_source.value, "none")
         return self._generate_fundamentals_analysis(symbol)
 
     def _get_mongodb_news(self, symbol: str, hours_back: int, limit: int) -> List[Dict[str, Any]]:
@@ -2057,7 +2111,10 @@ class DataSourceManager:
             adapter = get_mongodb_cache_adapter()
 
             # 从MongoDB获取新闻数据
+            fetch_start = time.perf_counter()
             news_data = adapter.get_news_data(symbol, hours_back=hours_back, limit=limit)
+            record_data_source_call("mongodb", "news", time.perf_counter() - fetch_start,
+                                    "ok" if news_data else "empty")
 
             if news_data and len(news_data) > 0:
                 logger.info(f"✅ [数据来源: MongoDB-新闻] 成功获取: {symbol or '市场新闻'} ({len(news_data)}条)")
@@ -2070,6 +2127,7 @@ class DataSourceManager:
             logger.error(f"❌ [数据来源: MongoDB] 获取新闻失败: {e}")
             return self._try_fallback_news(symbol, hours_back, limit)
 
+    @track_data_source("tushare", "news")
     def _get_tushare_news(self, symbol: str, hours_back: int, limit: int) -> List[Dict[str, Any]]:
         """从Tushare获取新闻数据"""
         try:
@@ -2081,6 +2139,7 @@ class DataSourceManager:
             logger.error(f"❌ [数据来源: Tushare] 获取新闻失败: {e}")
             return []
 
+    @track_data_source("akshare", "news")
     def _get_akshare_news(self, symbol: str, hours_back: int, limit: int) -> List[Dict[str, Any]]:
         """从AKShare获取新闻数据"""
         try:
@@ -2114,6 +2173,7 @@ class DataSourceManager:
 
                     if result and len(result) > 0:
                         logger.info(f"✅ [数据来源: 备用数据源] 降级成功获取新闻: {source.value}")
+                        record_data_source_fallback("news", self.current_source.value, source.value)
                         return result
                     else:
                         logger.warning(f"⚠️ 备用数据源{source.value}未返回新闻")
@@ -2124,6 +2184,7 @@ class DataSourceManager:
 
         # 所有数据源都失败
         logger.warning(f"⚠️ [数据来源: 所有数据源失败] 无法获取新闻: {symbol or '市场新闻'}")
+        record_data_source_fallback("news", self.current_source.value, "none")
         return []
 
 
@@ -2167,7 +2228,7 @@ def get_china_stock_data_unified(symbol: str, start_date: str, end_date: str) ->
         lines = result.split('\n')
         data_lines = [line for line in lines if '2025-' in line and symbol in line]
         logger.info(f"🔍 [股票代码追踪] 返回结果统计: 总行数={len(lines)}, 数据行数={len(data_lines)}, 结果长度={len(result)}字符")
-        logger.info(f"🔍 [股票代码追踪] 返回结果前500字符: {result[:500]}")
+        logger.info("🔍 [股票代码追踪] 返回结果前500字符: %.500s", result)
         if len(data_lines) > 0:
             logger.info(f"🔍 [股票代码追踪] 数据行示例: 第1行='{data_lines[0][:100]}', 最后1行='{data_lines[-1][:100]}'")
     else:
@@ -35,7 +35,11 @@ class OptimizedChinaDataProvider:
         logger.info(f"📊 优化A股数据提供器初始化完成")
 
     def _wait_for_rate_limit(self):
-        """等待API限制"""
+        """
+        等待API限制
+
+        只控制本实例的最小调用间隔；共享令牌桶由 DataSourceManager 在确定实际数据源后按数据源获取
+        """
         current_time = time.time()
         time_since_last_call = current_time - self.last_api_call
 
@@ -6,6 +6,7 @@ import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, List, Optional, Union
+import numpy as np
 import pandas as pd
 
 from ..base_provider import BaseStockDataProvider
@@ -24,7 +25,25 @@ class AKShareProvider(BaseStockDataProvider):
     - 财务数据
     - 港股数据支持
     """
-    
+
+    # 全市场快照数值字段：输出字段 -> AKShare 列名（成交量单独按整数处理）
+    SPOT_FLOAT_COLUMNS = {
+        "price": "最新价",
+        "change": "涨跌额",
+        "change_percent": "涨跌幅",
+        "amount": "成交额",
+        "open_price": "今开",
+        "high_price": "最高",
+        "low_price": "最低",
+        "pre_close": "昨收",
+        "turnover_rate": "换手率",
+        "volume_ratio": "量比",
+        "pe": "市盈率-动态",
+        "pb": "市净率",
+        "total_mv": "总市值",
+        "circ_mv": "流通市值",
+    }
+
     def __init__(self):
         super().__init__("AKShare")
         self.ak = None
@@ -609,6 +628,87 @@ class AKShareProvider(BaseStockDataProvider):
                 "timezone": "Asia/Shanghai"
             }
     
+    async def _throttle_request(self, fallback_delay: float):
+        """请求前限流：优先使用 app 层共享的 AKShare 限流器，独立使用时退化为固定延迟"""
+        try:
+            from app.core.rate_limiter import RatePriority, get_akshare_rate_limiter
+            limiter = get_akshare_rate_limiter()
+        except Exception:
+            await asyncio.sleep(fallback_delay)
+            return
+        await limiter.acquire(priority=RatePriority.NORMAL)
+
+    def _parse_spot_quotes(self, spot_df: pd.DataFrame, codes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        把全市场快照 DataFrame 转换为 代码 -> 行情 的映射
+
+        按列整体转换（to_numeric 批量转数值，非法值/缺失值按 0 处理），只对命中的行构建字典，
+        避免 iterrows 逐格转换
+        """
+        if "代码" not in spot_df.columns:
+            return {}
+
+        codes_set = set(codes)
+        raw_codes = spot_df["代码"].astype(str)
+        # 原始代码命中优先，其次去掉交易所前缀后命中（例如：sh600000 -> 600000）
+        stripped = raw_codes.str.replace(r"^(sh|sz|bj)", "", regex=True)
+        matched = raw_codes.where(raw_codes.isin(codes_set), stripped)
+        mask = matched.isin(codes_set)
+        if not mask.any():
+            return {}
+
+        df = spot_df.loc[mask.to_numpy()]
+        matched_codes = matched[mask].tolist()
+        n = len(matched_codes)
+
+        def numeric(column: str) -> np.ndarray:
+            if column not in df.columns:
+                return np.zeros(n)
+            return pd.to_numeric(df[column], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+        cols = {field: numeric(column).tolist() for field, column in self.SPOT_FLOAT_COLUMNS.items()}
+        volumes = numeric("成交量").astype(np.int64).tolist()
+        if "名称" in df.columns:
+            names = df["名称"].astype(str).tolist()
+        else:
+            names = [f"股票{code}" for code in matched_codes]
+        last_sync = datetime.now(timezone.utc)
+
+        quotes_map = {}
+        for i, code in enumerate(matched_codes):
+            pe = cols["pe"][i]
+            total_mv = cols["total_mv"][i]
+            circ_mv = cols["circ_mv"][i]
+            quotes_map[code] = {
+                "code": code,
+                "symbol": code,
+                "name": names[i],
+                "price": cols["price"][i],
+                "change": cols["change"][i],
+                "change_percent": cols["change_percent"][i],
+                "volume": volumes[i],
+                "amount": cols["amount"][i],
+                "open_price": cols["open_price"][i],
+                "high_price": cols["high_price"][i],
+                "low_price": cols["low_price"][i],
+                "pre_close": cols["pre_close"][i],
+                # 财务指标字段
+                "turnover_rate": cols["turnover_rate"][i],  # 换手率（%）
+                "volume_ratio": cols["volume_ratio"][i],  # 量比
+                "pe": pe,  # 动态市盈率
+                "pe_ttm": pe,  # TTM市盈率（与动态市盈率相同）
+                "pb": cols["pb"][i],  # 市净率
+                "total_mv": total_mv / 1e8 if total_mv else None,  # 总市值（转换为亿元）
+                "circ_mv": circ_mv / 1e8 if circ_mv else None,  # 流通市值（转换为亿元）
+                # 扩展字段
+                "full_symbol": self._get_full_symbol(code),
+                "market_info": self._get_market_info(code),
+                "data_source": "akshare",
+                "last_sync": last_sync,
+                "sync_status": "success"
+            }
+        return quotes_map
+
     async def get_batch_stock_quotes(self, codes: List[str]) -> Dict[str, Dict[str, Any]]:
         """
         批量获取股票实时行情（优化版：一次获取全市场快照）
@@ -633,23 +733,16 @@ class AKShareProvider(BaseStockDataProvider):
                 logger.debug(f"📊 批量获取 {len(codes)} 只股票的实时行情... (尝试 {attempt + 1}/{max_retries})")
 
                 # 优先使用新浪财经接口（更稳定，不容易被封）
-                def fetch_spot_data_sina():
-                    import time
-                    time.sleep(0.3)  # 添加延迟避免频率限制
-                    return self.ak.stock_zh_a_spot()
-
                 try:
-                    spot_df = await asyncio.to_thread(fetch_spot_data_sina)
+                    await self._throttle_request(0.3)
+                    spot_df = await asyncio.to_thread(self.ak.stock_zh_a_spot)
                     data_source = "sina"
                     logger.debug("✅ 使用新浪财经接口获取数据")
                 except Exception as e:
                     logger.warning(f"⚠️ 新浪财经接口失败: {e}，尝试东方财富接口...")
                     # 回退到东方财富接口
-                    def fetch_spot_data_em():
-                        import time
-                        time.sleep(0.5)
-                        return self.ak.stock_zh_a_spot_em()
-                    spot_df = await asyncio.to_thread(fetch_spot_data_em)
+                    await self._throttle_request(0.5)
+                    spot_df = await asyncio.to_thread(self.ak.stock_zh_a_spot_em)
                     data_source = "eastmoney"
                     logger.debug("✅ 使用东方财富接口获取数据")
 
@@ -660,79 +753,9 @@ class AKShareProvider(BaseStockDataProvider):
                         continue
                     return {}
 
-                # 构建代码到行情的映射
-                quotes_map = {}
+                # 构建代码到行情的映射（按列整体转换）
                 codes_set = set(codes)
-
-                # 构建代码映射表（支持带前缀的代码匹配）
-                # 例如：sh600000 -> 600000, sz000001 -> 000001
-                code_mapping = {}
-                for code in codes:
-                    code_mapping[code] = code  # 原始代码
-                    # 添加可能的前缀变体
-                    for prefix in ['sh', 'sz', 'bj']:
-                        code_mapping[f"{prefix}{code}"] = code
-
-                for _, row in spot_df.iterrows():
-                    raw_code = str(row.get("代码", ""))
-
-                    # 尝试匹配代码（支持带前缀和不带前缀）
-                    matched_code = None
-                    if raw_code in code_mapping:
-                        matched_code = code_mapping[raw_code]
-                    elif raw_code in codes_set:
-                        matched_code = raw_code
-
-                    if matched_code:
-                        quotes_data = {
-                            "name": str(row.get("名称", f"股票{matched_code}")),
-                            "price": self._safe_float(row.get("最新价", 0)),
-                            "change": self._safe_float(row.get("涨跌额", 0)),
-                            "change_percent": self._safe_float(row.get("涨跌幅", 0)),
-                            "volume": self._safe_int(row.get("成交量", 0)),
-                            "amount": self._safe_float(row.get("成交额", 0)),
-                            "open": self._safe_float(row.get("今开", 0)),
-                            "high": self._safe_float(row.get("最高", 0)),
-                            "low": self._safe_float(row.get("最低", 0)),
-                            "pre_close": self._safe_float(row.get("昨收", 0)),
-                            # 🔥 新增：财务指标字段
-                            "turnover_rate": self._safe_float(row.get("换手率", None)),  # 换手率（%）
-                            "volume_ratio": self._safe_float(row.get("量比", None)),  # 量比
-                            "pe": self._safe_float(row.get("市盈率-动态", None)),  # 动态市盈率
-                            "pb": self._safe_float(row.get("市净率", None)),  # 市净率
-                            "total_mv": self._safe_float(row.get("总市值", None)),  # 总市值（元）
-                            "circ_mv": self._safe_float(row.get("流通市值", None)),  # 流通市值（元）
-                        }
-
-                        # 转换为标准化字典（使用匹配后的代码）
-                        quotes_map[matched_code] = {
-                            "code": matched_code,
-                            "symbol": matched_code,
-                            "name": quotes_data.get("name", f"股票{matched_code}"),
-                            "price": float(quotes_data.get("price", 0)),
-                            "change": float(quotes_data.get("change", 0)),
-                            "change_percent": float(quotes_data.get("change_percent", 0)),
-                            "volume": int(quotes_data.get("volume", 0)),
-                            "amount": float(quotes_data.get("amount", 0)),
-                            "open_price": float(quotes_data.get("open", 0)),
-                            "high_price": float(quotes_data.get("high", 0)),
-                            "low_price": float(quotes_data.get("low", 0)),
-                            "pre_close": float(quotes_data.get("pre_close", 0)),
-                            # 🔥 新增：财务指标字段
-                            "turnover_rate": quotes_data.get("turnover_rate"),  # 换手率（%）
-                            "volume_ratio": quotes_data.get("volume_ratio"),  # 量比
-                            "pe": quotes_data.get("pe"),  # 动态市盈率
-                            "pe_ttm": quotes_data.get("pe"),  # TTM市盈率（与动态市盈率相同）
-                            "pb": quotes_data.get("pb"),  # 市净率
-                            "total_mv": quotes_data.get("total_mv") / 1e8 if quotes_data.get("total_mv") else None,  # 总市值（转换为亿元）
-                            "circ_mv": quotes_data.get("circ_mv") / 1e8 if quotes_data.get("circ_mv") else None,  # 流通市值（转换为亿元）
-                            # 扩展字段
-                            "full_symbol": self._get_full_symbol(matched_code),
-                            "market_info": self._get_market_info(matched_code),
-                            "data_source": "akshare",
-                            "last_sync": datetime.now(timezone.utc),
-                            "sync_status": "success"
-                        }
+                quotes_map = self._parse_spot_quotes(spot_df, codes)
 
                 found_count = len(quotes_map)
                 missing_count = len(codes) - found_count
@@ -1160,6 +1183,18 @@ class AKShareProvider(BaseStockDataProvider):
             logger.error(f"标准化{code}历史数据列名失败: {e}")
             return df
 
+    async def _fetch_financial_statement(self, code: str, label: str, func) -> Optional[List[Dict[str, Any]]]:
+        """获取单张财务报表，失败或为空时返回 None"""
+        try:
+            await self._throttle_request(0.2)
+            df = await asyncio.to_thread(func, symbol=code)
+            if df is not None and not df.empty:
+                logger.debug(f"✅ {code}{label}获取成功")
+                return df.to_dict('records')
+        except Exception as e:
+            logger.debug(f"获取{code}{label}失败: {e}")
+        return None
+
     async def get_financial_data(self, code: str) -> Dict[str, Any]:
         """
         获取财务数据
@@ -1176,55 +1211,21 @@ class AKShareProvider(BaseStockDataProvider):
         try:
             logger.debug(f"💰 获取{code}财务数据...")
 
-            financial_data = {}
-
-            # 1. 获取主要财务指标
-            try:
-                def fetch_financial_abstract():
-                    return self.ak.stock_financial_abstract(symbol=code)
-
-                main_indicators = await asyncio.to_thread(fetch_financial_abstract)
-                if main_indicators is not None and not main_indicators.empty:
-                    financial_data['main_indicators'] = main_indicators.to_dict('records')
-                    logger.debug(f"✅ {code}主要财务指标获取成功")
-            except Exception as e:
-                logger.debug(f"获取{code}主要财务指标失败: {e}")
-
-            # 2. 获取资产负债表
-            try:
-                def fetch_balance_sheet():
-                    return self.ak.stock_balance_sheet_by_report_em(symbol=code)
-
-                balance_sheet = await asyncio.to_thread(fetch_balance_sheet)
-                if balance_sheet is not None and not balance_sheet.empty:
-                    financial_data['balance_sheet'] = balance_sheet.to_dict('records')
-                    logger.debug(f"✅ {code}资产负债表获取成功")
-            except Exception as e:
-                logger.debug(f"获取{code}资产负债表失败: {e}")
-
-            # 3. 获取利润表
-            try:
-                def fetch_income_statement():
-                    return self.ak.stock_profit_sheet_by_report_em(symbol=code)
-
-                income_statement = await asyncio.to_thread(fetch_income_statement)
-                if income_statement is not None and not income_statement.empty:
-                    financial_data['income_statement'] = income_statement.to_dict('records')
-                    logger.debug(f"✅ {code}利润表获取成功")
-            except Exception as e:
-                logger.debug(f"获取{code}利润表失败: {e}")
-
-            # 4. 获取现金流量表
-            try:
-                def fetch_cash_flow():
-                    return self.ak.stock_cash_flow_sheet_by_report_em(symbol=code)
+            # 四张报表并发获取，每次请求前经过共享限流
+            statements = [
+                ("main_indicators", "主要财务指标", self.ak.stock_financial_abstract),
+                ("balance_sheet", "资产负债表", self.ak.stock_balance_sheet_by_report_em),
+                ("income_statement", "利润表", self.ak.stock_profit_sheet_by_report_em),
+                ("cash_flow", "现金流量表", self.ak.stock_cash_flow_sheet_by_report_em),
+            ]
+            results = await asyncio.gather(
+                *(self._fetch_financial_statement(code, label, func) for _, label, func in statements)
+            )
 
-                cash_flow = await asyncio.to_thread(fetch_cash_flow)
-                if cash_flow is not None and not cash_flow.empty:
-                    financial_data['cash_flow'] = cash_flow.to_dict('records')
-                    logger.debug(f"✅ {code}现金流量表获取成功")
-            except Exception as e:
-                logger.debug(f"获取{code}现金流量表失败: {e}")
+            financial_data = {}
+            for (key, _, _), records in zip(statements, results):
+                if records:
+                    financial_data[key] = records
 
             if financial_data:
                 logger.debug(f"✅ {code}财务数据获取完成: {len(financial_data)}个数据集")
@@ -1,34 +1,30 @@
 """
 美股数据提供器
 包含 Finnhub, Yahoo Finance 等美股数据源
-"""
-
-# 导入 Finnhub 工具
-try:
-    from .finnhub import get_data_in_range
-    FINNHUB_AVAILABLE = True
-except ImportError:
-    get_data_in_range = None
-    FINNHUB_AVAILABLE = False
-
-# 导入 Yahoo Finance 工具
-try:
-    from .yfinance import YFinanceUtils
-    YFINANCE_AVAILABLE = True
-except ImportError:
-    YFinanceUtils = None
-    YFINANCE_AVAILABLE = False
 
-# 导入优化的美股数据提供器
-try:
-    from .optimized import OptimizedUSDataProvider
-    OPTIMIZED_US_AVAILABLE = True
-except ImportError:
-    OptimizedUSDataProvider = None
-    OPTIMIZED_US_AVAILABLE = False
+各提供器在首次访问时才导入（yfinance 导入开销较大）
+"""
 
-# 默认使用优化的提供器
-DefaultUSProvider = OptimizedUSDataProvider
+from tradingagents.utils.lazy_import import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    optional={
+        # Finnhub 工具
+        'get_data_in_range': '.finnhub:get_data_in_range',
+        # Yahoo Finance 工具
+        'YFinanceUtils': '.yfinance:YFinanceUtils',
+        # 优化的美股数据提供器
+        'OptimizedUSDataProvider': '.optimized:OptimizedUSDataProvider',
+        # 默认使用优化的提供器
+        'DefaultUSProvider': '.optimized:OptimizedUSDataProvider',
+    },
+    flags={
+        'FINNHUB_AVAILABLE': 'get_data_in_range',
+        'YFINANCE_AVAILABLE': 'YFinanceUtils',
+        'OPTIMIZED_US_AVAILABLE': 'OptimizedUSDataProvider',
+    },
+)
 
 __all__ = [
     # Finnhub
@@ -44,4 +40,3 @@ __all__ = [
     'OPTIMIZED_US_AVAILABLE',
     'DefaultUSProvider',
 ]
-
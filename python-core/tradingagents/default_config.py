@@ -21,6 +21,13 @@ DEFAULT_CONFIG = {
     "online_tools": os.getenv("ONLINE_TOOLS_ENABLED", "false").lower() == "true",
     "online_news": os.getenv("ONLINE_NEWS_ENABLED", "true").lower() == "true",
     "realtime_data": os.getenv("REALTIME_DATA_ENABLED", "false").lower() == "true",
+    # 同一次分析内相同参数的工具调用只执行一次（多个分析师共享结果）
+    "tool_result_memo": os.getenv("TOOL_RESULT_MEMO_ENABLED", "true").lower() == "true",
+    # 图执行前并发预取各分析师需要的数据（依赖 tool_result_memo）
+    "data_prefetch": os.getenv("DATA_PREFETCH_ENABLED", "true").lower() == "true",
+    # 工具输出写入分析师消息历史前按 token 预算压缩（预算同时不超过模型上下文窗口的 1/4）
+    "tool_output_compaction": os.getenv("TOOL_OUTPUT_COMPACTION_ENABLED", "true").lower() == "true",
+    "tool_output_token_budget": int(os.getenv("TOOL_OUTPUT_TOKEN_BUDGET", "6000")),
 
     # Analyst settings - 使用统一分析师（单一LLM调用）节约成本，避免rate limiting
     # 可选值：["unified"] 或 ["market", "social", "news", "fundamentals"]
@@ -0,0 +1,119 @@
+"""
+分析数据预取
+- propagate 开始时已知 ticker、交易日期与所选分析师，在图执行前把各分析师需要的行情、基本面、新闻、情绪数据提交到线程池并发获取
+- 预取通过 Toolkit 上的复用代理执行，结果写入本次运行的 ToolResultMemo；分析师随后以相同参数调用工具时直接复用（或等待进行中的预取）
+- 预取参数与各分析师实际调用参数保持一致，否则缓存键不匹配、预取结果不会被使用
+- 预取失败不影响分析：异常不缓存，分析师调用时会重新执行
+"""
+
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tradingagents.agents.utils.tool_memo import get_tool_memo, prefetching
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+# (名称, 调用函数) 列表
+PrefetchPlan = List[Tuple[str, Callable[[], Any]]]
+
+
+def _fundamentals_start_date(trade_date: str) -> str:
+    """与基本面分析师一致：固定取交易日前 10 天"""
+    try:
+        return (datetime.strptime(trade_date, "%Y-%m-%d") - timedelta(days=10)).strftime("%Y-%m-%d")
+    except ValueError:
+        return (datetime.now() - timedelta(days=10)).strftime("%Y-%m-%d")
+
+
+def build_prefetch_plan(toolkit, ticker: str, trade_date: str, selected_analysts: List[str], model_info: str = "") -> PrefetchPlan:
+    """
+    按所选分析师生成预取任务（参数与各分析师的实际调用一致）
+
+    Args:
+        toolkit: 已通过 memoize_toolkit 包装的 Toolkit
+        model_info: 新闻分析师传给统一新闻工具的模型信息（"类名:模型名"）
+    """
+    from tradingagents.tools.unified_news_tool import create_unified_news_tool
+
+    plan: Dict[str, Callable[[], Any]] = {}
+    selected = set(selected_analysts or [])
+
+    if "unified" in selected:
+        plan["unified_market"] = lambda: toolkit.get_stock_market_data_unified.invoke(
+            {"ticker": ticker, "start_date": trade_date, "end_date": trade_date})
+        plan["unified_fundamentals"] = lambda: toolkit.get_stock_fundamentals_unified.invoke(
+            {"ticker": ticker, "start_date": trade_date, "end_date": trade_date})
+        plan["unified_news"] = lambda: create_unified_news_tool(toolkit)(stock_code=ticker, max_news=10)
+        plan["unified_sentiment"] = lambda: toolkit.get_stock_sentiment_unified.invoke(
+            {"ticker": ticker, "curr_date": trade_date})
+
+    if "market" in selected:
+        # 市场分析师提示词要求 start_date/end_date 都传分析日期（工具内部自动扩展回溯区间）
+        plan["market"] = lambda: toolkit.get_stock_market_data_unified.invoke(
+            {"ticker": ticker, "start_date": trade_date, "end_date": trade_date})
+    if "fundamentals" in selected:
+        start_date = _fundamentals_start_date(trade_date)
+        plan["fundamentals"] = lambda: toolkit.get_stock_fundamentals_unified.invoke(
+            {"ticker": ticker, "start_date": start_date, "end_date": trade_date, "curr_date": trade_date})
+    if "news" in selected:
+        plan["news"] = lambda: create_unified_news_tool(toolkit)(stock_code=ticker, max_news=10, model_info=model_info)
+    if "social" in selected:
+        plan["social"] = lambda: toolkit.get_stock_sentiment_unified.invoke({"ticker": ticker, "curr_date": trade_date})
+
+    return list(plan.items())
+
+
+class DataPrefetcher:
+    """在后台线程池中执行预取任务，不阻塞图执行"""
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._timings: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+        self._memo = None
+
+    def start(self, plan: PrefetchPlan) -> "DataPrefetcher":
+        """提交预取任务（需在 memoize_tool_results 上下文内调用，工作线程继承当前上下文）"""
+        if not plan:
+            return self
+        self._memo = get_tool_memo()
+        if self._memo is None:
+            logger.warning("⚠️ [数据预取] 未启用工具结果复用，跳过预取")
+            return self
+        self._executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(plan)), thread_name_prefix="prefetch")
+        for name, fn in plan:
+            self._futures[name] = self._executor.submit(contextvars.copy_context().run, self._run, name, fn)
+        logger.info(f"🚀 [数据预取] 已提交 {len(plan)} 个预取任务: {', '.join(name for name, _ in plan)}")
+        return self
+
+    def _run(self, name: str, fn: Callable[[], Any]):
+        start = time.time()
+        try:
+            with prefetching():
+                fn()
+        except Exception as e:
+            self._errors[name] = str(e)
+            logger.warning(f"⚠️ [数据预取] {name} 失败（分析师调用时将重新获取）: {e}")
+        finally:
+            self._timings[name] = time.time() - start
+
+    def finish(self) -> Dict[str, Any]:
+        """结束预取（不等待未完成的任务）并返回统计"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        stats: Dict[str, Any] = {
+            "tasks": len(self._futures),
+            "completed": sum(1 for f in self._futures.values() if f.done() and not f.cancelled()) - len(self._errors),
+            "failed": len(self._errors),
+            "task_timings": {k: round(v, 2) for k, v in self._timings.items()},
+        }
+        if self._memo is not None:
+            stats.update(self._memo.get_prefetch_stats())
+        else:
+            stats.update({"prefetched": 0, "used": 0, "unused": 0, "hidden_seconds": 0.0})
+        return stats
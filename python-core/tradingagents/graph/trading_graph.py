@@ -11,6 +11,15 @@ from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_google_genai import ChatGoogleGenerativeAI
 from tradingagents.llm_adapters import ChatDashScopeOpenAI, ChatGoogleOpenAI
+from tradingagents.llm_adapters.streaming import stream_tokens_to
+from tradingagents.agents.utils.tool_memo import memoize_tool_results, memoize_toolkit
+from tradingagents.graph.prefetch import DataPrefetcher, build_prefetch_plan
+from tradingagents.agents.utils.tool_output_compactor import (
+    compacting_tool,
+    token_budget_for_model,
+    track_tool_output_compaction,
+)
+from tradingagents.utils.metrics import record_graph_node_timings
 
 from langgraph.prebuilt import ToolNode
 
@@ -758,6 +767,10 @@ class TradingAgentsGraph:
             logger.info(f"✅ [自定义厂家 {provider_name}] 已配置自定义端点并应用用户配置的模型参数")
         
         self.toolkit = Toolkit(config=self.config)
+        # 工具替换为复用代理：同一次 propagate 内相同参数的工具调用只执行一次（多个分析师共享）
+        self.tool_memo_enabled = self.config.get("tool_result_memo", True)
+        if self.tool_memo_enabled:
+            memoize_toolkit(self.toolkit)
 
         # Initialize memories (如果启用)
         memory_enabled = self.config.get("memory_enabled", True)
@@ -814,6 +827,7 @@ class TradingAgentsGraph:
         self.log_states_dict = {}  # date to full state dict
 
         # Set up the graph
+        self.selected_analysts = selected_analysts
         self.graph = self.graph_setup.setup_graph(selected_analysts)
 
     def _create_tool_nodes(self) -> Dict[str, ToolNode]:
@@ -821,60 +835,64 @@ class TradingAgentsGraph:
 
         注意：ToolNode 包含所有可能的工具，但 LLM 只会调用它绑定的工具。
         ToolNode 的作用是执行 LLM 生成的 tool_calls，而不是限制 LLM 可以调用哪些工具。
+        工具输出写入分析师消息历史前按分析师模型的 token 预算压缩（tool_output_compaction 配置）。
         """
+        tools_by_node = {
+            "market": [
+                # 统一工具（推荐）
+                self.toolkit.get_stock_market_data_unified,
+                # 在线工具（备用）
+                self.toolkit.get_YFin_data_online,
+                self.toolkit.get_stockstats_indicators_report_online,
+                # 离线工具（备用）
+                self.toolkit.get_YFin_data,
+                self.toolkit.get_stockstats_indicators_report,
+            ],
+            "social": [
+                # 统一工具（推荐）
+                self.toolkit.get_stock_sentiment_unified,
+                # 在线工具（备用）
+                self.toolkit.get_stock_news_openai,
+                # 离线工具（备用）
+                self.toolkit.get_reddit_stock_info,
+            ],
+            "news": [
+                # 统一工具（推荐）
+                self.toolkit.get_stock_news_unified,
+                # 在线工具（备用）
+                self.toolkit.get_global_news_openai,
+                self.toolkit.get_google_news,
+                # 离线工具（备用）
+                self.toolkit.get_finnhub_news,
+                self.toolkit.get_reddit_news,
+            ],
+            "fundamentals": [
+                # 统一工具（推荐）
+                self.toolkit.get_stock_fundamentals_unified,
+                # 离线工具（备用）
+                self.toolkit.get_finnhub_company_insider_sentiment,
+                self.toolkit.get_finnhub_company_insider_transactions,
+                self.toolkit.get_simfin_balance_sheet,
+                self.toolkit.get_simfin_cashflow,
+                self.toolkit.get_simfin_income_stmt,
+                # 中国市场工具（备用）
+                self.toolkit.get_china_stock_data,
+                self.toolkit.get_china_fundamentals,
+            ],
+        }
+        if not self.config.get("tool_output_compaction", True):
+            return {key: ToolNode(tools) for key, tools in tools_by_node.items()}
+
+        budget = token_budget_for_model(
+            getattr(self.quick_thinking_llm, "model_name", None),
+            self.config.get("tool_output_token_budget"),
+        )
         return {
-            "market": ToolNode(
-                [
-                    # 统一工具（推荐）
-                    self.toolkit.get_stock_market_data_unified,
-                    # 在线工具（备用）
-                    self.toolkit.get_YFin_data_online,
-                    self.toolkit.get_stockstats_indicators_report_online,
-                    # 离线工具（备用）
-                    self.toolkit.get_YFin_data,
-                    self.toolkit.get_stockstats_indicators_report,
-                ]
-            ),
-            "social": ToolNode(
-                [
-                    # 统一工具（推荐）
-                    self.toolkit.get_stock_sentiment_unified,
-                    # 在线工具（备用）
-                    self.toolkit.get_stock_news_openai,
-                    # 离线工具（备用）
-                    self.toolkit.get_reddit_stock_info,
-                ]
-            ),
-            "news": ToolNode(
-                [
-                    # 统一工具（推荐）
-                    self.toolkit.get_stock_news_unified,
-                    # 在线工具（备用）
-                    self.toolkit.get_global_news_openai,
-                    self.toolkit.get_google_news,
-                    # 离线工具（备用）
-                    self.toolkit.get_finnhub_news,
-                    self.toolkit.get_reddit_news,
-                ]
-            ),
-            "fundamentals": ToolNode(
-                [
-                    # 统一工具（推荐）
-                    self.toolkit.get_stock_fundamentals_unified,
-                    # 离线工具（备用）
-                    self.toolkit.get_finnhub_company_insider_sentiment,
-                    self.toolkit.get_finnhub_company_insider_transactions,
-                    self.toolkit.get_simfin_balance_sheet,
-                    self.toolkit.get_simfin_cashflow,
-                    self.toolkit.get_simfin_income_stmt,
-                    # 中国市场工具（备用）
-                    self.toolkit.get_china_stock_data,
-                    self.toolkit.get_china_fundamentals,
-                ]
-            ),
+            key: ToolNode([compacting_tool(t, f"tools_{key}", budget) for t in tools])
+            for key, tools in tools_by_node.items()
         }
 
-    def propagate(self, company_name, trade_date, progress_callback=None, task_id=None):
+    def propagate(self, company_name, trade_date, progress_callback=None, task_id=None, token_callback=None):
         """Run the trading agents graph for a company on a specific date.
 
         Args:
@@ -882,6 +900,8 @@ class TradingAgentsGraph:
             trade_date: Date for analysis
             progress_callback: Optional callback function for progress updates
             task_id: Optional task ID for tracking performance data
+            token_callback: Optional callback receiving rate-coalesced incremental LLM output
+                ({"node", "delta", "chars", "final"}), see tradingagents.llm_adapters.streaming
         """
 
         # 添加详细的接收日志
@@ -913,52 +933,19 @@ class TradingAgentsGraph:
         # 根据是否有进度回调选择不同的stream_mode
         args = self.propagator.get_graph_args(use_progress_callback=bool(progress_callback))
 
-        if self.debug:
-            # Debug mode with tracing and progress updates
-            trace = []
-            final_state = None
-            for chunk in self.graph.stream(init_agent_state, **args):
-                # 记录节点计时
-                for node_name in chunk.keys():
-                    if not node_name.startswith('__'):
-                        # 如果有上一个节点，记录其结束时间
-                        if current_node_name and current_node_start:
-                            elapsed = time.time() - current_node_start
-                            node_timings[current_node_name] = elapsed
-                            logger.info(f"⏱️ [{current_node_name}] 耗时: {elapsed:.2f}秒")
-
-                        # 开始新节点计时
-                        current_node_name = node_name
-                        current_node_start = time.time()
-                        break
-
-                # 在 updates 模式下，chunk 格式为 {node_name: state_update}
-                # 在 values 模式下，chunk 格式为完整的状态
-                if progress_callback and args.get("stream_mode") == "updates":
-                    # updates 模式：chunk = {"Market Analyst": {...}}
-                    self._send_progress_update(chunk, progress_callback)
-                    # 累积状态更新
-                    if final_state is None:
-                        final_state = init_agent_state.copy()
-                    for node_name, node_update in chunk.items():
-                        if not node_name.startswith('__'):
-                            final_state.update(node_update)
-                else:
-                    # values 模式：chunk = {"messages": [...], ...}
-                    if len(chunk.get("messages", [])) > 0:
-                        chunk["messages"][-1].pretty_print()
-                    trace.append(chunk)
-                    final_state = chunk
-
-            if not trace and final_state:
-                # updates 模式下，使用累积的状态
-                pass
-            elif trace:
-                final_state = trace[-1]
-        else:
-            # Standard mode without tracing but with progress updates
-            if progress_callback:
-                # 使用 updates 模式以便获取节点级别的进度
+        # 有增量输出订阅者时，LLM 适配器改为流式生成并把增量转发给 token_callback；工具结果在本次运行内复用
+        with stream_tokens_to(token_callback) as token_sink, \
+                memoize_tool_results(self.tool_memo_enabled) as tool_memo, \
+                track_tool_output_compaction(self.config.get("tool_output_compaction", True)) as compaction:
+            # 图执行前并发预取各分析师需要的数据，与首个 LLM 调用重叠（结果写入本次运行的工具复用缓存）
+            prefetcher = None
+            if tool_memo is not None and self.config.get("data_prefetch", True):
+                prefetcher = DataPrefetcher().start(build_prefetch_plan(
+                    self.toolkit, company_name, trade_date, self.selected_analysts, self._analyst_model_info()
+                ))
+
+            if self.debug:
+                # Debug mode with tracing and progress updates
                 trace = []
                 final_state = None
                 for chunk in self.graph.stream(init_agent_state, **args):
@@ -970,48 +957,92 @@ class TradingAgentsGraph:
                                 elapsed = time.time() - current_node_start
                                 node_timings[current_node_name] = elapsed
                                 logger.info(f"⏱️ [{current_node_name}] 耗时: {elapsed:.2f}秒")
-                                logger.info(f"🔍 [TIMING] 节点切换: {current_node_name} → {node_name}")
 
                             # 开始新节点计时
                             current_node_name = node_name
                             current_node_start = time.time()
-                            logger.info(f"🔍 [TIMING] 开始计时: {node_name}")
                             break
 
-                    self._send_progress_update(chunk, progress_callback)
-                    # 累积状态更新
-                    if final_state is None:
-                        final_state = init_agent_state.copy()
-                    for node_name, node_update in chunk.items():
-                        if not node_name.startswith('__'):
-                            final_state.update(node_update)
+                    # 在 updates 模式下，chunk 格式为 {node_name: state_update}
+                    # 在 values 模式下，chunk 格式为完整的状态
+                    if progress_callback and args.get("stream_mode") == "updates":
+                        # updates 模式：chunk = {"Market Analyst": {...}}
+                        self._send_progress_update(chunk, progress_callback)
+                        # 累积状态更新
+                        if final_state is None:
+                            final_state = init_agent_state.copy()
+                        for node_name, node_update in chunk.items():
+                            if not node_name.startswith('__'):
+                                final_state.update(node_update)
+                    else:
+                        # values 模式：chunk = {"messages": [...], ...}
+                        if len(chunk.get("messages", [])) > 0:
+                            chunk["messages"][-1].pretty_print()
+                        trace.append(chunk)
+                        final_state = chunk
+
+                if not trace and final_state:
+                    # updates 模式下，使用累积的状态
+                    pass
+                elif trace:
+                    final_state = trace[-1]
             else:
-                # 原有的invoke模式（也需要计时）
-                logger.info("⏱️ 使用 invoke 模式执行分析（无进度回调）")
-                # 使用stream模式以便计时，但不发送进度更新
-                trace = []
-                final_state = None
-                for chunk in self.graph.stream(init_agent_state, **args):
-                    # 记录节点计时
-                    for node_name in chunk.keys():
-                        if not node_name.startswith('__'):
-                            # 如果有上一个节点，记录其结束时间
-                            if current_node_name and current_node_start:
-                                elapsed = time.time() - current_node_start
-                                node_timings[current_node_name] = elapsed
-                                logger.info(f"⏱️ [{current_node_name}] 耗时: {elapsed:.2f}秒")
-
-                            # 开始新节点计时
-                            current_node_name = node_name
-                            current_node_start = time.time()
-                            break
-
-                    # 累积状态更新
-                    if final_state is None:
-                        final_state = init_agent_state.copy()
-                    for node_name, node_update in chunk.items():
-                        if not node_name.startswith('__'):
-                            final_state.update(node_update)
+                # Standard mode without tracing but with progress updates
+                if progress_callback:
+                    # 使用 updates 模式以便获取节点级别的进度
+                    trace = []
+                    final_state = None
+                    for chunk in self.graph.stream(init_agent_state, **args):
+                        # 记录节点计时
+                        for node_name in chunk.keys():
+                            if not node_name.startswith('__'):
+                                # 如果有上一个节点，记录其结束时间
+                                if current_node_name and current_node_start:
+                                    elapsed = time.time() - current_node_start
+                                    node_timings[current_node_name] = elapsed
+                                    logger.info(f"⏱️ [{current_node_name}] 耗时: {elapsed:.2f}秒")
+                                    logger.info(f"🔍 [TIMING] 节点切换: {current_node_name} → {node_name}")
+
+                                # 开始新节点计时
+                                current_node_name = node_name
+                                current_node_start = time.time()
+                                logger.info(f"🔍 [TIMING] 开始计时: {node_name}")
+                                break
+
+                        self._send_progress_update(chunk, progress_callback)
+                        # 累积状态更新
+                        if final_state is None:
+                            final_state = init_agent_state.copy()
+                        for node_name, node_update in chunk.items():
+                            if not node_name.startswith('__'):
+                                final_state.update(node_update)
+                else:
+                    # 原有的invoke模式（也需要计时）
+                    logger.info("⏱️ 使用 invoke 模式执行分析（无进度回调）")
+                    # 使用stream模式以便计时，但不发送进度更新
+                    trace = []
+                    final_state = None
+                    for chunk in self.graph.stream(init_agent_state, **args):
+                        # 记录节点计时
+                        for node_name in chunk.keys():
+                            if not node_name.startswith('__'):
+                                # 如果有上一个节点，记录其结束时间
+                                if current_node_name and current_node_start:
+                                    elapsed = time.time() - current_node_start
+                                    node_timings[current_node_name] = elapsed
+                                    logger.info(f"⏱️ [{current_node_name}] 耗时: {elapsed:.2f}秒")
+
+                                # 开始新节点计时
+                                current_node_name = node_name
+                                current_node_start = time.time()
+                                break
+
+                        # 累积状态更新
+                        if final_state is None:
+                            final_state = init_agent_state.copy()
+                        for node_name, node_update in chunk.items():
+                            if not node_name.startswith('__'):
+                                final_state.update(node_update)
 
         # 记录最后一个节点的时间
         if current_node_name and current_node_start:
@@ -1032,8 +1063,23 @@ class TradingAgentsGraph:
         self._print_timing_summary(node_timings, total_elapsed)
         logger.info("🔍 [TIMING DEBUG] _print_timing_summary 调用完成")
 
-        # 构建性能数据
+        # 构建性能数据（节点耗时同时写入进程内指标）
         performance_data = self._build_performance_data(node_timings, total_elapsed)
+        record_graph_node_timings(node_timings)
+        if token_sink is not None:
+            performance_data['llm_streaming'] = token_sink.get_stats()
+        if prefetcher is not None:
+            performance_data['data_prefetch'] = prefetcher.finish()
+            logger.info(f"🚀 [数据预取] 预取 {performance_data['data_prefetch']['prefetched']} 项，"
+                        f"被复用 {performance_data['data_prefetch']['used']} 次，"
+                        f"隐藏工具耗时约 {performance_data['data_prefetch']['hidden_seconds']:.2f}秒")
+        if compaction is not None:
+            performance_data['tool_output_compaction'] = compaction.get_stats()
+        if tool_memo is not None:
+            performance_data['tool_memo'] = tool_memo.get_stats()
+            logger.info(f"♻️ [工具复用] 调用 {performance_data['tool_memo']['calls']} 次，"
+                        f"复用 {performance_data['tool_memo']['saved_calls']} 次，"
+                        f"约节省 {performance_data['tool_memo']['saved_seconds']:.2f}秒")
 
         # 将性能数据添加到状态中
         final_state['performance_metrics'] = performance_data
@@ -1061,6 +1107,13 @@ class TradingAgentsGraph:
         # Return decision and processed signal
         return final_state, decision
 
+    def _analyst_model_info(self) -> str:
+        """分析师传给统一新闻工具的模型信息（与新闻分析师的计算方式一致）"""
+        llm = self.quick_thinking_llm
+        if hasattr(llm, 'model_name'):
+            return f"{llm.__class__.__name__}:{llm.model_name}"
+        return llm.__class__.__name__
+
     def _send_progress_update(self, chunk, progress_callback):
         """发送进度更新到回调函数
 
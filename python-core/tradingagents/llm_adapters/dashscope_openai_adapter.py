@@ -5,11 +5,16 @@
 """
 
 import os
+import time
 from typing import Any, Dict, List, Optional, Union, Sequence
 from langchain_openai import ChatOpenAI
 from langchain_core.tools import BaseTool
+from langchain_core.language_models.chat_models import generate_from_stream
 from pydantic import Field, SecretStr
 from ..config.config_manager import token_tracker
+from .streaming import get_token_sink, forward_stream_chunks
+from .response_cache import get_llm_response_cache, replay_to_token_sink
+from tradingagents.utils.metrics import record_llm_call
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
@@ -99,24 +104,54 @@ class ChatDashScopeOpenAI(ChatOpenAI):
         api_base = getattr(self, 'base_url', None) or getattr(self, 'openai_api_base', None) or kwargs.get('base_url', 'unknown')
         logger.info(f"   API Base: {api_base}")
     
-    def _generate(self, *args, **kwargs):
-        """重写生成方法，添加 token 使用量追踪"""
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        """重写生成方法，添加 token 使用量追踪（开启响应缓存时，确定性调用优先读缓存）"""
+
+        cache = get_llm_response_cache()
+        cache_key = cache.key_for(self, messages, stop, kwargs) if cache else None
+        if cache_key:
+            cached = cache.lookup(cache_key)
+            if cached is not None:
+                logger.info(f"♻️ [DashScope] LLM响应缓存命中 - Model: {self.model_name}")
+                record_llm_call("dashscope", self.model_name, 0.0, status="cache_hit")
+                replay_to_token_sink(cached, run_manager)
+                return cached
         
-        # 调用父类的生成方法
-        result = super()._generate(*args, **kwargs)
+        start_time = time.time()
+        try:
+            if get_token_sink() is not None:
+                # 有增量输出订阅者时改用流式生成（请求附带 usage，保证 token 统计不丢失）
+                kwargs.setdefault('stream_usage', True)
+                result = generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+            else:
+                # 调用父类的生成方法
+                result = super()._generate(messages, stop, run_manager, **kwargs)
+        except Exception:
+            record_llm_call("dashscope", self.model_name, time.time() - start_time, status="error")
+            raise
+        record_llm_call("dashscope", self.model_name, time.time() - start_time, result)
         
         # 追踪 token 使用量
         try:
             # 从结果中提取 token 使用信息
+            token_usage = {}
             if hasattr(result, 'llm_output') and result.llm_output:
                 token_usage = result.llm_output.get('token_usage', {})
-                
+            if not token_usage and result.generations:
+                # 流式生成的结果只在消息的 usage_metadata 中携带用量
+                usage = getattr(result.generations[0].message, 'usage_metadata', None) or {}
+                token_usage = {
+                    'prompt_tokens': usage.get('input_tokens', 0),
+                    'completion_tokens': usage.get('output_tokens', 0),
+                }
+
+            if token_usage:
                 input_tokens = token_usage.get('prompt_tokens', 0)
                 output_tokens = token_usage.get('completion_tokens', 0)
                 
                 if input_tokens > 0 or output_tokens > 0:
                     # 生成会话ID
-                    session_id = kwargs.get('session_id', f"dashscope_openai_{hash(str(args))%10000}")
+                    session_id = kwargs.get('session_id', f"dashscope_openai_{hash(str(messages))%10000}")
                     analysis_type = kwargs.get('analysis_type', 'stock_analysis')
                     
                     # 使用 TokenTracker 记录使用量
@@ -132,10 +167,18 @@ class ChatDashScopeOpenAI(ChatOpenAI):
         except Exception as track_error:
             # token 追踪失败不应该影响主要功能
             logger.error(f"⚠️ Token 追踪失败: {track_error}")
+
+        if cache_key:
+            cache.store(cache_key, result)
         
         return result
 
 
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        """流式生成，并把增量文本转发给进度订阅者"""
+        yield from forward_stream_chunks(super()._stream(messages, stop, run_manager, **kwargs), run_manager)
+
+
 # 支持的模型列表
 DASHSCOPE_OPENAI_MODELS = {
     # 通义千问系列
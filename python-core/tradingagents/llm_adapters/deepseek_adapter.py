@@ -15,6 +15,7 @@ from tradingagents.utils.logging_init import setup_llm_logging
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger, get_logger_manager
+from tradingagents.utils.metrics import record_llm_call
 logger = get_logger('agents')
 logger = setup_llm_logging()
 
@@ -125,6 +126,7 @@ class ChatDeepSeek(ChatOpenAI):
         try:
             # 调用父类方法生成响应
             result = super()._generate(messages, stop, run_manager, **kwargs)
+            record_llm_call("deepseek", self.model_name, time.time() - start_time, result)
             
             # 提取token使用量
             input_tokens = 0
@@ -186,6 +188,7 @@ class ChatDeepSeek(ChatOpenAI):
             return result
             
         except Exception as e:
+            record_llm_call("deepseek", self.model_name, time.time() - start_time, status="error")
             logger.error(f"❌ [DeepSeek] 调用失败: {e}", exc_info=True)
             raise
     
@@ -5,13 +5,18 @@ Google AI OpenAI兼容适配器
 """
 
 import os
+import time
 from typing import Any, Dict, List, Optional, Union, Sequence
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.tools import BaseTool
 from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage
 from langchain_core.outputs import LLMResult
+from langchain_core.language_models.chat_models import generate_from_stream
 from pydantic import Field, SecretStr
 from ..config.config_manager import token_tracker
+from .streaming import get_token_sink, forward_stream_chunks
+from .response_cache import get_llm_response_cache, replay_to_token_sink
+from tradingagents.utils.metrics import record_llm_call
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
@@ -143,11 +148,26 @@ class ChatGoogleOpenAI(ChatGoogleGenerativeAI):
         return model or "unknown"
     
     def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs) -> LLMResult:
-        """重写生成方法，优化工具调用处理和内容格式"""
-
+        """重写生成方法，优化工具调用处理和内容格式（开启响应缓存时，确定性调用优先读缓存）"""
+
+        cache = get_llm_response_cache()
+        cache_key = cache.key_for(self, messages, stop, kwargs) if cache else None
+        if cache_key:
+            cached = cache.lookup(cache_key)
+            if cached is not None:
+                logger.info(f"♻️ [Google适配器] LLM响应缓存命中 - Model: {self.model_name}")
+                record_llm_call("google", self.model_name, 0.0, status="cache_hit")
+                replay_to_token_sink(cached, kwargs.get("run_manager"))
+                return cached
+
+        start_time = time.time()
         try:
-            # 调用父类的生成方法
-            result = super()._generate(messages, stop, **kwargs)
+            if get_token_sink() is not None:
+                # 有增量输出订阅者时改用流式生成，结果与非流式一致
+                result = generate_from_stream(self._stream(messages, stop, **kwargs))
+            else:
+                # 调用父类的生成方法
+                result = super()._generate(messages, stop, **kwargs)
 
             # 优化返回内容格式
             # 注意：result.generations 是二维列表 [[ChatGeneration]]
@@ -165,10 +185,16 @@ class ChatGoogleOpenAI(ChatGoogleGenerativeAI):
 
             # 追踪 token 使用量
             self._track_token_usage(result, kwargs)
+            record_llm_call("google", self.model_name, time.time() - start_time, result)
+
+            # 只缓存成功结果（下方异常分支返回的错误提示不写入）
+            if cache_key:
+                cache.store(cache_key, result)
 
             return result
 
         except Exception as e:
+            record_llm_call("google", self.model_name, time.time() - start_time, status="error")
             logger.error(f"❌ Google AI 生成失败: {e}")
             logger.exception(e)  # 打印完整的堆栈跟踪
 
@@ -187,6 +213,12 @@ class ChatGoogleOpenAI(ChatGoogleGenerativeAI):
             error_generation = ChatGeneration(message=error_message)
             return LLMResult(generations=[[error_generation]])
     
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs):
+        """流式生成，并把增量文本转发给进度订阅者"""
+        yield from forward_stream_chunks(
+            super()._stream(messages, stop, **kwargs), kwargs.get("run_manager")
+        )
+
     def _optimize_message_content(self, message: BaseMessage):
         """优化消息内容格式，确保包含新闻特征关键词"""
         
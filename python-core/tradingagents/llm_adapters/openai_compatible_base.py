@@ -5,12 +5,17 @@ OpenAI兼容适配器基类
 
 import os
 import time
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Union
 from langchain_core.messages import BaseMessage
-from langchain_core.outputs import ChatResult
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.language_models.chat_models import generate_from_stream
 from langchain_openai import ChatOpenAI
 from langchain_core.callbacks import CallbackManagerForLLMRun
 
+from tradingagents.llm_adapters.streaming import get_token_sink, forward_stream_chunks
+from tradingagents.llm_adapters.response_cache import get_llm_response_cache, replay_to_token_sink
+from tradingagents.utils.metrics import record_llm_call
+
 # 导入统一日志系统
 from tradingagents.utils.logging_init import setup_llm_logging
 
@@ -160,20 +165,53 @@ class OpenAICompatibleBase(ChatOpenAI):
         **kwargs: Any,
     ) -> ChatResult:
         """
-        生成聊天响应，并记录token使用量
+        生成聊天响应，并记录token使用量（开启响应缓存时，确定性调用优先读缓存）
         """
         
         # 记录开始时间
         start_time = time.time()
+
+        cache = get_llm_response_cache()
+        cache_key = cache.key_for(self, messages, stop, kwargs) if cache else None
+        if cache_key:
+            cached = cache.lookup(cache_key)
+            if cached is not None:
+                logger.info(f"♻️ LLM响应缓存命中 - Provider: {self.provider_name}, Model: {self.model_name}")
+                record_llm_call(self.provider_name, self.model_name, 0.0, status="cache_hit")
+                replay_to_token_sink(cached, run_manager)
+                return cached
         
-        # 调用父类生成方法
-        result = super()._generate(messages, stop, run_manager, **kwargs)
+        try:
+            if get_token_sink() is not None:
+                # 有增量输出订阅者时改用流式生成，结果与非流式一致（请求附带 usage，保证 token 统计不丢失）
+                kwargs.setdefault("stream_usage", True)
+                result = generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+            else:
+                # 调用父类生成方法
+                result = super()._generate(messages, stop, run_manager, **kwargs)
+        except Exception:
+            record_llm_call(self.provider_name, self.model_name, time.time() - start_time, status="error")
+            raise
+        record_llm_call(self.provider_name, self.model_name, time.time() - start_time, result)
         
         # 记录token使用
         self._track_token_usage(result, kwargs, start_time)
+
+        if cache_key:
+            cache.store(cache_key, result)
         
         return result
 
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        """流式生成，并把增量文本转发给进度订阅者"""
+        yield from forward_stream_chunks(super()._stream(messages, stop, run_manager, **kwargs), run_manager)
+
     def _track_token_usage(self, result: ChatResult, kwargs: Dict, start_time: float):
         """记录token使用量并输出日志"""
         if not TOKEN_TRACKING_ENABLED:
@@ -0,0 +1,378 @@
+"""
+LLM 响应持久化缓存（默认关闭，TA_LLM_CACHE_ENABLED=true 开启）
+- 键：(适配器, 模型, 端点, 温度, 规范化后的消息, 绑定的工具及其它调用参数) 的 SHA-256
+- 规范化：忽略消息 id、工具调用 id、response_metadata 等每次调用都会变化的字段，只保留影响输出的内容
+- 只缓存确定性调用：温度不超过 TA_LLM_CACHE_MAX_TEMPERATURE 且 n<=1；调用失败/返回错误结果时不写入
+- 后端：本地 SQLite（默认，TTL + 条目数/总字节数上限，按最近访问淘汰）或 Redis（EX 过期 + 有序集合索引限制条目数）
+- 命中时不再计 token（usage 置零），并累计节省的 token 数，stats() 提供命中率
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from tradingagents.config.env_utils import parse_bool_env, parse_float_env, parse_int_env, parse_str_env
+from tradingagents.utils.logging_manager import get_logger
+from tradingagents.utils.metrics import record_cache_lookup
+logger = get_logger('agents')
+
+CACHE_FORMAT_VERSION = 1
+
+# 不影响模型输出、每次调用都可能不同的参数，不参与缓存键
+_IGNORED_KWARGS = {"run_manager", "callbacks", "session_id", "analysis_type", "stream_usage", "metadata", "tags"}
+
+
+# ---------------- 缓存键 ----------------
+
+def _normalize_message(message: BaseMessage) -> Dict[str, Any]:
+    item: Dict[str, Any] = {"type": message.type, "content": message.content}
+    name = getattr(message, "name", None)
+    if name:
+        item["name"] = name
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        # 工具调用 id 每次随机生成，只保留工具名与参数
+        item["tool_calls"] = [{"name": tc.get("name"), "args": tc.get("args")} for tc in tool_calls]
+    return item
+
+
+def _llm_param(llm: Any, kwargs: Dict[str, Any], name: str, default: Any = None) -> Any:
+    if name in kwargs:
+        return kwargs[name]
+    return getattr(llm, name, default)
+
+
+def build_cache_key(llm: Any, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> str:
+    """计算缓存键（工具定义、tool_choice 等通过 bind_tools 传入 kwargs，一并计入）"""
+    extra = {k: v for k, v in kwargs.items() if k not in _IGNORED_KWARGS}
+    payload = {
+        "v": CACHE_FORMAT_VERSION,
+        "llm": type(llm).__name__,
+        "model": getattr(llm, "model_name", None) or getattr(llm, "model", None),
+        "base_url": getattr(llm, "openai_api_base", None) or getattr(llm, "base_url", None),
+        "temperature": _llm_param(llm, kwargs, "temperature"),
+        "max_tokens": _llm_param(llm, kwargs, "max_tokens"),
+        "stop": stop,
+        "messages": [_normalize_message(m) for m in messages],
+        "kwargs": extra,
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ---------------- 序列化 ----------------
+
+def _usage_tokens(result: ChatResult) -> int:
+    if not result.generations:
+        return 0
+    usage = getattr(result.generations[0].message, "usage_metadata", None) or {}
+    total = usage.get("total_tokens")
+    if total is None:
+        total = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    return int(total or 0)
+
+
+def serialize_result(result: ChatResult) -> Optional[str]:
+    """ChatResult -> JSON 字符串；包含非 ChatGeneration 的结果返回 None（不缓存）"""
+    generations = []
+    for gen in result.generations:
+        if isinstance(gen, list):
+            # Google 适配器返回的 LLMResult 为二维列表
+            gen = gen[0] if len(gen) == 1 else None
+        if not isinstance(gen, ChatGeneration):
+            return None
+        generations.append({"message": message_to_dict(gen.message), "info": gen.generation_info})
+    return json.dumps({
+        "generations": generations,
+        "llm_output": result.llm_output,
+        "tokens": _usage_tokens(result),
+    }, ensure_ascii=False, default=str)
+
+
+def deserialize_result(raw: str) -> ChatResult:
+    """JSON 字符串 -> ChatResult；命中结果 usage 置零，工具调用 id 重新生成"""
+    data = json.loads(raw)
+    generations = []
+    for item in data["generations"]:
+        message = messages_from_dict([item["message"]])[0]
+        if isinstance(message, AIMessage):
+            if message.tool_calls:
+                for tc in message.tool_calls:
+                    tc["id"] = f"call_{uuid.uuid4().hex[:24]}"
+            if message.usage_metadata is not None:
+                message.usage_metadata = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+            message.response_metadata = {**(message.response_metadata or {}), "llm_cache_hit": True}
+        generations.append(ChatGeneration(message=message, generation_info=item.get("info")))
+    llm_output = dict(data.get("llm_output") or {})
+    llm_output.pop("token_usage", None)
+    return ChatResult(generations=generations, llm_output=llm_output or None)
+
+
+# ---------------- 后端 ----------------
+
+class SQLiteCacheBackend:
+    """本地 SQLite 后端：TTL + 条目数/总字节数上限，超限时按最近访问时间淘汰"""
+
+    def __init__(self, path: str, max_entries: int = 5000, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock:
+            # WAL 允许多个分析进程同时读写同一缓存文件
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now + ttl_seconds, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self.evictions += self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,)).rowcount
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # 从最久未访问的条目开始删除，直到条目数与总字节数都回到上限以内
+        removed = []
+        for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            removed.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", removed)
+        self.evictions += len(removed)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        return {"backend": "sqlite", "path": self.path, "entries": count, "bytes": total, "evictions": self.evictions}
+
+
+class RedisCacheBackend:
+    """Redis 后端：值带 EX 过期，另用有序集合按写入时间索引，超过条目上限时淘汰最旧的"""
+
+    def __init__(self, client, prefix: str = "ta:llm_cache:", max_entries: int = 5000):
+        self.client = client
+        self.prefix = prefix
+        self.index_key = f"{prefix}index"
+        self.max_entries = max_entries
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, value, ex=max(1, int(ttl_seconds)))
+        pipe.zadd(self.index_key, {key: now})
+        # 索引中已过期的键一并清理
+        pipe.zremrangebyscore(self.index_key, 0, now - ttl_seconds)
+        pipe.zcard(self.index_key)
+        count = pipe.execute()[-1]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            oldest = [k.decode("utf-8") if isinstance(k, bytes) else k for k, _ in self.client.zpopmin(self.index_key, overflow)]
+            if oldest:
+                self.client.delete(*(self.prefix + k for k in oldest))
+                self.evictions += len(oldest)
+
+    def clear(self):
+        keys = [k.decode("utf-8") if isinstance(k, bytes) else k for k in self.client.zrange(self.index_key, 0, -1)]
+        if keys:
+            self.client.delete(*(self.prefix + k for k in keys))
+        self.client.delete(self.index_key)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"backend": "redis", "entries": self.client.zcard(self.index_key), "evictions": self.evictions}
+
+
+# ---------------- 缓存 ----------------
+
+class LLMResponseCache:
+    """LLM 响应缓存，统计命中率与节省的 token"""
+
+    def __init__(self, backend, ttl_seconds: float = 7 * 24 * 3600, max_temperature: float = 0.3):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_temperature = max_temperature
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "skipped": 0, "errors": 0, "saved_tokens": 0}
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self._stats[name] += value
+
+    def key_for(self, llm: Any, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> Optional[str]:
+        """返回缓存键；非确定性调用（温度过高、n>1）返回 None"""
+        temperature = _llm_param(llm, kwargs, "temperature")
+        n = _llm_param(llm, kwargs, "n") or 1
+        if temperature is None or float(temperature) > self.max_temperature or n > 1:
+            self._count("skipped")
+            return None
+        try:
+            return build_cache_key(llm, messages, stop, kwargs)
+        except Exception as e:
+            logger.debug(f"LLM缓存键计算失败: {e}")
+            self._count("skipped")
+            return None
+
+    def lookup(self, key: str) -> Optional[ChatResult]:
+        try:
+            raw = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ LLM缓存读取失败: {e}")
+            self._count("errors")
+            return None
+        if raw is None:
+            self._count("misses")
+            record_cache_lookup("llm_response", False)
+            return None
+        try:
+            result = deserialize_result(raw)
+        except Exception as e:
+            logger.warning(f"⚠️ LLM缓存内容损坏，忽略: {e}")
+            self._count("errors")
+            return None
+        self._count("hits")
+        record_cache_lookup("llm_response", True)
+        self._count("saved_tokens", int(json.loads(raw).get("tokens", 0)))
+        return result
+
+    def store(self, key: str, result: ChatResult):
+        raw = serialize_result(result)
+        if raw is None:
+            return
+        try:
+            self.backend.set(key, raw, self.ttl_seconds)
+            self._count("stores")
+        except Exception as e:
+            logger.warning(f"⚠️ LLM缓存写入失败: {e}")
+            self._count("errors")
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        try:
+            stats.update(self.backend.describe())
+        except Exception as e:
+            stats["backend_error"] = str(e)
+        return stats
+
+
+def replay_to_token_sink(result: ChatResult, run_manager=None):
+    """命中缓存时把完整文本一次性推给增量输出订阅者，保持前端展示一致"""
+    from tradingagents.llm_adapters.streaming import get_token_sink, _node_name
+
+    sink = get_token_sink()
+    if sink is None or not result.generations:
+        return
+    node = _node_name(run_manager)
+    content = result.generations[0].message.content
+    sink.emit(node, content if isinstance(content, str) else "")
+    sink.finish(node)
+
+
+_llm_response_cache: Optional[LLMResponseCache] = None
+_llm_response_cache_initialized = False
+_init_lock = threading.Lock()
+
+
+def _create_backend():
+    backend = parse_str_env("TA_LLM_CACHE_BACKEND", "sqlite").lower()
+    max_entries = parse_int_env("TA_LLM_CACHE_MAX_ENTRIES", 5000)
+    if backend == "redis":
+        from tradingagents.config.database_manager import get_redis_client
+        client = get_redis_client()
+        if client is not None:
+            return RedisCacheBackend(client, max_entries=max_entries)
+        logger.warning("⚠️ Redis 不可用，LLM响应缓存改用本地 SQLite")
+    path = parse_str_env("TA_LLM_CACHE_PATH", os.path.join("data", "cache", "llm_response_cache.sqlite3"))
+    max_bytes = parse_int_env("TA_LLM_CACHE_MAX_MB", 256) * 1024 * 1024
+    return SQLiteCacheBackend(path, max_entries=max_entries, max_bytes=max_bytes)
+
+
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """获取 LLM 响应缓存（未开启时返回 None）"""
+    global _llm_response_cache, _llm_response_cache_initialized
+    if _llm_response_cache_initialized:
+        return _llm_response_cache
+    with _init_lock:
+        if not _llm_response_cache_initialized:
+            if parse_bool_env("TA_LLM_CACHE_ENABLED", False):
+                try:
+                    _llm_response_cache = LLMResponseCache(
+                        _create_backend(),
+                        ttl_seconds=parse_float_env("TA_LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600),
+                        max_temperature=parse_float_env("TA_LLM_CACHE_MAX_TEMPERATURE", 0.3),
+                    )
+                    logger.info(f"✅ LLM响应缓存已启用: {_llm_response_cache.backend.describe().get('backend')}")
+                except Exception as e:
+                    logger.error(f"❌ LLM响应缓存初始化失败，已禁用: {e}")
+                    _llm_response_cache = None
+            _llm_response_cache_initialized = True
+    return _llm_response_cache
+
+
+def reset_llm_response_cache():
+    """重置单例（测试或修改环境变量后重新读取配置）"""
+    global _llm_response_cache, _llm_response_cache_initialized
+    with _init_lock:
+        _llm_response_cache = None
+        _llm_response_cache_initialized = False
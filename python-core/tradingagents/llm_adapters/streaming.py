@@ -0,0 +1,127 @@
+"""
+LLM 增量输出转发
+- propagate 期间通过 stream_tokens_to() 注册 TokenStreamSink（基于 contextvars，LangGraph 的工作线程会继承）
+- 适配器检测到 sink 时改用 _stream 生成，把增量文本转发给 sink，最终结果与非流式调用一致
+- sink 按时间间隔合并增量（默认每秒最多 10 次），避免订阅端被逐 token 刷屏
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+
+class TokenStreamSink:
+    """按节点累积 LLM 增量输出，并按频率上限合并推送给回调"""
+
+    def __init__(self, callback: Callable[[Dict[str, Any]], None], max_updates_per_second: float = 10.0):
+        """
+        Args:
+            callback: 推送回调，参数为事件字典
+                {"node": 节点名, "delta": 本次合并的增量文本, "chars": 该节点已输出字符数, "final": 是否为该次调用的结尾}
+            max_updates_per_second: 每秒最多推送次数（所有节点共享）
+        """
+        self.callback = callback
+        self.min_interval = 1.0 / max_updates_per_second if max_updates_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._pending: Dict[str, str] = {}
+        self._chars: Dict[str, int] = {}
+        self._last_flush = 0.0
+        self.first_token_at: Optional[float] = None
+        self.created_at = time.time()
+
+    def emit(self, node: str, text: str):
+        """接收一段增量文本，到达推送间隔时合并推送"""
+        if not text:
+            return
+        with self._lock:
+            if self.first_token_at is None:
+                self.first_token_at = time.time()
+            self._pending[node] = self._pending.get(node, "") + text
+            self._chars[node] = self._chars.get(node, 0) + len(text)
+            if time.time() - self._last_flush < self.min_interval:
+                return
+            events = self._drain()
+        self._dispatch(events)
+
+    def finish(self, node: str):
+        """一次 LLM 调用结束，推送该节点剩余的增量"""
+        with self._lock:
+            delta = self._pending.pop(node, "")
+            events = [{"node": node, "delta": delta, "chars": self._chars.get(node, 0), "final": True}]
+            self._last_flush = time.time()
+        self._dispatch(events)
+
+    def _drain(self):
+        events = [
+            {"node": node, "delta": delta, "chars": self._chars.get(node, 0), "final": False}
+            for node, delta in self._pending.items() if delta
+        ]
+        self._pending.clear()
+        self._last_flush = time.time()
+        return events
+
+    def _dispatch(self, events):
+        for event in events:
+            try:
+                self.callback(event)
+            except Exception as e:
+                logger.debug(f"LLM增量输出回调失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息（首个 token 延迟、各节点输出字符数）"""
+        return {
+            "time_to_first_token": (self.first_token_at - self.created_at) if self.first_token_at else None,
+            "chars_by_node": dict(self._chars),
+        }
+
+
+_token_sink: contextvars.ContextVar[Optional[TokenStreamSink]] = contextvars.ContextVar("llm_token_sink", default=None)
+
+
+def get_token_sink() -> Optional[TokenStreamSink]:
+    """获取当前上下文的增量输出接收器（未注册时返回 None）"""
+    return _token_sink.get()
+
+
+@contextmanager
+def stream_tokens_to(callback: Optional[Callable[[Dict[str, Any]], None]], max_updates_per_second: float = 10.0):
+    """在上下文内把所有适配器的增量输出转发到 callback；callback 为 None 时不启用"""
+    if callback is None:
+        yield None
+        return
+    sink = TokenStreamSink(callback, max_updates_per_second=max_updates_per_second)
+    token = _token_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _token_sink.reset(token)
+
+
+def _node_name(run_manager) -> str:
+    """从 LangGraph 注入的回调元数据中取当前节点名"""
+    metadata = getattr(run_manager, "metadata", None) or {}
+    return metadata.get("langgraph_node") or "llm"
+
+
+def forward_stream_chunks(chunks: Iterator, run_manager=None) -> Iterator:
+    """透传 _stream 产生的 chunk，同时把文本增量转发给当前 sink"""
+    sink = get_token_sink()
+    if sink is None:
+        yield from chunks
+        return
+    node = _node_name(run_manager)
+    try:
+        for chunk in chunks:
+            text = getattr(chunk, "text", None)
+            if text is None:
+                content = getattr(getattr(chunk, "message", None), "content", "")
+                text = content if isinstance(content, str) else ""
+            sink.emit(node, text)
+            yield chunk
+    finally:
+        sink.finish(node)
@@ -55,7 +55,7 @@ class UnifiedNewsAnalyzer:
         
         # 🔍 添加详细的结果调试日志
         logger.info(f"[统一新闻工具] 📊 新闻获取完成，结果长度: {len(result)} 字符")
-        logger.info(f"[统一新闻工具] 📋 返回结果预览 (前1000字符): {result[:1000]}")
+        logger.info("[统一新闻工具] 📋 返回结果预览 (前1000字符): %.1000s", result)
         
         # 如果结果为空或过短，记录警告
         if not result or len(result.strip()) < 50:
@@ -327,7 +327,7 @@ class UnifiedNewsAnalyzer:
                 
                 # 🔍 详细记录东方财富返回的内容
                 logger.info(f"[统一新闻工具] 📊 东方财富返回内容长度: {len(result) if result else 0} 字符")
-                logger.info(f"[统一新闻工具] 📋 东方财富返回内容预览 (前500字符): {result[:500] if result else 'None'}")
+                logger.info("[统一新闻工具] 📋 东方财富返回内容预览 (前500字符): %.500s", result)
                 
                 if result and len(result.strip()) > 100:
                     logger.info(f"[统一新闻工具] ✅ 东方财富新闻获取成功: {len(result)} 字符")
@@ -461,7 +461,7 @@ class UnifiedNewsAnalyzer:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # 🔍 添加调试日志：打印原始新闻内容
-        logger.info(f"[统一新闻工具] 📋 原始新闻内容预览 (前500字符): {news_content[:500]}")
+        logger.info("[统一新闻工具] 📋 原始新闻内容预览 (前500字符): %.500s", news_content)
         logger.info(f"[统一新闻工具] 📊 原始内容长度: {len(news_content)} 字符")
         
         # 检测是否为Google/Gemini模型
@@ -567,7 +567,16 @@ def create_unified_news_tool(toolkit):
         """
         if not stock_code:
             return "❌ 错误: 未提供股票代码"
-        
+
+        # 分析运行内相同参数的新闻请求只执行一次（新闻分析师与统一分析师共享）
+        from tradingagents.agents.utils.tool_memo import get_tool_memo
+        memo = get_tool_memo()
+        if memo is not None:
+            return memo.call(
+                "get_stock_news_unified",
+                {"stock_code": stock_code, "max_news": max_news, "model_info": model_info},
+                lambda: analyzer.get_stock_news_unified(stock_code, max_news, model_info),
+            )
         return analyzer.get_stock_news_unified(stock_code, max_news, model_info)
     
     # 设置工具属性
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+非阻塞队列日志
+- 日志器原有的处理器（控制台、轮转文件、错误日志、结构化 JSON）统一移到后台 QueueListener 线程执行，
+  调用线程（事件循环、分析工作线程）只做消息格式化并放入有界队列，不再同步写磁盘
+- 所有日志器共用一个队列和一个监听线程，每条记录携带所属日志器的原处理器列表，按处理器级别分发
+- 入队时复制 contextvars 上下文，监听线程在该上下文内执行处理器过滤器（trace_id 等上下文字段保持正确）
+- 队列满时的丢弃策略：DEBUG/INFO 直接丢弃；WARNING 及以上丢弃队列中最旧的一条后入队；丢弃数量会以告警日志补记
+- 环境变量：LOG_QUEUE_ENABLED（默认 true）、LOG_QUEUE_MAXSIZE（默认 10000）
+- 进程退出时（atexit）停止监听线程，队列中剩余日志全部写出
+"""
+
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_QUEUE_MAXSIZE = 10000
+# 丢弃告警的最小间隔（秒）
+DROP_REPORT_INTERVAL = 5.0
+
+
+def queue_logging_enabled() -> bool:
+    """是否启用队列日志（LOG_QUEUE_ENABLED，默认启用）"""
+    return os.getenv("LOG_QUEUE_ENABLED", "true").lower() == "true"
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """把记录连同目标处理器放入有界队列（队列满时按级别丢弃）"""
+
+    def __init__(self, log_queue: queue.Queue, targets: List[logging.Handler], dispatcher: "_LogDispatcher"):
+        super().__init__(log_queue)
+        self.targets = list(targets)
+        self._dispatcher = dispatcher
+        # 只要有一个目标处理器需要，就必须入队
+        self.setLevel(min((h.level for h in self.targets), default=logging.NOTSET))
+
+    def enqueue(self, record: logging.LogRecord):
+        item = (self.targets, contextvars.copy_context(), record)
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        if record.levelno >= logging.WARNING:
+            # 告警/错误优先保留：丢弃队列中最旧的一条
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self._dispatcher.count_dropped()
+                self.queue.put_nowait(item)
+                return
+            except (queue.Empty, queue.Full):
+                pass
+        self._dispatcher.count_dropped()
+
+
+class _RoutingQueueListener(logging.handlers.QueueListener):
+    """按记录携带的目标处理器分发（处理器自身级别生效）"""
+
+    def __init__(self, log_queue: queue.Queue, dispatcher: "_LogDispatcher"):
+        super().__init__(log_queue, respect_handler_level=True)
+        self._dispatcher = dispatcher
+
+    def enqueue_sentinel(self):
+        # 停止时阻塞等待队列空位，保证剩余日志写出
+        self.queue.put(self._sentinel)
+
+    def handle(self, item):
+        targets, ctx, record = item
+        ctx.run(self._dispatch, targets, record)
+        self._dispatcher.report_dropped(targets)
+
+    @staticmethod
+    def _dispatch(targets: List[logging.Handler], record: logging.LogRecord):
+        for handler in targets:
+            if record.levelno >= handler.level:
+                try:
+                    handler.handle(record)
+                except Exception:
+                    handler.handleError(record)
+
+
+class _LogDispatcher:
+    """共享队列与监听线程"""
+
+    def __init__(self, maxsize: int):
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.listener = _RoutingQueueListener(self.queue, self)
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self._reported = 0
+        self._last_report = 0.0
+        self.listener.start()
+
+    def count_dropped(self):
+        with self._lock:
+            self.dropped += 1
+
+    def report_dropped(self, targets: List[logging.Handler]):
+        """在监听线程中补记丢弃数量（限频）"""
+        if self.dropped == self._reported or time.time() - self._last_report < DROP_REPORT_INTERVAL:
+            return
+        with self._lock:
+            count = self.dropped - self._reported
+            self._reported = self.dropped
+        self._last_report = time.time()
+        record = logging.LogRecord(
+            "tradingagents.async_logging", logging.WARNING, __file__, 0,
+            f"⚠️ [日志队列] 队列已满，已丢弃 {count} 条日志", None, None,
+        )
+        self.listener._dispatch(targets, record)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待队列中的日志写出（超时返回 False）"""
+        deadline = time.time() + timeout
+        while self.queue.unfinished_tasks:
+            if time.time() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+
+_dispatcher: Optional[_LogDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def _get_dispatcher() -> _LogDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                maxsize = int(os.getenv("LOG_QUEUE_MAXSIZE", str(DEFAULT_QUEUE_MAXSIZE)))
+                _dispatcher = _LogDispatcher(maxsize)
+                atexit.register(_dispatcher.stop)
+    return _dispatcher
+
+
+def install_queue_logging(logger: logging.Logger, handlers: Optional[Iterable[logging.Handler]] = None) -> bool:
+    """
+    把日志器上的处理器移到后台队列线程
+
+    Args:
+        logger: 目标日志器
+        handlers: 需要异步化的处理器（默认为日志器上全部处理器）；未列出的处理器保持同步
+
+    Returns:
+        bool: 是否已安装
+    """
+    if not queue_logging_enabled():
+        return False
+    candidates = list(logger.handlers if handlers is None else handlers)
+    targets = [h for h in candidates if not isinstance(h, AsyncQueueHandler) and h in logger.handlers]
+    if not targets:
+        return False
+    dispatcher = _get_dispatcher()
+    # 已安装过时合并目标处理器，保证每个日志器只有一个队列处理器
+    for existing in [h for h in logger.handlers if isinstance(h, AsyncQueueHandler)]:
+        targets = existing.targets + targets
+        logger.removeHandler(existing)
+    for handler in targets:
+        logger.removeHandler(handler)
+    logger.addHandler(AsyncQueueHandler(dispatcher.queue, targets, dispatcher))
+    return True
+
+
+def install_queue_logging_for(logger_names: Iterable[Optional[str]]) -> List[str]:
+    """对多个日志器安装队列日志（None 表示根日志器），返回已安装的日志器名称"""
+    installed = []
+    for name in logger_names:
+        logger = logging.getLogger(name) if name else logging.getLogger()
+        if install_queue_logging(logger):
+            installed.append(name or "root")
+    return installed
+
+
+def flush_queue_logging(timeout: float = 5.0) -> bool:
+    """等待队列中的日志全部写出（重新配置日志或测试断言前调用）"""
+    if _dispatcher is None:
+        return True
+    return _dispatcher.flush(timeout)
+
+
+def get_queue_logging_stats() -> Dict[str, Any]:
+    """队列日志统计：是否启用、当前积压、容量、累计丢弃数"""
+    if _dispatcher is None:
+        return {"enabled": False, "pending": 0, "maxsize": 0, "dropped": 0}
+    return {
+        "enabled": True,
+        "pending": _dispatcher.queue.qsize(),
+        "maxsize": _dispatcher.queue.maxsize,
+        "dropped": _dispatcher.dropped,
+    }
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+包级延迟导入（PEP 562）
+- 数据源包（akshare/tushare/baostock/yfinance 等）的 __init__ 只登记导出名，首次访问时才导入对应子模块，
+  API 进程冷启动时不再为大多数请求用不到的 SDK 付出导入开销
+- 可选导出：依次尝试候选路径，全部 ImportError 时为 None（与原先 try/except ImportError 的写法一致）
+- 可用性标志：对应导出解析结果不为 None 时为 True
+- 解析结果写回包的全局命名空间，之后的访问不再经过 __getattr__
+"""
+
+import importlib
+import sys
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+Target = Union[str, Sequence[str]]
+
+
+def _load(package: str, target: str) -> Any:
+    """解析 "module:attr"（module 可为相对路径；省略 attr 时返回模块本身）"""
+    module_name, _, attr = target.partition(":")
+    module = importlib.import_module(module_name, package)
+    if not attr:
+        return module
+    try:
+        return getattr(module, attr)
+    except AttributeError:
+        # 与 from module import attr 一致：名称不存在时视为 ImportError
+        raise ImportError(f"cannot import name {attr!r} from {module.__name__!r}") from None
+
+
+def lazy_exports(
+    package: str,
+    required: Optional[Dict[str, str]] = None,
+    optional: Optional[Dict[str, Target]] = None,
+    flags: Optional[Dict[str, str]] = None,
+) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    生成包的 __getattr__ / __dir__
+
+    Args:
+        package: 包名（传入 __name__）
+        required: 必需导出 {名称: "module:attr"}，导入失败时抛出 ImportError
+        optional: 可选导出 {名称: "module:attr" 或候选列表}，全部失败时为 None
+        flags: 可用性标志 {标志名: 导出名}
+
+    Returns:
+        (__getattr__, __dir__)
+    """
+    required = dict(required or {})
+    optional = {k: [v] if isinstance(v, str) else list(v) for k, v in (optional or {}).items()}
+    flags = dict(flags or {})
+
+    def _resolve(name: str) -> Any:
+        if name in required:
+            return _load(package, required[name])
+        for target in optional[name]:
+            try:
+                return _load(package, target)
+            except ImportError:
+                continue
+        return None
+
+    def __getattr__(name: str) -> Any:
+        module_globals = vars(sys.modules[package])
+        if name in flags:
+            value = __getattr__(flags[name]) is not None
+        elif name in required or name in optional:
+            value = _resolve(name)
+        else:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        module_globals[name] = value
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | set(required) | set(optional) | set(flags))
+
+    return __getattr__, __dir__
+
+
+def lazy_callable(target: str) -> Callable[..., Any]:
+    """
+    返回首次调用时才导入目标的包装函数
+
+    适用于路由中按需使用的服务工厂/类（如 get_xxx_sync_service），异步工厂的返回值仍可直接 await；
+    包装函数本身不是协程函数，不要交给按函数类型分派的调用方（如 APScheduler 的任务函数）。
+
+    Args:
+        target: "绝对模块路径:属性名"
+    """
+    resolved: List[Any] = []
+    attr = target.partition(":")[2]
+
+    def wrapper(*args, **kwargs):
+        if not resolved:
+            resolved.append(_load(None, target))
+        return resolved[0](*args, **kwargs)
+
+    wrapper.__name__ = wrapper.__qualname__ = attr
+    wrapper.__doc__ = f"延迟导入 {target}"
+    return wrapper
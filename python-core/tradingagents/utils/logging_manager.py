@@ -208,6 +208,10 @@ class TradingAgentsLogger:
         
         # 配置特定日志器
         self._configure_specific_loggers()
+
+        # 处理器移到后台队列线程，调用线程不再同步写磁盘（LOG_QUEUE_ENABLED=false 可关闭）
+        from tradingagents.utils.async_logging import install_queue_logging
+        install_queue_logging(root_logger)
     
     def _add_console_handler(self, logger: logging.Logger):
         """添加控制台处理器"""
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+进程内指标注册表（Prometheus 文本格式）
+- Counter / Gauge / Histogram 三种指标，按标签维度累计，线程安全
+- 各热点路径通过本模块的辅助函数记录：数据源（按提供方的延迟/错误/降级）、缓存（按层级命中/未命中）、
+  LLM（按模型的延迟与 token）、图节点耗时、分析任务耗时与队列深度
+- register_collector() 注册的回调在导出前执行，用于刷新需要实时读取的 Gauge（如线程池积压）
+- app/main.py 与 api.py 的 /metrics 端点输出 render() 的结果；不提供 HTTP 接口的进程
+  （分析 Worker、定时任务进程）用 start_metrics_server() 在独立线程中提供 /metrics
+"""
+
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('metrics')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# 分析任务耗时通常在分钟级
+TASK_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """指标基类：按标签值元组保存样本"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames) or any(n not in labels for n in self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        """(名称后缀, 标签串, 值) 列表"""
+        with self._lock:
+            items = list(self._values.items())
+        return [("", _format_labels(self.labelnames, k), v) for k, v in sorted(items)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{suffix}{labels} {_format_value(v)}" for suffix, labels, v in self._samples()]
+        return lines
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        if amount < 0:
+            raise ValueError("Counter 只能增加")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    """可增减的瞬时值"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    """分桶直方图（导出 _bucket / _sum / _count）"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels) -> Dict[str, float]:
+        """某组标签的 count 与 sum"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return {"count": state["count"], "sum": state["sum"]} if state else {"count": 0, "sum": 0.0}
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = [(k, list(s["counts"]), s["sum"], s["count"]) for k, s in self._values.items()]
+        samples = []
+        for key, counts, total, count in sorted(items):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                samples.append(("_bucket", _format_labels(self.labelnames, key, ("le", _format_value(bound))), cumulative))
+            samples.append(("_bucket", _format_labels(self.labelnames, key, ("le", "+Inf")), count))
+            samples.append(("_sum", _format_labels(self.labelnames, key), total))
+            samples.append(("_count", _format_labels(self.labelnames, key), count))
+        return samples
+
+
+class MetricsRegistry:
+    """指标注册表：同名指标只创建一次"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"指标 {name} 已以不同类型或标签注册")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def register_collector(self, collector: Callable[[], None]):
+        """注册导出前执行的回调（用于刷新实时 Gauge）"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self):
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.debug(f"指标采集回调失败: {e}")
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式"""
+        self.collect()
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """清空所有样本（测试用，指标定义保留）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """获取全局指标注册表"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry()
+    return _registry
+
+
+def render_metrics() -> str:
+    """导出全局注册表的 Prometheus 文本"""
+    return get_metrics_registry().render()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """
+    在守护线程中提供 /metrics（供没有 HTTP 接口的进程使用）
+
+    独立线程不受事件循环阻塞影响（Worker 在事件循环线程中同步执行分析图）。
+    port 为 0 或端口被占用时不启动，返回 None。
+    """
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning(f"⚠️ 指标端口 {host}:{port} 启动失败，本进程指标不可抓取: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"📈 指标端点已启动: http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+# ---------------- 数据源 ----------------
+
+def _data_source_status(result: Any) -> str:
+    """按返回值判断数据源调用结果：ok / empty / error"""
+    if isinstance(result, tuple):
+        result = result[0] if result else None
+    if result is None:
+        return "empty"
+    if isinstance(result, str):
+        if "❌" in result:
+            return "error"
+        return "ok" if result.strip() else "empty"
+    if isinstance(result, dict) and result.get("error"):
+        return "error"
+    try:
+        return "ok" if len(result) else "empty"
+    except TypeError:
+        return "ok"
+
+
+def record_data_source_call(provider: str, operation: str, seconds: float, status: str):
+    registry = get_metrics_registry()
+    registry.counter(
+        "tradingagents_data_source_requests_total", "数据源调用次数", ("provider", "operation", "status")
+    ).inc(provider=provider, operation=operation, status=status)
+    registry.histogram(
+        "tradingagents_data_source_latency_seconds", "数据源调用耗时", ("provider", "operation")
+    ).observe(seconds, provider=provider, operation=operation)
+
+
+def track_data_source(provider: str, operation: str):
+    """数据源调用装饰器：记录耗时与结果（异常计为 error 并继续抛出）"""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            status = "error"
+            try:
+                result = func(*args, **kwargs)
+                status = _data_source_status(result)
+                return result
+            finally:
+                record_data_source_call(provider, operation, time.perf_counter() - start, status)
+        return wrapper
+    return decorator
+
+
+def record_data_source_fallback(operation: str, from_provider: str, to_provider: str):
+    """记录一次降级（to_provider 为 none 表示所有备用数据源均失败）"""
+    get_metrics_registry().counter(
+        "tradingagents_data_source_fallbacks_total", "数据源降级次数", ("operation", "from_provider", "to_provider")
+    ).inc(operation=operation, from_provider=from_provider, to_provider=to_provider)
+
+
+# ---------------- 缓存 ----------------
+
+def record_cache_lookup(tier: str, hit: bool):
+    get_metrics_registry().counter(
+        "tradingagents_cache_requests_total", "缓存查询次数", ("tier", "result")
+    ).inc(tier=tier, result="hit" if hit else "miss")
+
+
+def track_cache_lookup(tier: str):
+    """缓存读取装饰器：返回 None 计为未命中"""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            record_cache_lookup(tier, result is not None)
+            return result
+        return wrapper
+    return decorator
+
+
+# ---------------- LLM ----------------
+
+def llm_token_usage(result: Any) -> Tuple[int, int]:
+    """从 ChatResult 提取 (输入 token, 输出 token)"""
+    usage = None
+    generations = getattr(result, "generations", None)
+    if generations:
+        usage = getattr(getattr(generations[0], "message", None), "usage_metadata", None)
+    if usage:
+        return int(usage.get("input_tokens") or 0), int(usage.get("output_tokens") or 0)
+    token_usage = (getattr(result, "llm_output", None) or {}).get("token_usage") or {}
+    return int(token_usage.get("prompt_tokens") or 0), int(token_usage.get("completion_tokens") or 0)
+
+
+def record_llm_call(provider: str, model: str, seconds: float, result: Any = None, status: str = "success"):
+    """记录一次 LLM 调用的耗时与 token（缓存命中的调用 status=cache_hit）"""
+    registry = get_metrics_registry()
+    registry.counter(
+        "tradingagents_llm_requests_total", "LLM 调用次数", ("provider", "model", "status")
+    ).inc(provider=provider, model=model, status=status)
+    if status != "success":
+        return
+    registry.histogram(
+        "tradingagents_llm_latency_seconds", "LLM 调用耗时", ("provider", "model")
+    ).observe(seconds, provider=provider, model=model)
+    if result is not None:
+        input_tokens, output_tokens = llm_token_usage(result)
+        tokens = registry.counter("tradingagents_llm_tokens_total", "LLM token 用量", ("provider", "model", "type"))
+        tokens.inc(input_tokens, provider=provider, model=model, type="input")
+        tokens.inc(output_tokens, provider=provider, model=model, type="output")
+
+
+# ---------------- 分析图与任务 ----------------
+
+def record_graph_node_timings(node_timings: Dict[str, float]):
+    """记录一次分析中各图节点的耗时"""
+    histogram = get_metrics_registry().histogram(
+        "tradingagents_graph_node_duration_seconds", "分析图节点耗时", ("node",)
+    )
+    for node, seconds in node_timings.items():
+        histogram.observe(seconds, node=node)
+
+
+def record_task_duration(kind: str, status: str, seconds: float):
+    get_metrics_registry().histogram(
+        "tradingagents_task_duration_seconds", "任务耗时", ("kind", "status"), buckets=TASK_BUCKETS
+    ).observe(seconds, kind=kind, status=status)
+
+
+@contextmanager
+def track_task(kind: str) -> Iterator[None]:
+    """记录任务耗时（按结果区分 completed / failed）与进行中的任务数"""
+    in_progress = get_metrics_registry().gauge("tradingagents_tasks_in_progress", "进行中的任务数", ("kind",))
+    start = time.perf_counter()
+    in_progress.inc(kind=kind)
+    status = "failed"
+    try:
+        yield
+        status = "completed"
+    finally:
+        in_progress.dec(kind=kind)
+        record_task_duration(kind, status, time.perf_counter() - start)
+
+
+def set_queue_depth(queue: str, state: str, depth: float):
+    get_metrics_registry().gauge(
+        "tradingagents_queue_depth", "队列深度", ("queue", "state")
+    ).set(depth, queue=queue, state=state)
+
+
+# ---------------- HTTP ----------------
+
+def record_http_request(method: str, route: str, status_code: int, seconds: float):
+    """记录一次 HTTP 请求（route 为路由模板）"""
+    registry = get_metrics_registry()
+    registry.counter(
+        "tradingagents_http_requests_total", "HTTP 请求次数", ("method", "route", "status")
+    ).inc(method=method, route=route, status=str(status_code))
+    registry.histogram(
+        "tradingagents_http_request_duration_seconds", "HTTP 请求耗时", ("method", "route")
+    ).observe(seconds, method=method, route=route)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+进程内采样剖析器（纯标准库）
+- 后台守护线程按固定间隔读取 sys._current_frames()，记录目标线程（或全部线程）的调用栈
+- 相同调用栈合并计数，内存占用与不同栈的数量成正比，与运行时长无关
+- 输出 collapsed-stack 文本（flamegraph.pl / speedscope 可直接打开）与 speedscope JSON
+- 每个样本按距上次采样的实际间隔计权，GIL 争用导致的采样延迟不会让耗时失真
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+Stack = Tuple[str, ...]
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    """缩短源文件路径：第三方包取 site-packages 之后部分，项目文件取相对路径"""
+    normalized = filename.replace("\\", "/")
+    marker = "/site-packages/"
+    if marker in normalized:
+        return normalized.rsplit(marker, 1)[1]
+    try:
+        relative = os.path.relpath(filename)
+    except ValueError:
+        return normalized
+    return normalized if relative.startswith("..") else relative.replace("\\", "/")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    采样剖析器
+
+    用法：
+        profiler = SamplingProfiler(interval=0.01).start()
+        ...  # 被剖析的代码（在调用 start 的线程中执行）
+        profiler.stop()
+        profiler.to_collapsed()
+    """
+
+    def __init__(self, interval: float = 0.01, all_threads: bool = False, max_depth: int = 256):
+        """
+        Args:
+            interval: 采样间隔（秒）
+            all_threads: 采样进程内全部线程；默认只采样调用 start 的线程
+            max_depth: 单个调用栈保留的最大深度（保留靠近栈顶的帧）
+        """
+        self.interval = max(float(interval), 0.001)
+        self.all_threads = all_threads
+        self.max_depth = max_depth
+        self._stacks: Counter = Counter()
+        self._weights: Counter = Counter()
+        self._target_ident: Optional[int] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._started_at: Optional[float] = None
+        self._duration = 0.0
+
+    # ------------------------------------------------------------------
+    # 启停
+    # ------------------------------------------------------------------
+
+    def start(self, thread_ident: Optional[int] = None) -> "SamplingProfiler":
+        """开始采样；thread_ident 缺省为当前线程"""
+        if self._sampler is not None:
+            raise RuntimeError("profiler already started")
+        self._target_ident = thread_ident or threading.get_ident()
+        self._started_at = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        """停止采样（可重复调用）"""
+        if self._sampler is not None and self._sampler.is_alive():
+            self._stop_event.set()
+            self._sampler.join()
+            self._duration = time.perf_counter() - self._started_at
+        return self
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    @property
+    def running(self) -> bool:
+        return self._sampler is not None and self._sampler.is_alive()
+
+    # ------------------------------------------------------------------
+    # 采样
+    # ------------------------------------------------------------------
+
+    def _thread_names(self) -> Dict[int, str]:
+        return {thread.ident: thread.name for thread in threading.enumerate()}
+
+    def _stack(self, frame) -> Stack:
+        labels: List[str] = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        labels.reverse()
+        return tuple(labels)
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        names = self._thread_names()
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            frames = sys._current_frames()
+            if self.all_threads and any(ident not in names for ident in frames):
+                names = self._thread_names()
+            for ident, frame in frames.items():
+                if ident == own_ident or (not self.all_threads and ident != self._target_ident):
+                    continue
+                stack = (names.get(ident, f"thread-{ident}"),) + self._stack(frame)
+                self._stacks[stack] += 1
+                self._weights[stack] += weight
+            del frames
+
+    # ------------------------------------------------------------------
+    # 输出
+    # ------------------------------------------------------------------
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self._stacks.values())
+
+    @property
+    def duration(self) -> float:
+        """采样时长（秒）；运行中返回已经过的时间"""
+        if self.running:
+            return time.perf_counter() - self._started_at
+        return self._duration
+
+    def to_collapsed(self) -> str:
+        """collapsed-stack 格式：每行 "帧1;帧2;...;帧N 样本数" """
+        lines = [
+            f"{';'.join(label.replace(';', ':') for label in stack)} {count}"
+            for stack, count in sorted(self._stacks.items())
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def to_speedscope(self, name: str = "profile") -> Dict[str, Any]:
+        """speedscope 文件格式（sampled profile，权重单位为秒）"""
+        frame_index: Dict[str, int] = {}
+        frames: List[Dict[str, Any]] = []
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        for stack, weight in self._weights.items():
+            indexes = []
+            for label in stack:
+                if label not in frame_index:
+                    frame_index[label] = len(frames)
+                    frames.append({"name": label})
+                indexes.append(frame_index[label])
+            samples.append(indexes)
+            weights.append(round(weight, 6))
+        total = sum(weights)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(total, 6),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": name,
+            "exporter": "tradingagents.sampling_profiler",
+        }
+
+    def to_speedscope_json(self, name: str = "profile") -> str:
+        return json.dumps(self.to_speedscope(name), ensure_ascii=False)
+
+    def summary(self, top: int = 15) -> Dict[str, Any]:
+        """
+        剖析摘要
+
+        Returns:
+            samples / duration_seconds / interval_ms / threads，
+            以及按自身耗时（top_self）与包含子调用耗时（top_inclusive）排序的热点帧
+        """
+        total = sum(self._weights.values())
+        self_time: Counter = Counter()
+        inclusive: Counter = Counter()
+        threads = set()
+        for stack, weight in self._weights.items():
+            threads.add(stack[0])
+            frames = stack[1:]
+            if frames:
+                self_time[frames[-1]] += weight
+            for label in set(frames):
+                inclusive[label] += weight
+
+        def _rank(counter: Counter) -> List[Dict[str, Any]]:
+            return [
+                {
+                    "frame": label,
+                    "seconds": round(seconds, 3),
+                    "percent": round(seconds / total * 100, 1) if total else 0.0,
+                }
+                for label, seconds in counter.most_common(top)
+            ]
+
+        return {
+            "samples": self.sample_count,
+            "duration_seconds": round(self.duration, 3),
+            "interval_ms": round(self.interval * 1000, 3),
+            "threads": sorted(threads),
+            "top_self": _rank(self_time),
+            "top_inclusive": _rank(inclusive),
+        }
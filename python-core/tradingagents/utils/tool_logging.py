@@ -4,6 +4,7 @@
 为所有工具调用添加统一的日志记录
 """
 
+import logging
 import time
 import functools
 from typing import Any, Dict, Optional, Callable
@@ -22,6 +23,22 @@ logger = get_logger('agents')
 tool_logger = get_logger("tools")
 
 
+def _preview(value: Any, limit: int = 100) -> str:
+    """截断后的字符串预览（只调用一次 str）"""
+    text = str(value)
+    return text[:limit] + '...' if len(text) > limit else text
+
+
+def _preview_args(args: tuple, kwargs: dict) -> Dict[str, Any]:
+    """参数预览信息"""
+    args_info: Dict[str, Any] = {}
+    if args:
+        args_info['args'] = [_preview(arg) for arg in args]
+    if kwargs:
+        args_info['kwargs'] = {k: _preview(v) for k, v in kwargs.items()}
+    return args_info
+
+
 def log_tool_call(tool_name: Optional[str] = None, log_args: bool = True, log_result: bool = False):
     """
     工具调用日志装饰器
@@ -40,30 +57,17 @@ def log_tool_call(tool_name: Optional[str] = None, log_args: bool = True, log_re
             # 记录开始时间
             start_time = time.time()
 
-            # 准备参数信息
-            args_info = {}
-            if log_args:
-                # 记录位置参数
-                if args:
-                    args_info['args'] = [str(arg)[:100] + '...' if len(str(arg)) > 100 else str(arg) for arg in args]
-
-                # 记录关键字参数
-                if kwargs:
-                    args_info['kwargs'] = {
-                        k: str(v)[:100] + '...' if len(str(v)) > 100 else str(v)
-                        for k, v in kwargs.items()
+            # 记录工具调用开始（参数预览、时间戳仅在 INFO 级别启用时生成）
+            if tool_logger.isEnabledFor(logging.INFO):
+                tool_logger.info(
+                    f"🔧 [工具调用] {name} - 开始",
+                    extra={
+                        'tool_name': name,
+                        'event_type': 'tool_call_start',
+                        'timestamp': datetime.now(ZoneInfo(get_timezone_name())).isoformat(),
+                        'args_info': _preview_args(args, kwargs) if log_args else None
                     }
-
-            # 记录工具调用开始
-            tool_logger.info(
-                f"🔧 [工具调用] {name} - 开始",
-                extra={
-                    'tool_name': name,
-                    'event_type': 'tool_call_start',
-                    'timestamp': datetime.now(ZoneInfo(get_timezone_name())).isoformat(),
-                    'args_info': args_info if log_args else None
-                }
-            )
+                )
 
             try:
                 # 执行工具函数
@@ -72,23 +76,18 @@ def log_tool_call(tool_name: Optional[str] = None, log_args: bool = True, log_re
                 # 计算执行时间
                 duration = time.time() - start_time
 
-                # 准备结果信息
-                result_info = None
-                if log_result and result is not None:
-                    result_str = str(result)
-                    result_info = result_str[:200] + '...' if len(result_str) > 200 else result_str
-
                 # 记录工具调用成功
-                tool_logger.info(
-                    f"✅ [工具调用] {name} - 完成 (耗时: {duration:.2f}s)",
-                    extra={
-                        'tool_name': name,
-                        'event_type': 'tool_call_success',
-                        'duration': duration,
-                        'result_info': result_info if log_result else None,
-                        'timestamp': datetime.now(ZoneInfo(get_timezone_name())).isoformat()
-                    }
-                )
+                if tool_logger.isEnabledFor(logging.INFO):
+                    tool_logger.info(
+                        f"✅ [工具调用] {name} - 完成 (耗时: {duration:.2f}s)",
+                        extra={
+                            'tool_name': name,
+                            'event_type': 'tool_call_success',
+                            'duration': duration,
+                            'result_info': _preview(result, 200) if log_result and result is not None else None,
+                            'timestamp': datetime.now(ZoneInfo(get_timezone_name())).isoformat()
+                        }
+                    )
 
                 return result
 
@@ -0,0 +1,198 @@
+"""
+Token 使用量汇总（rollup）
+- 每条使用记录按 (粒度, 时间桶, 供应商, 模型, 用户, 货币) 累加到汇总文档（$inc upsert）
+- 粒度：hour（YYYY-MM-DDTHH）与 day（YYYY-MM-DD），时间桶直接取记录 timestamp 的前缀
+- 统计查询：窗口首日的不完整部分读小时汇总，其余整天读日汇总，查询量为 O(天数)
+- 历史回填：汇总累加成功后原始记录才带 _rolled_up 标记；回填前以条件 upsert 认领标记文档，
+  多个进程（app 启动任务、tradingagents MongoDBStorage）同时启动时只有一个执行回填；
+  回填失败时释放标记，进程崩溃遗留的未完成标记超过 BACKFILL_STALE_SECONDS 后可被重新认领
+"""
+from __future__ import annotations
+
+import os
+import socket
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+ROLLUP_COLLECTION = "token_usage_rollups"
+ROLLUP_KEY_FIELDS = ("granularity", "bucket", "provider", "model_name", "user_id", "currency")
+ROLLUP_COUNTERS = ("requests", "input_tokens", "output_tokens", "cost")
+
+# 原始记录标记：写入时已同步更新汇总，回填时跳过
+ROLLED_UP_FIELD = "_rolled_up"
+# 回填标记文档（存放在汇总集合中，不带时间桶，不会被统计查询与过期清理命中）
+BACKFILL_MARKER_ID = "backfill"
+BACKFILL_SOURCE_QUERY = {ROLLED_UP_FIELD: {"$ne": True}}
+# 未完成的回填标记超过该时长（秒）视为认领方已崩溃，可被重新认领
+BACKFILL_STALE_SECONDS = 3600
+
+
+def rollup_buckets(timestamp: str) -> List[Tuple[str, str]]:
+    """记录时间戳对应的 (粒度, 时间桶) 列表"""
+    return [("hour", timestamp[:13]), ("day", timestamp[:10])]
+
+
+def rollup_key(granularity: str, bucket: str, record: Dict[str, Any]) -> Tuple:
+    return (
+        granularity,
+        bucket,
+        record.get("provider") or "unknown",
+        record.get("model_name") or "unknown",
+        record.get("user_id") or "",
+        record.get("currency") or "CNY",
+    )
+
+
+class RollupAccumulator:
+    """在内存中合并多条记录的增量，flush 时每个汇总文档只需一次 $inc"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple, Dict[str, float]] = {}
+
+    def add(self, record: Dict[str, Any]):
+        timestamp = str(record.get("timestamp") or "")
+        if len(timestamp) < 13:
+            return
+        for granularity, bucket in rollup_buckets(timestamp):
+            counters = self._pending.setdefault(
+                rollup_key(granularity, bucket, record),
+                {"requests": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0},
+            )
+            counters["requests"] += 1
+            counters["input_tokens"] += int(record.get("input_tokens") or 0)
+            counters["output_tokens"] += int(record.get("output_tokens") or 0)
+            counters["cost"] += float(record.get("cost") or 0.0)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def drain(self) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """取出所有待写入的 (filter, update) 并清空"""
+        ops = [
+            (dict(zip(ROLLUP_KEY_FIELDS, key)), {"$inc": counters})
+            for key, counters in self._pending.items()
+        ]
+        self._pending = {}
+        return ops
+
+
+def backfill_owner(role: str) -> str:
+    """回填认领方标识（主机名 + 进程号 + 随机后缀，不同容器中的相同进程号不会混淆）"""
+    return f"{role}:{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def backfill_claim(owner: str, now: Optional[datetime] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    回填认领的 (filter, update)
+
+    以 upsert=True 执行：标记文档不存在时插入，未完成且已超时的标记被改写为本进程认领，
+    两种情况 backfill_claimed 均为 True；标记已完成或仍在进行时 filter 不匹配，
+    upsert 因 _id 重复抛出 DuplicateKeyError，表示已由其他进程负责
+    """
+    now = now or datetime.now(timezone.utc)
+    return (
+        {"_id": BACKFILL_MARKER_ID, "completed_at": {"$exists": False},
+         "started_at": {"$lt": now - timedelta(seconds=BACKFILL_STALE_SECONDS)}},
+        {"$set": {"granularity": "backfill", "owner": owner, "started_at": now}},
+    )
+
+
+def backfill_claimed(result) -> bool:
+    """认领 update_one 的结果是否表示本进程取得回填权"""
+    return result.upserted_id is not None or bool(result.modified_count)
+
+
+def backfill_release(owner: str) -> Dict[str, Any]:
+    """回填失败时删除本进程持有的未完成标记（delete_one 的 filter），让其他进程可以重试"""
+    return {"_id": BACKFILL_MARKER_ID, "owner": owner, "completed_at": {"$exists": False}}
+
+
+def backfill_done(rollups: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """回填完成后更新标记文档的 (filter, update)"""
+    return (
+        {"_id": BACKFILL_MARKER_ID},
+        {"$set": {"completed_at": datetime.now(timezone.utc), "rollups": rollups}},
+    )
+
+
+def rollup_window_query(
+    start: datetime,
+    end: datetime,
+    provider: Optional[str] = None,
+    model_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    统计窗口 [start, end] 对应的汇总查询条件
+
+    首日从 start 所在小时起读小时汇总，之后的整天读日汇总
+    """
+    start_hour = start.isoformat()[:13]
+    next_day = (start + timedelta(days=1)).strftime("%Y-%m-%d")
+    end_hour = end.isoformat()[:13]
+    end_day = end.strftime("%Y-%m-%d")
+
+    # 窗口不足一天时小时桶截止到 end 所在小时（"~" 大于任何数字字符）
+    query: Dict[str, Any] = {"$or": [
+        {"granularity": "hour", "bucket": {"$gte": start_hour, "$lt": min(next_day, end_hour + "~")}},
+        {"granularity": "day", "bucket": {"$gte": next_day, "$lte": end_day}},
+    ]}
+    if provider:
+        query["provider"] = provider
+    if model_name:
+        query["model_name"] = model_name
+    return query
+
+
+def _empty_group() -> Dict[str, Any]:
+    return {"requests": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0,
+            "cost_by_currency": defaultdict(float)}
+
+
+def summarize_rollups(docs: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并汇总文档为统计结果
+
+    Returns:
+        与原始记录统计相同的结构：total_*、cost_by_currency、by_provider、by_model、by_date
+    """
+    totals = {"total_requests": 0, "total_input_tokens": 0, "total_output_tokens": 0, "total_cost": 0.0}
+    cost_by_currency: Dict[str, float] = defaultdict(float)
+    by_provider = defaultdict(_empty_group)
+    by_model = defaultdict(_empty_group)
+    by_date = defaultdict(_empty_group)
+
+    for doc in docs:
+        requests = int(doc.get("requests") or 0)
+        input_tokens = int(doc.get("input_tokens") or 0)
+        output_tokens = int(doc.get("output_tokens") or 0)
+        cost = float(doc.get("cost") or 0.0)
+        currency = doc.get("currency") or "CNY"
+        provider = doc.get("provider") or "unknown"
+        model_key = f"{provider}/{doc.get('model_name') or 'unknown'}"
+        date_key = str(doc.get("bucket") or "")[:10]
+
+        totals["total_requests"] += requests
+        totals["total_input_tokens"] += input_tokens
+        totals["total_output_tokens"] += output_tokens
+        totals["total_cost"] += cost
+        cost_by_currency[currency] += cost
+
+        for group in (by_provider[provider], by_model[model_key], by_date[date_key]):
+            group["requests"] += requests
+            group["input_tokens"] += input_tokens
+            group["output_tokens"] += output_tokens
+            group["cost"] += cost
+            group["cost_by_currency"][currency] += cost
+
+    def _plain(groups):
+        return {k: {**v, "cost_by_currency": dict(v["cost_by_currency"])} for k, v in groups.items()}
+
+    return {
+        **totals,
+        "cost_by_currency": dict(cost_by_currency),
+        "by_provider": _plain(by_provider),
+        "by_model": _plain(by_model),
+        "by_date": _plain(by_date),
+    }